@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita la Message Batches API de Claude
+Sirve para probar el modo batch de LUC1 sin consumir la API real.
+Puerto: 8010 (CLAUDE_BATCH_API_URL=http://localhost:8010/v1/messages/batches)
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+# Número de consultas de estado antes de dar un lote por terminado
+POLLS_UNTIL_ENDED = int(os.getenv('BATCH_STUB_POLLS', 1))
+
+STUB_ANALYSIS = """Análisis simulado por el servidor batch local.
+
+TRANSPORTISTA_RECOMENDADO: timocom
+PRECIO_BASE_OPTIMO: €3000
+MARGEN_SUGERIDO: 18%
+PRECIO_FINAL_CLIENTE: €3540
+CONFIANZA_DECISION: 80%
+NIVEL_SERVICIO: Estándar
+RESTRICCIONES_IMPACTO: Bajo
+ALERTAS_CRITICAS: Ninguna
+RECOMENDACIONES_ESPECIALES: Ninguna
+JUSTIFICACION: Respuesta fija del servidor de pruebas."""
+
+
+def create_app(polls_until_ended: int = POLLS_UNTIL_ENDED) -> FastAPI:
+    """Crear la app del servidor simulado (una instancia = un estado aislado)"""
+    app = FastAPI(title="Claude Message Batches - stand-in local")
+    batches = {}
+    app.state.batches = batches
+
+    def _batch_view(request: Request, batch: dict) -> dict:
+        canceled = batch.get('canceled', False)
+        ended = canceled or batch['polls'] >= polls_until_ended
+        total = len(batch['requests'])
+        return {
+            'id': batch['id'],
+            'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': {
+                'processing': 0 if ended else total,
+                'succeeded': total if ended and not canceled else 0,
+                'errored': 0, 'canceled': total if canceled else 0, 'expired': 0
+            },
+            'created_at': batch['created_at'],
+            'results_url': str(request.url_for('batch_results', batch_id=batch['id'])) if ended else None
+        }
+
+    @app.post("/v1/messages/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        batches[batch_id] = {
+            'id': batch_id,
+            'requests': body.get('requests', []),
+            'polls': 0,
+            'created_at': datetime.now().isoformat()
+        }
+        return _batch_view(request, batches[batch_id])
+
+    @app.get("/v1/messages/batches/{batch_id}")
+    async def retrieve_batch(batch_id: str, request: Request):
+        if batch_id not in batches:
+            raise HTTPException(status_code=404, detail="batch not found")
+        batches[batch_id]['polls'] += 1
+        return _batch_view(request, batches[batch_id])
+
+    @app.post("/v1/messages/batches/{batch_id}/cancel")
+    async def cancel_batch(batch_id: str, request: Request):
+        if batch_id not in batches:
+            raise HTTPException(status_code=404, detail="batch not found")
+        batches[batch_id]['canceled'] = True
+        return _batch_view(request, batches[batch_id])
+
+    @app.get("/v1/messages/batches/{batch_id}/results", name="batch_results")
+    async def batch_results(batch_id: str):
+        if batch_id not in batches:
+            raise HTTPException(status_code=404, detail="batch not found")
+
+        lines = []
+        for item in batches[batch_id]['requests']:
+            params = item.get('params', {})
+            if batches[batch_id].get('canceled'):
+                result = {'type': 'canceled'}
+            elif not params.get('messages'):
+                result = {'type': 'errored',
+                          'error': {'type': 'error', 'error': {'type': 'invalid_request_error',
+                                                               'message': 'messages: field required'}}}
+            else:
+                result = {'type': 'succeeded',
+                          'message': {'model': params.get('model'), 'role': 'assistant',
+                                      'content': [{'type': 'text', 'text': STUB_ANALYSIS}]}}
+            lines.append(json.dumps({'custom_id': item['custom_id'], 'result': result}, ensure_ascii=False))
+
+        return PlainTextResponse("\n".join(lines) + "\n", media_type="application/x-jsonl")
+
+    return app
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("BATCH_STUB_PORT", 8010)))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker para servicios externos de LUC1
+Tras varios fallos seguidos deja de llamar al servicio durante un tiempo y
+después deja pasar una única petición de prueba (half-open). Con window_size
+también abre por la tasa de errores o de llamadas lentas de las últimas
+llamadas, aunque los fallos no sean consecutivos.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from loguru import logger
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: el servicio se considera caído"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 window_size: int = 0, error_rate: float = 0.5, slow_call_seconds: float = None,
+                 slow_call_rate: float = 0.5, min_calls: int = 10):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # Ventana móvil de las últimas llamadas: (fallida, lenta)
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self._window = deque(maxlen=window_size) if window_size else None
+
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        elif self._state == self.HALF_OPEN and self._probe_in_flight \
+                and now - self._probe_started >= self.reset_timeout:
+            # La prueba anterior nunca informó del resultado: permitir otra
+            self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Indica si se puede llamar al servicio ahora mismo"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def release_probe(self):
+        """La prueba half-open terminó sin resultado (cancelada, 429...): otra llamada puede probar"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _is_slow(self, duration: float = None) -> bool:
+        return self.slow_call_seconds is not None and duration is not None and duration >= self.slow_call_seconds
+
+    def _rates(self) -> tuple:
+        """(tasa de errores, tasa de lentas) de la ventana; None si aún no hay llamadas suficientes"""
+        if self._window is None or len(self._window) < self.min_calls:
+            return None
+        calls = len(self._window)
+        return (sum(failed for failed, _ in self._window) / calls,
+                sum(slow for _, slow in self._window) / calls)
+
+    def _open(self, reason: str):
+        if self._state != self.OPEN:
+            logger.warning(f"Circuito {self.name} abierto: {reason}")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        if self._window is not None:
+            self._window.clear()
+
+    def _check_window(self):
+        rates = self._rates()
+        if rates and rates[0] >= self.error_rate:
+            self._open(f"{rates[0]:.0%} de errores en las últimas {len(self._window)} llamadas")
+        elif rates and rates[1] >= self.slow_call_rate:
+            self._open(f"{rates[1]:.0%} de llamadas lentas en las últimas {len(self._window)} llamadas")
+
+    def record_success(self, duration: float = None):
+        """Llamada correcta; duration (s) cuenta para la tasa de llamadas lentas"""
+        with self._lock:
+            slow = self._is_slow(duration)
+            # Una prueba half-open lenta no basta para cerrar el circuito
+            if self._state == self.HALF_OPEN and slow:
+                self._open(f"prueba lenta ({duration:.1f} s)")
+                return
+            if self._state != self.CLOSED:
+                logger.info(f"Circuito {self.name} cerrado de nuevo")
+                if self._window is not None:
+                    self._window.clear()
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            if self._window is not None:
+                self._window.append((False, slow))
+                self._check_window()
+
+    def record_failure(self, duration: float = None):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._open(f"tras {self._consecutive_failures} fallos")
+                return
+            if self._window is not None and self._state == self.CLOSED:
+                self._window.append((True, self._is_slow(duration)))
+                self._check_window()
+
+    def snapshot(self) -> Dict:
+        """Estado y tasas de la ventana para métricas"""
+        with self._lock:
+            self._refresh()
+            rates = self._rates()
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'calls': len(self._window) if self._window is not None else 0,
+                'error_rate': round(rates[0], 3) if rates else None,
+                'slow_rate': round(rates[1], 3) if rates else None,
+            }
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Modo batch de LUC1 para análisis masivos de transportistas
+Envía muchos análisis a la Message Batches API de Claude, espera a que
+terminen y devuelve los resultados a medida que llegan.
+"""
+
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, List, Set
+
+import httpx
+from loguru import logger
+
+# Límites de la Message Batches API (por lote)
+MAX_REQUESTS_PER_BATCH = int(os.getenv('CLAUDE_BATCH_MAX_REQUESTS', 100000))
+MAX_CONCURRENT_BATCHES = int(os.getenv('CLAUDE_BATCH_MAX_CONCURRENT', 4))
+MAX_BYTES_PER_BATCH = int(os.getenv('CLAUDE_BATCH_MAX_BYTES', 256 * 1024 * 1024))
+
+DEFAULT_BATCH_API_URL = "https://api.anthropic.com/v1/messages/batches"
+DEFAULT_POLL_SECONDS = 30.0
+
+
+class ClaudeBatchClient:
+    """Cliente asíncrono mínimo para la Message Batches API"""
+
+    def __init__(self, api_key: str = None, api_url: str = None,
+                 transport: httpx.AsyncBaseTransport = None):
+        self.api_key = api_key if api_key is not None else os.getenv('CLAUDE_API_KEY', '')
+        self.api_url = (api_url or os.getenv('CLAUDE_BATCH_API_URL', DEFAULT_BATCH_API_URL)).rstrip('/')
+        # transport permite inyectar el servidor local de pruebas (ASGI)
+        self.transport = transport
+
+    def _headers(self) -> Dict:
+        return {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(headers=self._headers(), timeout=60, transport=self.transport)
+
+    async def create_batch(self, requests: List[Dict]) -> Dict:
+        """Crear un lote. Cada elemento es {'custom_id': ..., 'params': {...}}"""
+        async with self._client() as client:
+            response = await client.post(self.api_url, json={"requests": requests})
+            response.raise_for_status()
+            return response.json()
+
+    async def retrieve_batch(self, batch_id: str) -> Dict:
+        """Consultar el estado de un lote"""
+        async with self._client() as client:
+            response = await client.get(f"{self.api_url}/{batch_id}")
+            response.raise_for_status()
+            return response.json()
+
+    async def cancel_batch(self, batch_id: str) -> Dict:
+        """Cancelar un lote en curso (las peticiones ya procesadas conservan su resultado)"""
+        async with self._client() as client:
+            response = await client.post(f"{self.api_url}/{batch_id}/cancel")
+            response.raise_for_status()
+            return response.json()
+
+    async def iter_results(self, batch: Dict) -> AsyncIterator[Dict]:
+        """Leer los resultados (JSONL) de un lote terminado, línea a línea"""
+        results_url = batch.get('results_url') or f"{self.api_url}/{batch['id']}/results"
+        async with self._client() as client:
+            async with client.stream("GET", results_url) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class BatchAnalysisRunner:
+    """
+    Ejecuta análisis de transportistas en modo batch.
+    Trocea las peticiones según los límites del API (número y tamaño),
+    mantiene como mucho MAX_CONCURRENT_BATCHES lotes en vuelo y emite cada
+    resultado en cuanto su lote termina. Si el consumidor se va antes de
+    tiempo, los lotes sin terminar se cancelan también en el API.
+    """
+
+    def __init__(self, handler, client: ClaudeBatchClient = None,
+                 poll_seconds: float = None, max_requests_per_batch: int = None,
+                 max_concurrent_batches: int = None, max_bytes_per_batch: int = None):
+        self.handler = handler
+        self.client = client or ClaudeBatchClient(api_key=handler.api_key)
+        self.poll_seconds = poll_seconds if poll_seconds is not None else float(
+            os.getenv('CLAUDE_BATCH_POLL_SECONDS', DEFAULT_POLL_SECONDS))
+        self.max_requests_per_batch = max_requests_per_batch or MAX_REQUESTS_PER_BATCH
+        self.max_concurrent_batches = max_concurrent_batches or MAX_CONCURRENT_BATCHES
+        self.max_bytes_per_batch = max_bytes_per_batch or MAX_BYTES_PER_BATCH
+        # Cancelaciones en el API en curso (referencias para que no se recojan)
+        self._cancelling: Set[asyncio.Task] = set()
+
+    def _chunks(self, items: List[Dict]) -> List[List[Dict]]:
+        """Lotes con como mucho max_requests_per_batch peticiones y max_bytes_per_batch bytes"""
+        chunks, current, current_bytes = [], [], 0
+        for item in items:
+            size = len(json.dumps(item, ensure_ascii=False).encode('utf-8')) + 1
+            if current and (len(current) >= self.max_requests_per_batch
+                            or current_bytes + size > self.max_bytes_per_batch):
+                chunks.append(current)
+                current, current_bytes = [], 0
+            current.append(item)
+            current_bytes += size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _cancel_upstream(self, batch_ids: List[str]):
+        """
+        Cancelar lotes en el API en una tarea aparte: quien llama puede estar
+        siendo cancelado (desconexión del cliente) y no podría esperar
+        """
+        task = asyncio.get_running_loop().create_task(self._cancel_batches(batch_ids))
+        self._cancelling.add(task)
+        task.add_done_callback(self._cancelling.discard)
+
+    async def _cancel_batches(self, batch_ids: List[str]):
+        for batch_id in batch_ids:
+            try:
+                await self.client.cancel_batch(batch_id)
+                logger.info(f"Batch {batch_id} cancelado")
+            except Exception as e:
+                logger.warning(f"No se pudo cancelar el batch {batch_id}: {e}")
+
+    def _cancel_once_created(self, create: asyncio.Future):
+        """El lote se estaba creando al cancelar: cancelarlo en cuanto exista"""
+        if not create.cancelled() and create.exception() is None:
+            self._cancel_upstream([create.result()['id']])
+
+    async def _wait_for_batch(self, batch: Dict) -> Dict:
+        while batch.get('processing_status') != 'ended':
+            await asyncio.sleep(self.poll_seconds)
+            batch = await self.client.retrieve_batch(batch['id'])
+            logger.debug(f"Batch {batch['id']}: {batch.get('request_counts')}")
+        return batch
+
+    @staticmethod
+    def _parse_result(entry: Dict) -> Dict:
+        """Convertir una línea de resultados del API al formato del endpoint"""
+        result = entry.get('result', {})
+        if result.get('type') == 'succeeded':
+            content = result.get('message', {}).get('content', [])
+            text = "".join(block.get('text', '') for block in content if block.get('type') == 'text')
+            return {'success': True, 'analysis': text}
+
+        error = result.get('error', {})
+        if isinstance(error, dict) and 'error' in error:
+            error = error['error']
+        message = error.get('message') if isinstance(error, dict) else None
+        return {'success': False, 'error': message or result.get('type', 'unknown')}
+
+    async def _run_chunk(self, chunk: List[Dict], semaphore: asyncio.Semaphore,
+                         queue: asyncio.Queue, active: Set[str]):
+        pending = {item['custom_id'] for item in chunk}
+        error = 'missing result'
+        async with semaphore:
+            try:
+                create = asyncio.ensure_future(self.client.create_batch(chunk))
+                try:
+                    batch = await asyncio.shield(create)
+                except asyncio.CancelledError:
+                    create.add_done_callback(self._cancel_once_created)
+                    raise
+                active.add(batch['id'])
+                logger.info(f"Batch {batch['id']} enviado con {len(chunk)} analisis")
+                batch = await self._wait_for_batch(batch)
+                # Terminado: ya no hay nada que cancelar
+                active.discard(batch['id'])
+                async for entry in self.client.iter_results(batch):
+                    if entry.get('custom_id') in pending:
+                        pending.discard(entry['custom_id'])
+                        await queue.put((entry['custom_id'], self._parse_result(entry)))
+            except Exception as e:
+                logger.error(f"Error procesando batch: {e}")
+                error = str(e)
+
+        # Cualquier petición sin resultado se reporta como fallida
+        for custom_id in pending:
+            await queue.put((custom_id, {'success': False, 'error': error}))
+
+    async def run(self, analyses: List[Dict]) -> AsyncIterator[Dict]:
+        """
+        Procesar análisis en lote.
+
+        Args:
+            analyses: lista de {'prompt', 'sessionId', 'context'}
+
+        Yields:
+            Un dict por análisis, en orden de llegada (no de envío)
+        """
+        requests_by_id = {}
+        batch_requests = []
+        for index, analysis in enumerate(analyses):
+            custom_id = f"analysis-{index}"
+            requests_by_id[custom_id] = analysis
+            batch_requests.append({
+                'custom_id': custom_id,
+                'params': self.handler.build_analysis_params(analysis['prompt'])
+            })
+
+        if not batch_requests:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        # Lotes creados en el API que aún no han terminado
+        active: Set[str] = set()
+        tasks = [
+            asyncio.create_task(self._run_chunk(chunk, semaphore, queue, active))
+            for chunk in self._chunks(batch_requests)
+        ]
+
+        try:
+            for _ in range(len(batch_requests)):
+                custom_id, outcome = await queue.get()
+                original = requests_by_id.get(custom_id, {})
+                yield {
+                    **outcome,
+                    'sessionId': original.get('sessionId'),
+                    'context': original.get('context'),
+                    'mode': 'batch'
+                }
+        finally:
+            for task in tasks:
+                task.cancel()
+            if active:
+                self._cancel_upstream(list(active))
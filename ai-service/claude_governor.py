@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Gobernador de llamadas a la API de Claude
+Limita la concurrencia por modelo entre todas las sesiones, ordena la cola
+por prioridad (chat en vivo antes que análisis batch), reintenta 429/529
+respetando retry-after con backoff exponencial con jitter y corta el
+tráfico con un circuit breaker cuando el modelo está caído.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+from loguru import logger
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from claude_hedging import HedgeCancelled
+from timeout_policy import DeadlineExceeded, remaining_seconds
+
+# Prioridades (menor = antes)
+PRIORITY_CHAT = 0
+PRIORITY_BATCH = 10
+
+# Códigos que indican saturación o fallo transitorio del API
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+
+
+class GovernorTimeout(Exception):
+    """La petición esperó en cola más de lo permitido"""
+
+
+class _ModelLane:
+    """Estado de concurrencia y cola de un modelo"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters = []  # heap de (prioridad, orden, ticket)
+        self.blocked_until = 0.0  # retry-after global del modelo
+
+
+class ClaudeGovernor:
+    def __init__(self, limits: Dict[str, int] = None, default_limit: int = 4,
+                 max_retries: int = 3, base_backoff: float = 0.5, max_backoff: float = 20.0,
+                 max_queue_wait: float = 20.0, breaker_threshold: int = 5,
+                 breaker_reset: float = 30.0):
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_queue_wait = max_queue_wait
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+
+    def _lane(self, model: str) -> _ModelLane:
+        if model not in self._lanes:
+            self._lanes[model] = _ModelLane(self.limits.get(model, self.default_limit))
+        return self._lanes[model]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        with self._cond:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(
+                    f"claude:{model}", self.breaker_threshold, self.breaker_reset)
+            return self._breakers[model]
+
+    def is_available(self, model: str) -> bool:
+        """False si el circuito del modelo está abierto"""
+        return self.breaker(model).state != CircuitBreaker.OPEN
+
+    def _queue_timeout(self) -> float:
+        """Espera máxima en cola: max_queue_wait sin pasar del plazo de la petición"""
+        remaining = remaining_seconds()
+        return self.max_queue_wait if remaining is None else max(0.0, min(self.max_queue_wait, remaining))
+
+    def acquire(self, model: str, priority: int = PRIORITY_CHAT,
+                cancel_event: threading.Event = None, timeout: float = None):
+        """Esperar turno para `model` respetando prioridad, límite y retry-after"""
+        timeout = timeout if timeout is not None else self.max_queue_wait
+        deadline = time.monotonic() + timeout
+        ticket = object()
+
+        with self._cond:
+            lane = self._lane(model)
+            heapq.heappush(lane.waiters, (priority, next(self._sequence), ticket))
+            try:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise HedgeCancelled(model)
+
+                    now = time.monotonic()
+                    at_head = lane.waiters[0][2] is ticket
+                    if at_head and lane.in_flight < lane.limit and now >= lane.blocked_until:
+                        heapq.heappop(lane.waiters)
+                        lane.in_flight += 1
+                        return
+
+                    if now >= deadline:
+                        raise GovernorTimeout(f"{model}: sin turno tras {timeout:.1f}s en cola")
+
+                    wake_at = deadline
+                    if lane.blocked_until > now:
+                        wake_at = min(wake_at, lane.blocked_until)
+                    if cancel_event is not None:
+                        wake_at = min(wake_at, now + 0.1)
+                    self._cond.wait(timeout=max(0.0, wake_at - now))
+            except BaseException:
+                lane.waiters = [w for w in lane.waiters if w[2] is not ticket]
+                heapq.heapify(lane.waiters)
+                self._cond.notify_all()
+                raise
+
+    def release(self, model: str):
+        with self._cond:
+            self._lane(model).in_flight -= 1
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial con full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        return getattr(error, 'status_code', None) in RETRYABLE_STATUS
+
+    def execute(self, fn: Callable, model: str, priority: int = PRIORITY_CHAT,
+                cancel_event: threading.Event = None):
+        """
+        Ejecutar fn() para `model` bajo el gobernador.
+        Reintenta errores transitorios y propaga el último error si se agotan.
+        """
+        breaker = self.breaker(model)
+
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"claude:{model}")
+
+            # Si el intento acaba sin resultado (cancelado, 429...), la prueba half-open queda libre
+            recorded = False
+            try:
+                self.acquire(model, priority, cancel_event, timeout=self._queue_timeout())
+                try:
+                    result = fn()
+                    breaker.record_success()
+                    recorded = True
+                    return result
+                finally:
+                    self.release(model)
+            except (HedgeCancelled, DeadlineExceeded, GovernorTimeout):
+                # Ni cancelación ni plazo vencido ni la espera en cola son fallos del modelo
+                raise
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                retry_after: Optional[float] = getattr(e, 'retry_after', None)
+
+                # 429 es limitación de cuota, no caída: no abre el circuito
+                if status != 429 and (self._is_retryable(e) or status is None):
+                    breaker.record_failure()
+                    recorded = True
+
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    raise
+
+                if retry_after is not None:
+                    delay = retry_after
+                    with self._cond:
+                        lane = self._lane(model)
+                        lane.blocked_until = max(lane.blocked_until, time.monotonic() + retry_after)
+                else:
+                    delay = self._backoff(attempt)
+
+                # Un retry-after más largo que el plazo de la petición no se espera
+                remaining = remaining_seconds()
+                if remaining is not None and delay >= remaining:
+                    logger.warning(f"Claude {model}: reintento en {delay:.1f}s supera el plazo "
+                                   f"restante ({max(remaining, 0):.1f}s)")
+                    raise
+
+                logger.warning(f"Claude {model} error {status or type(e).__name__}, "
+                               f"reintento {attempt + 1}/{self.max_retries} en {delay:.1f}s")
+                if cancel_event is not None:
+                    if cancel_event.wait(timeout=delay):
+                        raise HedgeCancelled(model)
+                else:
+                    time.sleep(delay)
+            finally:
+                if not recorded:
+                    breaker.release_probe()
@@ -8,15 +8,35 @@ import requests
 import json
 import os
 import sys
+import threading
 import time
 from datetime import datetime, timedelta
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from loguru import logger
 
 # Agregar el directorio actual al path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from claude_hedging import CancellableSession, HedgeCancelEvent, HedgedCaller, HedgeCancelled
+from claude_governor import ClaudeGovernor, GovernorTimeout, PRIORITY_BATCH, PRIORITY_CHAT
+from circuit_breaker import CircuitOpenError
+from model_router import ModelRouter, TurnLogger, estimate_cost
+from reply_validator import asks_for_collected, is_reask_complaint, requested_fields, validate_reply
+from quote_parser import parse_number, parse_pickup_date, parse_volume, parse_weight_kg
+from structured_extraction import QUOTATION_TOOL, QUOTATION_TOOL_NAME, validate_structured_fields
+from pickup_optimizer import PickupDateOptimizer
+from load_planner import chat_shipment, ltl_price, plan_load, truck_share
+from multi_stop import MultiStopQuoter
+from quote_graph import QuoteGraph
+from quote_idempotency import IdempotentQuotes, idempotency_key
+from quote_prefetch import QuotePrefetcher, backend_precomputed
+from quote_progress import (BACKEND_QUOTE_SAVED, RESTRICTIONS_CHECKED, ROUTE_RESOLVED, TOLLS_COMPUTED,
+                            QuoteProgress)
+from route_countries import fallback_path, get_country_grid, scale_country_km
+from timeout_policy import TIMEOUTS, check_deadline, deadline_capped
+from toll_estimator import estimate_route_tolls
+
 try:
     from european_logistics import EuropeanLogisticsService
     LOGISTICS_SERVICE_AVAILABLE = True
@@ -27,6 +47,113 @@ except ImportError:
 MAX_SESSIONS = 100
 SESSION_TTL_SECONDS = 30 * 60  # 30 minutes
 
+
+class ClaudeAPIError(Exception):
+    """Respuesta no válida de la API de Claude"""
+
+    def __init__(self, status_code: int, body: str = "", retry_after: float = None):
+        super().__init__(f"Claude API error: {status_code}")
+        self.status_code = status_code
+        self.body = body
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_response(cls, response) -> 'ClaudeAPIError':
+        retry_after = response.headers.get('retry-after')
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        return cls(response.status_code, response.text, retry_after)
+
+
+# Análisis estructurado devuelto cuando Claude no está disponible en modo agente
+FALLBACK_ANALYSIS = """Análisis realizado con datos disponibles.
+
+TRANSPORTISTA_RECOMENDADO: timocom
+PRECIO_BASE_OPTIMO: €3200
+MARGEN_SUGERIDO: 20%
+PRECIO_FINAL_CLIENTE: €3840
+CONFIANZA_DECISION: 75%
+NIVEL_SERVICIO: Estándar
+RESTRICCIONES_IMPACTO: Medio
+ALERTAS_CRITICAS: Verificar disponibilidad de transportista
+RECOMENDACIONES_ESPECIALES: Confirmar fechas con transportista
+JUSTIFICACION: Análisis basado en promedio de mercado. Sistema de IA temporalmente no disponible."""
+
+class DialoguePolicy:
+    """
+    Política de diálogo determinista para turnos rutinarios de recopilación.
+    Si el usuario responde a la pregunta pendiente (o confirma) y no hay nada
+    ambiguo, la siguiente pregunta sale de una plantilla sin llamar a Claude.
+    Devuelve None cuando el turno debe pasar al modelo.
+    """
+
+    QUESTION_TEMPLATES = {
+        'origen': "¿Desde qué ciudad española sale la mercancía?",
+        'destino': "¿Cuál es la ciudad de destino?",
+        'peso_kg': "¿Cuál es el peso total de la carga (en kg o toneladas)?",
+        'volumen_m3': "¿Qué volumen ocupa la carga en m³? También me sirven las dimensiones o el número de palés.",
+        'tipo_carga': "¿Qué tipo de carga es: general, forestales, ADR (peligrosa), refrigerado o especial?",
+        'fecha_recogida': "¿Qué fecha de recogida prefieres?",
+        'tipo_servicio': "¿Qué tipo de servicio prefieres: económico, estándar o express?",
+    }
+
+    FIELD_LABELS = {
+        'origen': lambda v: f"origen {v}",
+        'destino': lambda v: f"destino {v}",
+        'peso_kg': lambda v: f"{v:g} kg",
+        'volumen_m3': lambda v: f"{v:g} m³",
+        'tipo_carga': lambda v: f"carga {v}",
+        'fecha_recogida': lambda v: f"recogida el {v}",
+        'tipo_servicio': lambda v: f"servicio {v}",
+    }
+
+    CONFIRMATIONS = {'sí', 'si', 'ok', 'okay', 'vale', 'claro', 'correcto', 'exacto', 'perfecto',
+                     'de acuerdo', 'sí, correcto', 'si, correcto', 'adelante', 'eso es'}
+
+    # Indicadores de mensaje abierto o ambiguo que debe atender el modelo
+    OPEN_ENDED_PATTERN = re.compile(
+        r'\?|¿|\b(qu[eé]|c[oó]mo|por qu[eé]|cu[aá]nto cuesta|puedes|podr[ií]as|explica|ayuda|'
+        r'no|pero|aunque|cambia|mejor|en vez|otra vez|error)\b'
+    )
+
+    def __init__(self, required_fields: List[str]):
+        self.required_fields = required_fields
+
+    def _acknowledge(self, extracted: Dict) -> str:
+        parts = [self.FIELD_LABELS[f](extracted[f]) for f in self.required_fields if f in extracted]
+        return f"Perfecto: {', '.join(parts)}." if parts else "Perfecto."
+
+    def respond(self, message: str, extracted: Dict, quotation_data: Dict,
+                missing_fields: List[str], last_assistant_message: str = "") -> Optional[str]:
+        """Respuesta por plantilla para un turno rutinario, o None si hace falta Claude"""
+        if not missing_fields:
+            return None
+
+        text = message.lower().strip().rstrip('.!')
+        is_confirmation = text in self.CONFIRMATIONS
+        answered = {f for f in self.required_fields if f in extracted}
+
+        if is_confirmation:
+            # "ok" a una pregunta por un dato que falta no contesta nada
+            if requested_fields(last_assistant_message) & set(missing_fields):
+                return None
+        else:
+            if not answered or self.OPEN_ENDED_PATTERN.search(text):
+                return None
+            # Si había una pregunta pendiente, la respuesta debe contestarla
+            asked = requested_fields(last_assistant_message) & (set(missing_fields) | answered)
+            if asked and not asked & answered:
+                return None
+
+        next_field = missing_fields[0]
+        question = self.QUESTION_TEMPLATES[next_field]
+        if is_confirmation:
+            return question
+        return f"{self._acknowledge(extracted)} {question}"
+
+
 class LUC1ClaudeHandler:
     SONNET_MODEL = "claude-sonnet-4-20250514"
     HAIKU_MODEL = "claude-haiku-4-5-20251001"
@@ -38,16 +165,89 @@ class LUC1ClaudeHandler:
         'importa', 'exporta', 'almacén', 'almacen', 'palé', 'palet',
     ]
 
+    # Ciudades españolas reconocidas como origen
+    SPANISH_CITIES = [
+        'madrid', 'barcelona', 'valencia', 'sevilla', 'zaragoza', 'málaga',
+        'murcia', 'palma', 'las palmas', 'bilbao', 'alicante', 'córdoba',
+        'valladolid', 'vigo', 'gijón', 'la coruña', 'granada', 'vitoria',
+        'elche', 'santander', 'burgos', 'salamanca', 'tarragona'
+    ]
+
+    # Ciudades europeas reconocidas como destino (variante -> nombre normalizado)
+    EUROPEAN_CITIES = {
+        'parís': 'París', 'paris': 'París', 'lyon': 'Lyon', 'marsella': 'Marsella', 'niza': 'Niza',
+        'toulouse': 'Toulouse', 'burdeos': 'Burdeos', 'bordeaux': 'Burdeos',
+        'berlín': 'Berlín', 'berlin': 'Berlín', 'múnich': 'Múnich', 'munich': 'Múnich',
+        'hamburgo': 'Hamburgo', 'frankfurt': 'Frankfurt', 'colonia': 'Colonia', 'stuttgart': 'Stuttgart',
+        'roma': 'Roma', 'milán': 'Milán', 'milan': 'Milán', 'nápoles': 'Nápoles', 'napoles': 'Nápoles',
+        'turín': 'Turín', 'turin': 'Turín', 'florencia': 'Florencia', 'venecia': 'Venecia',
+        'ámsterdam': 'Ámsterdam', 'amsterdam': 'Ámsterdam', 'róterdam': 'Róterdam', 'rotterdam': 'Róterdam',
+        'utrecht': 'Utrecht', 'la haya': 'La Haya',
+        'bruselas': 'Bruselas', 'amberes': 'Amberes', 'gante': 'Gante', 'brujas': 'Brujas',
+        'zurich': 'Zurich', 'ginebra': 'Ginebra', 'berna': 'Berna', 'basilea': 'Basilea',
+        'viena': 'Viena', 'salzburgo': 'Salzburgo', 'innsbruck': 'Innsbruck', 'graz': 'Graz',
+        'lisboa': 'Lisboa', 'oporto': 'Oporto', 'braga': 'Braga', 'coimbra': 'Coimbra',
+        'praga': 'Praga', 'brno': 'Brno', 'ostrava': 'Ostrava',
+        'varsovia': 'Varsovia', 'cracovia': 'Cracovia', 'gdansk': 'Gdansk', 'wroclaw': 'Wroclaw'
+    }
+
     def __init__(self):
         """Inicializar LUC1 con Claude Sonnet 4 API"""
         self.api_key = os.getenv('CLAUDE_API_KEY', '')
         self.api_url = "https://api.anthropic.com/v1/messages"
         self.model = self.SONNET_MODEL  # Default model (used by analyze_direct)
+        # Espera máxima entre bytes del stream (la conexión usa el timeout adaptativo)
+        self.stream_read_timeout = float(os.getenv('CLAUDE_STREAM_READ_TIMEOUT_SECONDS', 120))
+
+        # Hedge hacia Haiku cuando el modelo principal tarda en dar el primer token
+        self.hedging_enabled = os.getenv('CLAUDE_HEDGING', 'true').lower() == 'true'
+        self.hedger = HedgedCaller()
+
+        # Concurrencia, cola con prioridad, reintentos y circuit breaker por modelo
+        self.governor = ClaudeGovernor(
+            limits={
+                self.SONNET_MODEL: int(os.getenv('CLAUDE_MAX_CONCURRENCY_SONNET', 4)),
+                self.HAIKU_MODEL: int(os.getenv('CLAUDE_MAX_CONCURRENCY_HAIKU', 8)),
+            },
+            max_retries=int(os.getenv('CLAUDE_MAX_RETRIES', 3)),
+            max_queue_wait=float(os.getenv('CLAUDE_MAX_QUEUE_SECONDS', 20)),
+        )
+
+        # Modo cascada: Haiku primero con escalado a Sonnet (sustituye al router)
+        self.cascade_enabled = os.getenv('CLAUDE_CASCADE', 'false').lower() == 'true'
+        self.cascade_stats = {'accepted': 0, 'escalated': 0}
+
+        # Extracción estructurada (tool use) en la misma llamada de chat
+        self.structured_extraction = os.getenv('CLAUDE_STRUCTURED_EXTRACTION', 'false').lower() == 'true'
+
+        # Router de modelos entrenado con turnos registrados (fallback: palabras clave)
+        self.router = ModelRouter([self.HAIKU_MODEL, self.SONNET_MODEL], fallback=self._keyword_select_model)
+        self.turn_logger = TurnLogger()
 
         # Backend integration
         self.backend_url = os.getenv('BACKEND_URL', 'http://localhost:5000')
         self.backend_auth_token = os.getenv('BACKEND_AUTH_TOKEN', '')
 
+        # Prefetch especulativo de ruta/peajes/restricciones mientras se recopilan datos
+        self.logistics_service = EuropeanLogisticsService() if LOGISTICS_SERVICE_AVAILABLE else None
+        self.prefetcher = None
+        # Recotizaciones "qué pasaría si" sobre resultados intermedios en caché
+        self.quote_graph = QuoteGraph(self.logistics_service) if self.logistics_service else None
+        # Mejor fecha de recogida dentro de una ventana de días
+        self.pickup_optimizer = PickupDateOptimizer(self.logistics_service, self.quote_graph) \
+            if self.logistics_service else None
+        # Rutas con varias paradas: tramos en paralelo sobre la caché del grafo
+        self.multi_stop = MultiStopQuoter(self.logistics_service, self.quote_graph) \
+            if self.logistics_service else None
+        if self.logistics_service and os.getenv('QUOTE_PREFETCH', 'false').lower() == 'true':
+            self.prefetcher = QuotePrefetcher(self.logistics_service)
+
+        # Cotizaciones recientes y en curso por hash del payload (reintentos idempotentes)
+        self.idempotent_quotes = IdempotentQuotes()
+
+        # Cola de cotizaciones en segundo plano (la asigna luci_server al arrancar)
+        self.quote_jobs = None
+
         # Sistema de sesiones
         self.sessions = {}
         self.current_session = None
@@ -80,10 +280,20 @@ class LUC1ClaudeHandler:
             'descripcion_carga'  # Descripción detallada
         ]
 
+        # Turnos rutinarios resueltos por plantilla, sin llamar a Claude
+        self.fast_path_enabled = os.getenv('DIALOGUE_FAST_PATH', 'true').lower() == 'true'
+        self.dialogue_policy = DialoguePolicy(self.required_fields)
+
         logger.info("LUC1 con Claude Sonnet 4 API inicializado correctamente")
         logger.info(f"Backend URL: {self.backend_url}")
 
     def _select_model(self, message: str, session: dict) -> str:
+        """Select the cheapest model expected to handle the turn (learned router)."""
+        quotation_data = session.get('quotation_data', {})
+        filled_count = sum(1 for f in self.required_fields if quotation_data.get(f))
+        return self.router.select(message, session, filled_count, len(self.required_fields))
+
+    def _keyword_select_model(self, message: str, session: dict) -> str:
         """Select Haiku for simple queries, Sonnet for complex logistics analysis."""
         quotation_data = session.get('quotation_data', {})
         filled_count = sum(1 for f in self.required_fields if quotation_data.get(f))
@@ -107,6 +317,47 @@ class LUC1ClaudeHandler:
         # Default: use Sonnet for complex reasoning
         return self.SONNET_MODEL
 
+    def _known_cities(self) -> Dict[str, str]:
+        """Todas las ciudades reconocidas (variante -> nombre normalizado)"""
+        return {**{city: city.title() for city in self.SPANISH_CITIES}, **self.EUROPEAN_CITIES}
+
+    def _cascade_reply(self, messages: List[Dict], session_id: str,
+                       missing_fields: List[str]) -> Tuple[str, List[str]]:
+        """
+        Modo cascada: responder con HAIKU_MODEL y escalar a SONNET_MODEL sólo
+        si el validador local encuentra problemas en la respuesta.
+        Devuelve (respuesta, problemas de la respuesta de Haiku).
+        """
+        session = self.sessions[session_id]
+        reply = self.call_claude_api(messages, session_id, model=self.HAIKU_MODEL)
+
+        if not session.get('last_model'):
+            issues = ['error']
+        elif not reply.strip() and 'structured_fields' in session:
+            # Sólo la herramienta: la respuesta la completa la plantilla
+            issues = []
+        else:
+            issues = validate_reply(reply, session['quotation_data'], missing_fields, self._known_cities())
+
+        if not issues:
+            self.cascade_stats['accepted'] += 1
+            return reply, issues
+
+        logger.info(f"Cascada: escalando a {self.SONNET_MODEL} ({', '.join(issues)})")
+        self.cascade_stats['escalated'] += 1
+        haiku_model = session.pop('last_model', None)
+        haiku_fields = session.get('structured_fields')
+        escalated = self.call_claude_api(messages, session_id, model=self.SONNET_MODEL,
+                                         hedge_model=self.SONNET_MODEL)
+
+        # Si Sonnet también falla, mejor la respuesta imperfecta de Haiku que una disculpa
+        if not session.get('last_model') and haiku_model:
+            session['last_model'] = haiku_model
+            if haiku_fields:
+                session['structured_fields'] = haiku_fields
+            return reply, issues
+        return escalated, issues
+
     def cleanup_sessions(self):
         """Remove sessions inactive for more than SESSION_TTL_SECONDS"""
         now = time.time()
@@ -116,6 +367,8 @@ class LUC1ClaudeHandler:
         ]
         for sid in expired:
             del self.sessions[sid]
+            if self.prefetcher:
+                self.prefetcher.discard(sid)
         if expired:
             logger.info(f"Cleaned up {len(expired)} expired sessions")
 
@@ -213,9 +466,105 @@ TIPOS DE CARGA:
 
 Cuando tengas todos los datos, confirma la información y procede a generar la cotización automáticamente."""
 
-    def call_claude_api(self, messages: List[Dict], session_id: str, model: str = None) -> str:
-        """Llamar a la API de Claude"""
+    def _stream_claude(self, payload: Dict, cancel_event: threading.Event,
+                       first_byte_event: threading.Event, usage: Dict = None,
+                       tool_inputs: Dict = None) -> str:
+        """
+        Llamar a Claude en streaming, marcando el primer token recibido.
+        Las entradas de las herramientas usadas se dejan en tool_inputs (nombre -> dict).
+        """
+        usage = usage if usage is not None else {}
+        tool_inputs = tool_inputs if tool_inputs is not None else {}
+        tool_blocks = {}  # índice de bloque -> (nombre, fragmentos JSON)
+        headers = {
+            "Content-Type": "application/json",
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01"
+        }
+
+        # Si la petición pierde la carrera, el ganador cierra su socket aunque
+        # aún no haya llegado ningún byte (no se queda ocupando un hilo del pool)
+        session = CancellableSession()
+        on_cancel = getattr(cancel_event, 'on_cancel', None)
+        if on_cancel:
+            on_cancel(session.abort)
+
+        def lines():
+            # Con stream=True la latencia registrada es la de las cabeceras (primer byte).
+            # El timeout aprendido sólo limita la conexión: entre tokens puede haber pausas
+            # largas (tool use, respuestas largas) y la lectura lleva un timeout holgado
+            response = TIMEOUTS.call('claude_stream', 30, lambda timeout: session.post(
+                self.api_url,
+                headers=headers,
+                json={**payload, "stream": True},
+                stream=True,
+                timeout=(timeout, deadline_capped(self.stream_read_timeout, 'claude_stream'))
+            ))
+            with response:
+                if response.status_code != 200:
+                    raise ClaudeAPIError.from_response(response)
+                yield from response.iter_lines(decode_unicode=True)
+
+        parts = []
+        with session:
+            try:
+                for line in lines():
+                    if cancel_event.is_set():
+                        raise HedgeCancelled(payload["model"])
+                    # El cliente ya no espera: dejar de leer
+                    check_deadline('claude_stream')
+                    if not line or not line.startswith("data:"):
+                        continue
+
+                    event = json.loads(line[5:])
+                    if event.get("type") == "message_start":
+                        usage.update(event.get("message", {}).get("usage", {}))
+                    elif event.get("type") == "message_delta":
+                        usage.update(event.get("usage", {}))
+                    elif event.get("type") == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                        first_byte_event.set()
+                        parts.append(event["delta"]["text"])
+                    elif event.get("type") == "content_block_start" \
+                            and event.get("content_block", {}).get("type") == "tool_use":
+                        first_byte_event.set()
+                        tool_blocks[event["index"]] = (event["content_block"]["name"], [])
+                    elif event.get("type") == "content_block_delta" and event["delta"].get("type") == "input_json_delta":
+                        tool_blocks[event["index"]][1].append(event["delta"].get("partial_json", ""))
+                    elif event.get("type") == "error":
+                        raise ClaudeAPIError(529, json.dumps(event.get("error", {})))
+            except requests.RequestException:
+                # Conexión cerrada por la cancelación: no es un fallo del modelo
+                if cancel_event.is_set():
+                    raise HedgeCancelled(payload["model"])
+                raise
+
+        for name, fragments in tool_blocks.values():
+            try:
+                tool_inputs[name] = json.loads("".join(fragments) or "{}")
+            except json.JSONDecodeError:
+                logger.warning(f"Entrada de herramienta {name} no es JSON valido")
+
+        text = "".join(parts)
+        # Sólo la herramienta, sin texto, es una respuesta válida: la pregunta la pone la plantilla
+        if not text and not tool_inputs:
+            raise ClaudeAPIError(200, "respuesta vacia")
+        return text
+
+    def call_claude_api(self, messages: List[Dict], session_id: str, model: str = None,
+                        hedge_model: str = None, extract_fields: bool = None) -> str:
+        """
+        Llamar a la API de Claude (con hedge hacia Haiku si el modelo tarda en responder).
+
+        Con extract_fields (por defecto CLAUDE_STRUCTURED_EXTRACTION) se envía la
+        herramienta de datos de cotización y los campos validados quedan en
+        session['structured_fields'].
+        """
         selected_model = model or self.model
+        hedge_model = hedge_model or self.HAIKU_MODEL
+        if extract_fields is None:
+            extract_fields = self.structured_extraction
+        if session_id in self.sessions:
+            self.sessions[session_id].pop('structured_fields', None)
         try:
             # Preparar los mensajes para la API
             api_messages = []
@@ -233,12 +582,6 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
                 content_preview = msg['content'][:100] if len(msg['content']) > 100 else msg['content']
                 logger.debug(f"  {i+1}. [{msg['role']}] {content_preview}...")
 
-            headers = {
-                "Content-Type": "application/json",
-                "x-api-key": self.api_key,
-                "anthropic-version": "2023-06-01"
-            }
-
             payload = {
                 "model": selected_model,
                 "max_tokens": 2000,
@@ -252,21 +595,57 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
                 ],
                 "messages": api_messages
             }
-
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                return result["content"][0]["text"]
+            if extract_fields:
+                payload["tools"] = [QUOTATION_TOOL]
+                payload["tool_choice"] = {"type": "auto"}
+
+            answered_by = {}
+
+            def call_model(model_name, cancel_event, first_byte_event):
+                usage = {}
+                tool_inputs = {}
+                started = time.monotonic()
+                text = self.governor.execute(
+                    lambda: self._stream_claude({**payload, "model": model_name}, cancel_event,
+                                                first_byte_event, usage, tool_inputs),
+                    model_name,
+                    priority=PRIORITY_CHAT,
+                    cancel_event=cancel_event
+                )
+                latency = time.monotonic() - started
+                input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+                self.router.stats.record_call(model_name, latency, input_tokens, output_tokens)
+                if not answered_by:
+                    answered_by.update(model=model_name, latency_s=round(latency, 3),
+                                       cost_usd=estimate_cost(model_name, input_tokens, output_tokens))
+                    answered_by['tool_input'] = tool_inputs.get(QUOTATION_TOOL_NAME)
+                return text
+
+            # Con el circuito de Sonnet abierto, pasar directamente a Haiku
+            if selected_model != self.HAIKU_MODEL and not self.governor.is_available(selected_model):
+                logger.warning(f"Circuito de {selected_model} abierto, usando {self.HAIKU_MODEL}")
+                selected_model = self.HAIKU_MODEL
+
+            if self.hedging_enabled:
+                text = self.hedger.call(call_model, selected_model, hedge_model)
             else:
-                logger.error(f"Error API Claude: {response.status_code} - {response.text}")
-                return "Lo siento, tengo problemas técnicos. Por favor, intenta de nuevo."
-
+                text = call_model(selected_model, HedgeCancelEvent(), threading.Event())
+
+            tool_input = answered_by.pop('tool_input', None)
+            if session_id in self.sessions:
+                self.sessions[session_id]['last_model'] = answered_by.get("model", selected_model)
+                self.sessions[session_id]['last_call'] = dict(answered_by)
+                if tool_input:
+                    self.sessions[session_id]['structured_fields'] = validate_structured_fields(
+                        tool_input, self._known_cities())
+            return text
+
+        except ClaudeAPIError as e:
+            logger.error(f"Error API Claude: {e.status_code} - {e.body}")
+            return "Lo siento, tengo problemas técnicos. Por favor, intenta de nuevo."
+        except (CircuitOpenError, GovernorTimeout) as e:
+            logger.error(f"Claude API saturada o no disponible: {e}")
+            return "Lo siento, tengo problemas técnicos. Por favor, intenta de nuevo."
         except Exception as e:
             logger.error(f"Error en llamada API: {e}")
             return "Disculpa, hay un problema de conexion. Por favor, intenta nuevamente."
@@ -277,21 +656,14 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
         text_lower = text.lower()
         last_message_lower = last_assistant_message.lower()
 
-        # Detectar peso
-        weight_patterns = [
-            r'(\d+(?:\.\d+)?)\s*(?:kg|kilos?|kilogramos?)',
-            r'(\d+(?:\.\d+)?)\s*(?:ton|toneladas?)',
-            r'peso[:\s]*(\d+(?:\.\d+)?)',
-        ]
-
-        for pattern in weight_patterns:
-            match = re.search(pattern, text_lower)
+        # Detectar peso (kg, toneladas, libras; admite coma decimal)
+        weight = parse_weight_kg(text)
+        if weight is None:
+            match = re.search(r'peso[:\s]*(\d+(?:[.,]\d+)?)(?![\d.,]|\s*(?:-|a|y|o)\s*\d)', text_lower)
             if match:
-                weight = float(match.group(1))
-                if 'ton' in pattern:
-                    weight *= 1000  # Convertir a kg
-                data['peso_kg'] = weight
-                break
+                weight = parse_number(match.group(1))
+        if weight is not None:
+            data['peso_kg'] = weight
 
         # Si no se detectó peso pero el mensaje es solo un número y el asistente preguntó por peso
         if 'peso_kg' not in data and ('peso' in last_message_lower or 'kg' in last_message_lower):
@@ -299,25 +671,22 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
             if number_match:
                 data['peso_kg'] = float(number_match.group(1))
 
-        # Detectar volumen
-        volume_patterns = [
-            r'(\d+(?:\.\d+)?)\s*(?:m3|m³|metros? c[uú]bicos?)',
-            r'volumen[:\s]*(\d+(?:\.\d+)?)',
-            r'(\d+(?:\.\d+)?)\s*x\s*(\d+(?:\.\d+)?)\s*x\s*(\d+(?:\.\d+)?)',  # dimensiones con 'x'
-            r'(\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)',  # dimensiones separadas por espacios
-        ]
-
-        for pattern in volume_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                # Verificar si es un patrón de dimensiones (tiene 3 grupos de captura)
-                if len(match.groups()) == 3 and all(match.group(i) for i in range(1, 4)):
-                    # Calcular volumen desde dimensiones
-                    dims = [float(match.group(i)) for i in range(1, 4)]
-                    data['volumen_m3'] = dims[0] * dims[1] * dims[2]
-                else:
-                    data['volumen_m3'] = float(match.group(1))
-                break
+        # Detectar volumen (m³, dimensiones en m/cm/mm o número de palés)
+        data.update(parse_volume(text))
+        if 'volumen_m3' not in data:
+            volume_patterns = [
+                r'volumen[:\s]*(\d+(?:[.,]\d+)?)',
+                r'(\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)',  # dimensiones separadas por espacios
+            ]
+            for pattern in volume_patterns:
+                match = re.search(pattern, text_lower)
+                if match:
+                    if len(match.groups()) == 3:
+                        dims = [float(match.group(i)) for i in range(1, 4)]
+                        data['volumen_m3'] = dims[0] * dims[1] * dims[2]
+                    else:
+                        data['volumen_m3'] = parse_number(match.group(1))
+                    break
 
         # Si no se detectó volumen pero el mensaje es solo un número y el asistente preguntó por volumen
         if 'volumen_m3' not in data and ('volumen' in last_message_lower or 'm³' in last_message_lower or 'm3' in last_message_lower):
@@ -344,12 +713,7 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
                 break
 
         # Detectar ciudades españolas (origen)
-        spanish_cities = [
-            'madrid', 'barcelona', 'valencia', 'sevilla', 'zaragoza', 'málaga',
-            'murcia', 'palma', 'las palmas', 'bilbao', 'alicante', 'córdoba',
-            'valladolid', 'vigo', 'gijón', 'la coruña', 'granada', 'vitoria',
-            'elche', 'santander', 'burgos', 'salamanca', 'tarragona'
-        ]
+        spanish_cities = self.SPANISH_CITIES
 
         for city in spanish_cities:
             if city in text_lower:
@@ -357,22 +721,7 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
                 break
 
         # Detectar ciudades europeas (destino)
-        european_cities = {
-            'parís': 'París', 'paris': 'París', 'lyon': 'Lyon', 'marsella': 'Marsella', 'niza': 'Niza',
-            'toulouse': 'Toulouse', 'burdeos': 'Burdeos', 'bordeaux': 'Burdeos',
-            'berlín': 'Berlín', 'berlin': 'Berlín', 'múnich': 'Múnich', 'munich': 'Múnich',
-            'hamburgo': 'Hamburgo', 'frankfurt': 'Frankfurt', 'colonia': 'Colonia', 'stuttgart': 'Stuttgart',
-            'roma': 'Roma', 'milán': 'Milán', 'milan': 'Milán', 'nápoles': 'Nápoles', 'napoles': 'Nápoles',
-            'turín': 'Turín', 'turin': 'Turín', 'florencia': 'Florencia', 'venecia': 'Venecia',
-            'ámsterdam': 'Ámsterdam', 'amsterdam': 'Ámsterdam', 'róterdam': 'Róterdam', 'rotterdam': 'Róterdam',
-            'utrecht': 'Utrecht', 'la haya': 'La Haya',
-            'bruselas': 'Bruselas', 'amberes': 'Amberes', 'gante': 'Gante', 'brujas': 'Brujas',
-            'zurich': 'Zurich', 'ginebra': 'Ginebra', 'berna': 'Berna', 'basilea': 'Basilea',
-            'viena': 'Viena', 'salzburgo': 'Salzburgo', 'innsbruck': 'Innsbruck', 'graz': 'Graz',
-            'lisboa': 'Lisboa', 'oporto': 'Oporto', 'braga': 'Braga', 'coimbra': 'Coimbra',
-            'praga': 'Praga', 'brno': 'Brno', 'ostrava': 'Ostrava',
-            'varsovia': 'Varsovia', 'cracovia': 'Cracovia', 'gdansk': 'Gdansk', 'wroclaw': 'Wroclaw'
-        }
+        european_cities = self.EUROPEAN_CITIES
 
         for city_key, city_name in european_cities.items():
             if city_key in text_lower:
@@ -405,7 +754,8 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
         }
 
         for keyword, cargo_type in cargo_types.items():
-            if keyword in text_lower:
+            # Sólo al inicio de palabra ('adr' no debe coincidir con 'Madrid')
+            if re.search(r'\b' + re.escape(keyword), text_lower):
                 data['tipo_carga'] = cargo_type
                 break
 
@@ -469,27 +819,12 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
                 data['margen_utilidad'] = float(match.group(1))
                 break
 
-        # Detectar fecha
-        date_patterns = [
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
-            r'(\d{4})-(\d{1,2})-(\d{1,2})'
-        ]
-
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                if '/' in pattern or '-' in pattern:
-                    if len(match.group(3)) == 4:  # DD/MM/YYYY
-                        day, month, year = match.groups()
-                    else:  # YYYY-MM-DD
-                        year, month, day = match.groups()
-
-                    try:
-                        date_obj = datetime(int(year), int(month), int(day))
-                        data['fecha_recogida'] = date_obj.strftime('%Y-%m-%d')
-                    except ValueError:
-                        pass
-                break
+        # Detectar fecha (absoluta o relativa: "mañana", "el lunes", "en 3 días"); si el
+        # asistente preguntó por la fecha, "20/1" o "mañana" a secas ya son la recogida
+        pickup_date = parse_pickup_date(
+            text, expects_date='fecha_recogida' in requested_fields(last_assistant_message))
+        if pickup_date:
+            data['fecha_recogida'] = pickup_date
 
         return data
 
@@ -506,18 +841,55 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
         is_complete = len(missing_fields) == 0
         return is_complete, missing_fields
 
-    def generate_quotation(self, session_id: str) -> Optional[Dict]:
-        """Generar cotización llamando al backend de Node.js"""
+    def generate_quotation(self, session_id: str, quotation_data: Dict = None,
+                           progress: QuoteProgress = None) -> Optional[Dict]:
+        """
+        Generar cotización llamando al backend de Node.js.
+        quotation_data permite cotizar una copia fija de los datos (cola de trabajos).
+        progress recibe las etapas: datos anticipados disponibles y cotización guardada.
+        """
         logger.info(f"Iniciando generacion de cotizacion, session: {session_id}")
+        progress = progress or QuoteProgress()
 
-        session = self.sessions.get(session_id, {})
-        quotation_data = session.get('quotation_data', {})
+        if quotation_data is None:
+            quotation_data = self.sessions.get(session_id, {}).get('quotation_data', {})
 
         logger.debug(f"Datos de cotizacion extraidos: {quotation_data}")
 
         try:
             # Transformar datos al formato del backend
             backend_payload = self._transform_to_backend_format(quotation_data)
+        except Exception as e:
+            logger.error(f"Error critico generando cotizacion: {e}")
+            return None
+
+        # Reintentos y reenvíos de los mismos datos devuelven la misma cotización
+        key = idempotency_key(session_id, backend_payload)
+        quote_result, source = self.idempotent_quotes.run(
+            key, lambda: self._post_quotation(session_id, quotation_data, backend_payload, progress))
+        if quote_result and source != 'computed':
+            logger.info(f"Cotizacion {quote_result.get('quoteId', 'N/A')} reutilizada ({source})")
+            progress.stage(BACKEND_QUOTE_SAVED,
+                           quote_id=quote_result.get('quoteId', quote_result.get('quote_id')),
+                           distance_km=quote_result.get('route', {}).get('distance'),
+                           total_eur=quote_result.get('costBreakdown', {}).get('total'),
+                           idempotent=source)
+        return quote_result
+
+    def _post_quotation(self, session_id: str, quotation_data: Dict, backend_payload: Dict,
+                        progress: QuoteProgress) -> Optional[Dict]:
+        """POST /api/quotes/ai-generate con el payload"""
+        try:
+            # Lo ya anticipado adelanta el progreso y se envía al backend para que no
+            # lo recalcule; lo que siga en curso no se espera
+            if self.prefetcher:
+                prefetched = self.prefetcher.collect(session_id, quotation_data)
+                if prefetched:
+                    logger.debug(f"Etapas anticipadas disponibles: {', '.join(prefetched)}")
+                    self._report_prefetched_stages(progress, prefetched)
+                    precomputed = backend_precomputed(prefetched)
+                    if precomputed:
+                        backend_payload = {**backend_payload, 'precomputed': precomputed}
 
             logger.debug(f"Enviando cotizacion al backend: {self.backend_url}/api/quotes/ai-generate")
             logger.debug(f"Payload: {json.dumps(backend_payload, ensure_ascii=False)}")
@@ -533,11 +905,13 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
 
             logger.debug(f"POST request a: {self.backend_url}/api/quotes/ai-generate")
 
+            # Timeout fijo, no adaptativo: el POST crea la cotización y cortarlo
+            # antes de tiempo deja un reintento que puede duplicarla
             response = requests.post(
                 f'{self.backend_url}/api/quotes/ai-generate',
                 json=backend_payload,
                 headers=headers,
-                timeout=60
+                timeout=deadline_capped(60, 'backend_quote')
             )
 
             logger.debug(f"Respuesta del backend - Status: {response.status_code}")
@@ -546,6 +920,10 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
             if response.status_code == 200 or response.status_code == 201:
                 quote_result = response.json()
                 logger.info(f"Cotizacion generada exitosamente: {quote_result.get('quoteId', 'N/A')}")
+                progress.stage(BACKEND_QUOTE_SAVED,
+                               quote_id=quote_result.get('quoteId', quote_result.get('quote_id')),
+                               distance_km=quote_result.get('route', {}).get('distance'),
+                               total_eur=quote_result.get('costBreakdown', {}).get('total'))
                 return quote_result
             else:
                 logger.error(f"Error del backend: {response.status_code}")
@@ -559,11 +937,80 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
 
         return None
 
+    @staticmethod
+    def _report_prefetched_stages(progress: QuoteProgress, prefetched: Dict):
+        """Emitir como etapas los resultados parciales ya disponibles antes del backend"""
+        route = prefetched.get('route')
+        if route:
+            progress.stage(ROUTE_RESOLVED, distance_km=round(route.get('distance_km', 0), 1),
+                           duration_hours=round(route.get('duration_hours', 0), 1),
+                           countries=route.get('countries', []), prefetched=True)
+        if 'tolls' in prefetched:
+            progress.stage(TOLLS_COMPUTED, toll_cost_eur=prefetched['tolls'].get('total_cost', 0), prefetched=True)
+        if 'restrictions' in prefetched:
+            progress.stage(RESTRICTIONS_CHECKED,
+                           critical_alerts=prefetched['restrictions'].get('critical_alerts', 0), prefetched=True)
+
+    def format_quote_response(self, quote: Dict) -> str:
+        """Mensaje de chat con el resumen de una cotización generada"""
+        quote_id = quote.get('quoteId', quote.get('quote_id', 'N/A'))
+        portal_token = quote.get('portalAccess', {}).get('token', '')
+        portal_url = quote.get('portalAccess', {}).get('accessUrl', '')
+        email_template = quote.get('emailTemplate', {}).get('content', '')
+
+        return f"""✅ **Cotización generada y guardada exitosamente**
+
+📋 **ID:** {quote_id}
+🚛 **Ruta:** {quote.get('route', {}).get('origin', 'N/A')} → {quote.get('route', {}).get('destination', 'N/A')}
+📏 **Distancia:** {quote.get('route', {}).get('distance', 0):.0f} km
+💰 **Total:** {quote.get('costBreakdown', {}).get('total', 0):.2f} EUR
+
+---
+
+🔗 **PORTAL PARA EL CLIENTE:**
+{portal_url}
+
+📧 **EMAIL GENERADO:**
+Se creó un template profesional listo para enviar al cliente.
+
+📊 **Estado:** Guardado en sistema | Listo para enviar
+
+¿Generar otra cotización?"""
+
+    def run_quote_job(self, session_id: str, quotation_data: Dict,
+                      on_event: Callable[[Dict], None] = None) -> Dict:
+        """
+        Trabajo de la cola de cotizaciones: genera la cotización y, si la
+        sesión sigue viva, deja el resumen en la conversación.
+        on_event recibe los eventos de etapa del pipeline.
+        """
+        quote = self.generate_quotation(session_id, quotation_data, progress=QuoteProgress(on_event))
+        if not quote:
+            raise RuntimeError("El backend no devolvió cotización")
+        message = self.format_quote_response(quote)
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session['messages'].append({"role": "assistant", "content": message})
+            session['last_quote'] = quote
+        return {'quote': quote, 'message': message}
+
     def _transform_to_backend_format(self, data: Dict) -> Dict:
         """Transformar datos de Claude al formato esperado por el backend"""
         # Convertir peso de kg a toneladas, con mínimo de 0.1t (100kg) para validación
         weight_tons = max(data.get('peso_kg', 1000) / 1000, 0.1)
 
+        # Con volumen o palés reales el backend precia LTL/FTL por metros lineales
+        # (loadCalculatorService); sin dimensiones se queda con la tarifa por peso
+        load = {}
+        if data.get('volumen_m3') or data.get('num_pales'):
+            load_plan = plan_load(chat_shipment({**data, 'peso_kg': weight_tons * 1000}))
+            load = {
+                "transportType": load_plan['modo'],
+                "linearMeters": load_plan['metros_lineales'],
+                "utilization": load_plan['utilizacion'],
+                "pallets": load_plan['pales'],
+            }
+
         return {
             "route": {
                 "origin": data.get('origen', ''),
@@ -574,7 +1021,8 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
                 "weight": weight_tons,
                 "volume": data.get('volumen_m3', weight_tons * 1.5),  # Estimación si no hay volumen
                 "value": data.get('valor_carga', 0),
-                "description": data.get('descripcion_carga', f"Carga de tipo {data.get('tipo_carga', 'general')}")
+                "description": data.get('descripcion_carga', f"Carga de tipo {data.get('tipo_carga', 'general')}"),
+                **load
             },
             "service": {
                 "pickupDate": data.get('fecha_recogida', (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d'))
@@ -636,8 +1084,20 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
         rate = base_rates.get(cargo_type, 1.20)
         transport_cost = (weight_kg * rate * distance) / 100
         fuel_cost = distance * 0.35
+        # Grupaje con volumen o palés reales: metros lineales en lugar de peso x distancia
+        load_plan = plan_load(chat_shipment({**data, 'peso_kg': weight_kg}))
+        if load_plan['modo'] == 'LTL' and not load_plan['volumen_estimado']:
+            transport_cost = ltl_price(load_plan, distance)
+            fuel_cost *= truck_share(load_plan)
         insurance_cost = max(weight_kg * 0.05, 50)
-        toll_cost = distance * 0.08
+        # Peajes por país sobre el trazado aproximado (sin trazado, la distancia a medias con el destino)
+        route = {'distance_km': distance, 'countries': ['ES', 'EU']}
+        path = fallback_path(data.get('origen') or 'Madrid', data.get('destino', ''))
+        if path is not None:
+            route['country_km'] = scale_country_km(get_country_grid().country_km(path), distance)
+        vehicle_specs = self.logistics_service._get_vehicle_specs(weight_kg, load_plan) if self.logistics_service \
+            else {'type': 'truck', 'axles': 5}
+        toll_cost = estimate_route_tolls(route, vehicle_specs)['total_cost']
 
         total_cost = transport_cost + fuel_cost + insurance_cost + toll_cost
 
@@ -650,6 +1110,8 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
             'peso_kg': weight_kg,
             'tipo_carga': cargo_type,
             'distancia_km': distance,
+            'modo_transporte': load_plan['modo'],
+            'metros_lineales': load_plan['metros_lineales'],
             'costo_total_eur': round(total_cost, 2),
             'tiempo_estimado_dias': max(1, round(distance / 400)),
             'fecha_recogida': data.get('fecha_recogida'),
@@ -747,6 +1209,9 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
 
         session = self.sessions[session_id]
 
+        # Cerrar el registro del turno anterior (la queja del usuario marca re-pregunta)
+        self._finish_turn(session, session_id, message)
+
         # Obtener el último mensaje del asistente para contexto
         last_assistant_message = ""
         if session['messages']:
@@ -767,6 +1232,10 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
 
         logger.debug(f"Datos en sesion DESPUES de actualizar: {session['quotation_data']}")
 
+        # Anticipar las consultas de logística que ya se pueden hacer
+        if self.prefetcher:
+            self.prefetcher.prefetch(session_id, session['quotation_data'])
+
         # Agregar mensaje del usuario
         session['messages'].append({
             "role": "user",
@@ -778,35 +1247,18 @@ Cuando tengas todos los datos, confirma la información y procede a generar la c
 
         logger.debug(f"Estado de completitud: completo={is_complete}, faltantes={missing_fields}")
 
+        policy_reply = None
+        if not is_complete and self.fast_path_enabled:
+            policy_reply = self.dialogue_policy.respond(
+                message, extracted_data, session['quotation_data'], missing_fields, last_assistant_message)
+
         if is_complete:
             # Generar cotización automáticamente
-            quote = self.generate_quotation(session_id)
-            if quote:
-                quote_id = quote.get('quoteId', quote.get('quote_id', 'N/A'))
-                portal_token = quote.get('portalAccess', {}).get('token', '')
-                portal_url = quote.get('portalAccess', {}).get('accessUrl', '')
-                email_template = quote.get('emailTemplate', {}).get('content', '')
-
-                response = f"""✅ **Cotización generada y guardada exitosamente**
-
-📋 **ID:** {quote_id}
-🚛 **Ruta:** {quote.get('route', {}).get('origin', 'N/A')} → {quote.get('route', {}).get('destination', 'N/A')}
-📏 **Distancia:** {quote.get('route', {}).get('distance', 0):.0f} km
-💰 **Total:** {quote.get('costBreakdown', {}).get('total', 0):.2f} EUR
-
----
-
-🔗 **PORTAL PARA EL CLIENTE:**
-{portal_url}
-
-📧 **EMAIL GENERADO:**
-Se creó un template profesional listo para enviar al cliente.
-
-📊 **Estado:** Guardado en sistema | Listo para enviar
-
-¿Generar otra cotización?"""
-            else:
-                response = "Lo siento, hubo un problema generando la cotización. ¿Podrías verificar los datos proporcionados?"
+            response = self._quote_reply(session_id)
+        elif policy_reply is not None:
+            # Turno rutinario: siguiente pregunta por plantilla, sin llamada a Claude
+            logger.debug("Turno resuelto por la politica de dialogo (sin Claude)")
+            response = policy_reply
         else:
             # Continuar conversación para recopilar datos faltantes
             # Crear mensaje de contexto con datos ya recopilados
@@ -842,11 +1294,50 @@ Se creó un template profesional listo para enviar al cliente.
             # Agregar mensajes de la conversación
             messages_with_context.extend(session['messages'])
 
-            # Select model based on message complexity
-            model = self._select_model(message, session)
-
-            # Llamar a Claude API con contexto
-            response = self.call_claude_api(messages_with_context, session_id, model=model)
+            session.pop('last_model', None)
+            cascade_issues = None
+            if self.cascade_enabled:
+                # Haiku primero; Sonnet sólo si el validador local rechaza la respuesta
+                response, cascade_issues = self._cascade_reply(messages_with_context, session_id, missing_fields)
+            else:
+                # Select model based on message complexity
+                model = self._select_model(message, session)
+
+                # Llamar a Claude API con contexto
+                response = self.call_claude_api(messages_with_context, session_id, model=model)
+
+            # Campos que Claude extrajo en la misma llamada: sólo completan lo que falta.
+            # Se mezclan antes de decidir la respuesta: pueden completar la cotización
+            structured = session.pop('structured_fields', None)
+            if structured:
+                filled = {f: v for f, v in structured.items() if not session['quotation_data'].get(f)}
+                if filled:
+                    logger.debug(f"Datos extraidos por Claude (tool use): {filled}")
+                    session['quotation_data'].update(filled)
+                    if self.prefetcher:
+                        self.prefetcher.prefetch(session_id, session['quotation_data'])
+            is_complete, missing_fields = self.check_completion_status(session_id)
+
+            if is_complete:
+                response = self._quote_reply(session_id)
+            elif not response.strip():
+                # Respuesta sólo con la herramienta: la siguiente pregunta sale de la plantilla
+                response = self.dialogue_policy.QUESTION_TEMPLATES[missing_fields[0]]
+
+            # Sólo los turnos respondidos por Claude alimentan al router
+            if session.get('last_model'):
+                session['pending_turn'] = {
+                    'session_id': session_id,
+                    'message': message,
+                    'filled_count': len(self.required_fields) - len(missing_fields),
+                    'model': session['last_model'],
+                    'keyword_model': self._keyword_select_model(message, session),
+                    'needed_reask': bool(asks_for_collected(response, session['quotation_data'])),
+                    'latency_s': session.get('last_call', {}).get('latency_s'),
+                    'cost_usd': session.get('last_call', {}).get('cost_usd')
+                }
+                if cascade_issues is not None:
+                    session['pending_turn']['cheap_ok'] = not cascade_issues
 
         # Agregar respuesta del asistente a la sesión
         session['messages'].append({
@@ -856,6 +1347,30 @@ Se creó un template profesional listo para enviar al cliente.
 
         return response
 
+    def _quote_reply(self, session_id: str) -> str:
+        """Cotizar con los datos completos de la sesión (en segundo plano si hay cola de trabajos)"""
+        session = self.sessions[session_id]
+        if self.quote_jobs is not None and self.quote_jobs.running:
+            # Cotización en segundo plano: el chat responde al momento con el ID del trabajo
+            job_id = self.quote_jobs.submit(session_id, dict(session['quotation_data']))
+            session['quote_job_id'] = job_id
+            return (f"⏳ Generando tu cotización... (trabajo **{job_id}**). "
+                    "Te la muestro en cuanto esté lista.")
+        quote = self.generate_quotation(session_id)
+        if quote:
+            return self.format_quote_response(quote)
+        return "Lo siento, hubo un problema generando la cotización. ¿Podrías verificar los datos proporcionados?"
+
+    def _finish_turn(self, session: dict, session_id: str, next_message: str = None):
+        """Registrar el resultado del último turno atendido por Claude"""
+        turn = session.pop('pending_turn', None)
+        if not turn:
+            return
+        if is_reask_complaint(next_message):
+            turn['needed_reask'] = True
+        self.router.stats.record_outcome(turn['model'], turn['needed_reask'])
+        self.turn_logger.log(turn)
+
     def load_model(self):
         """Simular carga del modelo (para compatibilidad)"""
         self.is_loaded = True
@@ -868,18 +1383,14 @@ Se creó un template profesional listo para enviar al cliente.
     def clear_session(self, session_id: str):
         """Limpiar datos de la sesión"""
         if session_id in self.sessions:
+            self._finish_turn(self.sessions[session_id], session_id)
             del self.sessions[session_id]
+        if self.prefetcher:
+            self.prefetcher.discard(session_id)
 
-    def analyze_direct(self, prompt: str, context: dict = None) -> str:
-        """
-        MODO AGENTE: Análisis directo sin conversación
-        Usado para análisis de precios de transportistas desde luc1Service.js
-        """
-        try:
-            logger.info("LUC1 MODO AGENTE - Analisis directo iniciado")
-
-            # Crear prompt del sistema específico para análisis
-            system_prompt = """Eres LUC1, un experto analista de logística europea especializado en evaluación de ofertas de transporte.
+    def get_analysis_system_prompt(self) -> str:
+        """Obtener prompt del sistema para el modo agente (análisis de transportistas)"""
+        return """Eres LUC1, un experto analista de logística europea especializado en evaluación de ofertas de transporte.
 
 TU ROL:
 Analizar ofertas de transportistas y datos de rutas para recomendar la mejor opción comercial para AXEL.
@@ -904,6 +1415,38 @@ ALERTAS_CRITICAS: [lista separada por comas o "Ninguna"]
 RECOMENDACIONES_ESPECIALES: [acciones específicas o "Ninguna"]
 JUSTIFICACION: [explicación breve]"""
 
+    def build_analysis_params(self, prompt: str) -> Dict:
+        """Construir el cuerpo de la petición a Claude para un análisis directo.
+
+        Se comparte entre analyze_direct (llamada síncrona) y el modo batch,
+        de modo que ambos caminos envían exactamente los mismos parámetros.
+        """
+        return {
+            "model": self.model,
+            "max_tokens": 2000,
+            "system": [
+                {
+                    "type": "text",
+                    "text": self.get_analysis_system_prompt(),
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+
+    def analyze_direct(self, prompt: str, context: dict = None) -> str:
+        """
+        MODO AGENTE: Análisis directo sin conversación
+        Usado para análisis de precios de transportistas desde luc1Service.js
+        """
+        try:
+            logger.info("LUC1 MODO AGENTE - Analisis directo iniciado")
+
             # Preparar request para Claude API
             headers = {
                 "x-api-key": self.api_key,
@@ -911,54 +1454,29 @@ JUSTIFICACION: [explicación breve]"""
                 "content-type": "application/json"
             }
 
-            data = {
-                "model": self.model,
-                "max_tokens": 2000,
-                "system": [
-                    {
-                        "type": "text",
-                        "text": system_prompt,
-                        "cache_control": {"type": "ephemeral"}
-                    }
-                ],
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }
-
-            # Llamar a Claude API con timeout extendido
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                analysis = result['content'][0]['text']
-                logger.info(f"Analisis completado: {len(analysis)} caracteres")
-                return analysis
-            else:
-                logger.error(f"Error en API Claude: {response.status_code}")
-                logger.error(f"Response: {response.text}")
-                raise Exception(f"Claude API error: {response.status_code}")
+            data = self.build_analysis_params(prompt)
+
+            def post_analysis():
+                # Llamar a Claude API con timeout adaptativo (30 s como máximo)
+                response = TIMEOUTS.call('claude', 30, lambda timeout: requests.post(
+                    self.api_url,
+                    headers=headers,
+                    json=data,
+                    timeout=timeout
+                ))
+                if response.status_code != 200:
+                    logger.error(f"Error en API Claude: {response.status_code}")
+                    logger.error(f"Response: {response.text}")
+                    raise ClaudeAPIError.from_response(response)
+                return response.json()
+
+            # Los análisis del modo agente ceden el turno al chat en vivo
+            result = self.governor.execute(post_analysis, data["model"], priority=PRIORITY_BATCH)
+            analysis = result['content'][0]['text']
+            logger.info(f"Analisis completado: {len(analysis)} caracteres")
+            return analysis
 
         except Exception as e:
             logger.error(f"Error en analisis directo: {e}")
             # Retornar análisis de fallback estructurado
-            return """Análisis realizado con datos disponibles.
-
-TRANSPORTISTA_RECOMENDADO: timocom
-PRECIO_BASE_OPTIMO: €3200
-MARGEN_SUGERIDO: 20%
-PRECIO_FINAL_CLIENTE: €3840
-CONFIANZA_DECISION: 75%
-NIVEL_SERVICIO: Estándar
-RESTRICCIONES_IMPACTO: Medio
-ALERTAS_CRITICAS: Verificar disponibilidad de transportista
-RECOMENDACIONES_ESPECIALES: Confirmar fechas con transportista
-JUSTIFICACION: Análisis basado en promedio de mercado. Sistema de IA temporalmente no disponible."""
\ No newline at end of file
+            return FALLBACK_ANALYSIS
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Peticiones con cobertura (hedging) para las llamadas a Claude
+Si el modelo principal no emite el primer token dentro de un umbral
+aprendido de las latencias recientes, se lanza una segunda petición y se
+usa la primera respuesta válida.
+"""
+
+import os
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+
+from timeout_policy import in_context
+
+
+class HedgeCancelled(Exception):
+    """La petición perdió la carrera y fue cancelada"""
+
+
+class _FirstByteEvent(threading.Event):
+    """Event que informa del tiempo transcurrido la primera vez que se activa"""
+
+    def __init__(self, on_first_set: Callable[[float], None]):
+        super().__init__()
+        self._started = time.monotonic()
+        self._on_first_set = on_first_set
+        self._reported = False
+        self._report_lock = threading.Lock()
+
+    def _report(self):
+        with self._report_lock:
+            if self._reported:
+                return
+            self._reported = True
+        self._on_first_set(time.monotonic() - self._started)
+
+    def set(self):
+        self._report()
+        super().set()
+
+    def report_cancelled(self):
+        """
+        Petición cancelada sin primer token: lo esperado hasta ahora es una cota
+        inferior de su latencia (sin ella el percentil sólo vería las rápidas)
+        """
+        self._report()
+
+
+class HedgeCancelEvent(threading.Event):
+    """Event de cancelación que además ejecuta los callbacks registrados (p. ej. cerrar la conexión)"""
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks: List[Callable[[], None]] = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Registrar callback; si ya está cancelado se ejecuta al momento"""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        super().set()
+        with self._callbacks_lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Error cancelando petición: {e}")
+
+
+class _TrackingPoolManager(PoolManager):
+    """PoolManager que avisa de cada conexión abierta por sus pools"""
+
+    def __init__(self, *args, on_connect: Callable = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._on_connect = on_connect
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        on_connect = self._on_connect
+
+        class TrackedConnection(pool.ConnectionCls):
+            def connect(self):
+                super().connect()
+                on_connect(self)
+
+        pool.ConnectionCls = TrackedConnection
+        return pool
+
+
+class _TrackingAdapter(HTTPAdapter):
+    def __init__(self, on_connect: Callable):
+        self._on_connect = on_connect
+        super().__init__()
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager = _TrackingPoolManager(num_pools=connections, maxsize=maxsize, block=block,
+                                                on_connect=self._on_connect, **pool_kwargs)
+
+
+class CancellableSession(requests.Session):
+    """
+    Sesión que puede abortarse desde otro hilo: abort() cierra los sockets de
+    sus conexiones, también los que esperan las cabeceras o el siguiente byte
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._connections = []
+        self._aborted = False
+        self._connections_lock = threading.Lock()
+        adapter = _TrackingAdapter(self._track)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def _track(self, connection):
+        with self._connections_lock:
+            self._connections.append(connection)
+            aborted = self._aborted
+        if aborted:
+            self._shutdown(connection)
+
+    @staticmethod
+    def _shutdown(connection):
+        sock = getattr(connection, 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def abort(self):
+        with self._connections_lock:
+            self._aborted = True
+            connections = list(self._connections)
+        for connection in connections:
+            self._shutdown(connection)
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias por clave con percentiles"""
+
+    def __init__(self, window_size: int = 200):
+        self.window_size = window_size
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window_size))
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples[key])
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return [key for key, samples in self._samples.items() if samples]
+
+    def percentile(self, key: str, p: float, default: float = None) -> Optional[float]:
+        """Percentil p (0-100) de las muestras recientes, o default si no hay muestras"""
+        with self._lock:
+            samples = sorted(self._samples[key])
+        if not samples:
+            return default
+        index = min(len(samples) - 1, max(0, int(round(p / 100 * (len(samples) - 1)))))
+        return samples[index]
+
+
+class HedgeBudget:
+    """
+    Presupuesto de hedges: cada petición principal acumula `ratio` créditos
+    (hasta `burst`) y cada hedge consume uno, así que a largo plazo no se
+    lanzan más de ratio * peticiones hedges.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def on_request(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class HedgedCaller:
+    """
+    Ejecuta una llamada con posible hedge.
+
+    call_fn(model, cancel_event, first_byte_event) debe devolver el texto de
+    la respuesta, marcar first_byte_event al recibir el primer token y
+    abandonar (HedgeCancelled) cuando cancel_event esté activo.
+    """
+
+    def __init__(self, percentile: float = None, min_samples: int = 20,
+                 default_threshold: float = None, min_threshold: float = 0.5,
+                 max_threshold: float = 10.0, budget: HedgeBudget = None,
+                 tracker: LatencyTracker = None, max_workers: int = 16):
+        self.percentile = percentile if percentile is not None else float(
+            os.getenv('CLAUDE_HEDGE_PERCENTILE', 95))
+        self.min_samples = min_samples
+        self.default_threshold = default_threshold if default_threshold is not None else float(
+            os.getenv('CLAUDE_HEDGE_DEFAULT_SECONDS', 4.0))
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.budget = budget or HedgeBudget(ratio=float(os.getenv('CLAUDE_HEDGE_BUDGET_RATIO', 0.1)))
+        self.tracker = tracker or LatencyTracker()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="claude-hedge")
+        self.stats = {'requests': 0, 'hedges': 0, 'hedge_wins': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def threshold_for(self, model: str) -> float:
+        """Umbral de primer token para el modelo, aprendido de las latencias recientes"""
+        if self.tracker.count(model) < self.min_samples:
+            return self.default_threshold
+        value = self.tracker.percentile(model, self.percentile, self.default_threshold)
+        return min(self.max_threshold, max(self.min_threshold, value))
+
+    def _launch(self, call_fn: Callable, model: str):
+        cancel_event = HedgeCancelEvent()
+        first_byte_event = _FirstByteEvent(lambda elapsed: self.tracker.record(model, elapsed))
+        future = self.executor.submit(in_context(call_fn), model, cancel_event, first_byte_event)
+        return future, cancel_event, first_byte_event
+
+    def call(self, call_fn: Callable, primary_model: str, hedge_model: str) -> str:
+        """Llamar al modelo principal y, si tarda, cubrir con hedge_model"""
+        self._count('requests')
+        self.budget.on_request()
+
+        primary, primary_cancel, primary_first_byte = self._launch(call_fn, primary_model)
+        attempts = {primary: (primary_cancel, primary_first_byte)}
+
+        threshold = self.threshold_for(primary_model)
+        deadline = time.monotonic() + threshold
+        while not primary.done() and time.monotonic() < deadline:
+            if primary_first_byte.wait(timeout=min(0.05, max(0.0, deadline - time.monotonic()))):
+                break
+        if not primary_first_byte.is_set() and not primary.done():
+            if self.budget.try_acquire():
+                self._count('hedges')
+                logger.info(f"Hedge: {primary_model} sin primer token en {threshold:.2f}s, lanzando {hedge_model}")
+                hedge, hedge_cancel, hedge_first_byte = self._launch(call_fn, hedge_model)
+                attempts[hedge] = (hedge_cancel, hedge_first_byte)
+            else:
+                logger.debug("Hedge omitido: presupuesto agotado")
+
+        pending = set(attempts)
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+
+                # Primera respuesta válida: cancelar el resto
+                for other in pending:
+                    cancel_event, first_byte_event = attempts[other]
+                    first_byte_event.report_cancelled()
+                    cancel_event.set()
+                if future is not primary:
+                    self._count('hedge_wins')
+                return result
+
+        raise last_error
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Servicio de logística simulado compartido por los tests
+Los tests lo reciben con el fixture `fake_service` (una fábrica) y los
+runners `__main__` pasan FakeLogisticsService directamente.
+"""
+
+import sys
+import os
+import asyncio
+import threading
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from european_logistics import EuropeanLogisticsService
+
+ROUTE = {'distance_km': 1270.0, 'duration_hours': 14.0, 'polyline': 'abc', 'countries': ['ES', 'FR']}
+NO_RESTRICTIONS = {'restrictions': [], 'holidays': [], 'critical_alerts': 0, 'success': True}
+
+
+class FakeLogisticsService(EuropeanLogisticsService):
+    """
+    EuropeanLogisticsService con consultas simuladas que cuenta las llamadas.
+    - route: ruta de cualquier origen -> destino (por defecto Madrid -> París)
+    - legs: {(origen, destino) en minúsculas: (km, horas, km por país)}; un
+      tramo que no esté en la tabla no tiene ruta
+    - tolls: coste fijo o función de las specs del vehículo
+    - incidents: incidencias en vivo que devuelve el backend
+    - latency: segundos de espera por consulta ('route', 'tolls')
+    """
+
+    def __init__(self, route=None, legs=None, tolls=180.0, incidents=None, latency=None):
+        super().__init__()
+        self.route = {**ROUTE, **(route or {})}
+        self.legs = legs
+        self.tolls = tolls
+        self.incidents = incidents or []
+        self.latency = latency or {}
+        self.calls = {'route': 0, 'tolls': 0, 'restrictions': 0, 'incidents': 0}
+        self.route_calls = []
+        self._lock = threading.Lock()
+
+    def _count(self, stage):
+        with self._lock:
+            self.calls[stage] += 1
+
+    async def get_route_calculation(self, origin, destination, vehicle_specs=None):
+        with self._lock:
+            self.route_calls.append((origin, destination))
+        self._count('route')
+        await asyncio.sleep(self.latency.get('route', 0))
+        if self.legs is None:
+            return {**self.route, 'success': True}
+        leg = self.legs.get((origin.lower(), destination.lower()))
+        if not leg:
+            return {'success': False}
+        km, hours, country_km = leg
+        return {'distance_km': km, 'duration_hours': hours, 'polyline': None,
+                'countries': list(country_km), 'country_km': country_km, 'success': True}
+
+    async def get_toll_calculation(self, polyline, vehicle_specs):
+        self._count('tolls')
+        await asyncio.sleep(self.latency.get('tolls', 0))
+        cost = self.tolls(vehicle_specs) if callable(self.tolls) else self.tolls
+        return {'total_cost': cost, 'currency': 'EUR', 'breakdown': [], 'success': True}
+
+    def _get_live_incidents(self, countries, date_from, date_to, vehicle_specs):
+        self._count('incidents')
+        return list(self.incidents)
+
+    async def get_restrictions_and_holidays(self, countries, pickup_date, vehicle_specs):
+        self._count('restrictions')
+        return dict(NO_RESTRICTIONS)
+
+
+@pytest.fixture
+def fake_service():
+    """Fábrica de FakeLogisticsService"""
+    return FakeLogisticsService
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Consolidación de los envíos del día en camiones compartidos
+Agrupa los envíos por origen, ventana de fechas y corredor (rumbo desde el
+origen), los empaqueta con first-fit-decreasing por metros lineales, peso y
+volumen sobre un tráiler, elige el vehículo más pequeño para cada carga y
+ordena las paradas con inserción más barata y 2-opt. El ahorro se mide con el
+mismo modelo de coste (EUR/km por vehículo y parada) que un camión por envío.
+Distancias en línea recta x ROAD_DETOUR_FACTOR, sin llamadas al backend.
+"""
+
+import os
+import time
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+from loguru import logger
+
+from load_planner import DECK_LENGTH, DECK_PAYLOAD, DECK_VOLUME, VEHICLES, first_fit_decreasing, \
+    load_metrics, smallest_vehicle
+from polyline_utils import EARTH_RADIUS_KM
+from route_countries import ROAD_DETOUR_FACTOR, city_coordinates
+
+# Anchura angular máxima de un corredor visto desde el origen
+CORRIDOR_WIDTH_DEG = 30.0
+# Coste de operación por km (furgoneta, rígido, tráiler) y por parada de entrega
+VEHICLE_EUR_PER_KM = np.array([0.75, 1.10, 1.45])
+STOP_EUR = 40.0
+MAX_TWO_OPT_ROUNDS = 50
+
+TRAILER = len(VEHICLES) - 1
+TRAILER_CAPACITY = np.array([DECK_LENGTH[TRAILER], DECK_PAYLOAD[TRAILER], DECK_VOLUME[TRAILER]])
+
+
+def _road_km(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distancia por carretera aproximada entre puntos [lat, lon] (se difunden a y b)"""
+    a, b = np.radians(a), np.radians(b)
+    dlat, dlon = b[..., 0] - a[..., 0], b[..., 1] - a[..., 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[..., 0]) * np.cos(b[..., 0]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0))) * ROAD_DETOUR_FACTOR
+
+
+def _bearing(origin: tuple, points: np.ndarray) -> np.ndarray:
+    """Rumbo inicial en grados desde origin a cada punto"""
+    lat1, lon1 = np.radians(origin)
+    lat2, lon2 = np.radians(points[:, 0]), np.radians(points[:, 1])
+    x = np.sin(lon2 - lon1) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def _corridors(bearings: np.ndarray, width: float = CORRIDOR_WIDTH_DEG) -> np.ndarray:
+    """Etiqueta de corredor: rumbos ordenados, uno nuevo cuando se supera la anchura desde su primer envío"""
+    labels = np.empty(len(bearings), dtype=np.int64)
+    order = np.argsort(bearings)
+    # Empezar justo después del mayor hueco para no partir un corredor en 0/360 grados
+    gaps = np.diff(np.append(bearings[order], bearings[order][0] + 360))
+    order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+    unwrapped = np.unwrap(np.radians(bearings[order]))
+    unwrapped = np.degrees(unwrapped)
+    label, start = 0, unwrapped[0]
+    for position, value in zip(order, unwrapped):
+        if value - start > width:
+            label, start = label + 1, value
+        labels[position] = label
+    return labels
+
+
+def _date_windows(days: np.ndarray, window_days: int) -> np.ndarray:
+    """Ventanas de fechas: cada una empieza en el primer día aún sin ventana"""
+    labels = np.empty(len(days), dtype=np.int64)
+    order = np.argsort(days, kind='stable')
+    label, start = -1, None
+    for position in order:
+        if start is None or days[position] - start >= window_days:
+            label, start = label + 1, days[position]
+        labels[position] = label
+    return labels
+
+
+def order_stops(origin: np.ndarray, stops: np.ndarray) -> Tuple[List[int], float]:
+    """
+    Orden de reparto desde origin (ruta abierta): inserción más barata y 2-opt
+    vectorizado sobre la matriz de distancias. Devuelve (orden, km).
+    """
+    points = np.vstack((origin, stops))
+    dist = _road_km(points[:, None], points[None, :])
+    path = [0]
+    remaining = list(range(1, len(points)))
+    while remaining:
+        candidates = np.array(remaining)
+        # Coste de insertar cada parada en cada hueco (el último hueco es el final de la ruta)
+        previous = np.array(path)
+        following = np.array(path[1:] + [-1])
+        added = dist[previous][:, candidates] + np.where(following[:, None] >= 0,
+                                                         dist[candidates][:, following].T - dist[previous, following][:, None],
+                                                         0)
+        gap, best = np.unravel_index(np.argmin(added), added.shape)
+        path.insert(gap + 1, int(candidates[best]))
+        remaining.remove(int(candidates[best]))
+
+    path = np.array(path)
+    for _ in range(MAX_TWO_OPT_ROUNDS):
+        n = len(path)
+        if n < 4:
+            break
+        # Invertir path[i..j] (1 <= i < j): cambian los arcos (i-1, i) y (j, j+1)
+        i, j = np.triu_indices(n, k=1)
+        keep = i >= 1
+        i, j = i[keep], j[keep]
+        has_next = j < n - 1
+        next_j = np.where(has_next, j + 1, j)
+        delta = dist[path[i - 1], path[j]] - dist[path[i - 1], path[i]] + \
+            np.where(has_next, dist[path[i], path[next_j]] - dist[path[j], path[next_j]], 0)
+        best = int(np.argmin(delta))
+        if delta[best] >= -1e-9:
+            break
+        path[i[best]:j[best] + 1] = path[i[best]:j[best] + 1][::-1]
+
+    km = float(dist[path[:-1], path[1:]].sum())
+    return [int(p) - 1 for p in path[1:]], km
+
+
+def _trip_cost(km: float, vehicle: int, stops: int) -> float:
+    return float(km * VEHICLE_EUR_PER_KM[vehicle] + stops * STOP_EUR)
+
+
+class ConsolidationOptimizer:
+    def __init__(self, window_days: int = None):
+        self.window_days = window_days or int(os.getenv('CONSOLIDATION_WINDOW_DAYS', 1))
+
+    def optimize(self, shipments: List[Dict], window_days: int = None) -> Dict:
+        """
+        Consolidar un lote de envíos ({id, origin, destination, weight_kg,
+        volume_m3/pallets..., pickup_date}). Devuelve los camiones con sus
+        paradas y el ahorro frente a un camión por envío.
+        """
+        started = time.monotonic()
+        window_days = window_days or self.window_days
+        today = date.today().isoformat()
+
+        located, unlocated = [], []
+        for index, shipment in enumerate(shipments):
+            origin = city_coordinates(shipment.get('origin') or 'Madrid')
+            destination = city_coordinates(shipment.get('destination', ''))
+            if origin and destination:
+                located.append((index, origin, destination))
+            else:
+                unlocated.append(str(shipment.get('id', index)))
+
+        trucks: List[Dict] = []
+        individual_cost, individual_trucks = 0.0, 0
+        if located:
+            indices = np.array([index for index, _, _ in located])
+            origins = np.array([origin for _, origin, _ in located])
+            destinations = np.array([destination for _, _, destination in located])
+            metrics = load_metrics([shipments[i] for i in indices])
+            ids = [str(shipments[i].get('id', i)) for i in indices]
+            names = [shipments[i]['destination'] for i in indices]
+            days = np.array([datetime.strptime(shipments[i].get('pickup_date') or today, '%Y-%m-%d').toordinal()
+                             for i in indices])
+
+            # Coste de referencia: cada envío en su propio vehículo, directo
+            direct_km = _road_km(origins, destinations)
+            individual = (direct_km * VEHICLE_EUR_PER_KM[metrics['vehicle']] + STOP_EUR) * metrics['vehicles']
+            individual_cost = float(individual.sum())
+            individual_trucks = int(metrics['vehicles'].sum())
+
+            # Grupos: mismo origen, misma ventana de fechas y mismo corredor
+            origin_keys = {tuple(o): k for k, o in enumerate(np.unique(origins, axis=0).tolist())}
+            origin_label = np.array([origin_keys[tuple(o)] for o in origins.tolist()])
+            windows = _date_windows(days, window_days)
+            corridor = np.zeros(len(indices), dtype=np.int64)
+            for key in np.unique(origin_label):
+                members = np.flatnonzero(origin_label == key)
+                corridor[members] = _corridors(_bearing(origins[members[0]], destinations[members]))
+            groups = {}
+            for k, group_key in enumerate(zip(origin_label, windows, corridor)):
+                groups.setdefault(group_key, []).append(k)
+
+            for members in groups.values():
+                trucks += self._pack_group(np.array(members), origins, destinations, metrics,
+                                           ids, names, individual, days)
+
+        consolidated_cost = sum(truck['costo_eur'] for truck in trucks)
+        savings = individual_cost - consolidated_cost
+        elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.debug(f"Consolidación: {len(shipments)} envíos en {len(trucks)} camiones ({elapsed_ms} ms)")
+        return {
+            'camiones': trucks,
+            'sin_ubicar': unlocated,
+            'envios': len(shipments),
+            'camiones_individuales': individual_trucks,
+            'camiones_consolidados': len(trucks),
+            'costo_individual_eur': round(individual_cost, 2),
+            'costo_consolidado_eur': round(consolidated_cost, 2),
+            'ahorro_eur': round(savings, 2),
+            'ahorro_pct': round(savings / individual_cost * 100, 1) if individual_cost else 0.0,
+            'elapsed_ms': elapsed_ms,
+        }
+
+    def _pack_group(self, members: np.ndarray, origins: np.ndarray, destinations: np.ndarray, metrics: Dict,
+                    ids: List[str], names: List[str], individual: np.ndarray, days: np.ndarray) -> List[Dict]:
+        """Empaquetar un grupo sobre tráileres y ordenar las paradas de cada camión"""
+        # Los envíos de más de un tráiler viajan solos
+        oversize = members[metrics['vehicles'][members] > 1]
+        shared = members[metrics['vehicles'][members] == 1]
+        trucks = [self._truck([k], origins, destinations, metrics, ids, names, days) for k in oversize]
+        if not shared.size:
+            return trucks
+
+        sizes = np.column_stack((metrics['ldm_by_deck'][TRAILER, shared], metrics['weight'][shared],
+                                 metrics['volume'][shared]))
+        assignment, bins = first_fit_decreasing(sizes, TRAILER_CAPACITY)
+        for bin_index in range(bins):
+            load = shared[assignment == bin_index]
+            truck = self._truck(load, origins, destinations, metrics, ids, names, days)
+            # Si compartir sale más caro que ir por separado (desvíos), cada uno en su camión
+            if len(load) > 1 and truck['costo_eur'] > individual[load].sum():
+                trucks += [self._truck([k], origins, destinations, metrics, ids, names, days) for k in load]
+            else:
+                trucks.append(truck)
+        return trucks
+
+    @staticmethod
+    def _truck(load, origins: np.ndarray, destinations: np.ndarray, metrics: Dict, ids: List[str],
+               names: List[str], days: np.ndarray) -> Dict:
+        load = np.asarray(load)
+        ldm = metrics['ldm_by_deck'][:, load].sum(axis=1, keepdims=True)
+        weight, volume = metrics['weight'][load].sum(), metrics['volume'][load].sum()
+        vehicle = int(smallest_vehicle(ldm, np.array([weight]), np.array([volume]),
+                                       np.array([metrics['tallest'][load].max()]))[0][0])
+        count = int(metrics['vehicles'][load].max())
+
+        stops, stop_of = np.unique(destinations[load], axis=0, return_inverse=True)
+        order, km = order_stops(origins[load[0]], stops)
+        stop_of = stop_of.ravel()
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        by_stop = load[np.argsort(position[stop_of], kind='stable')]
+        return {
+            'envios': [ids[k] for k in by_stop],
+            'vehiculo': VEHICLES[vehicle],
+            'vehiculos': count,
+            'fecha_recogida': date.fromordinal(int(days[load].min())).isoformat(),
+            'paradas': [names[load[np.flatnonzero(stop_of == stop)[0]]] for stop in order],
+            'km': round(km, 1),
+            'utilizacion': {
+                'lineal': round(float(ldm[vehicle, 0] / (DECK_LENGTH[vehicle] * count) * 100), 1),
+                'peso': round(float(weight / (DECK_PAYLOAD[vehicle] * count) * 100), 1),
+                'volumen': round(float(volume / (DECK_VOLUME[vehicle] * count) * 100), 1),
+            },
+            'costo_eur': round(_trip_cost(km, vehicle, len(stops)) * count, 2),
+        }
+
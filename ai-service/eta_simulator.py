@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Simulador de ETA con los tiempos de conducción y descanso del Reglamento (CE) 561/2006
+Avanza en pasos de TICK_HOURS todas las combinaciones (distancia, salida, nivel
+de servicio) a la vez con NumPy: pausa de 45 min cada 4,5 h, límite diario de
+9 h (10 h dos días por semana), descanso diario de 11 h (9 h con doble
+conductor), 56 h semanales con descanso de 45 h, y las prohibiciones de
+circulación del país en el que está el camión en cada momento.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from truck_calendar import TRUCK_CALENDAR
+
+TICK_HOURS = 0.25
+DEFAULT_SPEED_KMH = 70.0
+# Hora de salida cuando sólo se conoce la fecha de recogida
+PICKUP_HOUR = 8
+
+BREAK_AFTER_HOURS = 4.5
+BREAK_HOURS = 0.75
+WEEKLY_DRIVING_HOURS = 56
+WEEKLY_REST_HOURS = 45
+
+# Reglas por nivel de servicio (mismo orden que SERVICE_LEVELS):
+# económico = un conductor sin ampliaciones, estándar = un conductor con los dos días
+# de 10 h, express = doble conductor (la pausa la hace el copiloto)
+DAILY_DRIVING_HOURS = np.array([9.0, 9.0, 20.0])
+EXTENDED_DRIVING_HOURS = np.array([9.0, 10.0, 20.0])
+EXTENDED_DAYS_PER_WEEK = np.array([0, 2, 0])
+DAILY_REST_HOURS = np.array([11.0, 11.0, 9.0])
+NEEDS_BREAKS = np.array([True, True, False])
+WEEKLY_LIMIT_FACTOR = np.array([1, 1, 2])
+
+
+def _ticks(hours) -> np.ndarray:
+    return np.ceil(np.asarray(hours) / TICK_HOURS - 1e-9).astype(np.int64)
+
+
+class EtaSimulator:
+    def __init__(self, calendar=None, tick_hours: float = TICK_HOURS):
+        self.calendar = calendar or TRUCK_CALENDAR
+        self.tick_hours = tick_hours
+
+    def _ban_mask(self, countries: List[str], origin: np.datetime64, ticks: int, heavy: bool,
+                  extra_bans: Iterable[Tuple[str, datetime, datetime]]) -> np.ndarray:
+        """Matriz países x ticks desde origin: True si el camión no puede circular"""
+        mask = np.zeros((max(len(countries), 1), ticks), dtype=bool)
+        start = origin.astype(datetime)
+        end = start + timedelta(hours=ticks * self.tick_hours)
+        tick = np.timedelta64(int(self.tick_hours * 60), 'm')
+
+        intervals = [(countries.index(country), np.datetime64(ban['start'].replace(' ', 'T')),
+                      np.datetime64(ban['end'].replace(' ', 'T')))
+                     for country in countries for ban in self.calendar.bans(country, start, end, heavy)]
+        intervals += [(countries.index(country), np.datetime64(ban_start, 'm'), np.datetime64(ban_end, 'm'))
+                      for country, ban_start, ban_end in extra_bans if country in countries]
+        for row, ban_start, ban_end in intervals:
+            first = max(int((ban_start - origin) // tick), 0)
+            last = min(int(-((origin - ban_end) // tick)), ticks)
+            mask[row, first:last] = True
+        return mask
+
+    def simulate(self, distance_km, start, service_level, country_km: Optional[Dict[str, float]] = None,
+                 speed_kmh: float = DEFAULT_SPEED_KMH, heavy: bool = True,
+                 extra_bans: Iterable[Tuple[str, datetime, datetime]] = ()) -> Dict[str, np.ndarray]:
+        """
+        ETA de cada combinación (se difunden distancia, salida y nivel 0-2).
+        country_km: km por país en orden de paso (se reparte en proporción a cada distancia).
+        extra_bans: (país, inicio, fin) adicionales, p. ej. incidencias en vivo.
+        Devuelve llegada (datetime64[m]) y horas totales, de conducción y de espera por prohibiciones.
+        """
+        distance, starts, levels = np.broadcast_arrays(
+            np.asarray(distance_km, dtype=np.float64),
+            np.asarray(start, dtype='datetime64[m]'),
+            np.asarray(service_level, dtype=np.int64))
+        distance, starts, levels = distance.ravel(), starts.ravel(), levels.ravel()
+        n = len(distance)
+
+        countries = list(country_km or {})
+        fractions = np.cumsum([country_km[c] for c in countries]) / sum(country_km.values()) \
+            if countries else np.ones(1)
+
+        dt = self.tick_hours
+        step_km = speed_kmh * dt
+        origin = starts.min()
+        offsets = ((starts - origin) // np.timedelta64(int(dt * 60), 'm')).astype(np.int64)
+        # Horizonte: conducción + descansos diarios/semanales + margen para prohibiciones
+        driving_ticks = _ticks(distance / speed_kmh)
+        horizon = int(offsets.max() + (driving_ticks * 3).max() + _ticks(WEEKLY_REST_HOURS + 72))
+        banned_at = self._ban_mask(countries, origin, horizon, heavy, extra_bans)
+
+        daily_limit = DAILY_DRIVING_HOURS[levels]
+        extended_limit = EXTENDED_DRIVING_HOURS[levels]
+        daily_rest = DAILY_REST_HOURS[levels]
+        needs_breaks = NEEDS_BREAKS[levels]
+        weekly_limit = WEEKLY_DRIVING_HOURS * WEEKLY_LIMIT_FACTOR[levels]
+
+        position = np.zeros(n)
+        since_break = np.zeros(n)
+        today = np.zeros(n)
+        week = np.zeros(n)
+        extensions_left = EXTENDED_DAYS_PER_WEEK[levels].copy()
+        idle = np.zeros(n)
+        rest_left = np.zeros(n)
+        ban_wait = np.zeros(n)
+        arrival_tick = np.full(n, -1, dtype=np.int64)
+
+        for k in range(horizon):
+            active = arrival_tick < 0
+            if not active.any():
+                break
+            country = np.searchsorted(fractions, np.minimum(position / np.maximum(distance, 1e-9), 1.0),
+                                      side='right')
+            country = np.minimum(country, banned_at.shape[0] - 1)
+            banned = banned_at[country, np.minimum(offsets + k, horizon - 1)]
+
+            # Pausas y descansos obligatorios antes de seguir conduciendo
+            # (el descanso semanal sustituye al diario si coinciden)
+            end_of_week = active & (rest_left <= 0) & (week >= weekly_limit - 1e-9)
+            rest_left = np.where(end_of_week, WEEKLY_REST_HOURS, rest_left)
+            # La ampliación a 10 h sólo se usa si con ella se llega sin otro descanso diario
+            finishes = distance - position <= (extended_limit - today) * speed_kmh + 1e-9
+            limit = np.where((extensions_left > 0) & finishes, extended_limit, daily_limit)
+            end_of_day = active & (rest_left <= 0) & (today >= limit - 1e-9)
+            used_extension = end_of_day & (today > daily_limit + 1e-9)
+            extensions_left = extensions_left - used_extension
+            rest_left = np.where(end_of_day, daily_rest, rest_left)
+            needs_break = active & (rest_left <= 0) & needs_breaks & (since_break >= BREAK_AFTER_HOURS - 1e-9)
+            rest_left = np.where(needs_break, BREAK_HOURS, rest_left)
+
+            resting = active & (rest_left > 0)
+            driving = active & ~resting & ~banned
+            waiting = active & ~resting & banned
+            ban_wait += waiting * dt
+
+            # El tiempo parado (descanso o prohibición) cuenta como pausa/descanso
+            stopped = resting | waiting
+            idle = np.where(stopped, idle + dt, 0.0)
+            rest_left = np.where(resting, rest_left - dt, rest_left)
+            since_break = np.where(stopped & (idle >= BREAK_HOURS - 1e-9), 0.0, since_break)
+            rested = stopped & (idle >= daily_rest - 1e-9)
+            today = np.where(rested, 0.0, today)
+            week_rested = stopped & (idle >= WEEKLY_REST_HOURS - 1e-9)
+            week = np.where(week_rested, 0.0, week)
+            extensions_left = np.where(week_rested, EXTENDED_DAYS_PER_WEEK[levels], extensions_left)
+
+            position = position + driving * step_km
+            since_break += driving * dt
+            today += driving * dt
+            week += driving * dt
+            arrival_tick = np.where(active & (position >= distance - 1e-9), k + 1, arrival_tick)
+
+        arrival_tick = np.where(arrival_tick < 0, horizon, arrival_tick)
+        hours = arrival_tick * dt
+        return {
+            'arrival': starts + (hours * 60).astype('timedelta64[m]'),
+            'hours': hours,
+            'driving_hours': distance / speed_kmh,
+            'ban_wait_hours': ban_wait,
+        }
+
+
+def departure(pickup_date: str) -> np.datetime64:
+    """Salida a PICKUP_HOUR del día de recogida"""
+    day = datetime.strptime(pickup_date, '%Y-%m-%d')
+    return np.datetime64(day + timedelta(hours=PICKUP_HOUR), 'm')
+
+
+def incident_date(incident: Dict) -> Optional[date]:
+    """Día de una incidencia del backend ('2026-10-21' o '2026-10-21T00:00:00Z'); None si no se entiende"""
+    try:
+        return date.fromisoformat(str(incident.get('date'))[:10])
+    except ValueError:
+        return None
+
+
+def incident_bans(incidents: Iterable[Dict]) -> List[Tuple[str, datetime, datetime]]:
+    """Incidencias críticas en vivo con país y fecha -> prohibición de todo ese día"""
+    bans = []
+    for incident in incidents:
+        if incident.get('severity') != 'critical' or not incident.get('country'):
+            continue
+        day = incident_date(incident)
+        if day is None:
+            continue
+        start = datetime.combine(day, datetime.min.time())
+        bans.append((incident['country'], start, start + timedelta(days=1)))
+    return bans
+
+
+ETA_SIMULATOR = EtaSimulator()
@@ -8,9 +8,29 @@ import requests
 import json
 from typing import Optional, Dict, List
 from loguru import logger
+import numpy as np
 import os
+import time
 from datetime import datetime, timedelta
 
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from eta_simulator import DEFAULT_SPEED_KMH, ETA_SIMULATOR, departure, incident_bans
+from load_planner import VEHICLES, ltl_price, plan_load, truck_share
+from polyline_utils import polyline_coords
+from quote_progress import (QUOTE_PRICED, RESTRICTIONS_CHECKED, ROUTE_RESOLVED, TOLLS_COMPUTED,
+                            QuoteProgress)
+from timeout_policy import TIMEOUTS, DeadlineExceeded, check_deadline, in_context
+from route_countries import ROAD_DETOUR_FACTOR, fallback_path, get_country_grid, scale_country_km
+from toll_estimator import estimate_route_tolls, estimate_tolls, route_country_km, validate_upstream
+from truck_calendar import LOCAL_BAN_TYPES, TRUCK_CALENDAR
+
+# Niveles de servicio (mismos factores que masterQuoteService/deliverySchedulingService del backend)
+SERVICE_LEVELS = ('economico', 'estandar', 'express')
+SERVICE_LABELS = {'economico': 'Económico', 'estandar': 'Estándar', 'express': 'Express'}
+SERVICE_PRICE_MULTIPLIERS = np.array([0.85, 1.0, 1.25])
+SERVICE_CONFIDENCE = np.array([75, 85, 95])
+
+
 class EuropeanLogisticsService:
     def __init__(self):
         """
@@ -27,6 +47,19 @@ class EuropeanLogisticsService:
             'holidays': f"{self.backend_url}/api/holidays"
         }
 
+        # Circuit breaker por endpoint: con el backend degradado se pasa al fallback local sin esperar
+        self.breakers = {
+            name: CircuitBreaker(
+                f"logistics:{name}",
+                failure_threshold=int(os.getenv('LOGISTICS_BREAKER_FAILURES', 3)),
+                reset_timeout=float(os.getenv('LOGISTICS_BREAKER_RESET_SECONDS', 30)),
+                window_size=int(os.getenv('LOGISTICS_BREAKER_WINDOW', 20)),
+                error_rate=float(os.getenv('LOGISTICS_BREAKER_ERROR_RATE', 0.5)),
+                slow_call_seconds=float(os.getenv('LOGISTICS_SLOW_CALL_SECONDS', 5)),
+                min_calls=int(os.getenv('LOGISTICS_BREAKER_MIN_CALLS', 10)))
+            for name in self.endpoints
+        }
+
         # Ciudades europeas principales desde España
         self.european_cities = {
             'francia': ['parís', 'lyon', 'marsella', 'toulouse', 'niza', 'burdeos'],
@@ -52,8 +85,48 @@ class EuropeanLogisticsService:
             'peligrosa': 3.00          # EUR por kg por 100km
         }
 
+        # Más allá de este tiempo el peaje se estima localmente
+        self.toll_timeout = float(os.getenv('TOLL_UPSTREAM_TIMEOUT_SECONDS', 5))
+
+        # Festivos y prohibiciones de circulación precalculados
+        self.calendar = TRUCK_CALENDAR
+        self.eta = ETA_SIMULATOR
+
         logger.info("🚚 EuropeanLogisticsService inicializado para transporte terrestre")
 
+    def _post(self, endpoint: str, payload: Dict, timeout: float) -> requests.Response:
+        """
+        POST a un endpoint del backend a través de su circuit breaker.
+        Con el circuito abierto lanza CircuitOpenError sin llamar; los 5xx y los
+        errores de red cuentan como fallo, el resto como éxito con su latencia.
+        timeout es el techo: el efectivo sale de TIMEOUTS y del plazo de la petición;
+        si vence por el plazo no cuenta como fallo.
+        """
+        # Un plazo vencido no es fallo del upstream: se comprueba antes del circuito
+        check_deadline(endpoint)
+        breaker = self.breakers[endpoint]
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"logistics:{endpoint}")
+        started = time.monotonic()
+        try:
+            response = TIMEOUTS.call(endpoint, timeout, lambda t: requests.post(
+                self.endpoints[endpoint], json=payload, timeout=t))
+        except DeadlineExceeded:
+            breaker.release_probe()
+            raise
+        except Exception:
+            breaker.record_failure(time.monotonic() - started)
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure(time.monotonic() - started)
+        else:
+            breaker.record_success(time.monotonic() - started)
+        return response
+
+    def circuit_snapshot(self) -> Dict[str, Dict]:
+        """Estado de los circuitos de cada endpoint"""
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
     async def get_route_calculation(self, origin: str, destination: str, vehicle_specs: Dict = None):
         """
         Obtener cálculo de ruta usando OpenRouteService a través del backend
@@ -74,21 +147,24 @@ class EuropeanLogisticsService:
                 'profile': 'driving-hgv'  # Heavy Goods Vehicle
             }
 
-            response = requests.post(self.endpoints['openroute'], json=payload, timeout=15)
+            response = self._post('openroute', payload, timeout=15)
 
             if response.status_code == 200:
                 route_data = response.json()
-                return {
+                return self._with_country_km({
                     'distance_km': route_data.get('distance', 0) / 1000,
                     'duration_hours': route_data.get('duration', 0) / 3600,
                     'polyline': route_data.get('geometry'),
                     'countries': route_data.get('countries', []),
                     'success': True
-                }
+                })
             else:
                 logger.warning(f"OpenRoute error: {response.status_code}")
                 return self._fallback_route_calculation(origin, destination)
 
+        except CircuitOpenError:
+            logger.debug("Circuito de OpenRoute abierto: ruta aproximada")
+            return self._fallback_route_calculation(origin, destination)
         except Exception as e:
             logger.error(f"Error calling OpenRoute: {e}")
             return self._fallback_route_calculation(origin, destination)
@@ -96,71 +172,115 @@ class EuropeanLogisticsService:
     async def get_toll_calculation(self, polyline: str, vehicle_specs: Dict):
         """
         Calcular peajes usando TollGuru a través del backend
+        Si falla o tarda más de toll_timeout se usa la estimación local por país;
+        si responde, se contrasta con ella.
         """
+        estimate = self._estimate_polyline_tolls(polyline, vehicle_specs)
         try:
             payload = {
                 'polyline': polyline,
                 'vehicle': {
                     'type': 'truck',
                     'weight': vehicle_specs.get('weight', 20),
-                    'axles': 3,
+                    'axles': vehicle_specs.get('axles', 3),
                     'height': vehicle_specs.get('height', 4),
-                    'emissionClass': 'euro6'
+                    'emissionClass': vehicle_specs.get('emission_class', 'euro6')
                 }
             }
 
-            response = requests.post(self.endpoints['tollguru'], json=payload, timeout=15)
+            response = self._post('tollguru', payload, timeout=self.toll_timeout)
 
             if response.status_code == 200:
                 toll_data = response.json()
-                return {
+                upstream = {
                     'total_cost': toll_data.get('totalCost', 0),
                     'currency': toll_data.get('currency', 'EUR'),
                     'breakdown': toll_data.get('breakdown', []),
                     'countries': toll_data.get('countries', []),
                     'success': True
                 }
+                return validate_upstream(upstream, estimate) if estimate else upstream
             else:
                 logger.warning(f"TollGuru error: {response.status_code}")
-                return {'total_cost': 0, 'currency': 'EUR', 'success': False}
 
+        except CircuitOpenError:
+            logger.debug("Circuito de TollGuru abierto: peajes estimados")
         except Exception as e:
             logger.error(f"Error calling TollGuru: {e}")
-            return {'total_cost': 0, 'currency': 'EUR', 'success': False}
+
+        return estimate or {'total_cost': 0, 'currency': 'EUR', 'success': False}
+
+    def _estimate_polyline_tolls(self, polyline: str, vehicle_specs: Dict) -> Optional[Dict]:
+        """Estimación local a partir de los km por país de la polyline"""
+        try:
+            country_km = get_country_grid().country_km(polyline_coords(polyline))
+        except (ValueError, UnicodeEncodeError):
+            return None
+        return estimate_tolls(country_km, vehicle_specs) if country_km else None
 
     async def get_restrictions_and_holidays(self, countries: List[str], pickup_date: str, vehicle_specs: Dict):
         """
         Obtener restricciones de tráfico y festivos
+        Festivos y prohibiciones salen del calendario local; el backend sólo aporta incidencias en vivo.
+        """
+        restrictions_data = self.calendar.restrictions(countries, pickup_date, vehicle_specs)
+        incidents = self._get_live_incidents(countries, pickup_date, pickup_date, vehicle_specs)
+        restrictions_data['restrictions'] += incidents or []
+        restrictions_data['critical_alerts'] = len(
+            [a for a in restrictions_data['restrictions'] if a.get('severity') == 'critical'])
+        restrictions_data['live_incidents'] = incidents is not None
+        restrictions_data['success'] = True
+        return restrictions_data
+
+    async def get_restrictions_window(self, countries: List[str], date_from: str, date_to: str,
+                                      vehicle_specs: Dict):
+        """
+        Festivos locales e incidencias en vivo de todo un rango de fechas en una
+        sola consulta (cada incidencia trae su 'date')
         """
+        first = datetime.strptime(date_from, '%Y-%m-%d').date()
+        last = datetime.strptime(date_to, '%Y-%m-%d').date()
+        holidays = [holiday for country in countries for holiday in self.calendar.holidays(country, first, last)]
+        incidents = self._get_live_incidents(countries, date_from, date_to, vehicle_specs)
+        return {'restrictions': incidents or [], 'holidays': holidays, 'success': incidents is not None}
+
+    def _get_live_incidents(self, countries: List[str], date_from: str, date_to: str,
+                            vehicle_specs: Dict) -> Optional[List[Dict]]:
+        """Incidencias en vivo del backend (cortes, obras...); None si no responde"""
         try:
             payload = {
                 'countries': countries,
-                'date': pickup_date,
+                'date': date_from,
+                'dateFrom': date_from,
+                'dateTo': date_to,
                 'vehicle': vehicle_specs
             }
 
-            response = requests.post(self.endpoints['restrictions'], json=payload, timeout=10)
+            response = self._post('restrictions', payload, timeout=10)
 
             if response.status_code == 200:
-                restrictions_data = response.json()
-                return {
-                    'restrictions': restrictions_data.get('alerts', []),
-                    'holidays': restrictions_data.get('holidays', []),
-                    'critical_alerts': restrictions_data.get('summary', {}).get('critical', 0),
-                    'success': True
-                }
-            else:
-                logger.warning(f"Restrictions API error: {response.status_code}")
-                return self._fallback_restrictions(countries, pickup_date)
+                # Festivos y prohibiciones fijas ya vienen del calendario local
+                return [alert for alert in response.json().get('alerts', [])
+                        if alert.get('type') not in LOCAL_BAN_TYPES]
+            logger.warning(f"Restrictions API error: {response.status_code}")
 
+        except CircuitOpenError:
+            logger.debug("Circuito de restricciones abierto: sólo calendario local")
         except Exception as e:
-            logger.error(f"Error getting restrictions: {e}")
-            return self._fallback_restrictions(countries, pickup_date)
+            logger.error(f"Error getting live incidents: {e}")
 
-    def generate_european_quote(self, quote_data: Dict):
+        return None
+
+    def generate_european_quote(self, quote_data: Dict, prefetched: Dict = None,
+                                progress: QuoteProgress = None):
         """
         Generar cotización completa para transporte terrestre europeo
+
+        prefetched: resultados ya obtenidos ('route', 'tolls', 'restrictions', 'eta'),
+        p. ej. por QuotePrefetcher; las etapas presentes no se vuelven a consultar.
+        progress: recibe un evento por etapa (ruta, peajes, restricciones, precio)
         """
+        progress = progress or QuoteProgress()
         try:
             # Datos extraídos
             weight_kg = quote_data.get('weight_kg', 1000)  # Default 1 tonelada
@@ -169,50 +289,82 @@ class EuropeanLogisticsService:
             cargo_type = quote_data.get('cargo_type', 'carga_general')
             pickup_date = quote_data.get('pickup_date',
                                        (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'))
+            service_type = quote_data.get('service_type') or 'estandar'
+            if service_type not in SERVICE_LEVELS:
+                service_type = 'estandar'
 
             if not destination:
                 return None
 
-            # Especificaciones del vehículo basadas en peso
-            vehicle_specs = self._get_vehicle_specs(weight_kg)
+            # Plan de carga (metros lineales, LTL/FTL) y vehículo por peso y volumen
+            load_plan = plan_load({**quote_data, 'weight_kg': weight_kg})
+            vehicle_specs = self._get_vehicle_specs(weight_kg, load_plan)
+            prefetched = prefetched or {}
 
             # 1. Calcular ruta
-            route_data = self._sync_call(self.get_route_calculation(origin, destination, vehicle_specs))
+            route_data = prefetched.get('route') or self._sync_call(
+                self.get_route_calculation(origin, destination, vehicle_specs))
 
             if not route_data['success']:
                 return None
 
-            # 2. Calcular peajes si hay polyline
-            toll_data = {'total_cost': 0, 'currency': 'EUR'}
-            if route_data.get('polyline'):
+            # Estimación base en cuanto se conoce la distancia (sin peajes)
+            distance_km = route_data['distance_km']
+            rate_per_kg_100km = self.base_rates.get(cargo_type, self.base_rates['carga_general'])
+            base_estimate = (weight_kg * rate_per_kg_100km * distance_km) / 100 + distance_km * 0.35
+            progress.stage(ROUTE_RESOLVED,
+                           distance_km=round(distance_km, 1),
+                           duration_hours=round(route_data['duration_hours'], 1),
+                           countries=route_data['countries'],
+                           base_estimate_eur=round(base_estimate, 2),
+                           prefetched='route' in prefetched)
+
+            # 2. Calcular peajes si hay polyline; si no, o si fallan, estimación local por país
+            toll_data = prefetched.get('tolls')
+            if 'tolls' not in prefetched and route_data.get('polyline'):
                 toll_data = self._sync_call(self.get_toll_calculation(route_data['polyline'], vehicle_specs))
+            if not toll_data or not toll_data.get('success'):
+                toll_data = estimate_route_tolls(route_data, vehicle_specs)
+            progress.stage(TOLLS_COMPUTED, toll_cost_eur=toll_data.get('total_cost', 0),
+                           prefetched='tolls' in prefetched)
 
             # 3. Verificar restricciones y festivos
-            restrictions_data = self._sync_call(
+            restrictions_data = prefetched.get('restrictions') or self._sync_call(
                 self.get_restrictions_and_holidays(route_data['countries'], pickup_date, vehicle_specs)
             )
+            progress.stage(RESTRICTIONS_CHECKED, critical_alerts=restrictions_data.get('critical_alerts', 0),
+                           prefetched='restrictions' in prefetched)
 
             # 4. Calcular costo base de transporte
-            distance_km = route_data['distance_km']
-            rate_per_kg_100km = self.base_rates.get(cargo_type, self.base_rates['carga_general'])
             transport_cost = (weight_kg * rate_per_kg_100km * distance_km) / 100
+            # Grupaje con dimensiones reales: tarifa por metro lineal y parte proporcional del combustible
+            ltl = load_plan['modo'] == 'LTL' and not load_plan['volumen_estimado']
+            if ltl:
+                transport_cost = ltl_price(load_plan, distance_km)
 
             # 5. Costos adicionales
             fuel_cost = distance_km * 0.35  # EUR por km (combustible)
+            if ltl:
+                fuel_cost *= truck_share(load_plan)
             insurance_cost = max(weight_kg * 0.05, 50)  # Seguro mínimo 50 EUR
 
             # 6. Peajes
             toll_cost = toll_data.get('total_cost', 0)
 
-            # 7. Total
-            total_cost = transport_cost + fuel_cost + insurance_cost + toll_cost
-
-            # 8. Tiempo estimado
+            # 7. Tiempo estimado: los tres niveles en una simulación 561/2006 con las prohibiciones de la ruta
             base_hours = route_data['duration_hours']
-            # Agregar tiempo por restricciones y paradas obligatorias
-            additional_hours = 2 + (distance_km / 500) * 8  # Descansos obligatorios cada 500km
-            total_hours = base_hours + additional_hours
-            estimated_days = max(1, round(total_hours / 10))  # 10 horas de conducción por día
+            eta = prefetched.get('eta') or self.estimate_transit(route_data, pickup_date, vehicle_specs,
+                                                                 restrictions_data.get('restrictions', []))
+
+            # 8. Los tres niveles de servicio de una vez; el total es el del nivel pedido
+            service_levels = self._service_level_options(transport_cost, fuel_cost, insurance_cost,
+                                                         toll_cost, eta['hours'], eta['arrival'])
+            selected = service_levels[service_type]
+            multiplier = selected['multiplicador']
+            transport_cost *= multiplier
+            fuel_cost *= multiplier
+            total_cost = selected['costo_total_eur']
+            estimated_days = selected['tiempo_estimado_dias']
 
             quote = {
                 'origen': origin,
@@ -222,18 +374,23 @@ class EuropeanLogisticsService:
                 'tipo_transporte': 'terrestre',
                 'distancia_km': round(distance_km, 1),
                 'paises_transito': route_data['countries'],
+                'km_por_pais': route_data.get('country_km', {}),
                 'fecha_recogida': pickup_date,
+                'tipo_servicio': service_type,
 
                 # Costos detallados
                 'costo_transporte_eur': round(transport_cost, 2),
                 'costo_combustible_eur': round(fuel_cost, 2),
                 'costo_peajes_eur': round(toll_cost, 2),
+                'peajes_estimados': bool(toll_data.get('estimated')),
                 'costo_seguro_eur': round(insurance_cost, 2),
                 'costo_total_eur': round(total_cost, 2),
 
                 # Tiempos
                 'tiempo_estimado_dias': estimated_days,
                 'horas_conduccion': round(base_hours, 1),
+                'horas_transito': selected['horas_transito'],
+                'llegada_estimada': selected['llegada_estimada'],
 
                 # Restricciones y alertas
                 'restricciones': restrictions_data.get('restrictions', []),
@@ -242,19 +399,85 @@ class EuropeanLogisticsService:
 
                 # Vehículo
                 'vehiculo': vehicle_specs,
+                'carga': load_plan,
+                'modo_transporte': load_plan['modo'],
+
+                # Comparativa de niveles de servicio
+                'niveles_servicio': service_levels,
+                'tabla_comparativa': self.format_service_comparison(service_levels, service_type),
 
                 'validez_dias': 7
             }
 
+            progress.stage(QUOTE_PRICED, total_eur=quote['costo_total_eur'],
+                           estimated_days=estimated_days)
             return quote
 
         except Exception as e:
             logger.error(f"Error generating European quote: {e}")
             return None
 
-    def _get_vehicle_specs(self, weight_kg: float):
-        """Obtener especificaciones del vehículo según el peso"""
-        if weight_kg <= 3500:  # Furgoneta
+    def estimate_transit(self, route_data: Dict, pickup_date: str, vehicle_specs: Dict,
+                         incidents: List[Dict] = (), service_levels=None, departures=None) -> Dict:
+        """
+        ETA de la ruta con tiempos de conducción y descanso 561/2006 y las prohibiciones
+        de cada país del recorrido. Por defecto, los tres niveles con salida el día de
+        recogida; service_levels/departures admiten arrays para simular lotes.
+        """
+        duration = route_data.get('duration_hours') or 0
+        distance = route_data['distance_km']
+        if departures is None:
+            try:
+                departures = departure(pickup_date)
+            except (TypeError, ValueError):
+                departures = departure((datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'))
+        return self.eta.simulate(
+            distance, departures,
+            np.arange(len(SERVICE_LEVELS)) if service_levels is None else service_levels,
+            route_country_km(route_data),
+            speed_kmh=distance / duration if duration else DEFAULT_SPEED_KMH,
+            heavy=vehicle_specs.get('type') != 'van',
+            extra_bans=incident_bans(incidents))
+
+    @staticmethod
+    def _service_level_options(transport_cost: float, fuel_cost: float, insurance_cost: float,
+                               toll_cost: float, hours: np.ndarray, arrivals: np.ndarray) -> Dict:
+        """
+        Precio y plazo de cada nivel de servicio en una sola pasada.
+        El multiplicador se aplica a transporte y combustible; peajes y seguro
+        se repercuten sin cambios. El plazo son las horas simuladas de cada nivel.
+        """
+        totals = (transport_cost + fuel_cost) * SERVICE_PRICE_MULTIPLIERS + insurance_cost + toll_cost
+        days = np.maximum(1, np.ceil(np.asarray(hours) / 24))
+
+        return {
+            level: {
+                'multiplicador': float(SERVICE_PRICE_MULTIPLIERS[i]),
+                'costo_total_eur': round(float(totals[i]), 2),
+                'tiempo_estimado_dias': int(days[i]),
+                'horas_transito': round(float(hours[i]), 1),
+                'llegada_estimada': str(arrivals[i]).replace('T', ' '),
+                'confianza': int(SERVICE_CONFIDENCE[i]),
+            }
+            for i, level in enumerate(SERVICE_LEVELS)
+        }
+
+    @staticmethod
+    def format_service_comparison(service_levels: Dict, selected: str = None) -> str:
+        """Tabla markdown con precio y plazo de cada nivel de servicio"""
+        lines = ["| Servicio | Total (EUR) | Plazo (días) | Confianza |",
+                 "|---|---:|---:|---:|"]
+        for level in SERVICE_LEVELS:
+            option = service_levels[level]
+            label = SERVICE_LABELS[level] + (' ✓' if level == selected else '')
+            lines.append(f"| {label} | {option['costo_total_eur']:.2f} | "
+                         f"{option['tiempo_estimado_dias']} | {option['confianza']}% |")
+        return "\n".join(lines)
+
+    def _get_vehicle_specs(self, weight_kg: float, load_plan: Dict = None):
+        """Obtener especificaciones del vehículo según el peso (y el plan de carga si lo hay)"""
+        size = VEHICLES.index(load_plan['vehiculo']) if load_plan else 0
+        if weight_kg <= 3500 and size == 0:  # Furgoneta
             return {
                 'type': 'van',
                 'weight': weight_kg / 1000,
@@ -263,7 +486,7 @@ class EuropeanLogisticsService:
                 'length': 6.0,
                 'axles': 2
             }
-        elif weight_kg <= 12000:  # Camión rígido
+        elif weight_kg <= 12000 and size <= 1:  # Camión rígido
             return {
                 'type': 'truck',
                 'weight': weight_kg / 1000,
@@ -305,7 +528,7 @@ class EuropeanLogisticsService:
                     except Exception as e:
                         exception = e
 
-                thread = threading.Thread(target=run_in_thread)
+                thread = threading.Thread(target=in_context(run_in_thread))
                 thread.start()
                 thread.join()
 
@@ -321,8 +544,42 @@ class EuropeanLogisticsService:
             loop.close()
             return result
 
+    def _with_country_km(self, route: Dict) -> Dict:
+        """
+        Km por país a partir de la polyline (segmentación local, sin red);
+        completa 'countries' si el backend no los trae
+        """
+        if not route.get('polyline'):
+            return route
+        try:
+            coords = polyline_coords(route['polyline'])
+        except (ValueError, UnicodeEncodeError) as e:
+            logger.warning(f"Polyline no decodificable: {e}")
+            return route
+
+        country_km = get_country_grid().country_km(coords)
+        if country_km:
+            route['country_km'] = scale_country_km(country_km, route['distance_km'])
+            if not route.get('countries'):
+                route['countries'] = list(country_km)
+        return route
+
     def _fallback_route_calculation(self, origin: str, destination: str):
         """Cálculo de ruta de fallback con distancias aproximadas"""
+        # Ciudades conocidas: trazado aproximado por los pasos fronterizos y segmentación por países
+        path = fallback_path(origin, destination)
+        country_km = get_country_grid().country_km(path) if path is not None else {}
+        if country_km:
+            distance = round(sum(country_km.values()) * ROAD_DETOUR_FACTOR, 1)
+            return {
+                'distance_km': distance,
+                'duration_hours': distance / 80,  # 80 km/h promedio
+                'countries': list(country_km),
+                'country_km': scale_country_km(country_km, distance),
+                'fallback': True,
+                'success': True
+            }
+
         # Distancias aproximadas desde España
         fallback_distances = {
             'francia': 800, 'alemania': 1200, 'italia': 1100,
@@ -343,31 +600,10 @@ class EuropeanLogisticsService:
             'distance_km': distance,
             'duration_hours': distance / 80,  # 80 km/h promedio
             'countries': ['ES', self._get_country_code(destination)],
+            'fallback': True,
             'success': True
         }
 
-    def _fallback_restrictions(self, countries: List[str], pickup_date: str):
-        """Restricciones de fallback básicas"""
-        alerts = []
-
-        # Verificar si es domingo
-        pickup_datetime = datetime.strptime(pickup_date, '%Y-%m-%d')
-        if pickup_datetime.weekday() == 6:  # Domingo
-            for country in countries:
-                if country in ['DE', 'AT', 'CH']:
-                    alerts.append({
-                        'type': 'weekend_ban',
-                        'severity': 'critical',
-                        'country': country,
-                        'message': f'PROHIBIDA circulación camiones domingos en {country}'
-                    })
-
-        return {
-            'restrictions': alerts,
-            'holidays': [],
-            'critical_alerts': len([a for a in alerts if a['severity'] == 'critical'])
-        }
-
     def _get_country_code(self, destination: str):
         """Obtener código de país del destino"""
         country_codes = {
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Evaluación offline del router de modelos frente a la regla de palabras clave
+El registro de turnos se parte en orden temporal: el router se entrena con los
+turnos antiguos y se evalúa con los más recientes, que no ha visto. Sobre esos
+turnos compara qué parte va a Haiku, los errores en ambos sentidos y el coste
+estimado:
+- mal enrutados a Haiku: turnos etiquetados "Haiku no basta" enviados a Haiku
+- enviados a Haiku sin verificar: turnos que sirvió Sonnet (sin etiqueta
+  fiable) y que el router mandaría a Haiku
+- sobre-enrutados a Sonnet: turnos etiquetados "Haiku basta" enviados a Sonnet
+
+Uso: python evaluate_router.py turns.jsonl [fracción_de_evaluación=0.2]
+"""
+
+import sys
+import os
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from claude_handler import LUC1ClaudeHandler
+from model_router import ModelRouter, load_turns, split_by_time, turn_label
+from train_router import build_examples, train_classifier
+
+
+def evaluate(name, choose, turns, cheap_model, avg_cost):
+    routed_cheap = 0
+    misrouted = 0
+    unverified = 0
+    over_routed = 0
+    labeled = 0
+    cost = 0.0
+
+    for turn in turns:
+        model = choose(turn)
+        cost += avg_cost.get(model, 0.0)
+        if model == cheap_model:
+            routed_cheap += 1
+
+        outcome = turn_label(turn, cheap_model)
+        if outcome is None or outcome[1] < 1.0:
+            # Sin etiqueta fiable: sólo cuenta el riesgo de mandar a Haiku lo que sirvió Sonnet
+            if model == cheap_model and turn.get('model') != cheap_model:
+                unverified += 1
+            continue
+        labeled += 1
+        if model == cheap_model and outcome[0] == 0:
+            misrouted += 1
+        elif model != cheap_model and outcome[0] == 1:
+            over_routed += 1
+
+    total = max(len(turns), 1)
+    print(f"\n📊 {name}")
+    print(f"   Turnos a Haiku:               {routed_cheap}/{len(turns)} ({100 * routed_cheap / total:.1f}%)")
+    print(f"   Mal enrutados a Haiku:        {misrouted}/{labeled} turnos etiquetados")
+    print(f"   Sobre-enrutados a Sonnet:     {over_routed}/{labeled} turnos etiquetados")
+    print(f"   A Haiku sin verificar:        {unverified} turnos servidos por Sonnet")
+    print(f"   Coste estimado:               ${cost:.4f}")
+    return {'cheap_share': routed_cheap / total, 'misrouted': misrouted, 'over_routed': over_routed,
+            'unverified': unverified, 'labeled': labeled, 'cost': cost}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    holdout = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    train_turns, test_turns = split_by_time(load_turns(sys.argv[1]), holdout)
+    if not test_turns:
+        print("❌ No quedan turnos para evaluar")
+        sys.exit(1)
+
+    handler = LUC1ClaudeHandler()
+    cheap = handler.HAIKU_MODEL
+    print(f"📁 {len(train_turns)} turnos de entrenamiento, {len(test_turns)} de evaluación (más recientes)")
+
+    # Coste medio observado por modelo en los turnos de entrenamiento
+    totals = {}
+    for turn in train_turns:
+        if turn.get('cost_usd') is not None:
+            entry = totals.setdefault(turn['model'], [0.0, 0])
+            entry[0] += turn['cost_usd']
+            entry[1] += 1
+    avg_cost = {model: total / count for model, (total, count) in totals.items()}
+
+    def keyword_rule(turn):
+        return turn.get('keyword_model') or handler._keyword_select_model(turn.get('message', ''), {})
+
+    router = ModelRouter([cheap, handler.SONNET_MODEL], fallback=lambda m, s: handler._keyword_select_model(m, s))
+    examples = build_examples(train_turns, cheap, len(handler.required_fields))
+    if examples:
+        router.classifier = train_classifier(examples)
+    else:
+        router.classifier = None
+        print("⚠️ No hay turnos etiquetables para entrenar: el router usará la regla de palabras clave")
+
+    def learned_router(turn):
+        return router.select(turn.get('message', ''), {}, turn.get('filled_count', 0), len(handler.required_fields))
+
+    evaluate("Regla de palabras clave", keyword_rule, test_turns, cheap, avg_cost)
+    evaluate("Router aprendido", learned_router, test_turns, cheap, avg_cost)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Planificador de carga por metros lineales y palés
+Misma lógica que loadCalculatorService.js del backend, sin ida y vuelta: huella
+de cada palé (EUR/ISO/medio) en la anchura de la caja, niveles de apilado según
+la altura, metros lineales por tipo de vehículo y decisión LTL/FTL. Los lotes
+de envíos se calculan a la vez con NumPy; lo que no cabe en un tráiler se
+reparte con first-fit-decreasing sobre las cajas.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from quote_parser import DEFAULT_PALLET, DEFAULT_PALLET_HEIGHT_M, PALLET_FOOTPRINTS
+
+# Cajas por clase de vehículo (mismos umbrales de peso que _get_vehicle_specs):
+# largo, ancho y alto útiles en metros y carga máxima en kg
+VEHICLES = ('van', 'rigid', 'trailer')
+DECKS = np.array([
+    [4.3, 1.8, 1.9, 3500.0],
+    [7.2, 2.45, 2.6, 12000.0],
+    [13.6, 2.45, 2.7, 24000.0],
+])
+DECK_LENGTH, DECK_WIDTH, DECK_HEIGHT, DECK_PAYLOAD = DECKS.T
+DECK_VOLUME = DECK_LENGTH * DECK_WIDTH * DECK_HEIGHT
+
+MAX_STACK_LEVELS = 2
+
+# Criterios FTL del backend (sobre un tráiler estándar)
+FTL_LINEAR_SHARE = 0.65
+FTL_WEIGHT_SHARE = 0.70
+FTL_VOLUME_SHARE = 0.60
+FTL_LINEAR_METRES = 8.5
+
+# Tarifa de grupaje (pricingFactors.ltl del backend)
+LTL_EUR_PER_LDM = 35.0
+LTL_EUR_PER_M3 = 45.0
+LTL_EUR_PER_KG_OVER = 0.05
+LTL_FREE_KG = 1000.0
+LTL_EUR_PER_KM_LDM = 0.12
+LTL_MIN_CHARGE = 150.0
+
+
+def _ldm_per_position(length, width) -> np.ndarray:
+    """Metros lineales por posición de suelo en cada caja (vehículos x palés), la mejor orientación"""
+    deck_width = DECK_WIDTH[:, None]
+    lengthwise = length / np.maximum(np.floor(deck_width / width), 1)
+    crosswise = np.where(deck_width >= length, width / np.maximum(np.floor(deck_width / length), 1), np.inf)
+    return np.minimum(lengthwise, crosswise)
+
+
+def _shipment_lines(shipment: Dict) -> Tuple[List[tuple], bool]:
+    """
+    Líneas (largo, ancho, alto, cantidad, peso, apilable) de un envío y si el
+    volumen es estimado. Sin 'items' se usan pallets/pallet_type o volume_m3; sin
+    nada, 1,5 m³ por tonelada como el backend.
+    """
+    weight = float(shipment.get('weight_kg') or 0)
+    stackable = bool(shipment.get('stackable', False))
+    if shipment.get('items'):
+        items = shipment['items']
+        # Las líneas sin peso se reparten por palé el peso del envío que no declaran las demás
+        declared = sum(float(item.get('weight_kg') or 0) for item in items)
+        unweighted = sum(int(item.get('count', 1)) for item in items if not item.get('weight_kg'))
+        per_pallet = max(weight - declared, 0) / unweighted if unweighted else 0.0
+        lines = []
+        for item in items:
+            length, width = PALLET_FOOTPRINTS.get(item.get('pallet_type') or DEFAULT_PALLET,
+                                                  PALLET_FOOTPRINTS[DEFAULT_PALLET])
+            count = int(item.get('count', 1))
+            lines.append((length, width, float(item.get('height_m') or DEFAULT_PALLET_HEIGHT_M),
+                          count, float(item.get('weight_kg') or 0) or per_pallet * count,
+                          bool(item.get('stackable', stackable))))
+        return lines, False
+
+    length, width = PALLET_FOOTPRINTS.get(shipment.get('pallet_type') or DEFAULT_PALLET,
+                                          PALLET_FOOTPRINTS[DEFAULT_PALLET])
+    volume = shipment.get('volume_m3')
+    estimated = not shipment.get('pallets') and not volume
+    if estimated:
+        volume = max(weight / 1000, 0.1) * 1.5
+    if shipment.get('pallets'):
+        count = int(shipment['pallets'])
+        height = float(volume) / (length * width * count) if volume else DEFAULT_PALLET_HEIGHT_M
+    else:
+        count = int(np.ceil(float(volume) / (length * width * DEFAULT_PALLET_HEIGHT_M) - 1e-9))
+        height = DEFAULT_PALLET_HEIGHT_M
+    return [(length, width, min(height, DECK_HEIGHT[-1]), max(count, 1), weight, stackable)], estimated
+
+
+def first_fit_decreasing(sizes: np.ndarray, capacity: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Empaquetado first-fit-decreasing en varias dimensiones (p. ej. metros lineales y kg).
+    sizes: (n, k), capacity: (k,). Devuelve (caja asignada a cada elemento, nº de cajas).
+    """
+    sizes = np.atleast_2d(np.asarray(sizes, dtype=np.float64))
+    capacity = np.asarray(capacity, dtype=np.float64)
+    order = np.argsort(-(sizes / capacity).max(axis=1), kind='stable')
+    residual = np.empty((0, len(capacity)))
+    assignment = np.empty(len(sizes), dtype=np.int64)
+    for i in order:
+        fits = np.flatnonzero((residual >= sizes[i] - 1e-9).all(axis=1))
+        if fits.size:
+            bin_index = int(fits[0])
+        else:
+            bin_index = len(residual)
+            residual = np.vstack((residual, capacity))
+        residual[bin_index] -= sizes[i]
+        assignment[i] = bin_index
+    return assignment, len(residual)
+
+
+def smallest_vehicle(ldm_by_deck: np.ndarray, weight: np.ndarray, volume: np.ndarray,
+                     tallest: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Índice en VEHICLES del vehículo más pequeño que admite cada carga y si alguno la admite"""
+    fits = (ldm_by_deck <= DECK_LENGTH[:, None] + 1e-9) & (weight <= DECK_PAYLOAD[:, None]) & \
+        (tallest <= DECK_HEIGHT[:, None]) & (volume <= DECK_VOLUME[:, None] + 1e-9)
+    fits_any = fits.any(axis=0)
+    return np.where(fits_any, fits.argmax(axis=0), len(VEHICLES) - 1), fits_any
+
+
+def load_metrics(shipments: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Métricas de un lote de envíos como arrays: metros lineales en cada caja
+    (vehículos x envíos), peso, volumen, altura máxima, palés, vehículo, nº de
+    vehículos y si el volumen es estimado
+    """
+    parsed = [_shipment_lines(shipment) for shipment in shipments]
+    lines = np.array([line for shipment_lines, _ in parsed for line in shipment_lines], dtype=np.float64)
+    owner = np.repeat(np.arange(len(shipments)), [len(shipment_lines) for shipment_lines, _ in parsed])
+    length, width, height, count, weight, stackable = lines.T
+
+    # Niveles, posiciones y metros lineales de cada línea en cada caja (vehículos x líneas)
+    levels = np.where(stackable > 0, np.clip(np.floor(DECK_HEIGHT[:, None] / height), 1, MAX_STACK_LEVELS), 1)
+    positions = np.ceil(count / levels)
+    per_position = _ldm_per_position(length, width)
+    ldm = positions * per_position
+
+    def per_shipment(values):
+        return np.stack([np.bincount(owner, weights=row, minlength=len(shipments)) for row in np.atleast_2d(values)])
+
+    ldm_by_deck = per_shipment(ldm)
+    total_weight = per_shipment(weight)[0]
+    volume = per_shipment(length * width * height * count)[0]
+    tallest = np.zeros(len(shipments))
+    np.maximum.at(tallest, owner, height)
+
+    vehicle, fits_any = smallest_vehicle(ldm_by_deck, total_weight, volume, tallest)
+
+    # Lo que no cabe en un tráiler: FFD de las posiciones de suelo por metros y peso
+    vehicles = np.ones(len(shipments), dtype=np.int64)
+    trailer = len(VEHICLES) - 1
+    for i in np.flatnonzero(~fits_any):
+        own = np.flatnonzero(owner == i)
+        repeats = positions[trailer, own].astype(np.int64)
+        sizes = np.column_stack((np.repeat(per_position[trailer, own], repeats),
+                                 np.repeat(weight[own] / positions[trailer, own], repeats)))
+        vehicles[i] = first_fit_decreasing(sizes, DECKS[trailer, [0, 3]])[1]
+
+    return {
+        'ldm_by_deck': ldm_by_deck,
+        'weight': total_weight,
+        'volume': volume,
+        'tallest': tallest,
+        'pallets': np.bincount(owner, weights=count, minlength=len(shipments)),
+        'vehicle': vehicle,
+        'vehicles': vehicles,
+        'estimated': np.array([estimated for _, estimated in parsed]),
+    }
+
+
+def plan_loads(shipments: List[Dict]) -> List[Dict]:
+    """Plan de carga de un lote de envíos en una sola pasada vectorizada"""
+    if not shipments:
+        return []
+    metrics = load_metrics(shipments)
+    ldm_by_deck, total_weight, volume = metrics['ldm_by_deck'], metrics['weight'], metrics['volume']
+    vehicle, vehicles, pallets = metrics['vehicle'], metrics['vehicles'], metrics['pallets']
+    trailer = len(VEHICLES) - 1
+
+    ldm_chosen = ldm_by_deck[vehicle, np.arange(len(shipments))]
+    linear_share = ldm_by_deck[trailer] / DECK_LENGTH[trailer]
+    weight_share = total_weight / DECK_PAYLOAD[trailer]
+    volume_share = volume / DECK_VOLUME[trailer]
+    ftl = (linear_share >= FTL_LINEAR_SHARE) | (weight_share >= FTL_WEIGHT_SHARE) | \
+        (volume_share >= FTL_VOLUME_SHARE) | (ldm_by_deck[trailer] >= FTL_LINEAR_METRES)
+
+    capacity_ldm = vehicles * DECK_LENGTH[vehicle]
+    capacity_kg = vehicles * DECK_PAYLOAD[vehicle]
+    capacity_m3 = vehicles * DECK_VOLUME[vehicle]
+    return [{
+        # Metros lineales de referencia: los de un tráiler estándar, como en el backend
+        'metros_lineales': round(float(ldm_by_deck[trailer, i]), 2),
+        'peso_kg': round(float(total_weight[i]), 1),
+        'volumen_m3': round(float(volume[i]), 3),
+        'volumen_estimado': bool(metrics['estimated'][i]),
+        'pales': int(pallets[i]),
+        'vehiculo': VEHICLES[vehicle[i]],
+        'vehiculos': int(vehicles[i]),
+        'utilizacion': {
+            'lineal': round(float(ldm_chosen[i] / capacity_ldm[i] * 100), 1),
+            'peso': round(float(total_weight[i] / capacity_kg[i] * 100), 1),
+            'volumen': round(float(volume[i] / capacity_m3[i] * 100), 1),
+        },
+        'modo': 'FTL' if ftl[i] else 'LTL',
+    } for i in range(len(shipments))]
+
+
+def plan_load(shipment: Dict) -> Dict:
+    """Plan de carga de un envío"""
+    return plan_loads([shipment])[0]
+
+
+def chat_shipment(data: Dict) -> Dict:
+    """Envío en el formato del planificador a partir de los datos de la conversación"""
+    return {'weight_kg': float(data.get('peso_kg') or 0), 'volume_m3': data.get('volumen_m3'),
+            'pallets': data.get('num_pales'), 'pallet_type': data.get('tipo_pale')}
+
+
+def ltl_price(plan: Dict, distance_km: float) -> float:
+    """Precio de grupaje por metros lineales, volumen, exceso de peso y distancia"""
+    ldm = plan['metros_lineales']
+    price = (ldm * LTL_EUR_PER_LDM
+             + max(plan['peso_kg'] - LTL_FREE_KG, 0) * LTL_EUR_PER_KG_OVER
+             + plan['volumen_m3'] * LTL_EUR_PER_M3
+             + distance_km * LTL_EUR_PER_KM_LDM * ldm)
+    return round(max(price, LTL_MIN_CHARGE), 2)
+
+
+def truck_share(plan: Dict) -> float:
+    """Fracción de tráiler que ocupa la carga (la mayor de metros, peso y volumen)"""
+    return min(max(plan['metros_lineales'] / DECK_LENGTH[-1], plan['peso_kg'] / DECK_PAYLOAD[-1],
+                   plan['volumen_m3'] / DECK_VOLUME[-1]), 1.0)
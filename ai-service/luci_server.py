@@ -5,10 +5,16 @@ Puerto: 8002 (reemplaza el servicio anterior)
 """
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import List
+from datetime import date
 import uvicorn
 import sys
 import os
+import json
+import re
+import asyncio
 import time
 from collections import defaultdict
 from loguru import logger
@@ -17,6 +23,12 @@ from loguru import logger
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from claude_handler import LUC1ClaudeHandler
+from claude_batches import BatchAnalysisRunner
+from quote_jobs import FINAL_STATUSES, QuoteJobQueue
+from consolidation import ConsolidationOptimizer
+from load_planner import plan_loads
+from quote_progress import QuoteProgress, stage_metrics_snapshot
+from timeout_policy import TIMEOUTS, request_deadline
 
 app = FastAPI(title="LUC1 AI Service - Claude Sonnet 4")
 
@@ -40,6 +52,7 @@ class SimpleRateLimiter:
 
 
 rate_limiter = SimpleRateLimiter(max_requests=10, window_seconds=60)
+consolidation_optimizer = ConsolidationOptimizer()
 
 
 class ChatRequest(BaseModel):
@@ -57,6 +70,73 @@ class TransportistAnalysisRequest(BaseModel):
     sessionId: str
     context: dict = None
 
+class BatchTransportistAnalysisRequest(BaseModel):
+    requests: List[TransportistAnalysisRequest] = Field(..., min_length=1)
+
+class PalletLine(BaseModel):
+    pallet_type: str = 'eur'
+    count: int = Field(1, ge=1)
+    height_m: float = Field(None, gt=0)
+    weight_kg: float = Field(0, ge=0)
+    stackable: bool = None
+
+class EuropeanQuoteRequest(BaseModel):
+    origin: str = 'Madrid'
+    destination: str
+    weight_kg: float = Field(1000, gt=0)
+    cargo_type: str = 'carga_general'
+    pickup_date: str = None
+    service_type: str = None
+    volume_m3: float = Field(None, gt=0)
+    pallets: int = Field(None, ge=1)
+    pallet_type: str = None
+    stackable: bool = None
+    items: List[PalletLine] = None
+
+class ShipmentLoad(BaseModel):
+    weight_kg: float = Field(..., gt=0)
+    volume_m3: float = Field(None, gt=0)
+    pallets: int = Field(None, ge=1)
+    pallet_type: str = None
+    stackable: bool = None
+    items: List[PalletLine] = None
+
+class LoadPlanRequest(BaseModel):
+    shipments: List[ShipmentLoad] = Field(..., min_length=1, max_length=5000)
+
+class ConsolidationShipment(ShipmentLoad):
+    id: str
+    origin: str = 'Madrid'
+    destination: str
+    pickup_date: date = None
+
+class ConsolidationRequest(BaseModel):
+    shipments: List[ConsolidationShipment] = Field(..., min_length=1, max_length=2000)
+    window_days: int = Field(None, ge=1, le=7)
+
+class EuropeanRequoteRequest(BaseModel):
+    base: EuropeanQuoteRequest
+    changes: dict = Field(default_factory=dict)
+
+class MultiStopQuoteRequest(EuropeanQuoteRequest):
+    destination: str = None
+    stops: List[str] = Field(..., min_length=1, max_length=10)
+    optimize_order: bool = False
+
+class PickupWindowRequest(BaseModel):
+    origin: str = 'Madrid'
+    destination: str
+    weight_kg: float = Field(1000, gt=0)
+    cargo_type: str = 'carga_general'
+    service_type: str = None
+    volume_m3: float = Field(None, gt=0)
+    pallets: int = Field(None, ge=1)
+    pallet_type: str = None
+    stackable: bool = None
+    items: List[PalletLine] = None
+    start_date: date = None
+    days: int = Field(14, ge=1, le=60)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize LUC1 with Claude Sonnet 4 on server startup"""
@@ -65,6 +145,9 @@ async def startup_event():
     try:
         luc1 = LUC1ClaudeHandler()
         luc1.load_model()
+        if os.getenv('QUOTE_JOBS_ASYNC', 'true').lower() == 'true':
+            luc1.quote_jobs = QuoteJobQueue(luc1.run_quote_job)
+            await luc1.quote_jobs.start()
         if luc1.is_loaded:
             logger.info("LUC1 AI Service with Claude Sonnet 4 started successfully")
         else:
@@ -72,6 +155,30 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to start LUC1: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if luc1 and luc1.quote_jobs:
+        await luc1.quote_jobs.stop()
+
+# Endpoints SSE: duran lo que el stream (con su propio límite), no el plazo por defecto
+STREAMING_PATHS = re.compile(r'^/quotes/(european/stream|jobs/[^/]+/events)$')
+
+@app.middleware("http")
+async def propagate_deadline(request, call_next):
+    """
+    Plazo de la petición para todas las llamadas a upstreams: la cabecera
+    X-Request-Timeout (segundos) si el cliente la envía, si no REQUEST_DEADLINE_SECONDS.
+    Los endpoints SSE sólo llevan el de la cabecera.
+    """
+    seconds = None if STREAMING_PATHS.match(request.url.path) else float(os.getenv('REQUEST_DEADLINE_SECONDS', 90))
+    try:
+        header = float(request.headers['x-request-timeout'])
+        seconds = header if seconds is None else min(seconds, header)
+    except (KeyError, ValueError):
+        pass
+    with request_deadline(seconds):
+        return await call_next(request)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -196,6 +303,185 @@ async def analyze_transportist_prices(request: TransportistAnalysisRequest):
         logger.error(f"Traceback: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error analizando precios: {str(e)}")
 
+@app.post("/analyze/transportist-prices/batch")
+async def analyze_transportist_prices_batch(request: BatchTransportistAnalysisRequest):
+    """Análisis masivo de transportistas vía Message Batches API - respuesta NDJSON"""
+    if not luc1 or not luc1.is_loaded:
+        raise HTTPException(status_code=503, detail="LUC1 no disponible")
+
+    logger.info(f"MODO BATCH: {len(request.requests)} analisis de transportistas")
+    runner = BatchAnalysisRunner(luc1)
+    analyses = [item.model_dump() for item in request.requests]
+
+    async def generate():
+        """Emitir un resultado por línea en cuanto llega"""
+        async for result in runner.run(analyses):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def _get_quote_job(job_id: str) -> dict:
+    if not luc1 or not luc1.quote_jobs:
+        raise HTTPException(status_code=503, detail="Cola de cotizaciones no disponible")
+    job = luc1.quote_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@app.get("/quotes/jobs/{job_id}")
+async def get_quote_job(job_id: str):
+    """Estado de un trabajo de cotización (polling)"""
+    job = _get_quote_job(job_id)
+    return {"success": True, "job": job}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/quotes/jobs/{job_id}/events")
+async def quote_job_events(job_id: str):
+    """
+    Trabajo de cotización como Server-Sent Events hasta que termina:
+    'stage' por cada etapa del pipeline y 'status' en cada cambio de estado
+    """
+    job = _get_quote_job(job_id)
+    timeout = float(os.getenv('QUOTE_JOBS_SSE_TIMEOUT_SECONDS', 120))
+
+    async def generate():
+        current = job
+        sent_events = 0
+        last_status = None
+        deadline = time.monotonic() + timeout
+        while True:
+            events = current.get('events') or []
+            for event in events[sent_events:]:
+                yield _sse("stage", event)
+            sent_events = len(events)
+            if current['status'] != last_status:
+                yield _sse("status", {k: v for k, v in current.items() if k != 'events'})
+                last_status = current['status']
+            if current['status'] in FINAL_STATUSES or time.monotonic() >= deadline:
+                return
+            current = await luc1.quote_jobs.wait(job_id, current['status'], sent_events,
+                                                 timeout=max(0.0, deadline - time.monotonic()))
+            if current is None:
+                return
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+@app.post("/quotes/european/stream")
+async def stream_european_quote(request: EuropeanQuoteRequest):
+    """Cotización terrestre europea con las etapas como Server-Sent Events"""
+    if not luc1 or not luc1.logistics_service:
+        raise HTTPException(status_code=503, detail="Servicio de logística no disponible")
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    quote_data = request.model_dump(exclude_none=True)
+
+    def run_quote():
+        progress = QuoteProgress(lambda event: loop.call_soon_threadsafe(events.put_nowait, event))
+        return luc1.logistics_service.generate_european_quote(quote_data, progress=progress)
+
+    async def generate():
+        task = asyncio.ensure_future(asyncio.to_thread(run_quote))
+        while True:
+            getter = asyncio.ensure_future(events.get())
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield _sse("stage", getter.result())
+                continue
+            getter.cancel()
+            while not events.empty():
+                yield _sse("stage", events.get_nowait())
+            quote = task.result()
+            yield _sse("quote" if quote else "error", quote or {"error": "No se pudo generar la cotización"})
+            return
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+@app.post("/quotes/european/requote")
+async def requote_european(request: EuropeanRequoteRequest):
+    """
+    Recotización incremental: aplica los cambios sobre la cotización base y
+    recalcula sólo los nodos afectados (ruta, peajes, restricciones, precio)
+    """
+    if not luc1 or not luc1.quote_graph:
+        raise HTTPException(status_code=503, detail="Servicio de logística no disponible")
+
+    unknown = set(request.changes) - set(EuropeanQuoteRequest.model_fields)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Campos desconocidos: {', '.join(sorted(unknown))}")
+
+    # Los cambios se validan igual que una cotización completa
+    try:
+        merged = EuropeanQuoteRequest(**{**request.base.model_dump(exclude_none=True), **request.changes})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    merged = merged.model_dump(exclude_none=True)
+    changes = {key: merged[key] for key in request.changes if key in merged}
+    base = {key: value for key, value in merged.items() if key not in request.changes}
+    result = await asyncio.to_thread(luc1.quote_graph.requote, base, changes)
+    if not result['quote']:
+        raise HTTPException(status_code=422, detail="No se pudo generar la cotización")
+    return {"success": True, **result}
+
+@app.post("/quotes/european/multi-stop")
+async def quote_multi_stop(request: MultiStopQuoteRequest):
+    """Cotización origen -> parada -> ... -> destino final; optimize_order reordena las paradas"""
+    if not luc1 or not luc1.multi_stop:
+        raise HTTPException(status_code=503, detail="Servicio de logística no disponible")
+
+    quote_data = request.model_dump(exclude_none=True, exclude={'destination', 'stops', 'optimize_order'})
+    quote = await asyncio.to_thread(luc1.multi_stop.quote, quote_data, request.stops, request.optimize_order)
+    if not quote:
+        raise HTTPException(status_code=422, detail="No se pudo calcular la ruta de algún tramo")
+    return {"success": True, "quote": quote}
+
+@app.post("/quotes/european/pickup-dates")
+async def optimize_pickup_dates(request: PickupWindowRequest):
+    """Evalúa todas las fechas de recogida de la ventana y devuelve la más rápida y la más barata"""
+    if not luc1 or not luc1.pickup_optimizer:
+        raise HTTPException(status_code=503, detail="Servicio de logística no disponible")
+
+    quote_data = request.model_dump(exclude_none=True, exclude={'start_date', 'days'})
+    start_date = request.start_date.isoformat() if request.start_date else None
+    result = await asyncio.to_thread(luc1.pickup_optimizer.optimize, quote_data, start_date, request.days)
+    if not result:
+        raise HTTPException(status_code=422, detail="No se pudo calcular la ruta")
+    return {"success": True, **result}
+
+@app.post("/quotes/load-plan")
+async def load_plan(request: LoadPlanRequest):
+    """Metros lineales, vehículo, utilización y LTL/FTL de un lote de envíos"""
+    shipments = [shipment.model_dump(mode='json', exclude_none=True) for shipment in request.shipments]
+    plans = await asyncio.to_thread(plan_loads, shipments)
+    return {"success": True, "planes": plans}
+
+@app.post("/quotes/consolidate")
+async def consolidate_shipments(request: ConsolidationRequest):
+    """Consolida los envíos del día en camiones compartidos y calcula el ahorro"""
+    shipments = [shipment.model_dump(mode='json', exclude_none=True) for shipment in request.shipments]
+    result = await asyncio.to_thread(consolidation_optimizer.optimize, shipments, request.window_days)
+    return {"success": True, **result}
+
+@app.get("/metrics/quote-stages")
+async def quote_stage_metrics():
+    """Latencias por etapa del pipeline de cotización (p50/p95 en ms)"""
+    return {"success": True, "stages": stage_metrics_snapshot()}
+
+@app.get("/metrics/timeouts")
+async def timeout_metrics():
+    """Latencias observadas y timeout adaptativo actual de cada upstream"""
+    return {"success": True, "upstreams": TIMEOUTS.snapshot()}
+
+@app.get("/metrics/circuits")
+async def circuit_metrics():
+    """Estado de los circuit breakers de los endpoints de logística"""
+    if not luc1 or not luc1.logistics_service:
+        raise HTTPException(status_code=503, detail="Servicio de logística no disponible")
+    return {"success": True, "circuits": luc1.logistics_service.circuit_snapshot()}
+
 @app.get("/")
 async def root():
     """Root endpoint"""
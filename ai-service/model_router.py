@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Router de modelos de LUC1 basado en métricas
+Un clasificador local (regresión logística sobre n-gramas con hashing,
+entrenado offline con turnos registrados) estima si el modelo barato basta
+para el turno; las estadísticas online de latencia, coste y re-preguntas
+por modelo ajustan esa estimación. Cada turno va al modelo más barato que
+cumple el objetivo de calidad.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+N_FEATURE_BUCKETS = 2 ** 14
+
+# Precio en USD por millón de tokens (entrada, salida)
+MODEL_PRICES = {
+    'claude-sonnet-4-20250514': (3.0, 15.0),
+    'claude-haiku-4-5-20251001': (1.0, 5.0),
+}
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode('utf-8')) % N_FEATURE_BUCKETS
+
+
+def extract_features(message: str, filled_count: int = 0, total_required: int = 7) -> Dict[int, float]:
+    """
+    Rasgos del turno: unigramas y bigramas de palabras, trigramas de
+    caracteres y rasgos de contexto (longitud y campos ya completados).
+    """
+    text = (message or '').lower().strip()
+    tokens = TOKEN_PATTERN.findall(text)
+    features: Dict[int, float] = {}
+
+    def add(name: str, value: float = 1.0):
+        index = _bucket(name)
+        features[index] = features.get(index, 0.0) + value
+
+    for token in tokens:
+        add(f"w:{token}")
+    for first, second in zip(tokens, tokens[1:]):
+        add(f"b:{first}_{second}")
+    padded = f" {text} "
+    for i in range(len(padded) - 2):
+        add(f"c:{padded[i:i + 3]}", 0.2)
+
+    add(f"len:{min(len(text) // 25, 10)}")
+    add(f"words:{min(len(tokens), 20)}")
+    add(f"filled:{filled_count}")
+    add(f"missing:{max(total_required - filled_count, 0)}")
+    add("has_number" if re.search(r'\d', text) else "no_number")
+    add("bias")
+    return features
+
+
+class RouterClassifier:
+    """Regresión logística dispersa: P(el modelo barato resuelve el turno)"""
+
+    def __init__(self, weights: Dict[int, float] = None, bias: float = 0.0):
+        self.weights = weights or {}
+        self.bias = bias
+
+    def predict(self, features: Dict[int, float]) -> float:
+        z = self.bias + sum(self.weights.get(i, 0.0) * v for i, v in features.items())
+        z = max(-30.0, min(30.0, z))
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def train(self, examples: Iterable[Tuple[Dict[int, float], int, float]], epochs: int = 10,
+              learning_rate: float = 0.1, l2: float = 1e-4):
+        """SGD con regularización L2 sobre (rasgos, etiqueta, peso)"""
+        examples = list(examples)
+        for _ in range(epochs):
+            for features, label, sample_weight in examples:
+                error = (self.predict(features) - label) * sample_weight
+                self.bias -= learning_rate * error
+                for index, value in features.items():
+                    weight = self.weights.get(index, 0.0)
+                    self.weights[index] = weight - learning_rate * (error * value + l2 * weight)
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'n_buckets': N_FEATURE_BUCKETS,
+                'bias': self.bias,
+                'weights': {str(k): round(v, 6) for k, v in self.weights.items() if abs(v) > 1e-6}
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['RouterClassifier']:
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('n_buckets') != N_FEATURE_BUCKETS:
+            logger.warning(f"Pesos del router incompatibles ({path}), se ignoran")
+            return None
+        return cls({int(k): v for k, v in data['weights'].items()}, data.get('bias', 0.0))
+
+
+class ModelStats:
+    """Estadísticas online por modelo (medias móviles exponenciales)"""
+
+    def __init__(self, alpha: float = 0.05):
+        self.alpha = alpha
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _update(self, model: str, key: str, value: float):
+        entry = self._stats.setdefault(model, {})
+        previous = entry.get(key)
+        entry[key] = value if previous is None else previous + self.alpha * (value - previous)
+
+    def record_call(self, model: str, latency_s: float, input_tokens: int, output_tokens: int):
+        with self._lock:
+            self._update(model, 'latency_s', latency_s)
+            self._update(model, 'cost_usd', estimate_cost(model, input_tokens, output_tokens))
+
+    def record_outcome(self, model: str, needed_reask: bool):
+        with self._lock:
+            self._update(model, 'reask_rate', 1.0 if needed_reask else 0.0)
+            entry = self._stats[model]
+            entry['turns'] = entry.get('turns', 0) + 1
+
+    def get(self, model: str, key: str, default: float = None) -> Optional[float]:
+        with self._lock:
+            return self._stats.get(model, {}).get(key, default)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {model: dict(values) for model, values in self._stats.items()}
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICES.get(model, (3.0, 15.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+class ModelRouter:
+    """
+    Elige, por turno, el modelo más barato que cumple el objetivo de calidad.
+
+    La calidad esperada del modelo barato es P(basta) del clasificador por
+    (1 - tasa de re-preguntas observada); los modelos superiores sólo se
+    penalizan por su tasa de re-preguntas. Sin pesos entrenados se usa la
+    regla de palabras clave (fallback).
+    """
+
+    def __init__(self, models: List[str], fallback: Callable[[str, dict], str],
+                 weights_path: str = None, quality_target: float = None,
+                 stats: ModelStats = None):
+        self.models = models  # de más barato a más capaz
+        self.fallback = fallback
+        self.quality_target = quality_target if quality_target is not None else float(
+            os.getenv('ROUTER_QUALITY_TARGET', 0.85))
+        self.stats = stats or ModelStats()
+        latency_slo = os.getenv('ROUTER_LATENCY_SLO_SECONDS')
+        self.latency_slo = float(latency_slo) if latency_slo else None
+        self.weights_path = weights_path or os.getenv(
+            'ROUTER_WEIGHTS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'router_weights.json'))
+        self.classifier = RouterClassifier.load(self.weights_path)
+        if self.classifier:
+            logger.info(f"Router de modelos cargado desde {self.weights_path}")
+
+    def _models_by_cost(self) -> List[str]:
+        """Modelos ordenados por coste observado (precio de lista si no hay datos)"""
+        def cost(model):
+            observed = self.stats.get(model, 'cost_usd')
+            return observed if observed is not None else sum(MODEL_PRICES.get(model, (3.0, 15.0)))
+        cheapest = self.models[0]
+        rest = sorted(self.models[1:], key=cost)
+        return [cheapest] + rest
+
+    def expected_quality(self, model: str, p_cheap_ok: float) -> float:
+        base = p_cheap_ok if model == self.models[0] else 1.0
+        return base * (1.0 - self.stats.get(model, 'reask_rate', 0.0))
+
+    def select(self, message: str, session: dict, filled_count: int, total_required: int) -> str:
+        if not self.classifier:
+            return self.fallback(message, session)
+
+        p_cheap_ok = self.classifier.predict(extract_features(message, filled_count, total_required))
+        candidates = self._models_by_cost()
+        if self.latency_slo is not None:
+            # Los modelos que incumplen el SLO de latencia sólo se usan si no queda otro
+            candidates.sort(key=lambda m: (self.stats.get(m, 'latency_s', 0.0) > self.latency_slo))
+        for model in candidates:
+            if self.expected_quality(model, p_cheap_ok) >= self.quality_target:
+                return model
+        return self.models[-1]
+
+
+class TurnLogger:
+    """Registro JSONL de turnos para entrenar y evaluar el router offline"""
+
+    def __init__(self, path: str = None):
+        self.path = path if path is not None else os.getenv('ROUTER_TURN_LOG', '')
+        self._lock = threading.Lock()
+
+    def log(self, record: Dict):
+        if not self.path:
+            return
+        record = {'ts': time.time(), **record}
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning(f"No se pudo registrar el turno: {e}")
+
+
+def turn_label(record: Dict, cheap_model: str) -> Optional[Tuple[int, float]]:
+    """
+    Etiqueta de entrenamiento (etiqueta, peso) de un turno registrado:
+    1 si el modelo barato basta, 0 si no.
+
+    - 'cheap_ok' explícito (p. ej. revisado a mano): peso completo
+    - turno servido por el modelo barato: 1 salvo que necesitara re-pregunta
+    - turno servido por otro modelo: etiqueta débil tomada de la regla de
+      palabras clave ('keyword_model'), con medio peso
+    """
+    if 'cheap_ok' in record:
+        return int(bool(record['cheap_ok'])), 1.0
+    if record.get('model') == cheap_model:
+        return (0 if record.get('needed_reask') else 1), 1.0
+    if record.get('keyword_model'):
+        return int(record['keyword_model'] == cheap_model), 0.5
+    return None
+
+
+def load_turns(path: str) -> List[Dict]:
+    turns = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                turns.append(json.loads(line))
+    return turns
+
+
+def split_by_time(turns: List[Dict], holdout_fraction: float = 0.2) -> Tuple[List[Dict], List[Dict]]:
+    """
+    (entrenamiento, evaluación) en orden temporal: los turnos más recientes
+    se reservan para evaluar, así el router nunca se evalúa con turnos
+    anteriores a los que vio al entrenar.
+    """
+    ordered = sorted(turns, key=lambda turn: turn.get('ts', 0.0))
+    cut = len(ordered) - int(round(len(ordered) * holdout_fraction))
+    return ordered[:cut], ordered[cut:]
@@ -11,6 +11,7 @@ import os
 from pathlib import Path
 import re
 from european_logistics import EuropeanLogisticsService
+from timeout_policy import TIMEOUTS
 
 class GemmaHandler:
     def __init__(self, model_name: str = "gemma3:1b", ollama_url: str = "http://localhost:11434"):
@@ -42,7 +43,7 @@ class GemmaHandler:
             logger.info(f"Connecting to Ollama with model: {self.model_name}")
 
             # Test connection to Ollama
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = TIMEOUTS.call('ollama_tags', 5, lambda timeout: requests.get(f"{self.ollama_url}/api/tags", timeout=timeout))
             if response.status_code == 200:
                 models = response.json().get("models", [])
                 model_names = [model["name"] for model in models]
@@ -370,11 +371,11 @@ Responde siempre en español, enfocado en logística terrestre europea."""
             }
 
             # Send request to Ollama
-            response = requests.post(
+            response = TIMEOUTS.call('ollama', 30, lambda timeout: requests.post(
                 f"{self.ollama_url}/api/generate",
                 json=payload,
-                timeout=30
-            )
+                timeout=timeout
+            ))
 
             if response.status_code == 200:
                 result = response.json()
@@ -426,12 +427,12 @@ Responde siempre en español, enfocado en logística terrestre europea."""
             }
 
             # Send streaming request to Ollama
-            response = requests.post(
+            response = TIMEOUTS.call('ollama_stream', 30, lambda timeout: requests.post(
                 f"{self.ollama_url}/api/generate",
                 json=payload,
-                timeout=30,
+                timeout=timeout,
                 stream=True
-            )
+            ))
 
             if response.status_code == 200:
                 for line in response.iter_lines():
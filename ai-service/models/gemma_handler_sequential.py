@@ -11,6 +11,7 @@ import os
 from pathlib import Path
 import re
 from european_logistics import EuropeanLogisticsService
+from timeout_policy import TIMEOUTS
 
 class GemmaHandler:
     def __init__(self, model_name: str = "gemma3:1b", ollama_url: str = "http://localhost:11434"):
@@ -101,7 +102,7 @@ INSTRUCCIONES:
             logger.info(f"Connecting to Ollama with model: {self.model_name}")
 
             # Test connection to Ollama
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = TIMEOUTS.call('ollama_tags', 5, lambda timeout: requests.get(f"{self.ollama_url}/api/tags", timeout=timeout))
             if response.status_code == 200:
                 models = response.json().get("models", [])
                 model_names = [model["name"] for model in models]
@@ -264,7 +265,7 @@ INSTRUCCIONES:
                 # Respuesta conversacional normal
                 prompt = f"{self.system_prompt}\n\nUsuario: {message}\n\nLUC1:"
 
-                response = requests.post(
+                response = TIMEOUTS.call('ollama', 30, lambda timeout: requests.post(
                     f"{self.ollama_url}/api/generate",
                     json={
                         "model": self.model_name,
@@ -276,8 +277,8 @@ INSTRUCCIONES:
                             "max_tokens": 500
                         }
                     },
-                    timeout=30
-                )
+                    timeout=timeout
+                ))
 
                 if response.status_code == 200:
                     result = response.json()
@@ -356,7 +357,7 @@ INSTRUCCIONES:
     def health_check(self):
         """Check if the model is healthy and ready"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = TIMEOUTS.call('ollama_tags', 5, lambda timeout: requests.get(f"{self.ollama_url}/api/tags", timeout=timeout))
             return response.status_code == 200 and self.is_loaded
         except:
             return False
\ No newline at end of file
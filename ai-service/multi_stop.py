@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cotización de rutas con varias paradas (p. ej. Barcelona -> Lyon -> Milán)
+Cada tramo se resuelve en paralelo a través de QuoteGraph, cuya caché de ruta
+y peajes hace de caché por tramo: un tramo ya pedido por otra cotización no
+vuelve a consultarse. Si el orden es flexible, las paradas se ordenan con la
+misma heurística de inserción + 2-opt que la consolidación. Peajes, km por
+país y ETA se agregan tramo a tramo y el precio sale de generate_european_quote.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from consolidation import order_stops
+from eta_simulator import departure
+from load_planner import plan_load
+from quote_graph import QuoteGraph
+from timeout_policy import in_context
+from route_countries import city_coordinates
+from toll_estimator import estimate_route_tolls, route_country_km
+
+# Tiempo de descarga en cada parada intermedia
+STOP_HOURS = 1.0
+
+
+class MultiStopQuoter:
+    def __init__(self, service, graph: QuoteGraph = None, max_workers: int = None):
+        self.service = service
+        self.graph = graph or QuoteGraph(service)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('MULTI_STOP_WORKERS', 4)),
+            thread_name_prefix='multi-stop')
+
+    @staticmethod
+    def order(origin: str, stops: List[str]) -> List[str]:
+        """Mejor orden de reparto desde origin; sin coordenadas de alguna parada se respeta el dado"""
+        points = [city_coordinates(place) for place in [origin] + list(stops)]
+        if len(stops) < 2 or any(point is None for point in points):
+            return list(stops)
+        order, _ = order_stops(np.array(points[0]), np.array(points[1:]))
+        return [stops[i] for i in order]
+
+    def _legs(self, data: Dict, places: List[str]) -> Optional[List[tuple]]:
+        """(ruta, peajes) de cada tramo consecutivo, en paralelo; None si algún tramo falla"""
+        futures = [self.executor.submit(in_context(self.graph.leg), {**data, 'origin': a, 'destination': b})
+                   for a, b in zip(places, places[1:])]
+        legs = [future.result() for future in futures]
+        return None if any(leg is None for leg in legs) else legs
+
+    def quote(self, quote_data: Dict, stops: List[str], optimize_order: bool = False) -> Optional[Dict]:
+        """
+        Cotizar origin -> stops[0] -> ... -> stops[-1]. Con optimize_order las
+        paradas se reordenan (el origen se mantiene). None si falta algún tramo.
+        """
+        started = time.monotonic()
+        data = QuoteGraph._normalize(quote_data)
+        stops = [stop for stop in stops if stop]
+        if not stops:
+            return None
+        if optimize_order:
+            stops = self.order(data['origin'], stops)
+        places = [data['origin']] + stops
+
+        legs = self._legs(data, places)
+        if legs is None:
+            logger.warning(f"Multi-stop sin ruta para algún tramo de {' -> '.join(places)}")
+            return None
+
+        specs = self.service._get_vehicle_specs(float(data['weight_kg']), plan_load(data))
+        leg_tolls = [tolls if tolls.get('success') else estimate_route_tolls(route, specs) for route, tolls in legs]
+
+        # Ruta agregada: km por país sumados tramo a tramo y países en orden de paso
+        country_km: Dict[str, float] = {}
+        for route, _ in legs:
+            for country, km in route_country_km(route).items():
+                country_km[country] = country_km.get(country, 0.0) + km
+        route = {
+            'distance_km': sum(route['distance_km'] for route, _ in legs),
+            'duration_hours': sum(route['duration_hours'] for route, _ in legs),
+            'countries': list(dict.fromkeys(c for route, _ in legs for c in route['countries'])),
+            'country_km': country_km,
+            'success': True,
+        }
+        tolls = {
+            'total_cost': round(sum(t.get('total_cost', 0) for t in leg_tolls), 2),
+            'currency': 'EUR',
+            'estimated': any(t.get('estimated') for t in leg_tolls),
+            'success': True,
+        }
+        restrictions = self.service._sync_call(
+            self.service.get_restrictions_and_holidays(route['countries'], data['pickup_date'], specs))
+
+        # ETA encadenada: cada tramo sale a la llegada del anterior más la descarga
+        incidents = restrictions.get('restrictions', [])
+        try:
+            start = departure(data['pickup_date'])
+        except (TypeError, ValueError):
+            start = departure((datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'))
+        departures = np.full(3, start)
+        arrivals = []
+        for i, (leg_route, _) in enumerate(legs):
+            if i:
+                departures = arrivals[-1] + np.timedelta64(int(STOP_HOURS * 60), 'm')
+            arrivals.append(self.service.estimate_transit(leg_route, data['pickup_date'], specs, incidents,
+                                                          departures=departures)['arrival'])
+        eta = {'arrival': arrivals[-1], 'hours': (arrivals[-1] - start) / np.timedelta64(1, 'h')}
+
+        quote = self.service.generate_european_quote(
+            {**data, 'destination': stops[-1]},
+            prefetched={'route': route, 'tolls': tolls, 'restrictions': restrictions, 'eta': eta})
+        if not quote:
+            return None
+
+        level = list(quote['niveles_servicio']).index(quote['tipo_servicio'])
+        quote['paradas'] = stops
+        quote['orden_optimizado'] = optimize_order
+        quote['tramos'] = [{
+            'origen': a,
+            'destino': b,
+            'distancia_km': round(leg_route['distance_km'], 1),
+            'horas_conduccion': round(leg_route['duration_hours'], 1),
+            'paises': leg_route['countries'],
+            'costo_peajes_eur': round(leg_toll.get('total_cost', 0), 2),
+            'llegada_estimada': str(arrival[level]).replace('T', ' '),
+        } for a, b, (leg_route, _), leg_toll, arrival in zip(places, places[1:], legs, leg_tolls, arrivals)]
+        logger.info(f"Multi-stop {' -> '.join(places)}: {len(legs)} tramos en "
+                    f"{(time.monotonic() - started) * 1000:.0f} ms")
+        return quote
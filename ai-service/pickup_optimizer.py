@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Optimizador de fecha de recogida para una ruta europea
+Evalúa todas las fechas candidatas de una ventana (p. ej. los próximos 14 días)
+en una sola pasada: una consulta de restricciones para toda la ventana y una
+simulación 561/2006 vectorizada (eta_simulator) que calcula la espera por
+prohibiciones y la llegada de cada candidata. Las prohibiciones fijas salen del
+calendario local (truck_calendar) y las incidencias en vivo críticas del
+backend bloquean su día.
+"""
+
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from eta_simulator import departure, incident_date
+from load_planner import plan_load
+
+# Días consecutivos máximos que puede bloquear una prohibición (puente + fin de semana)
+MAX_BLOCKED_DAYS = 4
+
+
+class PickupDateOptimizer:
+    def __init__(self, service, graph=None, wait_cost_per_day: float = None):
+        self.service = service
+        self.graph = graph
+        self.wait_cost_per_day = wait_cost_per_day if wait_cost_per_day is not None else \
+            float(os.getenv('PICKUP_WAIT_COST_EUR', 180))
+
+    def _route(self, data: Dict) -> Optional[Dict]:
+        """Ruta desde el grafo de cotización (en caché) o directamente del servicio"""
+        if self.graph:
+            return self.graph.route(data)
+        specs = self.service._get_vehicle_specs(float(data['weight_kg']), plan_load(data))
+        route = asyncio.run(self.service.get_route_calculation(data['origin'], data['destination'], specs))
+        return route if route and route.get('success') else None
+
+    def _ban_matrix(self, countries: List[str], start: date, horizon: int, window: Dict,
+                    heavy: bool) -> np.ndarray:
+        """Matriz booleana países x días: True si el camión no puede circular"""
+        banned = np.zeros((len(countries), horizon), dtype=bool)
+        index = {country: i for i, country in enumerate(countries)}
+        for country, i in index.items():
+            banned[i] = self.service.calendar.blocked_days(country, start, horizon, heavy)
+
+        for incident in window.get('restrictions', []):
+            if incident.get('severity') != 'critical':
+                continue
+            country, day = incident.get('country'), incident_date(incident)
+            if country not in index or day is None:
+                continue
+            offset = (day - start).days
+            if 0 <= offset < horizon:
+                banned[index[country], offset] = True
+        return banned
+
+    def optimize(self, quote_data: Dict, start_date: str = None, days: int = 14) -> Optional[Dict]:
+        """
+        Evaluar las `days` fechas de recogida desde `start_date`.
+        Devuelve las candidatas con su espera, entrega y coste, y la más rápida
+        y la más barata entre las viables; None si no hay ruta.
+        """
+        started = time.monotonic()
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else \
+            date.today() + timedelta(days=1)
+        data = {'origin': 'Madrid', 'weight_kg': 1000, 'cargo_type': 'carga_general',
+                **quote_data, 'pickup_date': start.isoformat()}
+        if not data.get('destination'):
+            return None
+
+        route = self._route(data)
+        if not route:
+            return None
+        countries = route.get('countries') or []
+        # Mismo vehículo que la cotización: el volumen y los palés también cuentan
+        specs = self.service._get_vehicle_specs(float(data['weight_kg']), plan_load(data))
+
+        # El precio no depende de la fecha: una sola cotización sin restricciones
+        empty = {'restrictions': [], 'holidays': [], 'critical_alerts': 0}
+        quote = self.service.generate_european_quote(data, prefetched={'route': route, 'restrictions': empty})
+        if not quote:
+            return None
+        transit_days = int(quote['tiempo_estimado_dias'])
+
+        horizon = days + transit_days + MAX_BLOCKED_DAYS * max(transit_days, 1)
+        window = asyncio.run(self.service.get_restrictions_window(
+            countries, start.isoformat(), (start + timedelta(days=horizon - 1)).isoformat(), specs))
+        heavy = specs['type'] != 'van'
+        # El origen bloqueado el día de recogida descarta la fecha
+        feasible = ~self._ban_matrix(countries[:1], start, days, window, heavy)[0] if countries else \
+            np.ones(days, dtype=bool)
+
+        # Todas las salidas a la vez con el nivel de servicio de la cotización
+        departures = departure(start.isoformat()) + np.arange(days) * np.timedelta64(1, 'D')
+        eta = self.service.estimate_transit(route, start.isoformat(), specs, window.get('restrictions', []),
+                                            service_levels=list(quote['niveles_servicio']).index(quote['tipo_servicio']),
+                                            departures=departures)
+        wait_hours = eta['ban_wait_hours']
+        arrival = eta['arrival']
+        costs = quote['costo_total_eur'] + wait_hours / 24 * self.wait_cost_per_day
+
+        candidates = [{
+            'fecha_recogida': (start + timedelta(days=i)).isoformat(),
+            'viable': bool(feasible[i]),
+            'dias_espera': int(np.ceil(wait_hours[i] / 24)),
+            'horas_espera': round(float(wait_hours[i]), 1),
+            'fecha_entrega': str(arrival[i].astype('datetime64[D]')),
+            'llegada_estimada': str(arrival[i]).replace('T', ' '),
+            'costo_total_eur': round(float(costs[i]), 2),
+        } for i in range(days)]
+
+        viable = np.flatnonzero(feasible)
+        fastest = cheapest = None
+        if viable.size:
+            # Más rápida: llegada más temprana, no la primera fecha viable (a igualdad, menos
+            # espera); lexsort ordena por la última clave y es estable
+            arrival_minutes = arrival.astype('datetime64[m]').astype(np.int64)
+            fastest = candidates[int(viable[np.lexsort((wait_hours[viable], arrival_minutes[viable]))[0]])]
+            cheapest = candidates[int(viable[np.lexsort((arrival_minutes[viable], costs[viable]))[0]])]
+
+        elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.debug(f"Optimizador de recogida: {days} fechas en {elapsed_ms} ms")
+        return {
+            'origen': data['origin'],
+            'destino': data['destination'],
+            'paises_transito': countries,
+            'dias_transito': transit_days,
+            'restricciones_en_vivo': bool(window.get('success')),
+            'candidatas': candidates,
+            'mas_rapida': fastest,
+            'mas_barata': cheapest,
+            'elapsed_ms': elapsed_ms,
+        }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Utilidades para polylines codificadas (formato de Google, precisión 5)
+La decodificación es vectorizada con NumPy y devuelve un array float32 (n, 2) de
+[lat, lon] (menos de 1 m de error en Europa). POLYLINE_CACHE guarda cada polyline
+decodificada una sola vez, por huella, y entrega vistas de sólo lectura; para
+guardarla (payloads, sesiones) se simplifica con Douglas-Peucker.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import numpy as np
+
+POLYLINE_PRECISION = 5
+EARTH_RADIUS_KM = 6371.0
+# Tolerancia de la simplificación para almacenamiento
+POLYLINE_TOLERANCE_M = 25.0
+
+
+def decode_polyline(encoded: str, precision: int = POLYLINE_PRECISION) -> np.ndarray:
+    """Polyline codificada -> array (n, 2) de [lat, lon] en grados"""
+    if not encoded:
+        return np.empty((0, 2), dtype=np.float32)
+    chars = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    last_chunk = chars < 0x20
+
+    # Cada valor son varios bloques de 5 bits; el último no lleva el bit de continuación
+    group = np.concatenate(([0], np.cumsum(last_chunk)[:-1]))
+    group_start = np.flatnonzero(np.concatenate(([True], last_chunk[:-1])))
+    shift = 5 * (np.arange(len(chars)) - group_start[group])
+    values = np.bincount(group, weights=(chars & 0x1f) << shift).astype(np.int64)
+
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    if len(deltas) % 2:
+        raise ValueError("Polyline incompleta")
+    return (np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision).astype(np.float32)
+
+
+def encode_polyline(coords: Iterable, precision: int = POLYLINE_PRECISION) -> str:
+    """Array/lista de [lat, lon] -> polyline codificada"""
+    points = np.round(np.asarray(coords, dtype=np.float64) * 10 ** precision).astype(np.int64)
+    if points.size == 0:
+        return ''
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+
+    out = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            out.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        out.append(chr(value + 63))
+    return ''.join(out)
+
+
+def haversine_km(coords: np.ndarray) -> np.ndarray:
+    """Distancia en km de cada tramo consecutivo de un array (n, 2) de [lat, lon]"""
+    radians = np.radians(np.asarray(coords, dtype=np.float64))
+    lat, lon = radians[:, 0], radians[:, 1]
+    dlat, dlon = np.diff(lat), np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def simplify_coords(coords: np.ndarray, tolerance_m: float = POLYLINE_TOLERANCE_M) -> np.ndarray:
+    """Douglas-Peucker sobre una proyección equirectangular local (metros)"""
+    n = len(coords)
+    if n < 3:
+        return coords
+    radians = np.radians(np.asarray(coords, dtype=np.float64))
+    cos_lat = np.cos(radians[:, 0].mean())
+    xy = np.column_stack((radians[:, 1] * cos_lat, radians[:, 0])) * EARTH_RADIUS_KM * 1000
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = xy[last] - xy[first]
+        points = xy[first + 1:last] - xy[first]
+        length = np.hypot(*segment)
+        if length:
+            distances = np.abs(segment[0] * points[:, 1] - segment[1] * points[:, 0]) / length
+        else:
+            distances = np.hypot(points[:, 0], points[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack += [(first, split), (split, last)]
+    return coords[keep]
+
+
+def compact_polyline(encoded: Optional[str], tolerance_m: float = POLYLINE_TOLERANCE_M) -> Optional[str]:
+    """Polyline simplificada para guardar; si no se puede decodificar, la original"""
+    if not encoded:
+        return encoded
+    try:
+        coords = POLYLINE_CACHE.coords(encoded)
+    except (ValueError, UnicodeEncodeError):
+        return encoded
+    return encode_polyline(simplify_coords(coords, tolerance_m))
+
+
+class PolylineCache:
+    """Polylines decodificadas por huella (LRU); devuelve vistas de sólo lectura, nunca copias"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv('POLYLINE_CACHE_SIZE', 128))
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def fingerprint(encoded: str) -> str:
+        return hashlib.blake2b(encoded.encode('ascii'), digest_size=16).hexdigest()
+
+    def coords(self, encoded: str) -> np.ndarray:
+        key = self.fingerprint(encoded)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key].view()
+            self.stats['misses'] += 1
+
+        coords = decode_polyline(encoded)
+        coords.setflags(write=False)
+        with self._lock:
+            self._entries[key] = coords
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return coords.view()
+
+
+POLYLINE_CACHE = PolylineCache()
+
+
+def polyline_coords(encoded: str) -> np.ndarray:
+    """Coordenadas (float32, sólo lectura) de una polyline, decodificada una sola vez"""
+    return POLYLINE_CACHE.coords(encoded)
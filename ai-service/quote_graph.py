@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Modelo de cotización incremental para EuropeanLogisticsService
+La cotización es un grafo de dependencias con resultados intermedios en caché:
+
+    route        <- origen, destino, clase de vehículo
+    tolls        <- route (polyline), clase de vehículo
+    restrictions <- route (países), fecha de recogida, clase de vehículo
+    pricing      <- todo lo anterior + resto de datos de la cotización
+
+Al cambiar un dato ("y si fueran 5 toneladas", "cámbialo a express") sólo se
+recalculan los nodos cuya clave ha cambiado. Los resultados degradados (ruta de
+fallback, peajes estimados, restricciones sin incidencias en vivo) no se guardan:
+la siguiente cotización vuelve a consultar el servicio real.
+
+Sólo lo usa el endpoint /quotes/european/requote; el chat no pasa por aquí y
+un cambio tras la cotización vuelve a cotizar completo contra el backend.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from load_planner import plan_load
+
+NODES = ('route', 'tolls', 'restrictions', 'pricing')
+
+
+class QuoteGraph:
+    def __init__(self, service, max_entries: int = None):
+        self.service = service
+        self.max_entries = max_entries or int(os.getenv('QUOTE_GRAPH_CACHE_SIZE', 256))
+        self._caches: Dict[str, OrderedDict] = {node: OrderedDict() for node in NODES}
+        self._lock = threading.Lock()
+        self.stats = {node: {'hits': 0, 'misses': 0} for node in NODES}
+
+    def _cached(self, node: str, key, compute: Callable[[], Dict],
+                cacheable: Callable[[Dict], bool] = None) -> Tuple[Dict, bool]:
+        """Valor del nodo para `key` y si hubo que recalcularlo"""
+        with self._lock:
+            cache = self._caches[node]
+            if key in cache:
+                cache.move_to_end(key)
+                self.stats[node]['hits'] += 1
+                return copy.deepcopy(cache[key]), False
+            self.stats[node]['misses'] += 1
+
+        value = compute()
+        if value is not None and (cacheable is None or cacheable(value)):
+            with self._lock:
+                cache = self._caches[node]
+                cache[key] = copy.deepcopy(value)
+                while len(cache) > self.max_entries:
+                    cache.popitem(last=False)
+        return value, True
+
+    @staticmethod
+    def _degraded(value: Dict) -> bool:
+        """Resultado aproximado por fallo del servicio real: no se guarda en caché"""
+        return bool(value.get('fallback') or value.get('estimated') or value.get('live_incidents') is False)
+
+    @classmethod
+    def _live(cls, value: Dict) -> bool:
+        return bool(value.get('success')) and not cls._degraded(value)
+
+    @staticmethod
+    def _normalize(quote_data: Dict) -> Dict:
+        """Mismos valores por defecto que generate_european_quote"""
+        data = dict(quote_data)
+        data.setdefault('weight_kg', 1000)
+        data.setdefault('origin', 'Madrid')
+        data.setdefault('cargo_type', 'carga_general')
+        data.setdefault('pickup_date', (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'))
+        return data
+
+    def _route_node(self, data: Dict) -> Tuple[Dict, Dict, tuple, tuple, bool]:
+        """(ruta, specs, clase de vehículo, clave de ruta, recalculada)"""
+        specs = self.service._get_vehicle_specs(float(data['weight_kg']), plan_load(data))
+        vehicle_class = (specs['type'], specs['axles'])
+        route_key = (data['origin'].lower(), data['destination'].lower()) + vehicle_class
+        route, fresh = self._cached(
+            'route', route_key,
+            lambda: asyncio.run(self.service.get_route_calculation(data['origin'], data['destination'], specs)),
+            cacheable=self._live)
+        return route, specs, vehicle_class, route_key, fresh
+
+    def _tolls_node(self, route: Dict, specs: Dict, route_key: tuple) -> Tuple[Dict, bool]:
+        """(peajes, recalculados) de una ruta"""
+        def fetch_tolls():
+            if not route.get('polyline'):
+                return {'total_cost': 0, 'currency': 'EUR', 'success': False}
+            return asyncio.run(self.service.get_toll_calculation(route['polyline'], specs))
+
+        # Los peajes de una ruta de fallback tampoco: la ruta real traerá su polyline
+        return self._cached('tolls', route_key, fetch_tolls,
+                            cacheable=lambda t: self._live(t) and self._live(route))
+
+    def leg(self, quote_data: Dict) -> Optional[Tuple[Dict, Dict]]:
+        """Ruta y peajes (en caché) de un tramo origen -> destino; None si no hay ruta"""
+        data = self._normalize(quote_data)
+        route, specs, _, route_key, _ = self._route_node(data)
+        if not route or not route.get('success'):
+            return None
+        return route, self._tolls_node(route, specs, route_key)[0]
+
+    def route(self, quote_data: Dict) -> Optional[Dict]:
+        """Ruta (en caché) para el origen, destino y peso de quote_data"""
+        data = self._normalize(quote_data)
+        if not data.get('destination'):
+            return None
+        route = self._route_node(data)[0]
+        return route if route and route.get('success') else None
+
+    def quote(self, quote_data: Dict, progress=None) -> Dict:
+        """
+        Cotizar reutilizando los nodos en caché.
+        Devuelve {'quote': dict o None, 'recomputed': [nodos], 'elapsed_ms': float}.
+        """
+        started = time.monotonic()
+        data = self._normalize(quote_data)
+        recomputed: List[str] = []
+
+        def result(quote: Optional[Dict]) -> Dict:
+            return {'quote': quote, 'recomputed': recomputed,
+                    'elapsed_ms': round((time.monotonic() - started) * 1000, 1)}
+
+        if not data.get('destination'):
+            return result(None)
+
+        route, specs, vehicle_class, route_key, fresh = self._route_node(data)
+        if fresh:
+            recomputed.append('route')
+        if not route or not route.get('success'):
+            return result(None)
+
+        tolls, fresh = self._tolls_node(route, specs, route_key)
+        if fresh:
+            recomputed.append('tolls')
+
+        restrictions_key = (tuple(route.get('countries', [])), data['pickup_date']) + vehicle_class
+        restrictions, fresh = self._cached(
+            'restrictions', restrictions_key,
+            lambda: asyncio.run(self.service.get_restrictions_and_holidays(
+                route.get('countries', []), data['pickup_date'], specs)),
+            cacheable=self._live)
+        if fresh:
+            recomputed.append('restrictions')
+
+        # Un precio calculado sobre datos degradados tampoco se guarda
+        degraded = any(self._degraded(value) for value in (route, tolls, restrictions))
+        pricing_key = (route_key, restrictions_key, json.dumps(data, sort_keys=True, default=str))
+        quote, fresh = self._cached(
+            'pricing', pricing_key,
+            lambda: self.service.generate_european_quote(
+                data, prefetched={'route': route, 'tolls': tolls, 'restrictions': restrictions},
+                progress=progress),
+            cacheable=lambda _: not degraded)
+        if fresh:
+            recomputed.append('pricing')
+
+        logger.debug(f"Cotizacion incremental: recalculados {recomputed or 'ninguno'}")
+        return result(quote)
+
+    def requote(self, base_data: Dict, changes: Dict, progress=None) -> Dict:
+        """Cotización 'qué pasaría si': base_data con los cambios aplicados"""
+        return self.quote({**base_data, **changes}, progress=progress)
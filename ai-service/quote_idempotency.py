@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Idempotencia de las cotizaciones enviadas al backend
+La clave es un hash canónico (JSON con claves ordenadas) del payload de
+_transform_to_backend_format y de la sesión. Mientras una cotización está en
+curso, los reintentos con la misma clave esperan su resultado en lugar de
+volver a llamar al backend; una vez guardada, se devuelve la misma cotización
+(mismo quoteId) hasta que caduca.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+
+def idempotency_key(session_id: str, payload: Dict) -> str:
+    """Hash canónico de la sesión y el payload del backend"""
+    canonical = json.dumps({'session': session_id, 'payload': payload}, sort_keys=True,
+                           separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class IdempotentQuotes:
+    """Resultados recientes por clave (con caducidad) y cotizaciones en curso"""
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv('QUOTE_IDEMPOTENCY_TTL_SECONDS', 600))
+        self.max_entries = max_entries
+        self._results: OrderedDict = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'computed': 0, 'replayed': 0, 'joined': 0}
+
+    def run(self, key: str, compute: Callable[[], Optional[Dict]]) -> Tuple[Optional[Dict], str]:
+        """
+        Resultado para la clave y su origen: 'computed', 'replayed' (guardado)
+        o 'joined' (otra llamada en curso). Los fallos (None o excepción) no se guardan.
+        """
+        with self._lock:
+            entry = self._results.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._results.move_to_end(key)
+                self.stats['replayed'] += 1
+                return entry[1], 'replayed'
+            if entry:
+                del self._results[key]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+            else:
+                self.stats['joined'] += 1
+
+        if not owner:
+            return future.result(), 'joined'
+
+        try:
+            result = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if future.done() and not future.exception() and future.result() is not None:
+                    self._results[key] = (time.monotonic() + self.ttl_seconds, future.result())
+                    self._results.move_to_end(key)
+                    while len(self._results) > self.max_entries:
+                        self._results.popitem(last=False)
+                self.stats['computed'] += 1
+        logger.debug(f"Cotización idempotente {key[:8]} calculada")
+        return result, 'computed'
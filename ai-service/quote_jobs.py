@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Cola de trabajos de cotización de LUC1
+El chat encola la cotización y responde al momento; workers asyncio la
+generan en segundo plano (la llamada al backend se ejecuta en un hilo).
+El estado se guarda en memoria o, con QUOTE_JOBS_DB, en SQLite para que
+los trabajos pendientes sobrevivan a un reinicio.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINAL_STATUSES = (DONE, FAILED)
+
+
+class MemoryJobStore:
+    """Trabajos en memoria (se pierden al reiniciar)"""
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict):
+        with self._lock:
+            self._jobs[job['job_id']] = dict(job)
+            # Descartar los trabajos terminados más antiguos
+            finished = [j for j in self._jobs.values() if j['status'] in FINAL_STATUSES]
+            for old in sorted(finished, key=lambda j: j['created_at'])[:max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[old['job_id']]
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def append_event(self, job_id: str, event: Dict):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]['events'] = self._jobs[job_id].get('events', []) + [event]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def unfinished(self) -> List[Dict]:
+        with self._lock:
+            return [dict(j) for j in self._jobs.values() if j['status'] not in FINAL_STATUSES]
+
+
+class SQLiteJobStore:
+    """Trabajos persistentes en SQLite"""
+
+    COLUMNS = ('job_id', 'session_id', 'status', 'payload', 'result', 'error', 'events', 'created_at', 'updated_at')
+    JSON_COLUMNS = ('payload', 'result', 'events')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quote_jobs ("
+            "job_id TEXT PRIMARY KEY, session_id TEXT, status TEXT, payload TEXT, "
+            "result TEXT, error TEXT, events TEXT, created_at REAL, updated_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(quote_jobs)")}
+        if 'events' not in columns:
+            self._conn.execute("ALTER TABLE quote_jobs ADD COLUMN events TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS quote_jobs_status ON quote_jobs (status)")
+        self._conn.commit()
+
+    def _encode(self, fields: Dict) -> Dict:
+        return {k: json.dumps(v, ensure_ascii=False) if k in self.JSON_COLUMNS and v is not None else v
+                for k, v in fields.items()}
+
+    def _decode(self, row) -> Dict:
+        job = dict(zip(self.COLUMNS, row))
+        for column in self.JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+    def create(self, job: Dict):
+        row = self._encode({column: job.get(column) for column in self.COLUMNS})
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO quote_jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [row[c] for c in self.COLUMNS])
+            self._conn.commit()
+
+    def update(self, job_id: str, **fields):
+        fields = self._encode({**fields, 'updated_at': time.time()})
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE quote_jobs SET {assignments} WHERE job_id = ?",
+                               [*fields.values(), job_id])
+            self._conn.commit()
+
+    def append_event(self, job_id: str, event: Dict):
+        with self._lock:
+            row = self._conn.execute("SELECT events FROM quote_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            events = json.loads(row[0]) if row[0] else []
+            events.append(event)
+            self._conn.execute("UPDATE quote_jobs SET events = ? WHERE job_id = ?",
+                               (json.dumps(events, ensure_ascii=False), job_id))
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM quote_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def unfinished(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM quote_jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)).fetchall()
+        return [self._decode(row) for row in rows]
+
+
+class QuoteJobQueue:
+    """
+    Cola asíncrona de cotizaciones.
+
+    run_job(session_id, payload, on_event) se ejecuta en un hilo y devuelve el
+    resultado (dict serializable) o lanza una excepción si la cotización falla.
+    Los eventos que emita con on_event quedan en job['events'].
+    """
+
+    def __init__(self, run_job: Callable[[str, Dict, Callable[[Dict], None]], Dict], store=None,
+                 workers: int = None):
+        self.run_job = run_job
+        if store is None:
+            db_path = os.getenv('QUOTE_JOBS_DB', '')
+            store = SQLiteJobStore(db_path) if db_path else MemoryJobStore()
+        self.store = store
+        self.workers = workers or int(os.getenv('QUOTE_JOBS_WORKERS', 2))
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Arrancar los workers y reencolar lo que quedó pendiente"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        recovered = self.store.unfinished()
+        for job in recovered:
+            self.store.update(job['job_id'], status=QUEUED, events=[])
+            self._queue.put_nowait(job['job_id'])
+        if recovered:
+            logger.info(f"Cola de cotizaciones: {len(recovered)} trabajos recuperados")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, session_id: str, payload: Dict) -> str:
+        """Encolar una cotización; se puede llamar desde cualquier hilo"""
+        if not self.running:
+            raise RuntimeError("La cola de cotizaciones no está arrancada")
+        now = time.time()
+        job_id = f"job_{uuid.uuid4().hex[:12]}"
+        self.store.create({
+            'job_id': job_id, 'session_id': session_id, 'status': QUEUED,
+            'payload': payload, 'result': None, 'error': None, 'events': [],
+            'created_at': now, 'updated_at': now,
+        })
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job_id)
+        logger.info(f"Cotizacion encolada: {job_id} (sesion {session_id})")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.store.get(job_id)
+                if not job or job['status'] in FINAL_STATUSES:
+                    continue
+                self.store.update(job_id, status=RUNNING)
+                started = time.monotonic()
+                try:
+                    result = await asyncio.to_thread(
+                        self.run_job, job['session_id'], job['payload'],
+                        lambda event: self.store.append_event(job_id, event))
+                    self.store.update(job_id, status=DONE, result=result)
+                    logger.info(f"Cotizacion {job_id} lista en {time.monotonic() - started:.1f}s")
+                except Exception as e:
+                    logger.error(f"Cotizacion {job_id} fallida: {e}")
+                    self.store.update(job_id, status=FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def wait(self, job_id: str, known_status: str = None, known_events: int = 0,
+                   timeout: float = 30.0, poll_seconds: float = 0.25) -> Optional[Dict]:
+        """Esperar a que el trabajo cambie de estado o emita eventos nuevos (o termine el timeout)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.store.get(job_id)
+            if job is None or job['status'] != known_status or len(job.get('events') or []) > known_events \
+                    or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(poll_seconds)
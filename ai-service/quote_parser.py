@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Parser local de fechas relativas y unidades para LUC1
+Entiende "mañana", "el lunes", "la próxima semana", "en 3 días",
+"15 de diciembre", comas decimales, palés con medidas estándar,
+dimensiones en cm/mm y pesos en toneladas o libras. Todas las tablas y
+expresiones regulares se compilan una sola vez al importar el módulo.
+
+Las fechas sin año ("20/1") y "hoy"/"mañana" sólo cuentan junto a un
+contexto de recogida ("recogida", "el día", "para el"...) o cuando el texto
+es la respuesta a la pregunta por la fecha; así "1/2 carga", "2-3 toneladas"
+o "hoy necesito cotizar" no se leen como fechas.
+"""
+
+import re
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+# ---------------------------------------------------------------------------
+# Tablas
+# ---------------------------------------------------------------------------
+
+WEEKDAYS = {
+    'lunes': 0, 'martes': 1, 'miércoles': 2, 'miercoles': 2, 'jueves': 3,
+    'viernes': 4, 'sábado': 5, 'sabado': 5, 'domingo': 6,
+}
+
+MONTHS = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6, 'julio': 7,
+    'agosto': 8, 'septiembre': 9, 'setiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12,
+}
+
+NUMBER_WORDS = {
+    'un': 1, 'una': 1, 'uno': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6,
+    'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10, 'once': 11, 'doce': 12, 'quince': 15,
+    'veinte': 20, 'treinta': 30,
+}
+
+# Expresiones fijas -> (días desde hoy, requiere contexto de recogida)
+# (el orden importa: la más larga primero)
+RELATIVE_DAYS = [
+    ('pasado mañana', 2, True), ('pasado manana', 2, True),
+    ('mañana', 1, True), ('manana', 1, True),
+    ('hoy', 0, True), ('lo antes posible', 0, False), ('cuanto antes', 0, False),
+]
+
+# Unidades de peso -> factor a kg
+WEIGHT_UNITS = {
+    'kg': 1.0, 'kgs': 1.0, 'kilo': 1.0, 'kilos': 1.0, 'kilogramo': 1.0, 'kilogramos': 1.0,
+    't': 1000.0, 'tn': 1000.0, 'ton': 1000.0, 'tons': 1000.0, 'tonelada': 1000.0, 'toneladas': 1000.0,
+    'lb': 0.45359237, 'lbs': 0.45359237, 'libra': 0.45359237, 'libras': 0.45359237,
+}
+
+# Unidades de longitud -> factor a metros
+LENGTH_UNITS = {'m': 1.0, 'metros': 1.0, 'cm': 0.01, 'mm': 0.001}
+
+# Huellas estándar de palé (largo, ancho en metros)
+PALLET_FOOTPRINTS = {
+    'eur': (1.2, 0.8), 'europeo': (1.2, 0.8), 'europeos': (1.2, 0.8), 'europalet': (1.2, 0.8),
+    'iso': (1.2, 1.0), 'americano': (1.2, 1.0), 'americanos': (1.2, 1.0), 'universal': (1.2, 1.0),
+    'medio': (0.8, 0.6), 'medios': (0.8, 0.6),
+}
+DEFAULT_PALLET = 'eur'
+DEFAULT_PALLET_HEIGHT_M = 1.5
+
+# ---------------------------------------------------------------------------
+# Expresiones precompiladas
+# ---------------------------------------------------------------------------
+
+_NUM = r'\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:[.,]\d+)?'
+_COUNT = r'\d+|' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True))
+
+# Palabras que, detrás de "2-3" o "1/2", indican cantidad y no fecha
+_QUANTITY_WORDS = sorted(list(WEIGHT_UNITS) + [
+    'm3', 'm³', 'metros', 'días', 'dias', 'día', 'dia', 'semanas', 'semana', 'horas', 'hora',
+    'carga', 'cargas', 'camión', 'camion', 'camiones', 'palés', 'pales', 'palets', 'palet', 'pallets',
+], key=len, reverse=True)
+
+NUMERIC_DATE = re.compile(r'\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?\b'
+                          r'(?!\s*(?:' + '|'.join(_QUANTITY_WORDS) + r')\b)')
+ISO_DATE = re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b')
+DAY_MONTH = re.compile(r'\b(\d{1,2})\s+de\s+(' + '|'.join(MONTHS) + r')(?:\s+(?:de|del)\s+(\d{4}))?\b')
+# "en 3 días", "dentro de dos semanas" y rangos "en 3-4 días" (cuenta el primero)
+IN_N_UNITS = re.compile(r'\b(?:en|dentro de)\s+(' + _COUNT + r')(?:\s*(?:-|a|o)\s*(?:' + _COUNT + r'))?'
+                        r'\s+(d[ií]as?|semanas?)\b')
+# Contexto de recogida cerca de una fecha sin año o de "hoy"/"mañana"
+PICKUP_CONTEXT = re.compile(r'\b(?:recog\w*|fecha|el d[ií]a|para el|salida|sale|salir|cargar|'
+                            r'disponible|lista? para)\b')
+RELATIVE_CONTEXT = re.compile(r'\bpara\s+(?:el\s+)?$')
+CONTEXT_BEFORE = 30
+CONTEXT_AFTER = 20
+NEXT_WEEK = re.compile(r'\b(?:la\s+)?(?:pr[oó]xima semana|semana que viene|semana pr[oó]xima)\b')
+WEEKDAY = re.compile(r'\b(?:el\s+)?(pr[oó]ximo\s+)?(' + '|'.join(WEEKDAYS) + r')(\s+que viene|\s+pr[oó]ximo)?\b')
+MORNING = re.compile(r'\b(?:por|de|esta|la)\s+(?:la\s+)?ma[ñn]ana\b')
+
+WEIGHT = re.compile(r'(' + _NUM + r')\s*(' + '|'.join(sorted(WEIGHT_UNITS, key=len, reverse=True)) + r')\b')
+# Número y separador de rango justo antes del peso: "2-3 toneladas", "entre 2 y 3 t"
+WEIGHT_RANGE_PREFIX = re.compile(r'(?:' + _NUM + r')\s*(?:-|–|a|y|o)\s*$')
+VOLUME = re.compile(r'(' + _NUM + r')\s*(?:m3|m³|metros? c[uú]bicos?)')
+DIMENSIONS = re.compile(
+    r'(' + _NUM + r')\s*(cm|mm|m)?\s*[x×*]\s*(' + _NUM + r')\s*(cm|mm|m)?\s*[x×*]\s*(' + _NUM + r')\s*(cm|mm|metros|m)?\b'
+)
+PALLETS = re.compile(
+    r'\b(' + _COUNT + r')\s+(?:pal[eé]s|palets?|palles|pallets?)'
+    r'(?:\s+(' + '|'.join(sorted(PALLET_FOOTPRINTS, key=len, reverse=True)) + r'))?'
+)
+
+
+def parse_number(token: str) -> Optional[float]:
+    """Número en formato español o inglés: '1,5', '1.500', '1.500,25', '2.5'"""
+    token = token.strip()
+    if token in NUMBER_WORDS:
+        return float(NUMBER_WORDS[token])
+    if re.fullmatch(r'\d{1,3}(?:\.\d{3})+(?:,\d+)?', token):
+        token = token.replace('.', '').replace(',', '.')
+    else:
+        token = token.replace(',', '.')
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Fechas
+# ---------------------------------------------------------------------------
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _upcoming(today: date, month: int, day: int) -> Optional[date]:
+    """Próxima aparición de día/mes (este año o el siguiente)"""
+    candidate = _safe_date(today.year, month, day)
+    if candidate and candidate < today:
+        candidate = _safe_date(today.year + 1, month, day)
+    return candidate
+
+
+def _near_pickup_context(text: str, start: int, end: int) -> bool:
+    """True si hay una palabra de recogida poco antes o poco después de text[start:end]"""
+    window = text[max(0, start - CONTEXT_BEFORE):start] + ' ' + text[end:end + CONTEXT_AFTER]
+    return bool(PICKUP_CONTEXT.search(window))
+
+
+def parse_pickup_date(text: str, today: date = None, expects_date: bool = False) -> Optional[str]:
+    """
+    Fecha de recogida en formato YYYY-MM-DD, o None si no se reconoce.
+    expects_date: el texto es la propia fecha de recogida (respuesta a la
+    pregunta por la fecha o campo de la herramienta), sin exigir contexto.
+    """
+    today = today or date.today()
+    text_lower = text.lower()
+
+    iso_spans = []
+    for match in ISO_DATE.finditer(text_lower):
+        parsed = _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        if parsed:
+            return parsed.isoformat()
+        iso_spans.append(match.span())
+
+    # Antes que "d-m": "en 3-4 días" es un plazo, no el 3 de abril
+    match = IN_N_UNITS.search(text_lower)
+    if match:
+        amount = int(parse_number(match.group(1)))
+        days = amount * 7 if match.group(2).startswith('semana') else amount
+        return (today + timedelta(days=days)).isoformat()
+
+    for match in NUMERIC_DATE.finditer(text_lower):
+        # "2024-13-01" es una fecha ISO inválida, no el 13 de enero
+        if any(start <= match.start() < end for start, end in iso_spans):
+            continue
+        day, month, year = int(match.group(1)), int(match.group(2)), match.group(3)
+        if year:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+            parsed = _safe_date(year, month, day)
+        elif expects_date or _near_pickup_context(text_lower, match.start(), match.end()):
+            parsed = _upcoming(today, month, day)
+        else:
+            continue
+        if parsed:
+            return parsed.isoformat()
+
+    match = DAY_MONTH.search(text_lower)
+    if match:
+        day, month = int(match.group(1)), MONTHS[match.group(2)]
+        parsed = _safe_date(int(match.group(3)), month, day) if match.group(3) else _upcoming(today, month, day)
+        if parsed:
+            return parsed.isoformat()
+
+    match = WEEKDAY.search(text_lower)
+    if match:
+        target = WEEKDAYS[match.group(2)]
+        # "el viernes de la próxima semana": ese día de la semana siguiente
+        if NEXT_WEEK.search(text_lower):
+            return (today + timedelta(days=7 - today.weekday() + target)).isoformat()
+        ahead = (target - today.weekday()) % 7 or 7
+        return (today + timedelta(days=ahead)).isoformat()
+
+    if NEXT_WEEK.search(text_lower):
+        return (today + timedelta(days=7 - today.weekday())).isoformat()
+
+    text_without_morning = MORNING.sub(' ', text_lower)
+    for phrase, days, needs_context in RELATIVE_DAYS:
+        for match in re.finditer(r'\b' + phrase + r'\b', text_without_morning):
+            if (not needs_context or expects_date
+                    or RELATIVE_CONTEXT.search(text_without_morning[:match.start()])
+                    or _near_pickup_context(text_without_morning, match.start(), match.end())):
+                return (today + timedelta(days=days)).isoformat()
+
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Unidades
+# ---------------------------------------------------------------------------
+
+def parse_weight_kg(text: str) -> Optional[float]:
+    """Peso en kg a partir de kg, toneladas o libras; None para rangos ("2-3 toneladas")"""
+    text_lower = text.lower()
+    match = WEIGHT.search(text_lower)
+    if not match or WEIGHT_RANGE_PREFIX.search(text_lower[:match.start()]):
+        return None
+    value = parse_number(match.group(1))
+    if value is None:
+        return None
+    return round(value * WEIGHT_UNITS[match.group(2)], 3)
+
+
+def _dimensions_m(match) -> Tuple[float, float, float]:
+    values = [parse_number(match.group(i)) for i in (1, 3, 5)]
+    units = [match.group(i) for i in (2, 4, 6)]
+    # La última unidad aplica a las tres ("120x80x150 cm")
+    default_unit = next((u for u in reversed(units) if u), None)
+    if default_unit is None:
+        # Sin unidad: valores grandes son centímetros, pequeños metros
+        default_unit = 'cm' if max(values) > 20 else 'm'
+    factors = [LENGTH_UNITS.get(u or default_unit, 1.0) for u in units]
+    return tuple(v * f for v, f in zip(values, factors))
+
+
+def parse_volume(text: str) -> Dict:
+    """
+    Volumen y palés del texto.
+
+    Devuelve un dict con 'volumen_m3' y, si se mencionan palés,
+    'num_pales' y 'tipo_pale'. Dict vacío si no hay nada reconocible.
+    """
+    text_lower = text.lower()
+    result = {}
+
+    pallets = PALLETS.search(text_lower)
+    dimensions = DIMENSIONS.search(text_lower)
+    explicit = VOLUME.search(text_lower)
+
+    if pallets:
+        count = int(parse_number(pallets.group(1)))
+        kind = pallets.group(2) or DEFAULT_PALLET
+        result['num_pales'] = count
+        result['tipo_pale'] = 'iso' if PALLET_FOOTPRINTS[kind] == (1.2, 1.0) else (
+            'medio' if PALLET_FOOTPRINTS[kind] == (0.8, 0.6) else 'eur')
+
+    if explicit:
+        result['volumen_m3'] = round(parse_number(explicit.group(1)), 3)
+    elif dimensions:
+        length, width, height = _dimensions_m(dimensions)
+        count = result.get('num_pales', 1)
+        result['volumen_m3'] = round(length * width * height * count, 3)
+    elif pallets:
+        length, width = PALLET_FOOTPRINTS[pallets.group(2) or DEFAULT_PALLET]
+        result['volumen_m3'] = round(length * width * DEFAULT_PALLET_HEIGHT_M * result['num_pales'], 3)
+
+    return result
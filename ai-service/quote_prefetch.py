@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Prefetch especulativo de ruta, peajes y restricciones
+En cuanto la sesión tiene origen, destino y peso (y fecha, para las
+restricciones) se lanzan en segundo plano las consultas de
+EuropeanLogisticsService y se guardan por sesión con caducidad. Las claves
+usan la misma clase de vehículo que QuoteGraph (peso + plan de carga).
+
+Lo anticipado que ya haya terminado viaja en el POST al backend como bloque
+`precomputed` (backend_precomputed), que se ahorra esas consultas, y adelanta
+las etapas de progreso sin retrasar el POST (collect no espera por defecto).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from load_planner import chat_shipment, plan_load
+from quote_graph import QuoteGraph
+
+STAGES = ('route', 'tolls', 'restrictions')
+
+
+def backend_precomputed(prefetched: Dict) -> Dict:
+    """
+    Bloque `precomputed` del POST al backend con las etapas anticipadas fiables
+    (ni fallback ni estimadas). Peajes y restricciones sólo viajan con su ruta.
+    """
+    route = prefetched.get('route')
+    if not route or not QuoteGraph._live(route):
+        return {}
+    block = {'route': {'distance': route['distance_km'], 'duration': route['duration_hours'],
+                       'countries': route.get('countries', [])}}
+    tolls = prefetched.get('tolls')
+    if tolls and QuoteGraph._live(tolls):
+        block['tolls'] = {'totalCost': tolls.get('total_cost', 0), 'breakdown': tolls.get('breakdown', [])}
+    restrictions = prefetched.get('restrictions')
+    if restrictions and QuoteGraph._live(restrictions):
+        block['restrictions'] = {'alerts': restrictions.get('restrictions', []),
+                                 'holidays': restrictions.get('holidays', [])}
+    return block
+
+
+class PrefetchStore:
+    """Resultados anticipados por sesión: (sesión, etapa) -> (clave, caducidad, future)"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Dict[str, Tuple[tuple, float, Future]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, stage: str, key: tuple) -> Optional[Future]:
+        """Future vigente para la etapa si se lanzó con la misma clave"""
+        with self._lock:
+            entry = self._entries.get(session_id, {}).get(stage)
+            if not entry:
+                return None
+            entry_key, expires_at, future = entry
+            if entry_key != key or time.monotonic() >= expires_at:
+                return None
+            return future
+
+    def put(self, session_id: str, stage: str, key: tuple, future: Future):
+        with self._lock:
+            self._entries.setdefault(session_id, {})[stage] = (key, time.monotonic() + self.ttl_seconds, future)
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def purge(self):
+        """Eliminar entradas caducadas"""
+        now = time.monotonic()
+        with self._lock:
+            for session_id in list(self._entries):
+                stages = {s: e for s, e in self._entries[session_id].items() if e[1] > now}
+                if stages:
+                    self._entries[session_id] = stages
+                else:
+                    del self._entries[session_id]
+
+
+class QuotePrefetcher:
+    """Lanza y recoge las consultas anticipadas de una sesión"""
+
+    def __init__(self, service, ttl_seconds: float = None, max_workers: int = None):
+        self.service = service
+        self.store = PrefetchStore(ttl_seconds if ttl_seconds is not None else float(
+            os.getenv('QUOTE_PREFETCH_TTL_SECONDS', 600)))
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('QUOTE_PREFETCH_WORKERS', 4)),
+            thread_name_prefix='quote-prefetch')
+        self.stats = {'launched': 0, 'reused': 0}
+
+    @staticmethod
+    def _run(coroutine):
+        return asyncio.run(coroutine)
+
+    def _specs(self, data: Dict) -> Dict:
+        """Vehículo por peso y plan de carga (volumen, palés), como en QuoteGraph"""
+        return self.service._get_vehicle_specs(float(data['peso_kg']), plan_load(chat_shipment(data)))
+
+    def _keys(self, data: Dict) -> Dict[str, tuple]:
+        """Claves de cada etapa según los datos de la sesión (sólo las calculables)"""
+        origin, destination, weight = data.get('origen'), data.get('destino'), data.get('peso_kg')
+        if not (origin and destination and weight):
+            return {}
+        specs = self._specs(data)
+        # La ruta sólo cambia con la clase de vehículo, no con cada kilo
+        route_key = (origin.lower(), destination.lower(), specs['type'], specs['axles'])
+        keys = {'route': route_key, 'tolls': route_key}
+        if data.get('fecha_recogida'):
+            keys['restrictions'] = route_key + (data['fecha_recogida'],)
+        return keys
+
+    def prefetch(self, session_id: str, data: Dict) -> List[str]:
+        """Lanzar las etapas calculables que aún no estén en curso. Devuelve las lanzadas."""
+        self.store.purge()
+        keys = self._keys(data)
+        if not keys:
+            return []
+
+        specs = self._specs(data)
+        launched = []
+
+        route = self.store.get(session_id, 'route', keys['route'])
+        if route is None:
+            route = self.executor.submit(
+                self._run, self.service.get_route_calculation(data['origen'], data['destino'], specs))
+            self.store.put(session_id, 'route', keys['route'], route)
+            launched.append('route')
+
+        if self.store.get(session_id, 'tolls', keys['tolls']) is None:
+            def tolls(route=route):
+                route_data = route.result()
+                if not route_data.get('polyline'):
+                    return {'total_cost': 0, 'currency': 'EUR', 'success': False}
+                return self._run(self.service.get_toll_calculation(route_data['polyline'], specs))
+            self.store.put(session_id, 'tolls', keys['tolls'], self.executor.submit(tolls))
+            launched.append('tolls')
+
+        if 'restrictions' in keys and self.store.get(session_id, 'restrictions', keys['restrictions']) is None:
+            pickup_date = data['fecha_recogida']
+
+            def restrictions(route=route):
+                countries = route.result().get('countries', [])
+                return self._run(self.service.get_restrictions_and_holidays(countries, pickup_date, specs))
+            self.store.put(session_id, 'restrictions', keys['restrictions'], self.executor.submit(restrictions))
+            launched.append('restrictions')
+
+        if launched:
+            self.stats['launched'] += len(launched)
+            logger.debug(f"Prefetch sesión {session_id}: {', '.join(launched)}")
+        return launched
+
+    def collect(self, session_id: str, data: Dict, timeout: float = 0.0) -> Dict:
+        """
+        Resultados anticipados que siguen siendo válidos para `data`,
+        esperando como mucho `timeout` segundos en total a los que estén en curso
+        (por defecto sólo los ya terminados).
+        """
+        deadline = time.monotonic() + timeout
+        results = {}
+        for stage, key in self._keys(data).items():
+            future = self.store.get(session_id, stage, key)
+            if future is None:
+                continue
+            try:
+                results[stage] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                logger.debug(f"Prefetch {stage} de {session_id} aún en curso, se ignora")
+            except Exception as e:
+                logger.warning(f"Prefetch {stage} de {session_id} falló: {e}")
+        self.stats['reused'] += len(results)
+        return results
+
+    def discard(self, session_id: str):
+        self.store.discard(session_id)
+
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Eventos de progreso del pipeline de cotización
+Cada etapa (ruta resuelta, peajes calculados, restricciones verificadas,
+cotización guardada) emite un evento con su duración y los datos
+parciales disponibles, y su latencia queda en las métricas por etapa.
+Las etapas servidas desde caché (prefetch, réplica idempotente) duran ~0 ms:
+se cuentan aparte para no falsear los percentiles.
+"""
+
+import time
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+from claude_hedging import LatencyTracker
+
+# Etapas conocidas, en el orden habitual del pipeline
+ROUTE_RESOLVED = 'route_resolved'
+TOLLS_COMPUTED = 'tolls_computed'
+RESTRICTIONS_CHECKED = 'restrictions_checked'
+QUOTE_PRICED = 'quote_priced'
+BACKEND_QUOTE_SAVED = 'backend_quote_saved'
+
+# Latencias por etapa de todas las cotizaciones del proceso
+STAGE_METRICS = LatencyTracker(window_size=500)
+# Etapas servidas desde caché (sólo cuentan como aciertos)
+STAGE_CACHE_HITS = LatencyTracker(window_size=500)
+
+
+def is_cache_hit(data: Dict) -> bool:
+    """Etapa resuelta con un resultado ya disponible (prefetch o cotización idempotente)"""
+    return bool(data.get('prefetched')) or data.get('idempotent') in ('replayed', 'joined')
+
+
+class QuoteProgress:
+    """
+    Emisor de etapas de una cotización. La duración de cada etapa es el
+    tiempo transcurrido desde la etapa anterior (o desde el inicio).
+    """
+
+    def __init__(self, callback: Optional[Callable[[Dict], None]] = None,
+                 metrics: LatencyTracker = None, cache_hits: LatencyTracker = None):
+        self.callback = callback
+        self.metrics = metrics if metrics is not None else STAGE_METRICS
+        self.cache_hits = cache_hits if cache_hits is not None else STAGE_CACHE_HITS
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def stage(self, name: str, **data) -> Dict:
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        cached = is_cache_hit(data)
+        (self.cache_hits if cached else self.metrics).record(name, elapsed)
+
+        event = {
+            'stage': name,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'total_ms': round((now - self.started) * 1000, 1),
+            'cached': cached,
+            'data': data,
+        }
+        if self.callback:
+            try:
+                self.callback(event)
+            except Exception as e:
+                logger.warning(f"Error emitiendo etapa {name}: {e}")
+        return event
+
+
+def stage_metrics_snapshot(metrics: LatencyTracker = None, cache_hits: LatencyTracker = None) -> Dict[str, Dict]:
+    """Resumen de latencias por etapa (ms), sin las etapas servidas desde caché"""
+    metrics = metrics if metrics is not None else STAGE_METRICS
+    cache_hits = cache_hits if cache_hits is not None else STAGE_CACHE_HITS
+    snapshot = {}
+    for stage in dict.fromkeys(metrics.keys() + cache_hits.keys()):
+        p50, p95 = metrics.percentile(stage, 50), metrics.percentile(stage, 95)
+        snapshot[stage] = {
+            'count': metrics.count(stage),
+            'cache_hits': cache_hits.count(stage),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+        }
+    return snapshot
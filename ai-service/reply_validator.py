@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Análisis local de las respuestas de LUC1
+Detecta qué campos de la cotización pide una respuesta, si vuelve a pedir
+datos que el usuario ya dio, si contradice los datos recopilados o si
+muestra baja confianza.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+# Palabras que identifican, dentro de una pregunta, el campo que se pide
+FIELD_QUESTION_KEYWORDS = {
+    'origen': ('origen', 'desde qué ciudad', 'desde que ciudad', 'desde dónde', 'desde donde'),
+    'destino': ('destino', 'a qué ciudad', 'a que ciudad', 'a dónde', 'a donde', 'hacia dónde', 'hacia donde'),
+    'peso_kg': ('peso', 'kilos', 'kg', 'toneladas', 'cuánto pesa', 'cuanto pesa'),
+    'volumen_m3': ('volumen', 'm³', 'm3', 'metros cúbicos', 'metros cubicos', 'dimensiones', 'palés', 'pales'),
+    'tipo_carga': ('tipo de carga', 'tipo de mercancía', 'tipo de mercancia', 'qué mercancía', 'que mercancia',
+                   'qué tipo de producto', 'que tipo de producto'),
+    'fecha_recogida': ('fecha', 'cuándo', 'recogida', 'recoger'),
+    'tipo_servicio': ('tipo de servicio', 'qué servicio', 'que servicio', 'nivel de servicio',
+                      'económico', 'economico', 'express', 'urgencia'),
+}
+
+# Frases del usuario que indican que LUC1 preguntó algo que ya sabía
+REASK_COMPLAINT_PATTERN = re.compile(
+    r'\b(ya te (lo )?(dije|he dicho|indiqu[eé])|te lo (acabo de decir|he dicho)|como te dije|'
+    r'ya lo (dije|indiqu[eé])|lo dije antes)\b'
+)
+
+# Marcadores de baja confianza del modelo sobre lo que pidió el usuario; "creo que"
+# o "quizás" sueltos son estilo (recomendaciones), no duda sobre los datos
+LOW_CONFIDENCE_PATTERN = re.compile(
+    r'\b(no estoy segur[oa]|no tengo claro|no (lo )?entiendo|no he entendido|no puedo (ayudar|determinar)|'
+    r'podr[ií]as aclarar|podr[ií]as repetir|si no me equivoco|'
+    r'(creo|supongo) que (te refieres|quieres decir|has querido decir)|'
+    r'(quiz[aá]s?|tal vez) (te refieres|quieres decir|has querido decir))\b'
+)
+
+QUANTITY_PATTERNS = {
+    'peso_kg': [(re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:kg|kilos?|kilogramos?)\b'), 1.0),
+                (re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:t|ton|toneladas?)\b'), 1000.0)],
+    'volumen_m3': [(re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:m3|m³|metros? c[uú]bicos?)'), 1.0)],
+}
+
+QUESTION_PATTERN = re.compile(r'¿([^?]*)\?|([^.!¡¿\n]*)\?')
+
+
+def extract_questions(reply: str) -> list:
+    """Devolver el texto de cada pregunta de la respuesta"""
+    questions = []
+    for match in QUESTION_PATTERN.finditer(reply or ''):
+        text = (match.group(1) or match.group(2) or '').strip()
+        if text:
+            questions.append(text.lower())
+    return questions
+
+
+def requested_fields(reply: str) -> Set[str]:
+    """Campos obligatorios por los que pregunta la respuesta"""
+    fields = set()
+    for question in extract_questions(reply):
+        for field, keywords in FIELD_QUESTION_KEYWORDS.items():
+            if any(keyword in question for keyword in keywords):
+                fields.add(field)
+    return fields
+
+
+def asks_for_collected(reply: str, quotation_data: Dict) -> Set[str]:
+    """Campos ya recopilados por los que la respuesta vuelve a preguntar"""
+    return {field for field in requested_fields(reply) if quotation_data.get(field)}
+
+
+def is_reask_complaint(user_message: Optional[str]) -> bool:
+    """True si el usuario se queja de que ya había dado el dato"""
+    return bool(user_message) and bool(REASK_COMPLAINT_PATTERN.search(user_message.lower()))
+
+
+def _contradicted_cities(reply_lower: str, label_words: Iterable[str], value: str,
+                         known_cities: Dict[str, str]) -> bool:
+    """True si justo detrás de una etiqueta del campo aparece otra ciudad conocida"""
+    for word in label_words:
+        for match in re.finditer(rf'\b{word}\b[:\s]+(?:de\s+|la ciudad de\s+)?', reply_lower):
+            following = reply_lower[match.end():match.end() + 30]
+            for key, name in known_cities.items():
+                if following.startswith(key) and name.lower() != value.lower():
+                    return True
+    return False
+
+
+def contradicted_fields(reply: str, quotation_data: Dict, known_cities: Dict[str, str] = None) -> Set[str]:
+    """Campos cuyo valor en la respuesta no coincide con quotation_data"""
+    reply_lower = (reply or '').lower()
+    fields = set()
+
+    for field, patterns in QUANTITY_PATTERNS.items():
+        collected = quotation_data.get(field)
+        if not collected:
+            continue
+        for pattern, factor in patterns:
+            for match in pattern.finditer(reply_lower):
+                value = float(match.group(1).replace(',', '.')) * factor
+                if abs(value - float(collected)) > 0.01 * float(collected):
+                    fields.add(field)
+
+    if known_cities:
+        labels = {'origen': ('origen', 'desde'), 'destino': ('destino', 'hacia', 'hasta')}
+        for field, words in labels.items():
+            value = quotation_data.get(field)
+            if value and _contradicted_cities(reply_lower, words, value, known_cities):
+                fields.add(field)
+
+    return fields
+
+
+def validate_reply(reply: str, quotation_data: Dict, missing_fields: List[str],
+                   known_cities: Dict[str, str] = None) -> List[str]:
+    """
+    Validar una respuesta de chat. Devuelve la lista de problemas
+    encontrados (vacía si la respuesta es aceptable).
+    """
+    issues = []
+    if not reply or not reply.strip():
+        return ['empty']
+
+    repeated = asks_for_collected(reply, quotation_data)
+    if repeated:
+        issues.append(f"asks_collected:{','.join(sorted(repeated))}")
+
+    if missing_fields and not extract_questions(reply):
+        issues.append('no_question')
+
+    contradicted = contradicted_fields(reply, quotation_data, known_cities)
+    if contradicted:
+        issues.append(f"contradicts:{','.join(sorted(contradicted))}")
+
+    if LOW_CONFIDENCE_PATTERN.search(reply.lower()):
+        issues.append('low_confidence')
+
+    return issues
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Segmentación offline de una ruta por países
+Los polígonos simplificados de cada país se rasterizan una sola vez en una
+rejilla uniforme (GRID_STEP grados); clasificar los puntos de una polyline es
+indexar la rejilla con NumPy, sin red. Devuelve los países en orden de paso y
+los km recorridos en cada uno.
+"""
+
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from polyline_utils import haversine_km
+
+GRID_STEP = 0.1
+GRID_LAT = (35.5, 56.0)
+GRID_LON = (-10.0, 24.5)
+# Celdas de mar/costa junto a un país que se le asignan (≈ 30 km)
+COAST_FILL_CELLS = 3
+# Distancia entre puntos al densificar una ruta en línea recta
+DENSIFY_KM = 5.0
+# Recorrido por carretera frente a la distancia en línea recta
+ROAD_DETOUR_FACTOR = 1.2
+
+# Polígonos muy simplificados (lon, lat). Las fronteras comparten vértices;
+# en los solapes gana el primero en COUNTRY_PRIORITY.
+COUNTRY_POLYGONS = {
+    'ES': [(-9.3, 43.0), (-8.0, 43.7), (-5.8, 43.6), (-3.8, 43.5), (-1.8, 43.4), (-1.4, 43.05),
+           (-0.7, 42.8), (0.7, 42.8), (1.7, 42.5), (3.2, 42.4), (3.2, 41.9), (2.2, 41.3), (0.9, 41.0),
+           (0.0, 40.0), (-0.3, 39.4), (0.2, 38.8), (-0.5, 38.3), (-0.8, 37.6), (-2.0, 36.7),
+           (-4.4, 36.7), (-5.6, 36.0), (-6.3, 36.5), (-7.4, 37.2), (-7.5, 37.6), (-7.0, 38.2),
+           (-7.3, 38.8), (-7.0, 39.7), (-6.9, 40.2), (-6.9, 41.0), (-6.2, 41.6), (-6.6, 41.9),
+           (-7.2, 41.9), (-8.1, 41.8), (-8.9, 41.9), (-8.9, 42.2)],
+    'PT': [(-8.9, 41.9), (-8.1, 41.8), (-7.2, 41.9), (-6.6, 41.9), (-6.2, 41.6), (-6.9, 41.0),
+           (-6.9, 40.2), (-7.0, 39.7), (-7.3, 38.8), (-7.0, 38.2), (-7.5, 37.6), (-7.4, 37.2),
+           (-8.0, 37.0), (-9.0, 37.0), (-8.8, 38.5), (-9.5, 38.7), (-9.3, 39.4), (-8.9, 40.2),
+           (-8.7, 41.2)],
+    'FR': [(-1.8, 43.4), (-1.3, 44.5), (-1.2, 46.2), (-2.2, 47.1), (-4.4, 47.9), (-4.8, 48.4),
+           (-3.0, 48.8), (-1.6, 48.7), (-1.9, 49.7), (-1.2, 49.4), (0.2, 49.5), (1.5, 50.2),
+           (1.6, 50.9), (2.55, 51.09), (2.6, 50.8), (3.2, 50.7), (4.2, 50.3), (4.8, 50.1), (4.9, 49.8),
+           (5.8, 49.5), (6.4, 49.45), (7.0, 49.2), (8.2, 49.0), (7.8, 48.5), (7.6, 47.6), (7.0, 47.4),
+           (6.1, 46.6), (6.0, 46.15), (6.8, 46.15), (7.0, 45.9), (6.8, 45.2), (7.1, 44.8), (6.9, 44.4),
+           (7.5, 43.8), (7.27, 43.7), (6.9, 43.5), (6.0, 43.1), (5.0, 43.3), (4.6, 43.4), (3.5, 43.3),
+           (3.05, 42.5), (3.2, 42.4), (1.7, 42.5), (0.7, 42.8), (-0.7, 42.8), (-1.4, 43.05)],
+    'IT': [(7.5, 43.8), (6.9, 44.4), (7.1, 44.8), (6.8, 45.2), (7.0, 45.9), (7.9, 45.95), (8.4, 46.45),
+           (9.0, 45.85), (10.1, 46.25), (10.45, 46.9), (11.0, 46.8), (12.2, 47.05), (12.4, 46.7),
+           (13.7, 46.5), (13.6, 45.8), (13.8, 45.6), (12.3, 45.3), (12.4, 44.2), (13.6, 43.5),
+           (14.3, 42.5), (16.2, 41.9), (16.9, 41.1), (18.5, 40.1), (17.2, 40.4), (16.5, 39.7),
+           (17.1, 39.0), (16.6, 38.4), (15.6, 38.0), (15.6, 40.1), (14.3, 40.8), (13.0, 41.2),
+           (12.2, 41.8), (10.5, 42.9), (10.2, 43.9), (9.8, 44.1), (8.9, 44.4), (8.2, 43.9)],
+    'CH': [(6.0, 46.15), (6.1, 46.6), (7.0, 47.4), (7.6, 47.6), (8.6, 47.65), (9.6, 47.55),
+           (9.6, 47.05), (10.45, 46.9), (10.1, 46.25), (9.0, 45.85), (8.4, 46.45), (7.9, 45.95),
+           (7.0, 45.9), (6.8, 46.15)],
+    'AT': [(9.6, 47.55), (12.9, 47.7), (13.0, 48.2), (13.45, 48.55), (13.8, 48.75), (14.7, 48.6),
+           (14.95, 49.0), (16.1, 48.75), (16.9, 48.6), (17.15, 48.0), (16.1, 46.85), (14.5, 46.4),
+           (13.7, 46.5), (12.4, 46.7), (12.2, 47.05), (11.0, 46.8), (10.45, 46.9), (9.6, 47.05)],
+    'DE': [(6.4, 49.45), (7.0, 49.2), (8.2, 49.0), (7.8, 48.5), (7.6, 47.6), (8.6, 47.65), (9.6, 47.55),
+           (12.9, 47.7), (13.0, 48.2), (13.45, 48.55), (13.8, 48.75), (12.45, 49.7), (12.1, 50.3),
+           (14.3, 51.05), (14.8, 50.87), (15.0, 51.2), (14.7, 52.1), (14.6, 52.6), (14.2, 53.3),
+           (14.2, 53.9), (12.5, 54.5), (11.0, 54.0), (10.1, 54.4), (9.9, 54.8), (8.7, 54.9),
+           (8.6, 54.3), (8.9, 53.9), (7.2, 53.5), (7.2, 53.2), (7.05, 52.25), (6.8, 51.95),
+           (5.95, 51.85), (6.2, 51.4), (6.1, 51.2), (6.0, 50.75), (6.4, 50.3), (6.1, 50.15), (6.5, 49.8)],
+    'LU': [(5.75, 49.5), (6.4, 49.45), (6.5, 49.8), (6.1, 50.15), (5.75, 49.9)],
+    'BE': [(2.55, 51.09), (3.37, 51.37), (4.25, 51.37), (5.0, 51.45), (5.85, 51.15), (5.7, 50.75),
+           (6.0, 50.75), (6.4, 50.3), (6.1, 50.15), (5.75, 49.9), (5.75, 49.5), (4.9, 49.8), (4.8, 50.1),
+           (4.2, 50.3), (3.2, 50.7), (2.6, 50.8)],
+    'NL': [(3.37, 51.37), (4.25, 51.37), (5.0, 51.45), (5.85, 51.15), (5.7, 50.75), (6.0, 50.75),
+           (6.1, 51.2), (6.2, 51.4), (5.95, 51.85), (6.8, 51.95), (7.05, 52.25), (7.2, 53.2),
+           (6.9, 53.45), (5.0, 53.4), (4.7, 52.95), (4.4, 52.2), (4.0, 51.95)],
+    'CZ': [(12.1, 50.3), (12.45, 49.7), (13.8, 48.75), (14.7, 48.6), (14.95, 49.0), (16.1, 48.75),
+           (16.9, 48.6), (17.8, 48.9), (18.85, 49.5), (18.5, 49.9), (17.6, 50.25), (16.9, 50.45),
+           (16.2, 50.65), (14.8, 50.87), (14.3, 51.05)],
+    'PL': [(14.2, 53.9), (14.2, 53.3), (14.6, 52.6), (14.7, 52.1), (15.0, 51.2), (14.8, 50.87),
+           (16.2, 50.65), (16.9, 50.45), (17.6, 50.25), (18.5, 49.9), (18.85, 49.5), (20.0, 49.2),
+           (22.6, 49.1), (24.1, 50.5), (23.6, 51.5), (23.2, 52.3), (23.9, 53.0), (23.5, 54.2),
+           (22.8, 54.4), (19.6, 54.45), (18.6, 54.4), (16.5, 54.55)],
+}
+COUNTRY_PRIORITY = ('LU', 'CH', 'BE', 'NL', 'AT', 'CZ', 'PT', 'IT', 'PL', 'DE', 'FR', 'ES')
+COUNTRY_CODES = np.array(COUNTRY_PRIORITY)
+
+# Coordenadas (lat, lon) de las ciudades de origen y destino habituales
+CITY_COORDINATES = {
+    'madrid': (40.42, -3.70), 'barcelona': (41.39, 2.17), 'valencia': (39.47, -0.38),
+    'sevilla': (37.39, -5.98), 'bilbao': (43.26, -2.93), 'zaragoza': (41.65, -0.89),
+    'malaga': (36.72, -4.42), 'alicante': (38.35, -0.48), 'murcia': (37.99, -1.13),
+    'valladolid': (41.65, -4.72), 'vigo': (42.24, -8.72), 'coruna': (43.36, -8.41),
+    'paris': (48.86, 2.35), 'lyon': (45.76, 4.84), 'marsella': (43.30, 5.37), 'toulouse': (43.60, 1.44),
+    'niza': (43.70, 7.27), 'burdeos': (44.84, -0.58),
+    'berlin': (52.52, 13.40), 'munich': (48.14, 11.58), 'hamburgo': (53.55, 9.99),
+    'frankfurt': (50.11, 8.68), 'colonia': (50.94, 6.96), 'stuttgart': (48.78, 9.18),
+    'roma': (41.90, 12.50), 'milan': (45.46, 9.19), 'napoles': (40.85, 14.27), 'turin': (45.07, 7.69),
+    'florencia': (43.77, 11.26), 'venecia': (45.44, 12.32),
+    'amsterdam': (52.37, 4.90), 'roterdam': (51.92, 4.48), 'la haya': (52.08, 4.30), 'utrecht': (52.09, 5.12),
+    'bruselas': (50.85, 4.35), 'amberes': (51.22, 4.40), 'gante': (51.05, 3.72), 'brujas': (51.21, 3.22),
+    'zurich': (47.38, 8.54), 'ginebra': (46.20, 6.14), 'berna': (46.95, 7.45), 'basilea': (47.56, 7.59),
+    'viena': (48.21, 16.37), 'salzburgo': (47.81, 13.04), 'innsbruck': (47.27, 11.40), 'graz': (47.07, 15.44),
+    'lisboa': (38.72, -9.14), 'oporto': (41.15, -8.61), 'braga': (41.55, -8.42), 'coimbra': (40.21, -8.43),
+    'praga': (50.08, 14.44), 'brno': (49.20, 16.61), 'ostrava': (49.82, 18.26),
+    'varsovia': (52.23, 21.01), 'cracovia': (50.06, 19.94), 'gdansk': (54.35, 18.65), 'wroclaw': (51.11, 17.03),
+}
+
+# Pasos fronterizos para salir de la península: La Jonquera hacia el este, Irún hacia el norte;
+# después Ventimiglia hacia Italia por la costa y Lyon-Estrasburgo hacia Europa central (sin cruzar Suiza)
+IBERIA = ('ES', 'PT')
+CENTRAL_EUROPE = ('DE', 'AT', 'CZ', 'PL')
+BORDER_WAYPOINTS = {'east': (42.42, 2.87), 'north': (43.34, -1.79)}
+CORRIDOR_WAYPOINTS = {'italy': [(43.79, 7.53)], 'central': [(45.76, 4.84), (48.58, 7.75)]}
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c)).replace('ł', 'l')
+
+
+def city_coordinates(place: str) -> Optional[tuple]:
+    """(lat, lon) de la ciudad mencionada en el texto; la coincidencia más larga gana"""
+    if not place:
+        return None
+    text = _normalize(place)
+    for city in sorted(CITY_COORDINATES, key=len, reverse=True):
+        if city in text:
+            return CITY_COORDINATES[city]
+    return None
+
+
+def _points_in_polygon(lon: np.ndarray, lat: np.ndarray, polygon: List[tuple]) -> np.ndarray:
+    """Regla par-impar vectorizada sobre todos los puntos"""
+    xs, ys = np.array(polygon).T
+    inside = np.zeros(lon.shape, dtype=bool)
+    for x1, y1, x2, y2 in zip(xs, ys, np.roll(xs, -1), np.roll(ys, -1)):
+        if y1 == y2:
+            continue
+        crosses = (y1 > lat) != (y2 > lat)
+        inside ^= crosses & (lon < (x2 - x1) * (lat - y1) / (y2 - y1) + x1)
+    return inside
+
+
+class CountryGrid:
+    def __init__(self, polygons: Dict[str, List[tuple]] = None, step: float = GRID_STEP):
+        self.step = step
+        polygons = polygons or COUNTRY_POLYGONS
+        lats = np.arange(GRID_LAT[0], GRID_LAT[1], step) + step / 2
+        lons = np.arange(GRID_LON[0], GRID_LON[1], step) + step / 2
+        lon_grid, lat_grid = np.meshgrid(lons, lats)
+
+        # -1 = fuera de los países conocidos; si no, índice en COUNTRY_CODES
+        grid = np.full(lon_grid.shape, -1, dtype=np.int8)
+        for code_index, country in enumerate(COUNTRY_PRIORITY):
+            xs, ys = np.array(polygons[country]).T
+            in_bbox = (lon_grid >= xs.min()) & (lon_grid <= xs.max()) & \
+                      (lat_grid >= ys.min()) & (lat_grid <= ys.max()) & (grid < 0)
+            inside = _points_in_polygon(lon_grid[in_bbox], lat_grid[in_bbox], polygons[country])
+            cells = np.flatnonzero(in_bbox)[inside]
+            grid.flat[cells] = code_index
+
+        for _ in range(COAST_FILL_CELLS):
+            padded = np.pad(grid, 1, constant_values=-1)
+            for neighbour in (padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]):
+                grid = np.where((grid < 0) & (neighbour >= 0), neighbour, grid)
+        self.grid = grid
+
+    def classify(self, coords: np.ndarray) -> np.ndarray:
+        """Índice de país (en COUNTRY_CODES) de cada punto [lat, lon]; -1 si es desconocido"""
+        rows = np.floor((coords[:, 0] - GRID_LAT[0]) / self.step).astype(np.int64)
+        cols = np.floor((coords[:, 1] - GRID_LON[0]) / self.step).astype(np.int64)
+        valid = (rows >= 0) & (rows < self.grid.shape[0]) & (cols >= 0) & (cols < self.grid.shape[1])
+        codes = np.full(len(coords), -1, dtype=np.int8)
+        codes[valid] = self.grid[rows[valid], cols[valid]]
+        return codes
+
+    def country_km(self, coords: np.ndarray) -> Dict[str, float]:
+        """Km por país en orden de paso; los tramos sin país se suman al anterior"""
+        if len(coords) < 2:
+            return {}
+        codes = self.classify(coords)
+        known = np.flatnonzero(codes >= 0)
+        if not known.size:
+            return {}
+        # Rellenar huecos con el último país conocido (o el primero, al principio)
+        last_known = np.maximum.accumulate(np.where(codes >= 0, np.arange(len(codes)), -1))
+        codes = codes[np.where(last_known >= 0, last_known, known[0])][:-1]
+
+        km = np.bincount(codes, weights=haversine_km(coords), minlength=len(COUNTRY_CODES))
+        _, first_seen = np.unique(codes, return_index=True)
+        order = codes[np.sort(first_seen)]
+        return {str(COUNTRY_CODES[code]): round(float(km[code]), 1) for code in order}
+
+    def country_of(self, lat: float, lon: float) -> Optional[str]:
+        code = self.classify(np.array([[lat, lon]]))[0]
+        return str(COUNTRY_CODES[code]) if code >= 0 else None
+
+
+_grid: Optional[CountryGrid] = None
+_grid_lock = threading.Lock()
+
+
+def get_country_grid() -> CountryGrid:
+    """Rejilla compartida, construida en el primer uso"""
+    global _grid
+    if _grid is None:
+        with _grid_lock:
+            if _grid is None:
+                _grid = CountryGrid()
+    return _grid
+
+
+def densify(points: List[tuple], step_km: float = DENSIFY_KM) -> np.ndarray:
+    """Tramos rectos entre los puntos dados con un punto cada step_km"""
+    points = np.asarray(points, dtype=np.float64)
+    pieces = []
+    for start, end, length in zip(points[:-1], points[1:], haversine_km(points)):
+        steps = max(int(np.ceil(length / step_km)), 1)
+        pieces.append(start + np.linspace(0, 1, steps, endpoint=False)[:, None] * (end - start))
+    pieces.append(points[-1:])
+    return np.vstack(pieces)
+
+
+def fallback_path(origin: str, destination: str) -> Optional[np.ndarray]:
+    """Trazado aproximado (línea recta por los pasos fronterizos) entre dos ciudades conocidas"""
+    start, end = city_coordinates(origin), city_coordinates(destination)
+    if not start or not end:
+        return None
+    grid = get_country_grid()
+    start_country, end_country = grid.country_of(*start), grid.country_of(*end)
+
+    points = [start]
+    if start_country in IBERIA and end_country not in IBERIA:
+        points.append(BORDER_WAYPOINTS['east'] if end[1] > BORDER_WAYPOINTS['east'][1]
+                      else BORDER_WAYPOINTS['north'])
+        if end_country == 'IT':
+            points += CORRIDOR_WAYPOINTS['italy']
+        elif end_country in CENTRAL_EUROPE and end[1] > CORRIDOR_WAYPOINTS['central'][-1][1]:
+            points += CORRIDOR_WAYPOINTS['central']
+    points.append(end)
+    return densify(points)
+
+
+def scale_country_km(country_km: Dict[str, float], total_km: float) -> Dict[str, float]:
+    """Reparte total_km (distancia por carretera) en la proporción de country_km"""
+    measured = sum(country_km.values())
+    if not measured:
+        return {}
+    return {country: round(km * total_km / measured, 1) for country, km in country_km.items()}
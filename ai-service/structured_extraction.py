@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Extracción estructurada de datos de cotización en la misma llamada a Claude
+Define la herramienta (tool use) con el esquema de los siete campos
+obligatorios y valida los valores que devuelve el modelo antes de
+mezclarlos con los datos de la sesión.
+"""
+
+import unicodedata
+from datetime import date, timedelta
+from typing import Dict
+
+from loguru import logger
+
+from quote_parser import parse_number, parse_pickup_date
+from route_countries import CITY_COORDINATES
+
+QUOTATION_TOOL_NAME = 'registrar_datos_cotizacion'
+
+CARGO_TYPES = ('general', 'forestales', 'adr', 'refrigerado', 'especial')
+SERVICE_TYPES = ('economico', 'estandar', 'express')
+
+# Límites razonables para transporte por carretera (camión completo)
+MAX_WEIGHT_KG = 40000
+MAX_VOLUME_M3 = 120
+MAX_DAYS_AHEAD = 365
+
+QUOTATION_TOOL = {
+    "name": QUOTATION_TOOL_NAME,
+    "description": (
+        "Registra los datos de la cotización que el usuario ha dado en la conversación. "
+        "Incluye sólo los campos que el usuario haya indicado de forma explícita; no inventes valores. "
+        "Llama a esta herramienta además de responder al usuario con texto, nunca en su lugar."
+    ),
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "origen": {"type": "string", "description": "Ciudad de recogida"},
+            "destino": {"type": "string", "description": "Ciudad de entrega"},
+            "peso_kg": {"type": "number", "description": "Peso total en kg"},
+            "volumen_m3": {"type": "number", "description": "Volumen total en m³"},
+            "tipo_carga": {"type": "string", "enum": list(CARGO_TYPES)},
+            "fecha_recogida": {"type": "string", "description": "Fecha de recogida en formato YYYY-MM-DD"},
+            "tipo_servicio": {"type": "string", "enum": list(SERVICE_TYPES)},
+        },
+        "additionalProperties": False
+    }
+}
+
+
+def _plain(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.strip().lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _city(value, known_cities: Dict[str, str]):
+    """Sólo ciudades de la tabla del handler o de las coordenadas de rutas; el resto se pregunta"""
+    if not isinstance(value, str):
+        return None
+    plain = _plain(value)
+    for key, name in known_cities.items():
+        if _plain(key) == plain:
+            return name
+    return value.strip().title() if plain in CITY_COORDINATES else None
+
+
+def _positive(value, upper: float):
+    number = parse_number(value) if isinstance(value, str) else value
+    if isinstance(number, bool) or not isinstance(number, (int, float)):
+        return None
+    return float(number) if 0 < number <= upper else None
+
+
+def _pickup_date(value, today: date):
+    if not isinstance(value, str):
+        return None
+    parsed = parse_pickup_date(value, today=today, expects_date=True)
+    if not parsed:
+        return None
+    pickup = date.fromisoformat(parsed)
+    return parsed if today <= pickup <= today + timedelta(days=MAX_DAYS_AHEAD) else None
+
+
+def validate_structured_fields(raw: Dict, known_cities: Dict[str, str] = None, today: date = None) -> Dict:
+    """
+    Validar los campos devueltos por la herramienta.
+    Devuelve sólo los valores válidos, normalizados al formato de quotation_data.
+    """
+    if not isinstance(raw, dict):
+        return {}
+    known_cities = known_cities or {}
+    today = today or date.today()
+
+    validators = {
+        'origen': lambda v: _city(v, known_cities),
+        'destino': lambda v: _city(v, known_cities),
+        'peso_kg': lambda v: _positive(v, MAX_WEIGHT_KG),
+        'volumen_m3': lambda v: _positive(v, MAX_VOLUME_M3),
+        'tipo_carga': lambda v: v if v in CARGO_TYPES else None,
+        'fecha_recogida': lambda v: _pickup_date(v, today),
+        'tipo_servicio': lambda v: v if v in SERVICE_TYPES else None,
+    }
+
+    fields = {}
+    for field, value in raw.items():
+        validator = validators.get(field)
+        if validator is None or value in (None, ''):
+            continue
+        cleaned = validator(value)
+        if cleaned is None:
+            logger.debug(f"Campo estructurado descartado: {field}={value!r}")
+            continue
+        fields[field] = cleaned
+    return fields
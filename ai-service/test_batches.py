@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test del modo batch de análisis de transportistas contra el servidor local
+"""
+
+import sys
+import os
+import asyncio
+
+import httpx
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from batch_stub_server import create_app
+from claude_batches import BatchAnalysisRunner, ClaudeBatchClient
+from claude_handler import LUC1ClaudeHandler
+
+
+def _make_runner(max_requests_per_batch=2, polls_until_ended=2, poll_seconds=0, app=None):
+    client = ClaudeBatchClient(
+        api_key="test",
+        api_url="http://batch-stub/v1/messages/batches",
+        transport=httpx.ASGITransport(app=app or create_app(polls_until_ended=polls_until_ended))
+    )
+    return BatchAnalysisRunner(
+        LUC1ClaudeHandler(),
+        client=client,
+        poll_seconds=poll_seconds,
+        max_requests_per_batch=max_requests_per_batch
+    )
+
+
+def _analyses(n):
+    return [
+        {'prompt': f"Analiza ofertas para la cotización {i}", 'sessionId': f"quote-{i}", 'context': {'i': i}}
+        for i in range(n)
+    ]
+
+
+async def _collect(runner, analyses):
+    return [result async for result in runner.run(analyses)]
+
+
+def test_batch_analysis():
+    """Cinco análisis repartidos en tres lotes vuelven todos con su sessionId"""
+    results = asyncio.run(_collect(_make_runner(), _analyses(5)))
+
+    print(f"📦 Resultados recibidos: {len(results)}")
+    assert len(results) == 5
+    assert sorted(r['sessionId'] for r in results) == [f"quote-{i}" for i in range(5)]
+    for result in results:
+        assert result['success'], result
+        assert result['mode'] == 'batch'
+        assert 'TRANSPORTISTA_RECOMENDADO' in result['analysis']
+        assert result['context']['i'] == int(result['sessionId'].split('-')[1])
+
+
+def test_batch_empty():
+    """Sin análisis no se crea ningún lote"""
+    assert asyncio.run(_collect(_make_runner(), [])) == []
+
+
+def test_chunks_capped_by_bytes():
+    """Los lotes se trocean también por tamaño en bytes"""
+    runner = _make_runner(max_requests_per_batch=100)
+    items = [{'custom_id': f"analysis-{i}", 'params': {'prompt': 'x' * 1000}} for i in range(10)]
+    runner.max_bytes_per_batch = 3500
+
+    chunks = runner._chunks(items)
+    print(f"📦 Lotes por tamaño: {[len(chunk) for chunk in chunks]}")
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert [item for chunk in chunks for item in chunk] == items
+
+
+def test_disconnect_cancels_batches_upstream():
+    """Si el consumidor se va, los lotes en curso se cancelan también en el API"""
+    app = create_app(polls_until_ended=10_000)
+    runner = _make_runner(poll_seconds=0.01, app=app)
+
+    async def scenario():
+        results = runner.run(_analyses(5))
+        consumer = asyncio.create_task(results.__anext__())
+        while len(app.state.batches) < 3:
+            await asyncio.sleep(0.01)
+        consumer.cancel()
+        try:
+            await consumer
+        except asyncio.CancelledError:
+            pass
+        while runner._cancelling:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    canceled = [batch.get('canceled', False) for batch in app.state.batches.values()]
+    print(f"🛑 Lotes cancelados: {sum(canceled)}/{len(canceled)}")
+    assert len(canceled) == 3 and all(canceled)
+
+
+if __name__ == "__main__":
+    test_batch_analysis()
+    test_batch_empty()
+    test_chunks_capped_by_bytes()
+    test_disconnect_cancels_batches_upstream()
+    print("\n✅ Modo batch probado exitosamente!")
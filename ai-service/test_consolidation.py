@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test del optimizador de consolidación de envíos
+"""
+
+import sys
+import os
+import asyncio
+import itertools
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import numpy as np
+
+from consolidation import ConsolidationOptimizer, _road_km, order_stops
+from route_countries import CITY_COORDINATES
+
+DAY = '2025-03-11'
+
+
+def _shipment(id, destination, weight_kg, pallets, pickup_date=DAY):
+    return {'id': id, 'destination': destination, 'weight_kg': weight_kg, 'pallets': pallets,
+            'pickup_date': pickup_date}
+
+
+def test_same_corridor_shares_truck():
+    """Tres cargas parciales hacia Francia van en un camión; Lisboa (otro corredor) va sola"""
+    result = ConsolidationOptimizer().optimize([
+        _shipment('a', 'París', 3000, 6), _shipment('b', 'Burdeos', 2000, 4),
+        _shipment('c', 'Lyon', 1000, 2), _shipment('d', 'Lisboa', 1000, 2),
+        _shipment('e', 'Atlántida', 1000, 2)])
+    print(f"🚛 {result['camiones_consolidados']} camiones, ahorro {result['ahorro_eur']} EUR "
+          f"({result['ahorro_pct']}%)")
+
+    trucks = {tuple(sorted(truck['envios'])): truck for truck in result['camiones']}
+    assert set(trucks) == {('a', 'b', 'c'), ('d',)}
+    france = trucks[('a', 'b', 'c')]
+    assert france['paradas'][0] == 'Burdeos' and france['vehiculo'] == 'rigid'
+    assert result['sin_ubicar'] == ['e']
+    assert result['camiones_individuales'] == 4 and result['ahorro_eur'] > 0
+    assert result['costo_consolidado_eur'] < result['costo_individual_eur']
+
+
+def test_capacity_and_date_window():
+    """El peso y la ventana de fechas separan camiones"""
+    heavy = [_shipment(str(i), 'Múnich', 10000, 10) for i in range(3)]
+    result = ConsolidationOptimizer().optimize(heavy)
+    assert result['camiones_consolidados'] == 2
+
+    spread = [_shipment('x', 'París', 1000, 2, '2025-03-11'), _shipment('y', 'París', 1000, 2, '2025-03-12')]
+    assert ConsolidationOptimizer().optimize(spread)['camiones_consolidados'] == 2
+    assert ConsolidationOptimizer().optimize(spread, window_days=2)['camiones_consolidados'] == 1
+
+
+def test_stop_order_matches_brute_force():
+    """Inserción + 2-opt encuentra el mejor orden en rutas pequeñas"""
+    names = ['paris', 'lyon', 'burdeos', 'toulouse', 'bruselas', 'amsterdam']
+    stops = np.array([CITY_COORDINATES[name] for name in names])
+    origin = np.array(CITY_COORDINATES['madrid'])
+    order, km = order_stops(origin, stops)
+
+    points = np.vstack((origin, stops))
+    dist = _road_km(points[:, None], points[None, :])
+    best = min(sum(dist[a, b] for a, b in zip((0,) + p, p))
+               for p in itertools.permutations(range(1, len(points))))
+    assert sorted(order) == list(range(len(names)))
+    assert km <= best * 1.02
+
+
+def test_hundreds_of_shipments():
+    """Cientos de envíos en bastante menos de un segundo"""
+    rng = np.random.default_rng(11)
+    cities = ['París', 'Lyon', 'Burdeos', 'Múnich', 'Milán', 'Lisboa', 'Bruselas', 'Varsovia', 'Viena']
+    shipments = [_shipment(f'Q{i}', rng.choice(cities), float(rng.uniform(200, 8000)), int(rng.integers(1, 12)))
+                 for i in range(500)]
+    started = time.monotonic()
+    result = ConsolidationOptimizer().optimize(shipments)
+    assert time.monotonic() - started < 2
+    assert sorted(e for truck in result['camiones'] for e in truck['envios']) == sorted(s['id'] for s in shipments)
+    assert result['camiones_consolidados'] < 500 and result['ahorro_pct'] > 0
+
+
+def test_consolidate_endpoint():
+    """luci_server expone la consolidación por lotes"""
+    import luci_server
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            ok = await client.post("/quotes/consolidate", json={'shipments': [
+                _shipment('a', 'París', 3000, 6), _shipment('b', 'Lyon', 1000, 2)]})
+            bad = [await client.post("/quotes/consolidate", json={'shipments': shipments}) for shipments in (
+                [{'id': 'a'}],
+                [_shipment('a', 'París', 3000, 6, pickup_date='20/10/2026')],
+                [_shipment('a', 'París', 3000, 6, pickup_date='2026-10-20T08:00:00')])]
+        return ok.json(), [response.status_code for response in bad]
+
+    ok, bad_status = asyncio.run(scenario())
+    assert ok['success'] and ok['camiones_consolidados'] == 1
+    assert bad_status == [422, 422, 422]
+
+
+if __name__ == "__main__":
+    test_same_corridor_shares_truck()
+    test_capacity_and_date_window()
+    test_stop_order_matches_brute_force()
+    test_hundreds_of_shipments()
+    test_consolidate_endpoint()
+    print("✅ Consolidación de envíos OK")
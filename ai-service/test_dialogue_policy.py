@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test de la política de diálogo (turnos resueltos sin llamar a Claude)
+"""
+
+import sys
+import os
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from claude_handler import DialoguePolicy, LUC1ClaudeHandler
+
+
+def _handler_without_claude():
+    handler = LUC1ClaudeHandler()
+    handler.claude_calls = 0
+
+    def fake_call(*args, **kwargs):
+        handler.claude_calls += 1
+        return "¿En qué puedo ayudarte?"
+
+    handler.call_claude_api = fake_call
+    return handler
+
+
+def test_routine_turns_skip_claude():
+    """Las respuestas directas a la pregunta pendiente no llaman a Claude"""
+    handler = _handler_without_claude()
+    handler.generate_response("hola", "s")
+    assert handler.claude_calls == 1
+
+    response = handler.generate_response("Madrid a París", "s")
+    print(f"🤖 {response}")
+    assert "peso" in response.lower()
+
+    response = handler.generate_response("1500 kg", "s")
+    assert "volumen" in response.lower()
+    assert handler.claude_calls == 1
+
+
+def test_open_ended_goes_to_claude():
+    """Las preguntas del usuario siguen yendo al modelo"""
+    handler = _handler_without_claude()
+    handler.generate_response("Madrid a París", "s")
+    handler.generate_response("¿qué incluye el seguro?", "s")
+    assert handler.claude_calls == 1
+
+
+def test_confirmation_to_pending_question():
+    """Un "ok" a una pregunta por un dato que falta es ambiguo"""
+    policy = DialoguePolicy(LUC1ClaudeHandler().required_fields)
+    missing = ['peso_kg', 'volumen_m3']
+    assert policy.respond("ok", {}, {}, missing, "¿Cuál es el peso total?") is None
+    assert policy.respond("sí", {}, {'origen': 'Madrid'}, missing, "¿Confirmas origen Madrid?") \
+        == DialoguePolicy.QUESTION_TEMPLATES['peso_kg']
+
+
+if __name__ == "__main__":
+    test_routine_turns_skip_claude()
+    test_open_ended_goes_to_claude()
+    test_confirmation_to_pending_question()
+    print("\n✅ Política de diálogo probada exitosamente!")
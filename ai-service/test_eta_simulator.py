@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test del simulador de ETA con tiempos de conducción 561/2006
+"""
+
+import sys
+import os
+import time
+from datetime import datetime
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from eta_simulator import EtaSimulator, departure, incident_bans
+from european_logistics import EuropeanLogisticsService
+
+SIMULATOR = EtaSimulator()
+# Martes laborable, ruta sin prohibiciones (España)
+TUESDAY = departure('2025-03-11')
+
+
+def test_breaks_and_daily_rest():
+    """Un conductor para cada 4,5 h y descansa 11 h; con doble conductor no hay pausas"""
+    result = SIMULATOR.simulate(900, TUESDAY, [0, 1, 2], {'ES': 900}, speed_kmh=75)
+    print(f"⏱️  horas por nivel: {result['hours']}")
+    # Económico: 4,5 + 0,75 + 4,5 + 11 de descanso + 3 h (la pausa cae justo después de 4,5 h)
+    assert list(result['hours']) == [23.75, 23.75, 12.0]
+    assert str(result['arrival'][2]) == '2025-03-11T20:00'
+    assert not result['ban_wait_hours'].any()
+
+    # La ampliación a 10 h del estándar evita un descanso diario
+    result = SIMULATOR.simulate(740, TUESDAY, [0, 1], {'ES': 740}, speed_kmh=74)
+    assert result['hours'][1] < result['hours'][0]
+
+
+def test_weekly_rest():
+    """Agotadas las 56 h semanales, descanso de 45 h"""
+    short, long = SIMULATOR.simulate([3900, 4300], TUESDAY, 0, {'ES': 1}, speed_kmh=70)['hours']
+    assert long - short > 45
+
+
+def test_country_bans_on_the_way():
+    """El tramo alemán de un sábado espera al final de la prohibición del domingo"""
+    saturday = departure('2025-03-08')
+    result = SIMULATOR.simulate(900, saturday, 1, {'FR': 450, 'DE': 450}, speed_kmh=75)
+    assert result['ban_wait_hours'][0] == 17.25
+    assert str(result['arrival'][0]) == '2025-03-10T01:00'
+
+    # Las furgonetas no tienen prohibiciones; una incidencia en vivo bloquea su día
+    assert SIMULATOR.simulate(900, saturday, 1, {'FR': 450, 'DE': 450}, speed_kmh=75,
+                              heavy=False)['ban_wait_hours'][0] == 0
+    closure = incident_bans([{'severity': 'critical', 'country': 'ES', 'date': '2025-03-11'}])
+    assert closure == [('ES', datetime(2025, 3, 11), datetime(2025, 3, 12))]
+    blocked = SIMULATOR.simulate(300, TUESDAY, 2, {'ES': 300}, extra_bans=closure)
+    assert str(blocked['arrival'][0]) == '2025-03-12T04:30'
+
+
+def test_batch_matches_single_runs():
+    """Miles de combinaciones a la vez dan lo mismo que simularlas una a una"""
+    rng = np.random.default_rng(3)
+    distances = rng.uniform(100, 3000, 3000)
+    starts = departure('2025-03-03') + rng.integers(0, 14, 3000) * np.timedelta64(1, 'D')
+    levels = rng.integers(0, 3, 3000)
+    route = {'ES': 300, 'FR': 900, 'DE': 600}
+
+    started = time.monotonic()
+    batch = SIMULATOR.simulate(distances, starts, levels, route)
+    print(f"⚡ {len(distances)} combinaciones en {(time.monotonic() - started) * 1000:.0f} ms")
+
+    for i in rng.integers(0, 3000, 20):
+        single = SIMULATOR.simulate(distances[i], starts[i], levels[i], route)
+        assert single['hours'][0] == batch['hours'][i]
+        assert single['arrival'][0] == batch['arrival'][i]
+
+
+def test_quote_levels_use_simulation():
+    """La cotización toma plazo y llegada de la simulación de cada nivel"""
+    service = EuropeanLogisticsService()
+    route = {'distance_km': 900.0, 'duration_hours': 12.0, 'countries': ['ES'], 'success': True}
+    empty = {'restrictions': [], 'holidays': [], 'critical_alerts': 0}
+    quote = service.generate_european_quote(
+        {'destination': 'Barcelona', 'weight_kg': 15000, 'pickup_date': '2025-03-11'},
+        prefetched={'route': route, 'tolls': {'total_cost': 0, 'success': True}, 'restrictions': empty})
+
+    levels = quote['niveles_servicio']
+    assert [levels[level]['tiempo_estimado_dias'] for level in ('economico', 'estandar', 'express')] == [1, 1, 1]
+    assert levels['express']['llegada_estimada'] == '2025-03-11 20:00'
+    assert quote['llegada_estimada'] == levels['estandar']['llegada_estimada']
+
+
+def test_incident_dates_parsed_defensively():
+    """Fechas con hora del backend valen; las que no se entienden se ignoran sin tumbar la cotización"""
+    closures = incident_bans([
+        {'severity': 'critical', 'country': 'ES', 'date': '2025-03-11T00:00:00Z'},
+        {'severity': 'critical', 'country': 'FR', 'date': '11/03/2025'},
+        {'severity': 'critical', 'country': 'IT', 'date': None},
+    ])
+    assert closures == [('ES', datetime(2025, 3, 11), datetime(2025, 3, 12))]
+
+    service = EuropeanLogisticsService()
+    route = {'distance_km': 900.0, 'duration_hours': 12.0, 'countries': ['ES'], 'success': True}
+    alerts = [{'type': 'road_closure', 'severity': 'critical', 'country': 'ES', 'date': '2025-03-12T00:00:00Z'},
+              {'type': 'road_closure', 'severity': 'critical', 'country': 'ES', 'date': 'mañana'}]
+    quote = service.generate_european_quote(
+        {'destination': 'Barcelona', 'weight_kg': 15000, 'pickup_date': '2025-03-11'},
+        prefetched={'route': route, 'tolls': {'total_cost': 0, 'success': True},
+                    'restrictions': {'restrictions': alerts, 'holidays': [], 'critical_alerts': 2}})
+    assert quote is not None
+
+
+if __name__ == "__main__":
+    test_breaks_and_daily_rest()
+    test_weekly_rest()
+    test_country_bans_on_the_way()
+    test_batch_matches_single_runs()
+    test_quote_levels_use_simulation()
+    test_incident_dates_parsed_defensively()
+    print("✅ Simulador de ETA 561/2006 OK")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test del gobernador de llamadas a Claude (cola, reintentos y circuit breaker)
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from claude_governor import ClaudeGovernor, GovernorTimeout, PRIORITY_BATCH, PRIORITY_CHAT
+from claude_hedging import HedgeCancelled
+from timeout_policy import request_deadline
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def test_chat_jumps_batch_queue():
+    """Con el único slot ocupado, el chat pasa por delante de los análisis en cola"""
+    governor = ClaudeGovernor(default_limit=1)
+    order = []
+    release_first = threading.Event()
+
+    def hold():
+        release_first.wait()
+        return 'primero'
+
+    def worker(name, priority):
+        governor.execute(lambda: order.append(name), 'modelo', priority=priority)
+
+    first = threading.Thread(target=lambda: governor.execute(hold, 'modelo'))
+    first.start()
+    time.sleep(0.05)
+
+    batch = threading.Thread(target=worker, args=('batch', PRIORITY_BATCH))
+    batch.start()
+    time.sleep(0.05)
+    chat = threading.Thread(target=worker, args=('chat', PRIORITY_CHAT))
+    chat.start()
+    time.sleep(0.05)
+
+    release_first.set()
+    for thread in (first, batch, chat):
+        thread.join(timeout=2)
+
+    print(f"📋 Orden de ejecución: {order}")
+    assert order == ['chat', 'batch']
+
+
+def test_retry_after_is_honored():
+    """Un 429 con retry-after se reintenta después de esperar lo indicado"""
+    governor = ClaudeGovernor(max_retries=2)
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise FakeAPIError(429, retry_after=0.2)
+        return 'ok'
+
+    assert governor.execute(flaky, 'modelo') == 'ok'
+    assert calls[1] - calls[0] >= 0.19
+
+
+def test_breaker_opens_after_failures():
+    """Errores 529 repetidos abren el circuito y las siguientes llamadas fallan rápido"""
+    governor = ClaudeGovernor(max_retries=0, breaker_threshold=2, breaker_reset=60)
+
+    def overloaded():
+        raise FakeAPIError(529)
+
+    for _ in range(2):
+        try:
+            governor.execute(overloaded, 'modelo')
+        except FakeAPIError:
+            pass
+
+    assert governor.breaker('modelo').state == CircuitBreaker.OPEN
+    assert not governor.is_available('modelo')
+    try:
+        governor.execute(lambda: 'ok', 'modelo')
+        assert False, "debería fallar con el circuito abierto"
+    except CircuitOpenError:
+        pass
+
+
+def test_cancelled_probe_frees_half_open_slot():
+    """Una prueba half-open cancelada (hedge perdido) no bloquea el circuito hasta reset_timeout"""
+    governor = ClaudeGovernor(max_retries=0, breaker_threshold=1, breaker_reset=0.05)
+
+    def overloaded():
+        raise FakeAPIError(529)
+
+    try:
+        governor.execute(overloaded, 'modelo')
+    except FakeAPIError:
+        pass
+    time.sleep(0.06)
+
+    def cancelled():
+        raise HedgeCancelled('modelo')
+
+    try:
+        governor.execute(cancelled, 'modelo')
+        assert False, "debía propagarse la cancelación"
+    except HedgeCancelled:
+        pass
+    assert governor.execute(lambda: 'ok', 'modelo') == 'ok'
+    assert governor.breaker('modelo').state == CircuitBreaker.CLOSED
+
+
+def test_retry_after_bounded_by_deadline():
+    """Un retry-after mayor que el plazo restante no se espera; la cola tampoco pasa del plazo"""
+    governor = ClaudeGovernor(max_retries=2)
+
+    def throttled():
+        raise FakeAPIError(429, retry_after=30)
+
+    started = time.monotonic()
+    with request_deadline(0.5):
+        try:
+            governor.execute(throttled, 'modelo')
+            assert False, "debía propagarse el 429"
+        except FakeAPIError:
+            pass
+    assert time.monotonic() - started < 0.2
+
+    busy = ClaudeGovernor(default_limit=1, max_queue_wait=20)
+    busy.acquire('modelo')
+    with request_deadline(0.1):
+        try:
+            busy.execute(lambda: 'ok', 'modelo')
+            assert False, "debía agotar la espera en cola"
+        except GovernorTimeout as e:
+            assert 'tras 0.1s' in str(e)
+
+
+if __name__ == "__main__":
+    test_chat_jumps_batch_queue()
+    test_retry_after_is_honored()
+    test_breaker_opens_after_failures()
+    test_cancelled_probe_frees_half_open_slot()
+    test_retry_after_bounded_by_deadline()
+    print("\n✅ Gobernador probado exitosamente!")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test de hedging de llamadas a Claude con modelos simulados
+"""
+
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from claude_hedging import HedgeBudget, HedgeCancelEvent, HedgeCancelled, HedgedCaller
+
+# Segundos hasta el primer token por modelo simulado
+DELAYS = {'lento': 1.0, 'rapido': 0.01}
+
+
+def fake_call(model, cancel_event, first_byte_event):
+    """Modelo simulado: espera su retardo, emite el primer token y responde"""
+    deadline = time.monotonic() + DELAYS[model]
+    while time.monotonic() < deadline:
+        if cancel_event.is_set():
+            raise HedgeCancelled(model)
+        time.sleep(0.005)
+    first_byte_event.set()
+    return f"respuesta de {model}"
+
+
+def test_hedge_wins_on_slow_primary():
+    """Si el principal no da primer token a tiempo, gana el hedge"""
+    caller = HedgedCaller(default_threshold=0.05, budget=HedgeBudget(ratio=1, burst=1))
+    started = time.monotonic()
+    result = caller.call(fake_call, 'lento', 'rapido')
+    elapsed = time.monotonic() - started
+
+    print(f"⏱️ Respuesta en {elapsed:.2f}s: {result}")
+    assert result == "respuesta de rapido"
+    assert elapsed < 0.5
+    assert caller.stats['hedge_wins'] == 1
+
+
+def test_no_hedge_on_fast_primary():
+    """Un principal rápido no dispara hedge"""
+    caller = HedgedCaller(default_threshold=0.5)
+    assert caller.call(fake_call, 'rapido', 'lento') == "respuesta de rapido"
+    assert caller.stats['hedges'] == 0
+
+
+def test_budget_limits_hedges():
+    """Sin presupuesto, se espera al principal"""
+    caller = HedgedCaller(default_threshold=0.05, budget=HedgeBudget(ratio=0, burst=0))
+    assert caller.call(fake_call, 'lento', 'rapido') == "respuesta de lento"
+    assert caller.stats['hedges'] == 0
+
+
+def test_threshold_learned_from_latencies():
+    """El umbral pasa a ser el percentil de los tiempos observados"""
+    caller = HedgedCaller(percentile=95, min_samples=5, default_threshold=4.0)
+    for _ in range(20):
+        caller.tracker.record('modelo', 1.2)
+    assert abs(caller.threshold_for('modelo') - 1.2) < 1e-9
+    assert caller.threshold_for('otro') == 4.0
+
+
+def test_cancelled_primary_latency_recorded():
+    """El principal que pierde deja su espera como cota inferior de su latencia"""
+    caller = HedgedCaller(default_threshold=0.05, budget=HedgeBudget(ratio=1, burst=1))
+    assert caller.call(fake_call, 'lento', 'rapido') == "respuesta de rapido"
+
+    recorded = caller.tracker.percentile('lento', 50)
+    print(f"⏱️ lento: {caller.tracker.count('lento')} muestra(s), {recorded:.3f}s")
+    assert caller.tracker.count('lento') == 1
+    assert recorded >= 0.05
+
+
+def test_stats_under_concurrency():
+    """Los contadores no pierden incrementos con llamadas concurrentes"""
+    caller = HedgedCaller(default_threshold=0.5)
+    threads = [threading.Thread(target=lambda: [caller.call(fake_call, 'rapido', 'lento') for _ in range(10)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert caller.stats['requests'] == 80
+
+
+class _SilentUpstream(BaseHTTPRequestHandler):
+    """Acepta la petición y no responde nunca a tiempo"""
+
+    def do_POST(self):
+        time.sleep(3)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_cancel_closes_request_without_first_byte():
+    """Cancelar el perdedor cierra su socket aunque aún no haya recibido cabeceras"""
+    from claude_handler import LUC1ClaudeHandler
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SilentUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    handler = LUC1ClaudeHandler()
+    handler.api_url = f"http://127.0.0.1:{server.server_port}/v1/messages"
+
+    cancel_event = HedgeCancelEvent()
+    outcome = {}
+
+    def losing_call():
+        started = time.monotonic()
+        try:
+            handler._stream_claude({'model': 'lento', 'messages': []}, cancel_event, threading.Event())
+        except Exception as e:
+            outcome['error'] = e
+        outcome['elapsed'] = time.monotonic() - started
+
+    thread = threading.Thread(target=losing_call)
+    thread.start()
+    time.sleep(0.2)
+    cancel_event.set()
+    thread.join(timeout=2)
+    server.shutdown()
+
+    print(f"🛑 perdedor liberado en {outcome.get('elapsed', 0):.2f}s")
+    assert not thread.is_alive()
+    assert isinstance(outcome['error'], HedgeCancelled) and outcome['elapsed'] < 1
+
+
+if __name__ == "__main__":
+    test_hedge_wins_on_slow_primary()
+    test_no_hedge_on_fast_primary()
+    test_budget_limits_hedges()
+    test_threshold_learned_from_latencies()
+    test_cancelled_primary_latency_recorded()
+    test_stats_under_concurrency()
+    test_cancel_closes_request_without_first_byte()
+    print("\n✅ Hedging probado exitosamente!")
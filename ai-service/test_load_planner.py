@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test del planificador de carga por metros lineales y palés
+"""
+
+import sys
+import os
+import asyncio
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import numpy as np
+
+from european_logistics import EuropeanLogisticsService
+from load_planner import first_fit_decreasing, ltl_price, plan_load, plan_loads
+
+
+def test_linear_metres_and_mode():
+    """EUR 0,4 m, ISO 0,5 m por palé; el apilado divide las posiciones; umbrales FTL del backend"""
+    full = plan_load({'weight_kg': 20000, 'pallets': 33})
+    print(f"📦 33 EUR: {full['metros_lineales']} m, {full['modo']}, {full['utilizacion']}")
+    assert full['metros_lineales'] == 13.2 and full['modo'] == 'FTL' and full['vehiculo'] == 'trailer'
+
+    iso = plan_load({'weight_kg': 5000, 'pallets': 10, 'pallet_type': 'iso'})
+    assert iso['metros_lineales'] == 5.0 and iso['modo'] == 'LTL' and iso['vehiculo'] == 'rigid'
+
+    low = {'weight_kg': 8000, 'pallets': 20, 'volume_m3': 20}
+    assert plan_load({**low, 'stackable': True})['metros_lineales'] == 4.0
+    assert plan_load(low)['metros_lineales'] == 8.0
+
+    # Sin volumen ni palés se estima como el backend y se marca
+    assert plan_load({'weight_kg': 15000})['volumen_estimado']
+
+
+def test_vehicle_follows_volume():
+    """Poco peso pero mucho volumen ya no cabe en una furgoneta"""
+    service = EuropeanLogisticsService()
+    light = plan_load({'weight_kg': 2000, 'volume_m3': 2})
+    bulky = plan_load({'weight_kg': 2000, 'volume_m3': 25})
+    assert light['vehiculo'] == 'van' and service._get_vehicle_specs(2000, light)['type'] == 'van'
+    assert bulky['vehiculo'] == 'rigid' and service._get_vehicle_specs(2000, bulky)['axles'] == 3
+    assert service._get_vehicle_specs(2000, plan_load({'weight_kg': 2000, 'volume_m3': 40}))['axles'] == 5
+
+
+def test_first_fit_decreasing():
+    """FFD en dos dimensiones y envíos que necesitan varios tráileres"""
+    assignment, bins = first_fit_decreasing([[5, 1], [5, 1], [4, 1], [3, 1], [3, 1], [2, 1]], [10, 100])
+    assert bins == 3 and list(assignment) == [0, 0, 1, 1, 1, 2]
+    # Por peso: 3 de 10 t no caben en 24 t aunque sobren metros
+    assert first_fit_decreasing([[1, 10000]] * 3, [13.6, 24000])[1] == 2
+
+    plan = plan_load({'weight_kg': 40000, 'pallets': 50})
+    assert plan['vehiculos'] == 2 and plan['modo'] == 'FTL'
+
+
+def test_batch_matches_single_plans():
+    """Un lote vectorizado da lo mismo que planificar cada envío"""
+    rng = np.random.default_rng(5)
+    shipments = [{'weight_kg': float(w), 'pallets': int(p), 'pallet_type': t, 'stackable': bool(s)}
+                 for w, p, t, s in zip(rng.uniform(100, 30000, 300), rng.integers(1, 40, 300),
+                                       rng.choice(['eur', 'iso', 'medio'], 300), rng.integers(0, 2, 300))]
+    batch = plan_loads(shipments)
+    for i in rng.integers(0, 300, 25):
+        assert batch[i] == plan_load(shipments[i])
+
+
+def test_quote_prices_ltl_by_linear_metre():
+    """Con palés reales una carga parcial se cotiza como grupaje"""
+    service = EuropeanLogisticsService()
+    route = {'distance_km': 600.0, 'duration_hours': 8.0, 'countries': ['ES'], 'success': True}
+    prefetched = {'route': route, 'tolls': {'total_cost': 0, 'success': True},
+                  'restrictions': {'restrictions': [], 'holidays': [], 'critical_alerts': 0}}
+    data = {'destination': 'Barcelona', 'weight_kg': 600, 'pickup_date': '2025-03-11', 'service_type': 'estandar'}
+
+    ltl = service.generate_european_quote({**data, 'pallets': 2}, prefetched=prefetched)
+    assert ltl['modo_transporte'] == 'LTL' and ltl['carga']['metros_lineales'] == 0.8
+    assert ltl['costo_transporte_eur'] == ltl_price(ltl['carga'], 600)
+
+    # Sin dimensiones se mantiene la tarifa por peso
+    by_weight = service.generate_european_quote(data, prefetched=prefetched)
+    assert by_weight['costo_transporte_eur'] == round(600 * service.base_rates['carga_general'] * 600 / 100, 2)
+
+
+def test_items_without_weight_share_shipment_weight():
+    """Líneas de palés sin peso: el peso del envío se reparte entre ellas"""
+    items = [{'pallet_type': 'eur', 'count': 10}]
+    assert plan_load({'weight_kg': 22000, 'items': items}) == plan_load({'weight_kg': 22000, 'pallets': 10})
+
+    mixed = plan_load({'weight_kg': 5000, 'items': [{'pallet_type': 'eur', 'count': 2, 'weight_kg': 3000},
+                                                     {'pallet_type': 'iso', 'count': 4}]})
+    assert mixed['peso_kg'] == 5000.0
+
+    service = EuropeanLogisticsService()
+    route = {'distance_km': 1270.0, 'duration_hours': 14.0, 'countries': ['ES', 'FR'], 'success': True}
+    quote = service.generate_european_quote(
+        {'destination': 'París', 'weight_kg': 22000, 'pickup_date': '2025-03-11', 'items': items},
+        prefetched={'route': route, 'tolls': {'total_cost': 0, 'success': True},
+                    'restrictions': {'restrictions': [], 'holidays': [], 'critical_alerts': 0}})
+    assert quote['modo_transporte'] == 'FTL' and quote['carga']['peso_kg'] == 22000.0
+
+
+def test_chat_quote_sends_load_plan():
+    """La cotización del chat manda al backend el modo y los metros lineales si hay volumen o palés"""
+    from claude_handler import LUC1ClaudeHandler
+    handler = LUC1ClaudeHandler()
+    data = {'origen': 'Madrid', 'destino': 'Lyon', 'peso_kg': 600, 'tipo_carga': 'general'}
+
+    cargo = handler._transform_to_backend_format({**data, 'num_pales': 2})['cargo']
+    assert cargo['transportType'] == 'LTL' and cargo['linearMeters'] == 0.8 and cargo['pallets'] == 2
+    assert 'transportType' not in handler._transform_to_backend_format(data)['cargo']
+
+
+def test_load_plan_endpoint():
+    """luci_server planifica lotes de envíos"""
+    import luci_server
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            ok = await client.post("/quotes/load-plan", json={'shipments': [
+                {'weight_kg': 600, 'pallets': 2},
+                {'weight_kg': 3000, 'items': [{'pallet_type': 'iso', 'count': 4, 'height_m': 1.1,
+                                               'weight_kg': 3000, 'stackable': True}]}]})
+            bad = await client.post("/quotes/load-plan", json={'shipments': []})
+        return ok.json(), bad.status_code
+
+    ok, bad_status = asyncio.run(scenario())
+    assert ok['success'] and [p['metros_lineales'] for p in ok['planes']] == [0.8, 1.0]
+    assert bad_status == 422
+
+
+if __name__ == "__main__":
+    test_linear_metres_and_mode()
+    test_vehicle_follows_volume()
+    test_first_fit_decreasing()
+    test_batch_matches_single_plans()
+    test_quote_prices_ltl_by_linear_metre()
+    test_items_without_weight_share_shipment_weight()
+    test_chat_quote_sends_load_plan()
+    test_load_plan_endpoint()
+    print("✅ Planificador de carga OK")
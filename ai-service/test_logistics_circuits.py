@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test de los circuit breakers de los endpoints de logística
+"""
+
+import sys
+import os
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+import european_logistics
+from circuit_breaker import CircuitBreaker
+from european_logistics import EuropeanLogisticsService
+
+QUOTE = {'origin': 'Madrid', 'destination': 'París', 'weight_kg': 15000, 'pickup_date': '2025-03-11'}
+
+
+class _Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.text = ''
+
+    def json(self):
+        return self._body
+
+
+def _with_backend(handler, scenario):
+    """Ejecuta scenario con requests.post sustituido por handler"""
+    original_post = european_logistics.requests.post
+    european_logistics.requests.post = handler
+    try:
+        return scenario()
+    finally:
+        european_logistics.requests.post = original_post
+
+
+def test_rolling_window_opens_on_error_and_slow_rates():
+    """La ventana abre por tasa de errores o de lentas aunque no sean seguidos"""
+    breaker = CircuitBreaker('errores', failure_threshold=100, window_size=10, min_calls=4, error_rate=0.5)
+    for outcome in (True, False, True, False):
+        breaker.record_failure() if outcome else breaker.record_success()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    slow = CircuitBreaker('lentas', window_size=10, min_calls=4, slow_call_seconds=1.0, slow_call_rate=0.75,
+                          reset_timeout=0.05)
+    for duration in (2.0, 0.1, 2.0, 2.0):
+        slow.record_success(duration)
+    assert slow.snapshot()['state'] == CircuitBreaker.OPEN
+
+    # Half-open: una prueba lenta vuelve a abrir, una rápida cierra
+    time.sleep(0.06)
+    assert slow.allow_request() and not slow.allow_request()
+    slow.record_success(3.0)
+    assert slow.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert slow.allow_request()
+    slow.record_success(0.1)
+    assert slow.state == CircuitBreaker.CLOSED and slow.snapshot()['calls'] == 1
+
+
+def test_outage_quotes_fall_back_in_milliseconds():
+    """Con el backend caído, tras abrir los circuitos la cotización no espera ningún timeout"""
+    service = EuropeanLogisticsService()
+    calls = []
+
+    def hanging_backend(url, json=None, timeout=None):
+        calls.append(url)
+        time.sleep(0.1)
+        raise requests.Timeout(f"timeout tras {timeout} s")
+
+    def scenario():
+        for _ in range(3):
+            service.generate_european_quote(QUOTE)
+        started = time.monotonic()
+        quote = service.generate_european_quote(QUOTE)
+        return quote, time.monotonic() - started
+
+    quote, elapsed = _with_backend(hanging_backend, scenario)
+    print(f"⚡ cotización con circuitos abiertos en {elapsed * 1000:.0f} ms")
+
+    assert quote and quote['distancia_km'] > 0 and quote['costo_peajes_eur'] >= 0
+    assert elapsed < 0.1
+    assert len(calls) == 6  # 3 rutas + 3 incidencias; sin polyline no se piden peajes
+    snapshot = service.circuit_snapshot()
+    assert snapshot['openroute']['state'] == snapshot['restrictions']['state'] == CircuitBreaker.OPEN
+    assert snapshot['tollguru']['state'] == CircuitBreaker.CLOSED
+
+
+def test_client_errors_do_not_open_circuit():
+    """Un 404 es respuesta del backend, no caída; un 503 sí cuenta"""
+    service = EuropeanLogisticsService()
+    _with_backend(lambda url, json=None, timeout=None: _Response(404),
+                  lambda: [service._get_live_incidents(['ES'], '2025-03-11', '2025-03-11', {}) for _ in range(5)])
+    assert service.breakers['restrictions'].state == CircuitBreaker.CLOSED
+
+    _with_backend(lambda url, json=None, timeout=None: _Response(503),
+                  lambda: [service._get_live_incidents(['ES'], '2025-03-11', '2025-03-11', {}) for _ in range(3)])
+    assert service.breakers['restrictions'].state == CircuitBreaker.OPEN
+
+
+if __name__ == "__main__":
+    test_rolling_window_opens_on_error_and_slow_rates()
+    test_outage_quotes_fall_back_in_milliseconds()
+    test_client_errors_do_not_open_circuit()
+    print("✅ Circuit breakers de logística OK")
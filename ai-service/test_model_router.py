@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test del router de modelos (rasgos, etiquetas, umbral, fallback, registro y evaluación)
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from claude_handler import LUC1ClaudeHandler
+from evaluate_router import evaluate
+from model_router import (ModelRouter, ModelStats, RouterClassifier, TurnLogger, _bucket, extract_features,
+                          load_turns, split_by_time, turn_label)
+from train_router import build_examples, train_classifier
+
+CHEAP = 'haiku'
+STRONG = 'sonnet'
+
+
+def _router(classifier=None, quality_target=0.85):
+    router = ModelRouter([CHEAP, STRONG], fallback=lambda message, session: 'fallback',
+                         weights_path=os.path.join(tempfile.gettempdir(), 'no-existe-router.json'),
+                         quality_target=quality_target)
+    router.classifier = classifier
+    return router
+
+
+def test_feature_extraction():
+    """Rasgos deterministas con n-gramas y contexto del turno"""
+    features = extract_features("Hola, buenos días", 2, 7)
+    print(f"🔢 {len(features)} rasgos")
+    assert features == extract_features("  HOLA, buenos días ", 2, 7)
+    assert _bucket("w:hola") in features
+    assert _bucket("b:buenos_días") in features
+    assert _bucket("bias") in features
+    assert _bucket("no_number") in features and _bucket("has_number") not in features
+    assert _bucket("filled:2") in features and _bucket("missing:5") in features
+
+    with_number = extract_features("Son 1200 kg", 7, 7)
+    assert _bucket("has_number") in with_number
+    assert _bucket("missing:0") in with_number
+    assert extract_features("", 0)[_bucket("bias")] == 1.0
+
+
+def test_turn_label_rules():
+    """Etiqueta explícita > turno del modelo barato > regla de palabras clave (medio peso)"""
+    assert turn_label({'cheap_ok': False, 'model': CHEAP}, CHEAP) == (0, 1.0)
+    assert turn_label({'cheap_ok': True, 'model': STRONG}, CHEAP) == (1, 1.0)
+    assert turn_label({'model': CHEAP, 'needed_reask': False}, CHEAP) == (1, 1.0)
+    assert turn_label({'model': CHEAP, 'needed_reask': True}, CHEAP) == (0, 1.0)
+    assert turn_label({'model': STRONG, 'keyword_model': CHEAP}, CHEAP) == (1, 0.5)
+    assert turn_label({'model': STRONG, 'keyword_model': STRONG}, CHEAP) == (0, 0.5)
+    assert turn_label({'model': STRONG}, CHEAP) is None
+
+
+def test_threshold_routing():
+    """El modelo barato sólo si P(basta) x (1 - re-preguntas) llega al objetivo"""
+    confident = _router(RouterClassifier(bias=3.0))   # P ~ 0.95
+    doubtful = _router(RouterClassifier(bias=0.0))    # P = 0.5
+    assert confident.select("hola", {}, 0, 7) == CHEAP
+    assert doubtful.select("hola", {}, 0, 7) == STRONG
+
+    # Haiku re-pregunta a menudo: su calidad esperada cae por debajo del objetivo
+    for _ in range(30):
+        confident.stats.record_outcome(CHEAP, needed_reask=True)
+    assert confident.select("hola", {}, 0, 7) == STRONG
+
+    # Si ningún modelo llega al objetivo, el más capaz
+    strict = _router(RouterClassifier(bias=3.0), quality_target=1.01)
+    assert strict.select("hola", {}, 0, 7) == STRONG
+
+
+def test_classifier_train_save_load():
+    """El clasificador aprende a separar turnos y sobrevive a save/load"""
+    examples = [(extract_features(m), 1, 1.0) for m in ("hola", "gracias", "vale", "sí")] + \
+               [(extract_features(m), 0, 1.0) for m in ("compara rutas adr por los alpes con restricciones",
+                                                        "analiza el coste del transporte refrigerado a Polonia")]
+    classifier = train_classifier(examples, epochs=30)
+    assert classifier.predict(extract_features("hola")) > 0.5
+    assert classifier.predict(extract_features("analiza rutas adr con restricciones")) < 0.5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'weights.json')
+        classifier.save(path)
+        loaded = RouterClassifier.load(path)
+        assert abs(loaded.predict(extract_features("hola")) - classifier.predict(extract_features("hola"))) < 1e-3
+
+        # Pesos de otra configuración de hashing: se ignoran
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'n_buckets': 16, 'bias': 0.0, 'weights': {}}, f)
+        assert RouterClassifier.load(path) is None
+
+
+def test_fallback_without_weights():
+    """Sin fichero de pesos el router usa la regla de palabras clave"""
+    router = _router()
+    router.classifier = RouterClassifier.load(router.weights_path)
+    assert router.classifier is None
+    assert router.select("hola", {}, 0, 7) == 'fallback'
+
+
+def test_finish_turn_logs_reask():
+    """La queja del usuario en el turno siguiente marca la re-pregunta y se registra"""
+    handler = LUC1ClaudeHandler()
+    handler.router.stats = ModelStats()
+    with tempfile.TemporaryDirectory() as tmp:
+        handler.turn_logger = TurnLogger(os.path.join(tmp, 'turns.jsonl'))
+        session = {'pending_turn': {'message': 'de Madrid a Lyon', 'model': CHEAP, 'needed_reask': False}}
+
+        handler._finish_turn(session, 's', "Ya te lo dije, 1200 kg")
+        handler._finish_turn(session, 's', "otro mensaje")  # sin turno pendiente: nada que registrar
+
+        turns = load_turns(handler.turn_logger.path)
+    print(f"📝 {turns}")
+    assert 'pending_turn' not in session
+    assert len(turns) == 1 and turns[0]['needed_reask'] is True and 'ts' in turns[0]
+    assert handler.router.stats.get(CHEAP, 'reask_rate') == 1.0
+    assert build_examples(turns, CHEAP)[0][1] == 0
+
+
+def test_time_split_and_two_sided_evaluation():
+    """Se evalúa con los turnos más recientes y se cuentan errores en ambos sentidos"""
+    turns = [{'ts': ts, 'message': str(ts)} for ts in (5, 1, 4, 2, 3)]
+    train, test = split_by_time(turns, 0.4)
+    assert [t['ts'] for t in train] == [1, 2, 3]
+    assert [t['ts'] for t in test] == [4, 5]
+
+    test_turns = [
+        {'model': CHEAP, 'needed_reask': True, 'route': CHEAP},          # mal enrutado a Haiku
+        {'model': CHEAP, 'needed_reask': False, 'route': STRONG},        # sobre-enrutado a Sonnet
+        {'model': STRONG, 'keyword_model': STRONG, 'route': CHEAP},      # a Haiku sin verificar
+        {'model': STRONG, 'cheap_ok': True, 'route': CHEAP},             # acierto
+    ]
+    result = evaluate("test", lambda turn: turn['route'], test_turns, CHEAP, {CHEAP: 0.001, STRONG: 0.01})
+    assert result['misrouted'] == 1
+    assert result['over_routed'] == 1
+    assert result['unverified'] == 1
+    assert result['labeled'] == 3
+    assert abs(result['cost'] - 0.013) < 1e-9
+
+
+if __name__ == "__main__":
+    test_feature_extraction()
+    test_turn_label_rules()
+    test_threshold_routing()
+    test_classifier_train_save_load()
+    test_fallback_without_weights()
+    test_finish_turn_logs_reask()
+    test_time_split_and_two_sided_evaluation()
+    print("✅ Router de modelos OK")
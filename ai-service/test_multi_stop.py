@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test de la cotización con varias paradas
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from multi_stop import MultiStopQuoter
+
+# Tramos simulados: km, horas y km por país
+LEGS = {
+    ('barcelona', 'lyon'): (640.0, 8.0, {'ES': 200.0, 'FR': 440.0}),
+    ('lyon', 'milán'): (440.0, 6.0, {'FR': 200.0, 'IT': 240.0}),
+    ('barcelona', 'milán'): (1000.0, 12.0, {'ES': 200.0, 'FR': 500.0, 'IT': 300.0}),
+    ('milán', 'lyon'): (440.0, 6.0, {'IT': 240.0, 'FR': 200.0}),
+}
+
+
+# Cada consulta de ruta tarda 0,2 s
+LATENCY = {'route': 0.2}
+QUOTE = {'origin': 'Barcelona', 'weight_kg': 15000, 'pickup_date': '2025-03-11'}
+
+
+def test_legs_in_parallel_and_aggregated(fake_service):
+    """Los tramos se piden a la vez y la cotización suma km, peajes y países"""
+    service = fake_service(legs=LEGS, latency=LATENCY)
+    started = time.monotonic()
+    quote = MultiStopQuoter(service).quote(QUOTE, ['Lyon', 'Milán'])
+    elapsed = time.monotonic() - started
+    print(f"🗺️  {' -> '.join(['Barcelona'] + quote['paradas'])}: {quote['distancia_km']} km, "
+          f"{quote['costo_total_eur']} EUR en {elapsed * 1000:.0f} ms")
+
+    assert elapsed < 0.39
+    assert quote['distancia_km'] == 1080.0 and quote['destino'] == 'Milán'
+    assert quote['paises_transito'] == ['ES', 'FR', 'IT']
+    assert quote['km_por_pais'] == {'ES': 200.0, 'FR': 640.0, 'IT': 240.0}
+    assert [t['destino'] for t in quote['tramos']] == ['Lyon', 'Milán']
+    assert quote['costo_peajes_eur'] == round(sum(t['costo_peajes_eur'] for t in quote['tramos']), 2)
+
+
+def test_eta_chains_legs_with_unloading(fake_service):
+    """El segundo tramo sale a la llegada del primero más la descarga"""
+    quote = MultiStopQuoter(fake_service(legs=LEGS, latency=LATENCY)).quote({**QUOTE, 'service_type': 'express'}, ['Lyon', 'Milán'])
+    first, second = quote['tramos']
+    # Doble conductor: 8 h + 1 h de descarga + 6 h desde las 08:00
+    assert first['llegada_estimada'] == '2025-03-11 16:00'
+    assert second['llegada_estimada'] == '2025-03-11 23:00' == quote['llegada_estimada']
+    assert quote['horas_transito'] == 15.0
+
+
+def test_leg_cache_across_requests(fake_service):
+    """Un tramo ya resuelto por otra cotización no se vuelve a pedir"""
+    service = fake_service(legs=LEGS, latency=LATENCY)
+    quoter = MultiStopQuoter(service)
+    quoter.quote(QUOTE, ['Lyon', 'Milán'])
+    quoter.quote({**QUOTE, 'weight_kg': 14000}, ['Lyon'])
+    assert sorted(service.route_calls) == [('Barcelona', 'Lyon'), ('Lyon', 'Milán')]
+
+
+def test_flexible_order(fake_service):
+    """Con orden flexible Lyon va antes que Milán; un tramo sin ruta no se cotiza"""
+    quoter = MultiStopQuoter(fake_service(legs=LEGS, latency=LATENCY))
+    assert quoter.order('Barcelona', ['Milán', 'Lyon']) == ['Lyon', 'Milán']
+    assert quoter.order('Barcelona', ['Milán', 'Atlántida']) == ['Milán', 'Atlántida']
+
+    fixed = quoter.quote(QUOTE, ['Milán', 'Lyon'])
+    flexible = quoter.quote(QUOTE, ['Milán', 'Lyon'], optimize_order=True)
+    assert flexible['paradas'] == ['Lyon', 'Milán'] and flexible['orden_optimizado']
+    assert flexible['distancia_km'] < fixed['distancia_km']
+    assert quoter.quote(QUOTE, ['Lyon', 'Atlántida']) is None
+
+
+def test_multi_stop_endpoint(fake_service):
+    """luci_server expone la cotización con varias paradas"""
+    import luci_server
+
+    class _Handler:
+        multi_stop = MultiStopQuoter(fake_service(legs=LEGS, latency=LATENCY))
+
+    async def scenario():
+        luci_server.luc1 = _Handler()
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            ok = await client.post("/quotes/european/multi-stop",
+                                   json={**QUOTE, 'stops': ['Milán', 'Lyon'], 'optimize_order': True})
+            bad = await client.post("/quotes/european/multi-stop", json={**QUOTE, 'stops': []})
+        return ok.json(), bad.status_code
+
+    ok, bad_status = asyncio.run(scenario())
+    assert ok['success'] and ok['quote']['paradas'] == ['Lyon', 'Milán']
+    assert bad_status == 422
+
+
+if __name__ == "__main__":
+    from conftest import FakeLogisticsService
+    test_legs_in_parallel_and_aggregated(FakeLogisticsService)
+    test_eta_chains_legs_with_unloading(FakeLogisticsService)
+    test_leg_cache_across_requests(FakeLogisticsService)
+    test_flexible_order(FakeLogisticsService)
+    test_multi_stop_endpoint(FakeLogisticsService)
+    print("✅ Cotización con varias paradas OK")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test del optimizador de fecha de recogida
+"""
+
+import sys
+import os
+import asyncio
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import numpy as np
+
+from pickup_optimizer import PickupDateOptimizer
+from quote_graph import QuoteGraph
+
+
+# Lyon -> Múnich en 2 días, corte de carretera en Francia el 2025-03-12
+ROUTE = {'distance_km': 900.0, 'duration_hours': 12.0, 'polyline': None, 'countries': ['FR', 'DE']}
+INCIDENTS = [{'type': 'road_closure', 'severity': 'critical', 'country': 'FR', 'date': '2025-03-12'}]
+QUOTE = {'origin': 'Lyon', 'destination': 'Múnich', 'weight_kg': 15000}
+
+
+def test_window_evaluated_in_one_batch(fake_service):
+    """Una consulta de restricciones para toda la ventana y todas las fechas evaluadas"""
+    service = fake_service(route=ROUTE, incidents=INCIDENTS)
+    result = PickupDateOptimizer(service, wait_cost_per_day=100).optimize(QUOTE, '2025-03-08', days=7)
+    by_date = {c['fecha_recogida']: c for c in result['candidatas']}
+    print(f"📅 más rápida {result['mas_rapida']['fecha_recogida']}, "
+          f"más barata {result['mas_barata']['fecha_recogida']} ({result['elapsed_ms']} ms)")
+
+    assert service.calls == {'route': 1, 'tolls': 0, 'restrictions': 0, 'incidents': 1}
+    assert result['dias_transito'] == 2 and len(by_date) == 7
+
+    # Sábado: tras el descanso diario el domingo alemán obliga a esperar hasta las 22:00
+    assert by_date['2025-03-08']['dias_espera'] == 1
+    assert by_date['2025-03-08']['llegada_estimada'] == '2025-03-10 01:00'
+    assert by_date['2025-03-08']['costo_total_eur'] == \
+        round(by_date['2025-03-10']['costo_total_eur'] + 17.25 / 24 * 100, 2)
+    # Domingo: prohibido en Francia (origen)
+    assert not by_date['2025-03-09']['viable']
+    # Lunes: sin esperas, entrega el martes
+    assert by_date['2025-03-10']['dias_espera'] == 0 and by_date['2025-03-10']['fecha_entrega'] == '2025-03-11'
+    # Incidencia crítica en vivo en origen: no se puede recoger
+    assert not by_date['2025-03-12']['viable']
+
+    assert result['mas_rapida']['fecha_recogida'] == '2025-03-08'
+    assert result['mas_barata']['fecha_recogida'] == '2025-03-10'
+
+
+def test_fastest_ranked_by_arrival(fake_service):
+    """La más rápida es la de llegada más temprana, aunque no sea la primera fecha viable"""
+    service = fake_service(route=ROUTE, incidents=INCIDENTS)
+    simulate = service.estimate_transit
+
+    def first_date_delayed(*args, **kwargs):
+        eta = simulate(*args, **kwargs)
+        eta['arrival'] = eta['arrival'].copy()
+        eta['arrival'][0] += np.timedelta64(3, 'D')
+        return eta
+
+    service.estimate_transit = first_date_delayed
+    result = PickupDateOptimizer(service).optimize(QUOTE, '2025-03-10', days=3)
+    assert result['candidatas'][0]['viable']
+    assert result['mas_rapida']['fecha_recogida'] == '2025-03-11'
+
+
+def test_vehicle_from_load_plan(fake_service):
+    """Carga ligera pero voluminosa: ventana y ETA con el vehículo del plan de carga, como QuoteGraph"""
+    service = fake_service(route=ROUTE, incidents=INCIDENTS)
+    seen = []
+    window = service.get_restrictions_window
+
+    async def spy(countries, date_from, date_to, vehicle_specs):
+        seen.append(vehicle_specs)
+        return await window(countries, date_from, date_to, vehicle_specs)
+
+    service.get_restrictions_window = spy
+    light = {**QUOTE, 'weight_kg': 2000, 'volume_m3': 60}
+    PickupDateOptimizer(service).optimize(light, '2025-03-08', days=3)
+
+    graph_specs = QuoteGraph(service)._route_node({**light, 'pickup_date': '2025-03-08'})[1]
+    print(f"🚛 {seen[0]['type']} ({seen[0]['axles']} ejes)")
+    assert seen[0] == graph_specs
+    assert seen[0]['type'] != 'van'
+
+
+def test_incident_timestamps(fake_service):
+    """Incidencias con fecha y hora bloquean su día; las ilegibles se ignoran"""
+    incidents = [{**INCIDENTS[0], 'date': '2025-03-12T00:00:00Z'}, {**INCIDENTS[0], 'date': '12/03/2025'}]
+    result = PickupDateOptimizer(fake_service(route=ROUTE, incidents=incidents)).optimize(QUOTE, '2025-03-10', days=3)
+    assert [c['viable'] for c in result['candidatas']] == [True, True, False]
+
+
+def test_route_reused_from_quote_graph(fake_service):
+    """Con el grafo de cotización la ruta sale de su caché"""
+    service = fake_service(route=ROUTE, incidents=INCIDENTS)
+    graph = QuoteGraph(service)
+    graph.quote({**QUOTE, 'pickup_date': '2025-03-10'})
+    PickupDateOptimizer(service, graph).optimize(QUOTE, '2025-03-08')
+    assert service.calls['route'] == 1
+
+
+def test_pickup_dates_endpoint(fake_service):
+    """luci_server expone el optimizador"""
+    import luci_server
+
+    class _Handler:
+        pickup_optimizer = PickupDateOptimizer(fake_service(route=ROUTE, incidents=INCIDENTS))
+
+    async def scenario():
+        luci_server.luc1 = _Handler()
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            ok = await client.post("/quotes/european/pickup-dates",
+                                   json={**QUOTE, 'volume_m3': 40, 'start_date': '2025-03-08', 'days': 5})
+            bad = [await client.post("/quotes/european/pickup-dates", json={**QUOTE, **fields})
+                   for fields in ({'days': 0}, {'start_date': '08/03/2025'}, {'start_date': '2025-03-08T10:30:00'})]
+        return ok.json(), [response.status_code for response in bad]
+
+    ok, bad_status = asyncio.run(scenario())
+    assert ok['success'] and len(ok['candidatas']) == 5
+    assert bad_status == [422, 422, 422]
+
+
+if __name__ == "__main__":
+    from conftest import FakeLogisticsService
+    test_window_evaluated_in_one_batch(FakeLogisticsService)
+    test_fastest_ranked_by_arrival(FakeLogisticsService)
+    test_vehicle_from_load_plan(FakeLogisticsService)
+    test_incident_timestamps(FakeLogisticsService)
+    test_route_reused_from_quote_graph(FakeLogisticsService)
+    test_pickup_dates_endpoint(FakeLogisticsService)
+    print("✅ Optimizador de fecha de recogida OK")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test de la decodificación, simplificación y caché de polylines
+"""
+
+import sys
+import os
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from polyline_utils import (PolylineCache, compact_polyline, decode_polyline, encode_polyline,
+                            haversine_km, simplify_coords)
+from route_countries import densify
+
+
+def _wiggly_route() -> np.ndarray:
+    """Madrid -> París con 10.000 puntos y un zigzag de pocos metros"""
+    path = densify([(40.42, -3.70), (43.34, -1.79), (48.86, 2.35)], step_km=0.12)
+    noise = np.where(np.arange(len(path)) % 2, 0.00005, -0.00005)  # ≈ 5 m
+    return path + np.column_stack((noise, np.zeros(len(path))))
+
+
+def test_decode_float32_roundtrip():
+    """float32 conserva la precisión 5 en coordenadas europeas"""
+    route = _wiggly_route()
+    encoded = encode_polyline(route)
+    coords = decode_polyline(encoded)
+    assert coords.dtype == np.float32
+    assert encode_polyline(coords) == encoded
+
+
+def test_simplify_keeps_shape():
+    """Douglas-Peucker reduce los puntos sin cambiar la distancia apreciablemente"""
+    route = decode_polyline(encode_polyline(_wiggly_route()))
+    simplified = simplify_coords(route, tolerance_m=25)
+    full_km, short_km = haversine_km(route).sum(), haversine_km(simplified).sum()
+    print(f"✂️  {len(route)} -> {len(simplified)} puntos, {full_km:.1f} -> {short_km:.1f} km")
+    assert len(simplified) < len(route) / 100
+    assert abs(full_km - short_km) / full_km < 0.01
+    assert np.array_equal(simplified[[0, -1]], route[[0, -1]])
+
+    compact = compact_polyline(encode_polyline(route))
+    assert len(compact) < len(encode_polyline(route)) / 50
+    assert compact_polyline('abc') == 'abc'  # no decodificable: se deja tal cual
+
+
+def test_cache_returns_read_only_views():
+    """La segunda consulta no decodifica y nadie puede modificar el buffer compartido"""
+    cache = PolylineCache(max_entries=2)
+    encoded = encode_polyline(_wiggly_route())
+
+    started = time.perf_counter()
+    first = cache.coords(encoded)
+    decode_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    second = cache.coords(encoded)
+    hit_ms = (time.perf_counter() - started) * 1000
+    print(f"🧊 decodificar {decode_ms:.2f} ms, caché {hit_ms:.3f} ms")
+
+    assert cache.stats == {'hits': 1, 'misses': 1}
+    assert np.shares_memory(first, second)
+    assert not second.flags.writeable
+    try:
+        second[0, 0] = 0
+        assert False, "el buffer debería ser de sólo lectura"
+    except ValueError:
+        pass
+
+    cache.coords(encode_polyline([[1, 1], [2, 2]]))
+    cache.coords(encode_polyline([[3, 3], [4, 4]]))
+    cache.coords(encoded)
+    assert cache.stats['misses'] == 4  # expulsada por LRU
+
+
+if __name__ == "__main__":
+    test_decode_float32_roundtrip()
+    test_simplify_keeps_shape()
+    test_cache_returns_read_only_views()
+    print("✅ Utilidades de polylines OK")
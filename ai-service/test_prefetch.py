@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test del prefetch especulativo de ruta, peajes y restricciones
+"""
+
+import sys
+import os
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import claude_handler
+import european_logistics
+from quote_graph import QuoteGraph
+from quote_prefetch import QuotePrefetcher
+
+
+def test_prefetch_once_per_key(fake_service):
+    """Cada etapa se lanza una vez por clave; la clase de vehículo manda sobre el peso"""
+    service = fake_service(latency={'route': 0.05})
+    prefetcher = QuotePrefetcher(service, ttl_seconds=60, max_workers=2)
+    data = {'origen': 'Madrid', 'destino': 'París'}
+
+    assert prefetcher.prefetch('s', data) == []
+
+    data['peso_kg'] = 15000
+    assert prefetcher.prefetch('s', data) == ['route', 'tolls']
+    data['peso_kg'] = 18000  # mismo tráiler
+    assert prefetcher.prefetch('s', data) == []
+
+    data['fecha_recogida'] = '2025-03-10'
+    assert prefetcher.prefetch('s', data) == ['restrictions']
+
+    results = prefetcher.collect('s', data, timeout=5)
+    print(f"📦 {sorted(results)} | llamadas {service.calls}")
+    assert set(results) == {'route', 'tolls', 'restrictions'}
+    assert service.calls == {'route': 1, 'tolls': 1, 'restrictions': 1, 'incidents': 0}
+
+    data['peso_kg'] = 2000  # pasa a furgoneta: ruta nueva
+    assert prefetcher.prefetch('s', data) == ['route', 'tolls', 'restrictions']
+
+    prefetcher.discard('s')
+    assert prefetcher.collect('s', data, timeout=0) == {}
+
+
+def test_quote_reuses_prefetched_results(fake_service):
+    """generate_european_quote no vuelve a consultar lo anticipado"""
+    service = fake_service(latency={'route': 0.05})
+    prefetcher = QuotePrefetcher(service, ttl_seconds=60)
+    data = {'origen': 'Madrid', 'destino': 'París', 'peso_kg': 15000, 'fecha_recogida': '2025-03-10'}
+    prefetcher.prefetch('s', data)
+    prefetched = prefetcher.collect('s', data, timeout=5)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no debería llamar al backend")
+
+    original_post = european_logistics.requests.post
+    european_logistics.requests.post = fail
+    try:
+        quote = service.generate_european_quote({
+            'origin': 'Madrid', 'destination': 'París', 'weight_kg': 15000, 'pickup_date': '2025-03-10'
+        }, prefetched=prefetched)
+    finally:
+        european_logistics.requests.post = original_post
+
+    assert quote['distancia_km'] == 1270.0
+    assert quote['costo_peajes_eur'] == 180.0
+    assert service.calls == {'route': 1, 'tolls': 1, 'restrictions': 1, 'incidents': 0}
+
+
+def test_keys_use_load_plan(fake_service):
+    """Carga ligera pero voluminosa: la clave lleva el mismo vehículo que QuoteGraph"""
+    service = fake_service(latency={'route': 0.05})
+    prefetcher = QuotePrefetcher(service, ttl_seconds=60)
+    data = {'origen': 'Madrid', 'destino': 'París', 'peso_kg': 2000, 'volumen_m3': 60}
+
+    graph_key = QuoteGraph(service)._route_node(
+        {'origin': 'Madrid', 'destination': 'París', 'weight_kg': 2000, 'volume_m3': 60})[3]
+    print(f"🔑 {prefetcher._keys(data)['route']} == {graph_key}")
+    assert prefetcher._keys(data)['route'] == graph_key
+    assert graph_key[2:] != ('van', 2)
+
+
+DATA = {'origen': 'Madrid', 'destino': 'París', 'peso_kg': 15000, 'volumen_m3': 40, 'tipo_carga': 'general',
+        'fecha_recogida': '2030-03-10', 'tipo_servicio': 'estandar'}
+
+
+def _post_quotation(handler, data):
+    """generate_quotation con el POST al backend simulado: (cotización, payloads, segundos)"""
+    posted = []
+
+    class _Response:
+        status_code = 201
+        text = ''
+
+        def json(self):
+            return {'quoteId': 'Q-1'}
+
+    def fake_post(url, json=None, headers=None, timeout=None):
+        posted.append(json)
+        return _Response()
+
+    original_post = claude_handler.requests.post
+    claude_handler.requests.post = fake_post
+    try:
+        started = time.monotonic()
+        quote = handler.generate_quotation('s', data)
+        elapsed = time.monotonic() - started
+    finally:
+        claude_handler.requests.post = original_post
+    return quote, posted, elapsed
+
+
+def test_backend_post_does_not_wait_for_prefetch(fake_service):
+    """El POST al backend sale sin esperar a las consultas anticipadas en curso"""
+    handler = claude_handler.LUC1ClaudeHandler()
+    handler.prefetcher = QuotePrefetcher(fake_service(latency={'route': 1.5}), ttl_seconds=60)
+    handler.prefetcher.prefetch('s', DATA)
+
+    quote, posted, elapsed = _post_quotation(handler, DATA)
+
+    print(f"⏱️ POST en {elapsed * 1000:.0f} ms")
+    assert quote == {'quoteId': 'Q-1'}
+    assert elapsed < 1.0
+    assert 'precomputed' not in posted[0]
+
+
+def test_backend_post_sends_finished_stages(fake_service):
+    """Las etapas ya terminadas viajan al backend como `precomputed`"""
+    handler = claude_handler.LUC1ClaudeHandler()
+    handler.prefetcher = QuotePrefetcher(fake_service(), ttl_seconds=60)
+    handler.prefetcher.prefetch('s', DATA)
+    handler.prefetcher.collect('s', DATA, timeout=5)
+
+    quote, posted, _ = _post_quotation(handler, DATA)
+
+    precomputed = posted[0]['precomputed']
+    print(f"📦 precomputed: {precomputed}")
+    assert quote == {'quoteId': 'Q-1'}
+    assert precomputed['route'] == {'distance': 1270.0, 'duration': 14.0, 'countries': ['ES', 'FR']}
+    assert precomputed['tolls'] == {'totalCost': 180.0, 'breakdown': []}
+    assert precomputed['restrictions'] == {'alerts': [], 'holidays': []}
+
+
+def test_degraded_route_not_sent(fake_service):
+    """Una ruta de fallback no se envía (ni los peajes calculados sobre ella)"""
+    handler = claude_handler.LUC1ClaudeHandler()
+    handler.prefetcher = QuotePrefetcher(fake_service(route={'fallback': True}), ttl_seconds=60)
+    handler.prefetcher.prefetch('s', DATA)
+    handler.prefetcher.collect('s', DATA, timeout=5)
+
+    _, posted, _ = _post_quotation(handler, DATA)
+
+    assert 'precomputed' not in posted[0]
+
+
+if __name__ == "__main__":
+    from conftest import FakeLogisticsService
+    test_prefetch_once_per_key(FakeLogisticsService)
+    test_quote_reuses_prefetched_results(FakeLogisticsService)
+    test_keys_use_load_plan(FakeLogisticsService)
+    test_backend_post_does_not_wait_for_prefetch(FakeLogisticsService)
+    test_backend_post_sends_finished_stages(FakeLogisticsService)
+    test_degraded_route_not_sent(FakeLogisticsService)
+    print("✅ Prefetch OK")
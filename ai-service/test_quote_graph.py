@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test de la recotización incremental (grafo de dependencias)
+"""
+
+import sys
+import os
+import asyncio
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from quote_graph import QuoteGraph
+
+
+def _tolls_by_axles(specs):
+    return 60.0 * specs['axles']
+
+
+BASE = {'origin': 'Madrid', 'destination': 'París', 'weight_kg': 15000, 'pickup_date': '2025-03-10'}
+
+
+def test_only_affected_nodes_recomputed(fake_service):
+    """Cada cambio recalcula sólo los nodos que dependen de él"""
+    service = fake_service(tolls=_tolls_by_axles)
+    graph = QuoteGraph(service)
+
+    first = graph.quote(BASE)
+    assert first['recomputed'] == ['route', 'tolls', 'restrictions', 'pricing']
+
+    same = graph.quote(BASE)
+    assert same['recomputed'] == []
+    assert same['quote'] == first['quote']
+
+    heavier = graph.requote(BASE, {'weight_kg': 20000})  # mismo tráiler
+    print(f"⚖️  {heavier['recomputed']} en {heavier['elapsed_ms']} ms")
+    assert heavier['recomputed'] == ['pricing']
+    assert heavier['quote']['costo_total_eur'] > first['quote']['costo_total_eur']
+
+    later = graph.requote(BASE, {'pickup_date': '2025-03-11'})
+    assert later['recomputed'] == ['restrictions', 'pricing']
+
+    van = graph.requote(BASE, {'weight_kg': 2000})  # cambia la clase de vehículo
+    assert van['recomputed'] == ['route', 'tolls', 'restrictions', 'pricing']
+    assert van['quote']['costo_peajes_eur'] == 120.0
+
+    assert service.calls == {'route': 2, 'tolls': 2, 'restrictions': 3, 'incidents': 0}
+
+
+def test_service_levels_in_one_pass(fake_service):
+    """Los tres niveles salen de la misma pasada; cambiar a express sólo re-precia"""
+    graph = QuoteGraph(fake_service(tolls=_tolls_by_axles))
+    standard = graph.quote(BASE)['quote']
+    levels = standard['niveles_servicio']
+    print(standard['tabla_comparativa'])
+
+    assert standard['tipo_servicio'] == 'estandar'
+    assert standard['costo_total_eur'] == levels['estandar']['costo_total_eur']
+    assert levels['economico']['costo_total_eur'] < levels['estandar']['costo_total_eur'] \
+        < levels['express']['costo_total_eur']
+    assert levels['economico']['tiempo_estimado_dias'] >= levels['estandar']['tiempo_estimado_dias'] \
+        >= levels['express']['tiempo_estimado_dias']
+    assert 'Estándar ✓' in standard['tabla_comparativa']
+
+    express = graph.requote(BASE, {'service_type': 'express'})
+    assert express['recomputed'] == ['pricing']
+    assert express['quote']['costo_total_eur'] == levels['express']['costo_total_eur']
+    assert express['quote']['niveles_servicio'] == levels
+
+
+def test_degraded_results_not_cached(fake_service):
+    """Ruta de fallback y peajes estimados se vuelven a consultar en la siguiente cotización"""
+    service = fake_service(route={'fallback': True})
+    graph = QuoteGraph(service)
+    graph.quote(BASE)
+    again = graph.quote(BASE)
+    print(f"🔁 {again['recomputed']}")
+    assert again['recomputed'] == ['route', 'tolls', 'pricing']
+    assert service.calls['route'] == 2 and service.calls['tolls'] == 2
+
+    service.route.pop('fallback')
+    graph.quote(BASE)
+    assert graph.quote(BASE)['recomputed'] == []
+
+
+def test_requote_endpoint(fake_service):
+    """luci_server expone la recotización y valida los cambios como una cotización completa"""
+    import luci_server
+
+    class _Handler:
+        quote_graph = QuoteGraph(fake_service())
+
+    async def scenario():
+        luci_server.luc1 = _Handler()
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            ok = await client.post("/quotes/european/requote",
+                                   json={'base': BASE, 'changes': {'weight_kg': 5000}})
+            again = await client.post("/quotes/european/requote",
+                                      json={'base': BASE, 'changes': {'weight_kg': 6000}})
+            unknown = await client.post("/quotes/european/requote",
+                                        json={'base': BASE, 'changes': {'color': 'rojo'}})
+            invalid = await client.post("/quotes/european/requote",
+                                        json={'base': BASE, 'changes': {'weight_kg': 'abc'}})
+            negative = await client.post("/quotes/european/requote",
+                                         json={'base': BASE, 'changes': {'weight_kg': -5}})
+        return ok.json(), again.json(), unknown.status_code, invalid, negative.status_code
+
+    ok, again, unknown_status, invalid, negative_status = asyncio.run(scenario())
+    assert ok['success'] and ok['quote']['peso_kg'] == 5000
+    assert again['recomputed'] == ['pricing']
+    assert unknown_status == 422
+    assert invalid.status_code == 422 and invalid.json()['detail'][0]['loc'] == ['weight_kg']
+    assert negative_status == 422
+
+
+if __name__ == "__main__":
+    from conftest import FakeLogisticsService
+    test_only_affected_nodes_recomputed(FakeLogisticsService)
+    test_service_levels_in_one_pass(FakeLogisticsService)
+    test_degraded_results_not_cached(FakeLogisticsService)
+    test_requote_endpoint(FakeLogisticsService)
+    print("✅ Recotización incremental OK")
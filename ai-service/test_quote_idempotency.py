@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test de la idempotencia de las cotizaciones enviadas al backend
+"""
+
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quote_idempotency import IdempotentQuotes, idempotency_key
+
+DATA = {'origen': 'Madrid', 'destino': 'París', 'peso_kg': 1000, 'tipo_carga': 'general',
+        'fecha_recogida': '2030-01-10', 'email_cliente': 'ana@example.com'}
+
+
+class _Response:
+    status_code = 201
+    text = ''
+
+    def __init__(self, quote_id):
+        self.quote_id = quote_id
+
+    def json(self):
+        return {'quoteId': self.quote_id, 'route': {'distance': 1270}, 'costBreakdown': {'total': 2100.0}}
+
+
+def test_canonical_key():
+    """El orden de las claves no cambia el hash; la sesión y los datos sí"""
+    assert idempotency_key('s', {'a': 1, 'b': {'c': 2, 'd': 3}}) == idempotency_key('s', {'b': {'d': 3, 'c': 2}, 'a': 1})
+    assert idempotency_key('s', {'a': 1}) != idempotency_key('t', {'a': 1})
+    assert idempotency_key('s', {'a': 1}) != idempotency_key('s', {'a': 2})
+
+
+def test_in_flight_dedupe_and_ttl():
+    """Llamadas simultáneas comparten un cálculo; los fallos no se guardan y el resultado caduca"""
+    store = IdempotentQuotes(ttl_seconds=0.3)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'quoteId': f'Q{len(calls)}'}
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: store.run('k', compute), range(8)))
+    assert len(calls) == 1 and {r['quoteId'] for r, _ in results} == {'Q1'}
+    assert sorted(source for _, source in results).count('computed') == 1
+
+    assert store.run('k', compute) == ({'quoteId': 'Q1'}, 'replayed')
+    time.sleep(0.35)
+    assert store.run('k', compute)[0]['quoteId'] == 'Q2'
+
+    assert store.run('failed', lambda: None) == (None, 'computed')
+    assert store.run('failed', compute)[1] == 'computed'
+
+
+def test_retry_returns_same_quote_id():
+    """Un reintento del chat no vuelve a crear la cotización en el backend"""
+    import claude_handler
+    from claude_handler import LUC1ClaudeHandler
+
+    handler = LUC1ClaudeHandler()
+    handler.prefetcher = None
+    posts = []
+    lock = threading.Lock()
+
+    def fake_post(url, json=None, headers=None, timeout=None):
+        with lock:
+            posts.append(json)
+            quote_id = f'LUC1-{len(posts)}'
+        time.sleep(0.1)
+        return _Response(quote_id)
+
+    original_post = claude_handler.requests.post
+    claude_handler.requests.post = fake_post
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            first, timed_out_retry = pool.map(lambda _: handler.generate_quotation('s', dict(DATA)), range(2))
+        resubmitted = handler.generate_quotation('s', dict(DATA))
+        changed = handler.generate_quotation('s', {**DATA, 'peso_kg': 2000})
+    finally:
+        claude_handler.requests.post = original_post
+
+    print(f"🔁 {len(posts)} POST al backend para 4 envíos")
+    assert first['quoteId'] == timed_out_retry['quoteId'] == resubmitted['quoteId'] == 'LUC1-1'
+    assert changed['quoteId'] == 'LUC1-2' and len(posts) == 2
+
+
+if __name__ == "__main__":
+    test_canonical_key()
+    test_in_flight_dedupe_and_ttl()
+    test_retry_returns_same_quote_id()
+    print("✅ Idempotencia de cotizaciones OK")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test de la cola asíncrona de cotizaciones
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from quote_jobs import DONE, FAILED, QUEUED, MemoryJobStore, QuoteJobQueue, SQLiteJobStore
+
+
+def _slow_quote(session_id, payload, on_event=None):
+    time.sleep(0.1)
+    if payload.get('destino') == 'Atlantis':
+        raise RuntimeError("destino desconocido")
+    return {'quote': {'quoteId': f"Q-{session_id}"}, 'message': 'lista'}
+
+
+async def _wait_final(queue, job_id):
+    job = queue.get(job_id)
+    while job['status'] not in (DONE, FAILED):
+        job = await queue.wait(job_id, job['status'], timeout=5)
+    return job
+
+
+def test_jobs_run_in_background():
+    """submit responde al momento; los workers completan o marcan el fallo"""
+    async def scenario():
+        queue = QuoteJobQueue(_slow_quote, store=MemoryJobStore(), workers=2)
+        await queue.start()
+        started = time.monotonic()
+        ok = queue.submit('s1', {'destino': 'París'})
+        bad = queue.submit('s2', {'destino': 'Atlantis'})
+        assert time.monotonic() - started < 0.05
+        assert queue.get(ok)['status'] == QUEUED
+
+        ok_job, bad_job = await _wait_final(queue, ok), await _wait_final(queue, bad)
+        await queue.stop()
+        return ok_job, bad_job
+
+    ok_job, bad_job = asyncio.run(scenario())
+    print(f"📦 {ok_job['status']} / {bad_job['status']}")
+    assert ok_job['status'] == DONE and ok_job['result']['quote']['quoteId'] == 'Q-s1'
+    assert bad_job['status'] == FAILED and 'destino desconocido' in bad_job['error']
+
+
+def test_sqlite_jobs_survive_restart():
+    """Los trabajos pendientes en SQLite se reanudan al arrancar de nuevo"""
+    path = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+    now = time.time()
+    SQLiteJobStore(path).create({
+        'job_id': 'job_pendiente', 'session_id': 's9', 'status': 'running',
+        'payload': {'destino': 'Lyon'}, 'created_at': now, 'updated_at': now,
+    })
+
+    async def scenario():
+        queue = QuoteJobQueue(_slow_quote, store=SQLiteJobStore(path), workers=1)
+        await queue.start()
+        job = await _wait_final(queue, 'job_pendiente')
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job['status'] == DONE
+    assert job['result']['quote']['quoteId'] == 'Q-s9'
+
+
+def test_chat_replies_with_job_id():
+    """Con la cola arrancada el chat no espera al backend y expone el estado por HTTP"""
+    import luci_server
+    from claude_handler import LUC1ClaudeHandler
+
+    handler = LUC1ClaudeHandler()
+    handler.prefetcher = None
+
+    def fake_quotation(session_id, quotation_data=None, progress=None):
+        time.sleep(0.2)
+        progress.stage('backend_quote_saved', quote_id='LUC1-TEST')
+        return {'quoteId': 'LUC1-TEST', 'route': {'origin': 'Madrid', 'destination': 'París', 'distance': 1270},
+                'costBreakdown': {'total': 2100.0}}
+
+    handler.generate_quotation = fake_quotation
+
+    async def scenario():
+        handler.quote_jobs = QuoteJobQueue(handler.run_quote_job, store=MemoryJobStore(), workers=1)
+        await handler.quote_jobs.start()
+        luci_server.luc1 = handler
+
+        handler.create_session('s')
+        handler.sessions['s']['quotation_data'] = {
+            'origen': 'Madrid', 'destino': 'París', 'peso_kg': 1000, 'volumen_m3': 3,
+            'tipo_carga': 'general', 'fecha_recogida': '2030-01-10',
+        }
+        started = time.monotonic()
+        response = handler.generate_response("servicio estándar", 's')
+        elapsed = time.monotonic() - started
+        job_id = handler.sessions['s']['quote_job_id']
+
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            async with client.stream("GET", f"/quotes/jobs/{job_id}/events") as events:
+                body = "".join([chunk async for chunk in events.aiter_text()])
+            status = (await client.get(f"/quotes/jobs/{job_id}")).json()
+            missing = await client.get("/quotes/jobs/job_inexistente")
+
+        await handler.quote_jobs.stop()
+        return response, elapsed, body, status, missing.status_code
+
+    response, elapsed, body, status, missing_status = asyncio.run(scenario())
+    print(f"🤖 {response} ({elapsed * 1000:.0f} ms)")
+    assert "Generando" in response and elapsed < 0.2
+    assert body.count("event: status") >= 2 and '"status": "done"' in body
+    assert "event: stage" in body and "backend_quote_saved" in body
+    assert status['job']['status'] == DONE
+    assert missing_status == 404
+    assert "LUC1-TEST" in handler.sessions['s']['messages'][-1]['content']
+
+
+if __name__ == "__main__":
+    test_jobs_run_in_background()
+    test_sqlite_jobs_survive_restart()
+    test_chat_replies_with_job_id()
+    print("✅ Cola de cotizaciones OK")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test del parser local de fechas relativas y unidades
+"""
+
+import sys
+import os
+from datetime import date
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quote_parser import parse_number, parse_pickup_date, parse_volume, parse_weight_kg
+
+# Miércoles
+TODAY = date(2025, 1, 15)
+
+
+def test_relative_dates():
+    """Fechas relativas en español"""
+    cases = {
+        "para mañana": "2025-01-16",
+        "recogida pasado mañana": "2025-01-17",
+        "el lunes por la mañana": "2025-01-20",
+        "el viernes": "2025-01-17",
+        "el miércoles": "2025-01-22",
+        "la próxima semana": "2025-01-20",
+        "en 3 días": "2025-01-18",
+        "dentro de dos semanas": "2025-01-29",
+        "el 3 de febrero": "2025-02-03",
+        "el 10 de enero": "2026-01-10",
+        "20/01/2025": "2025-01-20",
+        "2025-02-01": "2025-02-01",
+        "recoger el 20/1": "2025-01-20",
+        "el día 3-2": "2025-02-03",
+        "en 3-4 días": "2025-01-18",
+    }
+    for text, expected in cases.items():
+        result = parse_pickup_date(text, today=TODAY)
+        print(f"📅 {text!r} -> {result}")
+        assert result == expected, f"{text!r}: {result} != {expected}"
+
+    assert parse_pickup_date("sin fecha todavía", today=TODAY) is None
+    assert parse_pickup_date("llámame por la mañana", today=TODAY) is None
+
+
+def test_next_week_weekday():
+    """Un día de "la próxima semana" cae siempre en la semana siguiente"""
+    monday = date(2026, 10, 19)
+    cases = {
+        "recogida el viernes de la próxima semana": "2026-10-30",
+        "recogida la próxima semana el viernes": "2026-10-30",
+        "el lunes de la semana que viene": "2026-10-26",
+        "el viernes": "2026-10-23",
+    }
+    for text, expected in cases.items():
+        result = parse_pickup_date(text, today=monday)
+        print(f"📅 {text!r} -> {result}")
+        assert result == expected, f"{text!r}: {result} != {expected}"
+
+    # Desde el domingo, "el lunes de la próxima semana" es mañana
+    assert parse_pickup_date("el lunes de la próxima semana", today=date(2026, 10, 25)) == "2026-10-26"
+
+
+def test_invalid_iso_date():
+    """Una fecha ISO inválida no se relee como día/mes"""
+    assert parse_pickup_date("recogida el 2024-13-01", today=TODAY) is None
+    assert parse_pickup_date("2024-13-01", today=TODAY, expects_date=True) is None
+    assert parse_pickup_date("llámame por la mañana", today=TODAY) is None
+
+
+def test_dates_need_pickup_context():
+    """Rangos, fracciones y "hoy" suelto no son fechas de recogida"""
+    for text in ("entre 2-3 toneladas", "1/2 carga", "Hola, hoy necesito cotizar", "20/1", "mañana te llamo"):
+        result = parse_pickup_date(text, today=TODAY)
+        print(f"📅 {text!r} -> {result}")
+        assert result is None, text
+
+    # Respuesta a la pregunta por la fecha (o campo de la herramienta): no hace falta contexto
+    assert parse_pickup_date("20/1", today=TODAY, expects_date=True) == "2025-01-20"
+    assert parse_pickup_date("mañana", today=TODAY, expects_date=True) == "2025-01-16"
+    assert parse_pickup_date("1/2 carga", today=TODAY, expects_date=True) is None
+
+
+def test_numbers_and_weights():
+    """Comas decimales, separadores de miles y unidades de peso"""
+    assert parse_number("1,5") == 1.5
+    assert parse_number("1.500") == 1500
+    assert parse_number("1.500,25") == 1500.25
+    assert parse_weight_kg("1,5 t") == 1500
+    assert parse_weight_kg("2 toneladas") == 2000
+    assert parse_weight_kg("1.200 kg") == 1200
+    assert abs(parse_weight_kg("1000 lb") - 453.592) < 0.01
+    assert parse_weight_kg("3 tableros") is None
+
+    # Rangos: mejor preguntar que quedarse con un extremo
+    assert parse_weight_kg("entre 2-3 toneladas") is None
+    assert parse_weight_kg("entre 2 y 3 t") is None
+    assert parse_weight_kg("2 palés y 3 toneladas") == 3000
+
+
+def test_volumes_and_pallets():
+    """Palés con medidas, palés estándar y dimensiones con unidad"""
+    result = parse_volume("2 palés de 120x80x150 cm")
+    assert result == {'num_pales': 2, 'tipo_pale': 'eur', 'volumen_m3': 2.88}
+
+    result = parse_volume("tres palets americanos")
+    assert result['num_pales'] == 3 and result['tipo_pale'] == 'iso'
+    assert result['volumen_m3'] == 5.4
+
+    assert parse_volume("2,5 m3")['volumen_m3'] == 2.5
+    assert parse_volume("1200x800x1000 mm")['volumen_m3'] == 0.96
+    assert parse_volume("2x1,5x1")['volumen_m3'] == 3.0
+    assert parse_volume("Madrid a París") == {}
+
+
+def test_handler_integration():
+    """extract_quotation_data usa el parser"""
+    from claude_handler import LUC1ClaudeHandler
+
+    handler = LUC1ClaudeHandler()
+    data = handler.extract_quotation_data("2 palés de 120x80x150 cm, 1,5 t, recogida mañana")
+    assert data['peso_kg'] == 1500
+    assert data['volumen_m3'] == 2.88
+    assert data['num_pales'] == 2
+    assert 'fecha_recogida' in data
+
+    data = handler.extract_quotation_data("Hola, hoy necesito cotizar entre 2-3 toneladas")
+    assert 'fecha_recogida' not in data and 'peso_kg' not in data
+    data = handler.extract_quotation_data("peso 2-3 t")
+    assert 'peso_kg' not in data
+    data = handler.extract_quotation_data("mañana", "¿Para qué fecha necesitas la recogida?")
+    assert 'fecha_recogida' in data
+
+
+if __name__ == "__main__":
+    test_relative_dates()
+    test_next_week_weekday()
+    test_invalid_iso_date()
+    test_dates_need_pickup_context()
+    test_numbers_and_weights()
+    test_volumes_and_pallets()
+    test_handler_integration()
+    print("✅ Parser OK")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test de los eventos de progreso del pipeline de cotización
+"""
+
+import sys
+import os
+import asyncio
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from claude_hedging import LatencyTracker
+from quote_progress import (BACKEND_QUOTE_SAVED, QUOTE_PRICED, RESTRICTIONS_CHECKED, ROUTE_RESOLVED, TOLLS_COMPUTED,
+                            QuoteProgress, stage_metrics_snapshot)
+
+# Latencias fijas de las consultas simuladas
+LATENCY = {'route': 0.05, 'tolls': 0.02}
+
+
+def test_stages_emitted_with_metrics(fake_service):
+    """Cada etapa emite un evento con su duración y queda en las métricas"""
+    metrics = LatencyTracker()
+    events = []
+    quote = fake_service(latency=LATENCY).generate_european_quote(
+        {'origin': 'Madrid', 'destination': 'París', 'weight_kg': 15000, 'pickup_date': '2025-03-10'},
+        progress=QuoteProgress(events.append, metrics))
+
+    stages = [event['stage'] for event in events]
+    print(f"📡 {[(e['stage'], e['elapsed_ms']) for e in events]}")
+    assert stages == [ROUTE_RESOLVED, TOLLS_COMPUTED, RESTRICTIONS_CHECKED, QUOTE_PRICED]
+    assert events[0]['data']['distance_km'] == 1270.0
+    assert events[0]['data']['base_estimate_eur'] > 0
+    assert events[0]['elapsed_ms'] >= 50
+    assert events[-1]['data']['total_eur'] == quote['costo_total_eur']
+
+    snapshot = stage_metrics_snapshot(metrics, LatencyTracker())
+    assert set(snapshot) == set(stages)
+    assert snapshot[ROUTE_RESOLVED]['count'] == 1
+
+
+def test_cache_hits_excluded_from_percentiles(fake_service):
+    """Etapas anticipadas y cotizaciones idempotentes no entran en p50/p95"""
+    metrics, cache_hits = LatencyTracker(), LatencyTracker()
+    events = []
+    service = fake_service(latency=LATENCY)
+    prefetched = {'route': asyncio.run(service.get_route_calculation('Madrid', 'París')),
+                  'tolls': {'total_cost': 180.0, 'currency': 'EUR', 'success': True}}
+    service.generate_european_quote(
+        {'origin': 'Madrid', 'destination': 'París', 'weight_kg': 15000, 'pickup_date': '2025-03-10'},
+        prefetched=prefetched, progress=QuoteProgress(events.append, metrics, cache_hits))
+    progress = QuoteProgress(events.append, metrics, cache_hits)
+    progress.stage(BACKEND_QUOTE_SAVED, quote_id='Q-1', idempotent='replayed')
+
+    print(f"📡 {[(e['stage'], e['cached']) for e in events]}")
+    assert [e['stage'] for e in events if e['cached']] == [ROUTE_RESOLVED, TOLLS_COMPUTED, BACKEND_QUOTE_SAVED]
+
+    snapshot = stage_metrics_snapshot(metrics, cache_hits)
+    assert snapshot[ROUTE_RESOLVED] == {'count': 0, 'cache_hits': 1, 'p50_ms': None, 'p95_ms': None}
+    assert snapshot[BACKEND_QUOTE_SAVED]['cache_hits'] == 1
+    assert snapshot[RESTRICTIONS_CHECKED]['count'] == 1 and snapshot[RESTRICTIONS_CHECKED]['cache_hits'] == 0
+
+
+def test_european_quote_stream_endpoint(fake_service):
+    """luci_server emite las etapas como SSE y termina con la cotización"""
+    import luci_server
+
+    class _Handler:
+        logistics_service = fake_service(latency=LATENCY)
+
+    async def scenario():
+        luci_server.luc1 = _Handler()
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            async with client.stream("POST", "/quotes/european/stream",
+                                     json={'destination': 'París', 'weight_kg': 15000,
+                                           'pickup_date': '2025-03-10'}) as response:
+                body = "".join([chunk async for chunk in response.aiter_text()])
+            metrics = (await client.get("/metrics/quote-stages")).json()
+        return body, metrics
+
+    body, metrics = asyncio.run(scenario())
+    assert body.count("event: stage") == 4
+    assert body.index(ROUTE_RESOLVED) < body.index(QUOTE_PRICED) < body.index("event: quote")
+    assert ROUTE_RESOLVED in metrics['stages']
+
+
+if __name__ == "__main__":
+    from conftest import FakeLogisticsService
+    test_stages_emitted_with_metrics(FakeLogisticsService)
+    test_cache_hits_excluded_from_percentiles(FakeLogisticsService)
+    test_european_quote_stream_endpoint(FakeLogisticsService)
+    print("✅ Progreso de cotización OK")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test del validador de respuestas y de la cascada Haiku -> Sonnet
+"""
+
+import sys
+import os
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from claude_handler import LUC1ClaudeHandler
+from reply_validator import is_reask_complaint, requested_fields, validate_reply
+
+CITIES = {'madrid': 'Madrid', 'valencia': 'Valencia', 'lyon': 'Lyon', 'milán': 'Milán'}
+COLLECTED = {'origen': 'Madrid', 'destino': 'Lyon', 'peso_kg': 1200}
+MISSING = ['volumen_m3', 'tipo_carga', 'fecha_recogida', 'tipo_servicio']
+
+# Respuestas correctas que no deben escalar
+ACCEPT = [
+    "Perfecto, 1200 kg de Madrid a Lyon. ¿Qué volumen ocupa la carga en m³?",
+    "Cuando tengas las medidas me las pasas. ¿Qué volumen tiene la mercancía?",
+    "Creo que la ruta por Francia es la mejor opción. ¿Qué tipo de carga es?",
+    "Quizás te interese el express si corre prisa. ¿Qué tipo de servicio prefieres?",
+    "Anotado el destino Lyon. ¿Para qué fecha necesitas la recogida?",
+]
+
+# Respuestas que deben escalar a Sonnet, con el problema esperado
+ESCALATE = [
+    ("¿Desde qué ciudad sale el envío?", 'asks_collected:origen'),
+    ("¿Cuánto pesa la carga?", 'asks_collected:peso_kg'),
+    ("Entendido, 1500 kg de Madrid a Lyon. ¿Qué volumen tiene?", 'contradicts:peso_kg'),
+    ("Perfecto, destino: Milán. ¿Qué volumen tiene?", 'contradicts:destino'),
+    ("No estoy seguro de haber entendido el volumen. ¿Cuántos m³ son?", 'low_confidence'),
+    ("Supongo que te refieres a Lyon. ¿Qué volumen tiene?", 'low_confidence'),
+    ("Gracias por la información.", 'no_question'),
+    ("", 'empty'),
+]
+
+
+def test_field_questions_anchored():
+    """Sólo cuenta el campo que la pregunta pide, no palabras sueltas"""
+    assert requested_fields("¿Cuándo quieres la recogida?") == {'fecha_recogida'}
+    assert requested_fields("¿Qué tipo de servicio prefieres: económico, estándar o express?") == {'tipo_servicio'}
+    assert requested_fields("¿Necesitas algún otro servicio?") == set()
+    assert requested_fields("¿Te aviso cuando esté lista la cotización?") == set()
+    assert requested_fields("La fecha es importante.") == set()  # no es una pregunta
+
+
+def test_accepted_replies():
+    for reply in ACCEPT:
+        issues = validate_reply(reply, COLLECTED, MISSING, CITIES)
+        print(f"✅ {reply} -> {issues}")
+        assert issues == [], reply
+
+
+def test_escalated_replies():
+    for reply, expected in ESCALATE:
+        issues = validate_reply(reply, COLLECTED, MISSING, CITIES)
+        print(f"⬆️ {reply!r} -> {issues}")
+        assert expected in issues, reply
+
+
+def test_reask_complaint():
+    assert is_reask_complaint("Ya te lo dije, son 1200 kg")
+    assert is_reask_complaint("como te dije, a Lyon")
+    assert not is_reask_complaint("Son 1200 kg")
+    assert not is_reask_complaint(None)
+
+
+def _cascade_handler(replies):
+    """Handler cuya llamada a Claude devuelve la respuesta fija de cada modelo"""
+    handler = LUC1ClaudeHandler()
+    calls = []
+
+    def fake_call(messages, session_id, model=None, hedge_model=None, extract_fields=None):
+        calls.append(model)
+        reply = replies.get(model)
+        if reply is not None:
+            handler.sessions[session_id]['last_model'] = model
+        return reply or "Lo siento, ha ocurrido un error."
+
+    handler.call_claude_api = fake_call
+    session_id = handler.create_session("cascada")
+    handler.sessions[session_id]['quotation_data'] = dict(COLLECTED)
+    return handler, session_id, calls
+
+
+def test_cascade_accepts_haiku():
+    handler, session_id, calls = _cascade_handler({LUC1ClaudeHandler.HAIKU_MODEL: ACCEPT[0]})
+    reply, issues = handler._cascade_reply([], session_id, MISSING)
+    assert (reply, issues) == (ACCEPT[0], [])
+    assert calls == [LUC1ClaudeHandler.HAIKU_MODEL]
+    assert handler.cascade_stats['accepted'] == 1
+
+
+def test_cascade_escalates_to_sonnet():
+    sonnet_reply = "Perfecto. ¿Qué volumen tiene la carga?"
+    handler, session_id, calls = _cascade_handler({LUC1ClaudeHandler.HAIKU_MODEL: "¿Cuánto pesa la carga?",
+                                                   LUC1ClaudeHandler.SONNET_MODEL: sonnet_reply})
+    reply, issues = handler._cascade_reply([], session_id, MISSING)
+    assert reply == sonnet_reply
+    assert issues == ['asks_collected:peso_kg']
+    assert calls == [LUC1ClaudeHandler.HAIKU_MODEL, LUC1ClaudeHandler.SONNET_MODEL]
+    assert handler.cascade_stats['escalated'] == 1
+
+
+def test_cascade_keeps_haiku_when_sonnet_fails():
+    haiku_reply = "Gracias por la información."
+    handler, session_id, _ = _cascade_handler({LUC1ClaudeHandler.HAIKU_MODEL: haiku_reply})
+    reply, issues = handler._cascade_reply([], session_id, MISSING)
+    assert reply == haiku_reply and issues == ['no_question']
+    assert handler.sessions[session_id]['last_model'] == LUC1ClaudeHandler.HAIKU_MODEL
+
+
+if __name__ == "__main__":
+    test_field_questions_anchored()
+    test_accepted_replies()
+    test_escalated_replies()
+    test_reask_complaint()
+    test_cascade_accepts_haiku()
+    test_cascade_escalates_to_sonnet()
+    test_cascade_keeps_haiku_when_sonnet_fails()
+    print("✅ Validador de respuestas OK")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test de la segmentación offline de rutas por países
+"""
+
+import sys
+import os
+import time
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from european_logistics import EuropeanLogisticsService
+from polyline_utils import decode_polyline, encode_polyline
+from route_countries import city_coordinates, fallback_path, get_country_grid
+
+
+def test_polyline_roundtrip():
+    """Decodificación vectorizada compatible con el formato de Google"""
+    coords = decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+    assert np.allclose(coords, [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]])
+    assert encode_polyline(coords) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+def test_cities_classified():
+    """Cada ciudad conocida cae en su país"""
+    grid = get_country_grid()
+    expected = {'Madrid': 'ES', 'Lisboa': 'PT', 'París': 'FR', 'Milán': 'IT', 'Múnich': 'DE',
+                'Ginebra': 'CH', 'Innsbruck': 'AT', 'Bruselas': 'BE', 'Róterdam': 'NL',
+                'Praga': 'CZ', 'Wrocław': 'PL'}
+    assert {city: grid.country_of(*city_coordinates(city)) for city in expected} == expected
+
+
+def test_madrid_milan_via_france():
+    """Madrid -> Milán pasa por Francia; km por país en orden de paso"""
+    grid = get_country_grid()
+    path = fallback_path('Madrid', 'Milán')
+    started = time.perf_counter()
+    country_km = grid.country_km(path)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"🗺️  {country_km} en {elapsed_ms:.2f} ms")
+
+    assert list(country_km) == ['ES', 'FR', 'IT']
+    assert all(km > 100 for km in country_km.values())
+    assert elapsed_ms < 20
+
+    berlin = grid.country_km(fallback_path('Barcelona', 'Berlín'))
+    assert list(berlin) == ['ES', 'FR', 'DE']
+
+
+def test_service_segments_routes():
+    """El fallback y las polylines del backend traen países y km por país"""
+    service = EuropeanLogisticsService()
+    fallback = service._fallback_route_calculation('Madrid', 'Milán')
+    assert fallback['countries'] == ['ES', 'FR', 'IT']
+    assert abs(sum(fallback['country_km'].values()) - fallback['distance_km']) < 1
+
+    route = service._with_country_km({
+        'distance_km': 1300.0, 'countries': [], 'success': True,
+        'polyline': encode_polyline(fallback_path('Valencia', 'Lyon')),
+    })
+    assert route['countries'] == ['ES', 'FR']
+    assert abs(sum(route['country_km'].values()) - 1300.0) < 1
+
+    # Destino desconocido: se mantiene la estimación anterior
+    assert service._fallback_route_calculation('Madrid', 'Atlantis')['countries'] == ['ES', 'EU']
+
+
+if __name__ == "__main__":
+    test_polyline_roundtrip()
+    test_cities_classified()
+    test_madrid_milan_via_france()
+    test_service_segments_routes()
+    print("✅ Segmentación de rutas por países OK")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test de la extracción estructurada (tool use) en la llamada de chat
+"""
+
+import sys
+import os
+import json
+from datetime import date
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import claude_handler
+from claude_handler import LUC1ClaudeHandler
+from structured_extraction import QUOTATION_TOOL_NAME, validate_structured_fields
+
+
+class _FakeStream:
+    """Respuesta SSE mínima con texto y un bloque tool_use"""
+
+    status_code = 200
+
+    def __init__(self, events):
+        self.lines = [f"data: {json.dumps(event)}" for event in events]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self.lines)
+
+
+def _events(text, tool_input):
+    """Eventos SSE con un bloque de texto (si text) y el bloque de la herramienta"""
+    encoded = json.dumps(tool_input)
+    text_events = [
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}},
+    ] if text else []
+    return [
+        {"type": "message_start", "message": {"usage": {"input_tokens": 100, "output_tokens": 1}}},
+        *text_events,
+        {"type": "content_block_start", "index": 1,
+         "content_block": {"type": "tool_use", "name": QUOTATION_TOOL_NAME, "input": {}}},
+        {"type": "content_block_delta", "index": 1,
+         "delta": {"type": "input_json_delta", "partial_json": encoded[:10]}},
+        {"type": "content_block_delta", "index": 1,
+         "delta": {"type": "input_json_delta", "partial_json": encoded[10:]}},
+        {"type": "message_delta", "usage": {"output_tokens": 40}},
+    ]
+
+
+def test_validation():
+    """Sólo pasan los valores válidos, normalizados"""
+    today = date(2025, 1, 15)
+    fields = validate_structured_fields({
+        'origen': 'valencia',
+        'destino': 'Lyon',
+        'peso_kg': '1.200',
+        'volumen_m3': -3,
+        'tipo_carga': 'explosivos',
+        'fecha_recogida': '2025-01-20',
+        'tipo_servicio': 'express',
+        'otro': 'x',
+    }, {'valencia': 'Valencia', 'lyon': 'Lyon'}, today=today)
+    print(f"📋 {fields}")
+    assert fields == {'origen': 'Valencia', 'destino': 'Lyon', 'peso_kg': 1200.0,
+                      'fecha_recogida': '2025-01-20', 'tipo_servicio': 'express'}
+
+    # Ciudades: sólo las de la tabla (con o sin acentos); lo demás no se inventa
+    cities = LUC1ClaudeHandler()._known_cities()
+    assert validate_structured_fields({'origen': 'MADRID', 'destino': 'munich'}, cities) == \
+        {'origen': 'Madrid', 'destino': 'Múnich'}
+    assert validate_structured_fields({'origen': 'la capital', 'destino': 'Lyon centro'}, cities) == {}
+    assert validate_structured_fields({'destino': 'coruña'}) == {'destino': 'Coruña'}
+
+    assert validate_structured_fields({'fecha_recogida': '2024-12-01'}, today=today) == {}
+    assert validate_structured_fields({'peso_kg': 90000}) == {}
+    assert validate_structured_fields("no es un dict") == {}
+
+
+def test_tool_fields_merged_in_same_call():
+    """Los campos de la herramienta completan quotation_data sin otra llamada"""
+    handler = LUC1ClaudeHandler()
+    handler.structured_extraction = True
+    handler.fast_path_enabled = False
+    handler.cascade_enabled = False
+    handler.hedging_enabled = False
+
+    posted = []
+
+    def fake_post(session, url, headers=None, json=None, stream=False, timeout=None):
+        posted.append(json)
+        return _FakeStream(_events("¿Qué tipo de servicio prefieres?",
+                                   {"origen": "Madrid", "tipo_carga": "refrigerado", "peso_kg": 99999999}))
+
+    # Las llamadas en streaming van por una sesión cancelable
+    original_post = claude_handler.CancellableSession.post
+    claude_handler.CancellableSession.post = fake_post
+    try:
+        response = handler.generate_response("Llevo yogures desde la capital", "s")
+    finally:
+        claude_handler.CancellableSession.post = original_post
+
+    data = handler.sessions["s"]["quotation_data"]
+    print(f"🤖 {response} | {data}")
+    assert len(posted) == 1
+    assert posted[0]["tools"][0]["name"] == QUOTATION_TOOL_NAME
+    assert response == "¿Qué tipo de servicio prefieres?"
+    assert data["origen"] == "Madrid"
+    assert data["tipo_carga"] == "refrigerado"
+    assert "peso_kg" not in data
+
+
+def _chat_handler(tool_input, text=None):
+    """Handler con la extracción estructurada y una API falsa que devuelve tool_input"""
+    handler = LUC1ClaudeHandler()
+    handler.structured_extraction = True
+    handler.fast_path_enabled = False
+    handler.cascade_enabled = False
+    handler.hedging_enabled = False
+    handler.prefetcher = None
+
+    def fake_post(session, url, headers=None, json=None, stream=False, timeout=None):
+        return _FakeStream(_events(text, tool_input))
+
+    return handler, fake_post
+
+
+def _chat(handler, fake_post, message, session_id="s"):
+    original_post = claude_handler.CancellableSession.post
+    claude_handler.CancellableSession.post = fake_post
+    try:
+        return handler.generate_response(message, session_id)
+    finally:
+        claude_handler.CancellableSession.post = original_post
+
+
+def test_tool_only_response():
+    """Sólo la herramienta, sin texto: se mezclan los campos y pregunta la plantilla"""
+    handler, fake_post = _chat_handler({"origen": "Valencia", "destino": "Lyon"})
+    response = _chat(handler, fake_post, "De la terreta a la ciudad de la luz")
+
+    data = handler.sessions["s"]["quotation_data"]
+    print(f"🤖 {response} | {data}")
+    assert data["origen"] == "Valencia" and data["destino"] == "Lyon"
+    assert response == claude_handler.DialoguePolicy.QUESTION_TEMPLATES["peso_kg"]
+
+
+def test_tool_fields_complete_quote():
+    """Si la herramienta completa los datos, se cotiza en ese mismo turno"""
+    handler, fake_post = _chat_handler({"tipo_servicio": "express"}, text="¿Qué tipo de servicio prefieres?")
+    handler.create_session("s")
+    handler.sessions["s"]["quotation_data"] = {
+        'origen': 'Madrid', 'destino': 'Lyon', 'peso_kg': 1200.0, 'volumen_m3': 10.0,
+        'tipo_carga': 'general', 'fecha_recogida': '2030-01-20'}
+    handler.generate_quotation = lambda session_id: {'quoteId': 'Q-1'}
+    handler.format_quote_response = lambda quote: f"Cotización {quote['quoteId']}"
+
+    response = _chat(handler, fake_post, "Lo quiere cuanto antes, que vaya rápido")
+    print(f"🤖 {response}")
+    assert response == "Cotización Q-1"
+    assert handler.sessions["s"]["quotation_data"]["tipo_servicio"] == "express"
+
+
+if __name__ == "__main__":
+    test_validation()
+    test_tool_fields_merged_in_same_call()
+    test_tool_only_response()
+    test_tool_fields_complete_quote()
+    print("✅ Extracción estructurada OK")
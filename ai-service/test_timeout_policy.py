@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Test de los timeouts adaptativos y del plazo de la petición
+"""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import numpy as np
+import requests
+
+import claude_handler
+import european_logistics
+from circuit_breaker import CircuitBreaker
+from european_logistics import EuropeanLogisticsService
+from timeout_policy import (TIMEOUTS, DeadlineExceeded, LatencyHistogram, TimeoutPolicy, in_context,
+                            remaining_seconds, request_deadline)
+
+
+def test_histogram_percentiles():
+    """Los cubos logarítmicos dan el percentil con un error de un cubo (~15%)"""
+    histogram = LatencyHistogram()
+    samples = np.random.default_rng(2).uniform(0.1, 1.0, 400)
+    for seconds in samples:
+        histogram.record(seconds)
+    exact = np.percentile(samples, 99)
+    assert exact <= histogram.percentile(99) <= exact * 1.16
+
+
+def test_timeout_from_percentile_capped_by_default_and_deadline():
+    """Sin muestras, el timeout fijo; después p99 + margen, sin pasar del fijo ni del plazo"""
+    policy = TimeoutPolicy(percentile=99, margin_ratio=0.5, margin_seconds=0.25, min_samples=20)
+    assert policy.timeout('openroute', 15) == 15
+    for _ in range(50):
+        policy.record('openroute', 0.2)
+    adaptive = policy.timeout('openroute', 15)
+    print(f"⏱️  timeout adaptativo de openroute: {adaptive:.2f} s")
+    assert 0.55 <= adaptive <= 0.65
+    assert policy.timeout('openroute', 0.5) == 0.5
+
+    with request_deadline(0.3):
+        assert policy.timeout('openroute', 15) <= 0.3
+        # Un plazo interior más largo no amplía el exterior
+        with request_deadline(10):
+            assert remaining_seconds() <= 0.3
+
+    calls = []
+    with request_deadline(0):
+        try:
+            policy.call('openroute', 15, lambda timeout: calls.append(timeout))
+            assert False, "debía vencer el plazo"
+        except DeadlineExceeded:
+            pass
+    assert not calls
+
+
+def test_timeouts_grow_when_upstream_slows_down():
+    """Los timeouts propios cuentan como muestras: el timeout sube hasta cubrir la nueva latencia"""
+    policy = TimeoutPolicy(percentile=99, margin_ratio=0.5, margin_seconds=0.25, min_samples=20)
+    for _ in range(100):
+        policy.record('tollguru', 0.2)
+
+    def slow_upstream(timeout):
+        if timeout < 3.0:
+            raise requests.Timeout()
+        return 'ok'
+
+    timeouts = []
+    for _ in range(30):
+        timeouts.append(policy.timeout('tollguru', 15))
+        try:
+            if policy.call('tollguru', 15, slow_upstream) == 'ok':
+                break
+        except requests.Timeout:
+            pass
+    assert timeouts[-1] >= 3.0 and timeouts == sorted(timeouts)
+
+
+def test_deadline_reaches_threads_and_logistics_calls():
+    """El plazo llega a los hilos que copian el contexto y recorta el timeout de los endpoints"""
+    service = EuropeanLogisticsService()
+    seen = []
+
+    def backend(url, json=None, timeout=None):
+        seen.append(timeout)
+        raise requests.ConnectionError("caído")
+
+    original_post = european_logistics.requests.post
+    european_logistics.requests.post = backend
+    try:
+        with request_deadline(0.5), ThreadPoolExecutor(1) as pool:
+            pool.submit(in_context(service._get_live_incidents), ['ES'], '2025-03-11', '2025-03-11', {}).result()
+            assert pool.submit(remaining_seconds).result() is None
+        with request_deadline(0):
+            assert service._get_live_incidents(['ES'], '2025-03-11', '2025-03-11', {}) is None
+    finally:
+        european_logistics.requests.post = original_post
+
+    assert len(seen) == 1 and seen[0] <= 0.5
+    # El plazo vencido no llega al upstream ni cuenta como fallo del circuito
+    assert service.breakers['restrictions'].snapshot()['consecutive_failures'] == 1
+    assert service.breakers['restrictions'].state == CircuitBreaker.CLOSED
+
+
+def test_deadline_timeout_not_a_circuit_failure():
+    """Un timeout recortado por el plazo sale como DeadlineExceeded y no abre el circuito"""
+    service = EuropeanLogisticsService()
+
+    def backend(url, json=None, timeout=None):
+        raise requests.Timeout()
+
+    original_post = european_logistics.requests.post
+    european_logistics.requests.post = backend
+    try:
+        with request_deadline(0.2):
+            try:
+                service._post('restrictions', {}, timeout=10)
+                assert False, "debía vencer el plazo"
+            except DeadlineExceeded:
+                pass
+        assert service.breakers['restrictions'].snapshot()['consecutive_failures'] == 0
+
+        # Sin plazo que lo recorte, el timeout sí es del upstream
+        try:
+            service._post('restrictions', {}, timeout=10)
+        except requests.Timeout:
+            pass
+    finally:
+        european_logistics.requests.post = original_post
+    assert service.breakers['restrictions'].snapshot()['consecutive_failures'] == 1
+
+
+def test_stream_and_backend_quote_timeouts():
+    """Streaming: (conexión aprendida, lectura holgada); POST de cotización: 60 s fijos recortados por el plazo"""
+    handler = claude_handler.LUC1ClaudeHandler()
+    handler.prefetcher = None
+    seen = {'stream': [], 'backend': []}
+
+    def stream_post(session, url, timeout=None, **kwargs):
+        seen['stream'].append(timeout)
+        raise requests.ConnectionError("caído")
+
+    def backend_post(url, json=None, headers=None, timeout=None):
+        seen['backend'].append(timeout)
+        raise requests.ConnectionError("caído")
+
+    original_stream_post = claude_handler.CancellableSession.post
+    original_post = claude_handler.requests.post
+    claude_handler.CancellableSession.post = stream_post
+    claude_handler.requests.post = backend_post
+    try:
+        for deadline in (None, 5):
+            with request_deadline(deadline):
+                try:
+                    handler._stream_claude({'model': 'sonnet', 'messages': []}, threading.Event(), threading.Event())
+                except requests.ConnectionError:
+                    pass
+
+        for _ in range(50):
+            TIMEOUTS.record('backend_quote', 0.1)
+        data = {'origen': 'Madrid', 'destino': 'París', 'volumen_m3': 40, 'tipo_carga': 'general',
+                'fecha_recogida': '2030-03-10', 'tipo_servicio': 'estandar'}
+        handler.generate_quotation('s', {**data, 'peso_kg': 15000})
+        with request_deadline(5):
+            handler.generate_quotation('s', {**data, 'peso_kg': 16000})
+    finally:
+        claude_handler.CancellableSession.post = original_stream_post
+        claude_handler.requests.post = original_post
+
+    print(f"⏱️  stream {seen['stream']} | backend {seen['backend']}")
+    (connect, read), (short_connect, short_read) = seen['stream']
+    assert connect <= 30 and read == handler.stream_read_timeout
+    assert short_connect <= 5 and short_read <= 5
+    assert seen['backend'][0] == 60 and seen['backend'][1] <= 5
+
+
+def test_streaming_endpoints_without_default_deadline():
+    """Los endpoints SSE no heredan el plazo por defecto; la cabecera sí se respeta"""
+    import luci_server
+
+    class _Service:
+        def generate_european_quote(self, quote_data, progress=None):
+            return {'remaining': remaining_seconds()}
+
+    class _Handler:
+        logistics_service = _Service()
+
+    async def scenario():
+        luci_server.luc1 = _Handler()
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            body = {'destination': 'París'}
+            unbounded = await client.post("/quotes/european/stream", json=body)
+            bounded = await client.post("/quotes/european/stream", json=body, headers={'X-Request-Timeout': '30'})
+        return unbounded.text, bounded.text
+
+    def quote_event(text):
+        return json.loads(text.split("event: quote\ndata: ")[1].split("\n")[0])
+
+    unbounded, bounded = asyncio.run(scenario())
+    assert quote_event(unbounded)['remaining'] is None
+    assert 0 < quote_event(bounded)['remaining'] <= 30
+    assert luci_server.STREAMING_PATHS.match('/quotes/jobs/abc/events')
+    assert not luci_server.STREAMING_PATHS.match('/quotes/european/requote')
+
+
+def test_request_deadline_header():
+    """X-Request-Timeout acorta el plazo que ven los endpoints (también dentro de asyncio.to_thread)"""
+    import luci_server
+
+    class _DeadlineQuoter:
+        def quote(self, quote_data, stops, optimize_order):
+            return {'remaining': remaining_seconds()}
+
+    class _Handler:
+        multi_stop = _DeadlineQuoter()
+
+    async def scenario():
+        luci_server.luc1 = _Handler()
+        transport = httpx.ASGITransport(app=luci_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://luc1") as client:
+            body = {'origin': 'Barcelona', 'stops': ['Lyon']}
+            short = await client.post("/quotes/european/multi-stop", json=body, headers={'X-Request-Timeout': '2'})
+            default = await client.post("/quotes/european/multi-stop", json=body)
+            metrics = await client.get("/metrics/timeouts")
+        return short.json(), default.json(), metrics.json()
+
+    short, default, metrics = asyncio.run(scenario())
+    assert 0 < short['quote']['remaining'] <= 2
+    assert 2 < default['quote']['remaining'] <= float(os.getenv('REQUEST_DEADLINE_SECONDS', 90))
+    assert metrics['success']
+
+
+if __name__ == "__main__":
+    test_histogram_percentiles()
+    test_timeout_from_percentile_capped_by_default_and_deadline()
+    test_timeouts_grow_when_upstream_slows_down()
+    test_deadline_reaches_threads_and_logistics_calls()
+    test_deadline_timeout_not_a_circuit_failure()
+    test_stream_and_backend_quote_timeouts()
+    test_streaming_endpoints_without_default_deadline()
+    test_request_deadline_header()
+    print("✅ Timeouts adaptativos OK")
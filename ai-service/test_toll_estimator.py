@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test del estimador offline de peajes
+"""
+
+import sys
+import os
+import asyncio
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from european_logistics import EuropeanLogisticsService
+from polyline_utils import encode_polyline
+from route_countries import fallback_path
+from toll_estimator import estimate_route_tolls, estimate_tolls, validate_upstream
+
+
+def test_rates_by_country_and_vehicle():
+    """Las tarifas dependen del país, la clase de vehículo y la clase Euro"""
+    service = EuropeanLogisticsService()
+    trailer, van = service._get_vehicle_specs(20000), service._get_vehicle_specs(2000)
+    country_km = {'ES': 600.0, 'FR': 400.0, 'DE': 300.0}
+
+    tolls = estimate_tolls(country_km, trailer)
+    by_country = {row['country']: row['cost'] for row in tolls['breakdown']}
+    print(f"💶 {by_country} = {tolls['total_cost']} EUR")
+    assert tolls['success'] and tolls['estimated']
+    assert by_country['DE'] > by_country['FR'] > by_country['ES'] > 0
+    assert estimate_tolls(country_km, van)['breakdown'][2]['cost'] == 0  # furgonetas sin Maut
+    assert estimate_tolls(country_km, {**trailer, 'emission_class': 'euro5'})['total_cost'] > tolls['total_cost']
+
+    # Sin km por país se reparte la distancia entre los países de la ruta
+    split = estimate_route_tolls({'distance_km': 1300.0, 'countries': ['ES', 'FR']}, trailer)
+    assert [row['km'] for row in split['breakdown']] == [650.0, 650.0]
+
+
+def test_upstream_validated_or_replaced():
+    """Un 0 del backend se sustituye; una desviación grande se marca"""
+    estimate = {'total_cost': 200.0, 'currency': 'EUR', 'estimated': True, 'success': True}
+    assert validate_upstream({'total_cost': 0, 'success': True}, estimate)['total_cost'] == 200.0
+    assert validate_upstream({'total_cost': 180.0, 'success': True}, estimate)['validated']
+    assert not validate_upstream({'total_cost': 2000.0, 'success': True}, estimate)['validated']
+
+
+def test_quotes_never_go_out_without_tolls():
+    """Sin backend, tanto con polyline como sin ella, la cotización lleva peajes"""
+    service = EuropeanLogisticsService()
+    service.endpoints['tollguru'] = 'http://127.0.0.1:9/api/tolls'
+    specs = service._get_vehicle_specs(15000)
+
+    polyline = encode_polyline(fallback_path('Madrid', 'Milán'))
+    tolls = asyncio.run(service.get_toll_calculation(polyline, specs))
+    assert tolls['estimated'] and tolls['countries'] == ['ES', 'FR', 'IT'] and tolls['total_cost'] > 0
+
+    route = service._fallback_route_calculation('Madrid', 'Milán')
+    quote = service.generate_european_quote(
+        {'destination': 'Milán', 'weight_kg': 15000, 'pickup_date': '2025-03-10'},
+        prefetched={'route': route, 'restrictions': {'restrictions': [], 'holidays': [], 'critical_alerts': 0}})
+    assert quote['costo_peajes_eur'] > 0 and quote['peajes_estimados']
+
+
+if __name__ == "__main__":
+    test_rates_by_country_and_vehicle()
+    test_upstream_validated_or_replaced()
+    test_quotes_never_go_out_without_tolls()
+    print("✅ Estimador de peajes OK")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test del calendario local de festivos y prohibiciones de camiones
+"""
+
+import sys
+import os
+import asyncio
+import threading
+from datetime import date, datetime
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from european_logistics import EuropeanLogisticsService
+from truck_calendar import HORIZON_YEARS, IntervalIndex, TruckCalendar, easter_sundays
+
+
+def test_easter_and_movable_holidays():
+    """Pascua de muchos años a la vez y festivos móviles derivados"""
+    easter = easter_sundays(np.array([2000, 2019, 2024, 2025, 2038]))
+    assert [str(d) for d in easter] == ['2000-04-23', '2019-04-21', '2024-03-31', '2025-04-20', '2038-04-25']
+
+    calendar = TruckCalendar(2024, 2026)
+    names = {h['date']: h['name'] for h in calendar.holidays('DE', date(2025, 4, 1), date(2025, 6, 30))}
+    print(f"🗓️  {names}")
+    assert names['2025-04-18'] == 'Viernes Santo'
+    assert names['2025-04-21'] == 'Lunes de Pascua'
+    assert names['2025-05-29'] == 'Ascensión'
+    assert names['2025-06-09'] == 'Lunes de Pentecostés'
+    assert calendar.holidays('ES', date(2025, 12, 6), date(2025, 12, 8))[-1]['name'] == 'Inmaculada Concepción'
+
+    # Fuera del rango precalculado se amplía al vuelo
+    assert calendar.holidays('FR', date(2031, 7, 14), date(2031, 7, 14))[0]['name'] == 'Fiesta Nacional'
+    assert calendar.last_year >= 2031
+
+
+def test_truck_bans_by_country():
+    """Domingo en DE, noches en AT/CH, víspera y festivo en FR, sin prohibición para furgonetas"""
+    calendar = TruckCalendar(2024, 2026)
+    sunday = datetime(2025, 3, 9)
+    assert [b['type'] for b in calendar.bans('DE', sunday, datetime(2025, 3, 10))] == ['weekend_ban']
+    assert calendar.bans('DE', datetime(2025, 3, 9, 22), datetime(2025, 3, 10, 6)) == []
+    assert calendar.bans('DE', sunday, datetime(2025, 3, 10), heavy=False) == []
+
+    tuesday_night = calendar.bans('AT', datetime(2025, 3, 11, 23), datetime(2025, 3, 12, 1))
+    assert [b['type'] for b in tuesday_night] == ['night_ban']
+    assert [b['type'] for b in calendar.bans('CH', datetime(2025, 3, 12, 4), datetime(2025, 3, 12, 5))] \
+        == ['night_ban']
+
+    bastille = calendar.bans('FR', datetime(2025, 7, 13, 23), datetime(2025, 7, 14))
+    assert bastille[0]['type'] == 'holiday_ban' and bastille[0]['start'] == '2025-07-13 22:00'
+
+    # Sólo los días en que la prohibición ocupa la jornada cuentan como bloqueados
+    assert list(calendar.blocked_days('AT', date(2025, 3, 8), 3)) == [False, True, False]
+    assert list(calendar.blocked_days('IT', date(2025, 12, 25), 1)) == [True]
+    assert not calendar.blocked_days('ES', date(2025, 3, 8), 7).any()
+
+
+def test_interval_index_matches_linear_scan():
+    """Las dos búsquedas binarias devuelven lo mismo que recorrer todos los intervalos"""
+    rng = np.random.default_rng(7)
+    starts = rng.integers(0, 10_000, 2_000).astype('datetime64[m]')
+    ends = starts + rng.integers(1, 600, 2_000).astype('timedelta64[m]')
+    index = IntervalIndex(starts, ends, [str(i) for i in range(2_000)])
+
+    for query_start in rng.integers(0, 10_000, 50):
+        a = np.datetime64(int(query_start), 'm')
+        b = a + np.timedelta64(90, 'm')
+        expected = {str(i) for i in range(2_000) if starts[i] < b and ends[i] > a}
+        assert {label for _, _, label in index.overlapping(a, b)} == expected
+
+
+def test_extension_is_atomic_and_bounded():
+    """Ampliar años no deja índices vacíos a la vista y no pasa del horizonte"""
+    this_year = date.today().year
+    calendar = TruckCalendar(this_year, this_year + 1)
+    christmas = date(this_year, 12, 25)
+    misses = []
+
+    def reader():
+        for _ in range(200):
+            if not calendar.holidays('ES', christmas, christmas):
+                misses.append(1)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for offset in range(2, 12):
+        calendar.holidays('FR', date(this_year + offset, 1, 1), date(this_year + offset, 1, 1))
+    for thread in threads:
+        thread.join()
+    assert not misses
+
+    # Fechas absurdas: no hay festivos y el rango no crece más allá del horizonte
+    assert calendar.holidays('ES', date(9999, 1, 1), date(9999, 12, 31)) == []
+    assert calendar.bans('DE', datetime(9999, 1, 3), datetime(9999, 1, 4)) == []
+    print(f"📅 Años precalculados: {calendar.first_year}-{calendar.last_year}")
+    assert calendar.last_year <= this_year + HORIZON_YEARS + 1
+
+
+def test_service_uses_local_calendar():
+    """Sin backend las restricciones salen del calendario local"""
+    service = EuropeanLogisticsService()
+    service.endpoints['restrictions'] = 'http://127.0.0.1:9/api/restrictions'
+    result = asyncio.run(service.get_restrictions_and_holidays(
+        ['ES', 'FR', 'DE'], '2025-05-01', service._get_vehicle_specs(15000)))
+
+    assert not result['live_incidents']
+    assert {h['country'] for h in result['holidays']} == {'ES', 'FR', 'DE'}
+    assert {a['country'] for a in result['restrictions']} == {'FR', 'DE'}
+    assert result['critical_alerts'] == 2
+
+
+if __name__ == "__main__":
+    test_easter_and_movable_holidays()
+    test_truck_bans_by_country()
+    test_interval_index_matches_linear_scan()
+    test_extension_is_atomic_and_bounded()
+    test_service_uses_local_calendar()
+    print("✅ Calendario de festivos y prohibiciones OK")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Timeouts adaptativos por upstream y plazo de la petición HTTP
+Cada upstream (Claude, backend, rutas, peajes, restricciones, Ollama) lleva un
+histograma de latencias en cubos logarítmicos que se va olvidando a la mitad
+cada cierto número de muestras. El timeout de cada llamada es un percentil
+alto más un margen, nunca mayor que el valor fijo de antes ni que lo que
+queda del plazo de la petición. El plazo viaja en un ContextVar: lo fija el
+middleware de luci_server y lo heredan asyncio.to_thread, asyncio.run y los
+executors que copian el contexto.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import requests
+
+# Límites superiores de los cubos: de 5 ms a 5 min, ~15% de anchura cada uno
+BUCKET_BOUNDS = np.geomspace(0.005, 300.0, 80)
+# Un timeout nunca baja de aquí aunque el upstream responda muy rápido
+MIN_TIMEOUT_SECONDS = 0.5
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """El plazo de la petición ya venció: no se llama al upstream"""
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]):
+    """Plazo (en segundos desde ahora) para todo lo que se ejecute dentro; None = sin plazo"""
+    deadline = time.monotonic() + seconds if seconds is not None else None
+    current = _deadline.get()
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_seconds() -> Optional[float]:
+    """Segundos que quedan del plazo de la petición (None si no hay plazo)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline(upstream: str = None):
+    """Lanza DeadlineExceeded si el plazo de la petición ya venció"""
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"plazo de la petición vencido{f' antes de {upstream}' if upstream else ''}")
+
+
+def deadline_capped(seconds: float, upstream: str = None) -> float:
+    """Timeout fijo (no adaptativo) recortado por lo que queda del plazo de la petición"""
+    check_deadline(upstream)
+    remaining = remaining_seconds()
+    return seconds if remaining is None else min(seconds, remaining)
+
+
+def in_context(fn: Callable) -> Callable:
+    """fn ligada al contexto actual (plazo incluido) para ejecutarla en otro hilo"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+class LatencyHistogram:
+    """Histograma de latencias en cubos logarítmicos con olvido exponencial"""
+
+    def __init__(self, half_life: int = 500):
+        self.half_life = half_life
+        self.counts = np.zeros(len(BUCKET_BOUNDS) + 1)
+        self.samples = 0
+
+    def record(self, seconds: float):
+        self.counts[np.searchsorted(BUCKET_BOUNDS, seconds)] += 1
+        self.samples += 1
+        if self.samples % self.half_life == 0:
+            self.counts *= 0.5
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Límite superior del cubo que contiene el percentil p (0-100)"""
+        cumulative = np.cumsum(self.counts)
+        if not cumulative[-1]:
+            return None
+        index = int(np.searchsorted(cumulative, p / 100 * cumulative[-1]))
+        return float(BUCKET_BOUNDS[min(index, len(BUCKET_BOUNDS) - 1)])
+
+
+class TimeoutPolicy:
+    def __init__(self, percentile: float = None, margin_ratio: float = None, margin_seconds: float = None,
+                 min_samples: int = None):
+        self.percentile = percentile if percentile is not None else float(
+            os.getenv('UPSTREAM_TIMEOUT_PERCENTILE', 99))
+        self.margin_ratio = margin_ratio if margin_ratio is not None else float(
+            os.getenv('UPSTREAM_TIMEOUT_MARGIN_RATIO', 0.5))
+        self.margin_seconds = margin_seconds if margin_seconds is not None else float(
+            os.getenv('UPSTREAM_TIMEOUT_MARGIN_SECONDS', 0.25))
+        self.min_samples = min_samples if min_samples is not None else int(
+            os.getenv('UPSTREAM_TIMEOUT_MIN_SAMPLES', 20))
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, upstream: str, seconds: float):
+        with self._lock:
+            self._histograms.setdefault(upstream, LatencyHistogram()).record(seconds)
+
+    def _adaptive(self, upstream: str, default: float) -> float:
+        """Percentil alto + margen, entre MIN_TIMEOUT_SECONDS y el timeout fijo; el fijo sin muestras suficientes"""
+        with self._lock:
+            histogram = self._histograms.get(upstream)
+            if not histogram or histogram.samples < self.min_samples:
+                return default
+            value = histogram.percentile(self.percentile)
+        return min(default, max(MIN_TIMEOUT_SECONDS, value * (1 + self.margin_ratio) + self.margin_seconds))
+
+    def _timeout(self, upstream: str, default: float) -> Tuple[float, bool]:
+        """(timeout, recortado por el plazo de la petición)"""
+        check_deadline(upstream)
+        timeout = self._adaptive(upstream, default)
+        remaining = remaining_seconds()
+        if remaining is not None and remaining < timeout:
+            return remaining, True
+        return timeout, False
+
+    def timeout(self, upstream: str, default: float) -> float:
+        """Timeout para la próxima llamada a upstream (default: el timeout fijo, que hace de techo)"""
+        return self._timeout(upstream, default)[0]
+
+    def call(self, upstream: str, default: float, fn: Callable[[float], object]):
+        """
+        fn(timeout) con el timeout de upstream, registrando su latencia. Un
+        timeout propio cuenta como muestra de ese valor para que el percentil
+        suba; uno recortado por el plazo de la petición no dice nada del upstream
+        y se propaga como DeadlineExceeded.
+        """
+        timeout, capped = self._timeout(upstream, default)
+        started = time.monotonic()
+        try:
+            result = fn(timeout)
+        except (requests.Timeout, TimeoutError) as e:
+            if capped:
+                raise DeadlineExceeded(f"plazo de la petición vencido esperando a {upstream}") from e
+            self.record(upstream, timeout)
+            raise
+        self.record(upstream, time.monotonic() - started)
+        return result
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Muestras, percentil y timeout actual de cada upstream"""
+        with self._lock:
+            upstreams = {name: (h.samples, h.percentile(50), h.percentile(self.percentile))
+                         for name, h in self._histograms.items()}
+        return {name: {'samples': samples,
+                       'p50_s': p50,
+                       f'p{self.percentile:g}_s': high,
+                       'timeout_s': round(self._adaptive(name, float('inf')), 3) if samples >= self.min_samples else None}
+                for name, (samples, p50, high) in upstreams.items()}
+
+
+TIMEOUTS = TimeoutPolicy()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Estimador offline de peajes para camiones por país
+Tarifas medias por km (EUR, Euro 6) de cada país y clase de vehículo, ponderadas
+por la fracción de la ruta que suele ir por vías de pago. Con los km por país de
+la ruta el coste sale de una sola operación vectorizada, sin red; sirve de
+respaldo cuando /api/tolls falla o tarda y para validar lo que devuelve.
+"""
+
+from typing import Dict
+
+import numpy as np
+from loguru import logger
+
+# Clases de vehículo: furgoneta (≤ 3,5 t), rígido de 3 ejes, articulado de 5 ejes
+VEHICLE_CLASSES = ('van', 'rigid', 'articulated')
+
+# EUR/km en vías de pago por clase de vehículo (Euro 6)
+TOLL_RATES_EUR_KM = {
+    'ES': (0.08, 0.12, 0.15),
+    'PT': (0.07, 0.12, 0.18),
+    'FR': (0.10, 0.17, 0.25),
+    'IT': (0.08, 0.12, 0.17),
+    'CH': (0.00, 0.62, 0.95),   # LSVA/RPLP: todas las carreteras, según peso
+    'AT': (0.00, 0.30, 0.48),   # furgonetas: viñeta
+    'DE': (0.00, 0.27, 0.35),   # furgonetas exentas de la Maut
+    'LU': (0.00, 0.01, 0.01),   # Eurovignette por tiempo
+    'BE': (0.00, 0.14, 0.17),
+    'NL': (0.00, 0.12, 0.16),
+    'CZ': (0.00, 0.14, 0.22),
+    'PL': (0.00, 0.09, 0.12),
+    'EU': (0.05, 0.12, 0.18),   # país desconocido: media
+}
+# Fracción de los km del país que van por vías de pago
+TOLLED_SHARE = {
+    'ES': 0.15, 'PT': 0.6, 'FR': 0.6, 'IT': 0.8, 'CH': 1.0, 'AT': 0.85, 'DE': 0.9,
+    'LU': 1.0, 'BE': 0.9, 'NL': 0.9, 'CZ': 0.7, 'PL': 0.5, 'EU': 0.5,
+}
+EURO_CLASS_FACTORS = {'euro6': 1.0, 'euro5': 1.15, 'euro4': 1.3}
+
+TOLL_COUNTRIES = tuple(TOLL_RATES_EUR_KM)
+_COUNTRY_INDEX = {country: i for i, country in enumerate(TOLL_COUNTRIES)}
+_RATES = np.array([TOLL_RATES_EUR_KM[c] for c in TOLL_COUNTRIES]) * \
+    np.array([TOLLED_SHARE[c] for c in TOLL_COUNTRIES])[:, None]
+
+# Un peaje del backend fuera de [mín, máx] x estimación se marca como dudoso
+UPSTREAM_RATIO_RANGE = (0.3, 3.0)
+
+
+def vehicle_class(vehicle_specs: Dict) -> int:
+    """Índice en VEHICLE_CLASSES a partir de _get_vehicle_specs"""
+    if vehicle_specs.get('type') == 'van':
+        return 0
+    return 2 if vehicle_specs.get('axles', 5) >= 5 else 1
+
+
+def route_country_km(route: Dict) -> Dict[str, float]:
+    """Km por país de la ruta; sin segmentación, la distancia a partes iguales entre sus países"""
+    if route.get('country_km'):
+        return route['country_km']
+    countries = route.get('countries') or ['EU']
+    share = float(route.get('distance_km', 0)) / len(countries)
+    return {country: share for country in countries}
+
+
+def estimate_tolls(country_km: Dict[str, float], vehicle_specs: Dict) -> Dict:
+    """Peajes estimados con el formato de get_toll_calculation"""
+    countries = list(country_km)
+    km = np.array([country_km[c] for c in countries], dtype=np.float64)
+    rows = np.array([_COUNTRY_INDEX.get(c, _COUNTRY_INDEX['EU']) for c in countries], dtype=np.int64)
+    factor = EURO_CLASS_FACTORS.get(vehicle_specs.get('emission_class', 'euro6'), 1.0)
+    costs = km * _RATES[rows, vehicle_class(vehicle_specs)] * factor if countries else np.zeros(0)
+
+    return {
+        'total_cost': round(float(costs.sum()), 2),
+        'currency': 'EUR',
+        'breakdown': [{'country': c, 'km': round(float(k), 1), 'cost': round(float(cost), 2)}
+                      for c, k, cost in zip(countries, km, costs)],
+        'countries': countries,
+        'estimated': True,
+        'success': True
+    }
+
+
+def validate_upstream(upstream: Dict, estimate: Dict) -> Dict:
+    """
+    Contrastar el peaje del backend con la estimación local: un 0 con km de pago
+    se sustituye; una desviación fuera de UPSTREAM_RATIO_RANGE se marca
+    """
+    expected = estimate['total_cost']
+    upstream['estimated_cost'] = expected
+    if expected <= 0:
+        return upstream
+    if not upstream.get('total_cost'):
+        logger.warning(f"Peaje del backend a 0; se usa la estimación local ({expected} EUR)")
+        return {**estimate, 'upstream_cost': 0}
+
+    ratio = upstream['total_cost'] / expected
+    upstream['validated'] = UPSTREAM_RATIO_RANGE[0] <= ratio <= UPSTREAM_RATIO_RANGE[1]
+    if not upstream['validated']:
+        logger.warning(f"Peaje del backend {upstream['total_cost']} EUR lejos de la estimación {expected} EUR")
+    return upstream
+
+
+def estimate_route_tolls(route: Dict, vehicle_specs: Dict) -> Dict:
+    """Estimación para una ruta (usa 'country_km' si la trae)"""
+    return estimate_tolls(route_country_km(route), vehicle_specs)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Entrenamiento offline del router de modelos de LUC1
+Lee el registro de turnos (ROUTER_TURN_LOG) y genera router_weights.json
+
+Uso: python train_router.py turns.jsonl [router_weights.json]
+"""
+
+import sys
+import os
+import random
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from claude_handler import LUC1ClaudeHandler
+from model_router import RouterClassifier, extract_features, load_turns, turn_label
+
+
+def build_examples(turns, cheap_model, total_required=7):
+    examples = []
+    for turn in turns:
+        labeled = turn_label(turn, cheap_model)
+        if labeled is None:
+            continue
+        label, weight = labeled
+        features = extract_features(turn.get('message', ''), turn.get('filled_count', 0), total_required)
+        examples.append((features, label, weight))
+    return examples
+
+
+def train_classifier(examples, epochs=None, seed=42):
+    """Clasificador entrenado con los ejemplos en orden aleatorio reproducible"""
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    classifier = RouterClassifier()
+    classifier.train(examples, epochs=epochs if epochs is not None else int(os.getenv('ROUTER_EPOCHS', 10)))
+    return classifier
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    log_path = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'router_weights.json')
+
+    examples = build_examples(load_turns(log_path), LUC1ClaudeHandler.HAIKU_MODEL)
+    if not examples:
+        print("❌ No hay turnos etiquetables en el registro")
+        sys.exit(1)
+
+    classifier = train_classifier(examples)
+    classifier.save(output_path)
+
+    positives = sum(label for _, label, _ in examples)
+    print(f"✅ Router entrenado con {len(examples)} turnos ({positives} resolubles por Haiku)")
+    print(f"📁 Pesos guardados en {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Calendario local de festivos y prohibiciones de circulación de camiones en Europa
+Festivos fijos y móviles (calculados a partir de la Pascua para muchos años de
+una vez) y ventanas de prohibición por país (domingos en DE, noches en AT/CH,
+festivos en FR/IT...) en un índice de intervalos ordenado: cada consulta por
+(país, rango de fechas) es una búsqueda binaria, O(log n).
+Cambian unas pocas veces al año; el backend sólo aporta incidencias en vivo.
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Festivos nacionales fijos: (mes, día, nombre)
+FIXED_HOLIDAYS = {
+    'ES': [(1, 1, 'Año Nuevo'), (1, 6, 'Epifanía'), (5, 1, 'Día del Trabajo'), (8, 15, 'Asunción'),
+           (10, 12, 'Fiesta Nacional'), (11, 1, 'Todos los Santos'), (12, 6, 'Día de la Constitución'),
+           (12, 8, 'Inmaculada Concepción'), (12, 25, 'Navidad')],
+    'FR': [(1, 1, 'Año Nuevo'), (5, 1, 'Día del Trabajo'), (5, 8, 'Victoria 1945'), (7, 14, 'Fiesta Nacional'),
+           (8, 15, 'Asunción'), (11, 1, 'Todos los Santos'), (11, 11, 'Armisticio'), (12, 25, 'Navidad')],
+    'DE': [(1, 1, 'Año Nuevo'), (5, 1, 'Día del Trabajo'), (10, 3, 'Día de la Unidad'),
+           (12, 25, 'Navidad'), (12, 26, 'San Esteban')],
+    'IT': [(1, 1, 'Año Nuevo'), (1, 6, 'Epifanía'), (4, 25, 'Liberación'), (5, 1, 'Día del Trabajo'),
+           (6, 2, 'Fiesta de la República'), (8, 15, 'Ferragosto'), (11, 1, 'Todos los Santos'),
+           (12, 8, 'Inmaculada Concepción'), (12, 25, 'Navidad'), (12, 26, 'San Esteban')],
+    'NL': [(1, 1, 'Año Nuevo'), (4, 27, 'Día del Rey'), (12, 25, 'Navidad'), (12, 26, 'San Esteban')],
+    'BE': [(1, 1, 'Año Nuevo'), (5, 1, 'Día del Trabajo'), (7, 21, 'Fiesta Nacional'), (8, 15, 'Asunción'),
+           (11, 1, 'Todos los Santos'), (11, 11, 'Armisticio'), (12, 25, 'Navidad')],
+    'CH': [(1, 1, 'Año Nuevo'), (8, 1, 'Fiesta Nacional'), (12, 25, 'Navidad'), (12, 26, 'San Esteban')],
+    'AT': [(1, 1, 'Año Nuevo'), (1, 6, 'Epifanía'), (5, 1, 'Día del Trabajo'), (8, 15, 'Asunción'),
+           (10, 26, 'Fiesta Nacional'), (11, 1, 'Todos los Santos'), (12, 8, 'Inmaculada Concepción'),
+           (12, 25, 'Navidad'), (12, 26, 'San Esteban')],
+    'PT': [(1, 1, 'Año Nuevo'), (4, 25, 'Día de la Libertad'), (5, 1, 'Día del Trabajo'),
+           (6, 10, 'Día de Portugal'), (8, 15, 'Asunción'), (10, 5, 'Implantación de la República'),
+           (11, 1, 'Todos los Santos'), (12, 1, 'Restauración de la Independencia'),
+           (12, 8, 'Inmaculada Concepción'), (12, 25, 'Navidad')],
+    'CZ': [(1, 1, 'Año Nuevo'), (5, 1, 'Día del Trabajo'), (5, 8, 'Día de la Liberación'),
+           (7, 5, 'Cirilo y Metodio'), (7, 6, 'Jan Hus'), (9, 28, 'San Wenceslao'),
+           (10, 28, 'Día de la Independencia'), (11, 17, 'Día de la Libertad'), (12, 24, 'Nochebuena'),
+           (12, 25, 'Navidad'), (12, 26, 'San Esteban')],
+    'PL': [(1, 1, 'Año Nuevo'), (1, 6, 'Epifanía'), (5, 1, 'Día del Trabajo'), (5, 3, 'Día de la Constitución'),
+           (8, 15, 'Asunción'), (11, 1, 'Todos los Santos'), (11, 11, 'Día de la Independencia'),
+           (12, 25, 'Navidad'), (12, 26, 'San Esteban')],
+}
+
+# Festivos móviles: días respecto al domingo de Pascua
+EASTER_OFFSETS = {
+    -2: 'Viernes Santo', 0: 'Domingo de Pascua', 1: 'Lunes de Pascua', 39: 'Ascensión',
+    49: 'Pentecostés', 50: 'Lunes de Pentecostés', 60: 'Corpus Christi',
+}
+EASTER_HOLIDAYS = {
+    'ES': (-2,), 'FR': (1, 39, 50), 'DE': (-2, 1, 39, 50), 'IT': (1,), 'NL': (1, 39, 50),
+    'BE': (1, 39, 50), 'CH': (-2, 1, 39, 50), 'AT': (1, 39, 50, 60), 'PT': (-2, 60),
+    'CZ': (-2, 1), 'PL': (0, 1, 49, 60),
+}
+
+CALENDAR_COUNTRIES = tuple(FIXED_HOLIDAYS)
+
+# Prohibiciones para camiones (> 7,5 t; > 3,5 t en Suiza). Horas desde las 00:00 del día
+# de referencia; pueden pasar de 24 (noche siguiente) o ser negativas (víspera).
+#   ('weekly', tipo, día de la semana, desde, hasta, meses o None)
+#   ('daily', tipo, desde, hasta)
+#   ('holiday', tipo, desde, hasta)
+TRUCK_BANS = {
+    'DE': [('weekly', 'weekend_ban', 6, 0, 22, None),
+           ('holiday', 'holiday_ban', 0, 22),
+           ('weekly', 'summer_ban', 5, 7, 20, (7, 8))],
+    'AT': [('weekly', 'weekend_ban', 5, 15, 24, None),
+           ('weekly', 'weekend_ban', 6, 0, 22, None),
+           ('holiday', 'holiday_ban', 0, 22),
+           ('daily', 'night_ban', 22, 29)],
+    'CH': [('weekly', 'weekend_ban', 6, 0, 24, None),
+           ('holiday', 'holiday_ban', 0, 24),
+           ('daily', 'night_ban', 22, 29)],
+    'FR': [('weekly', 'weekend_ban', 5, 22, 46, None),
+           ('holiday', 'holiday_ban', -2, 22)],
+    'IT': [('weekly', 'weekend_ban', 6, 9, 22, None),
+           ('holiday', 'holiday_ban', 9, 22)],
+}
+
+BAN_MESSAGES = {
+    'weekend_ban': 'PROHIBIDA circulación camiones en fin de semana',
+    'holiday_ban': 'PROHIBIDA circulación camiones en festivo',
+    'summer_ban': 'PROHIBIDA circulación camiones sábados de verano',
+    'night_ban': 'PROHIBIDA circulación nocturna de camiones',
+}
+LOCAL_BAN_TYPES = frozenset(BAN_MESSAGES)
+
+# Un día queda bloqueado si la prohibición ocupa al menos BLOCKED_MINUTES de la franja de conducción
+DRIVING_WINDOW_HOURS = (5, 22)
+BLOCKED_MINUTES = 8 * 60
+
+# Años precalculables alrededor del actual: fuera de ahí no hay festivos ni prohibiciones
+# (una fecha como 9999-01-01 no fuerza a construir miles de años)
+HORIZON_YEARS = 20
+
+
+def easter_sundays(years: np.ndarray) -> np.ndarray:
+    """Domingo de Pascua (calendario gregoriano) de todos los años a la vez, como datetime64[D]"""
+    y = np.asarray(years, dtype=np.int64)
+    a, b, c = y % 19, y // 100, y % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    months = (y - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1)
+    return months.astype('datetime64[D]') + (day - 1)
+
+
+class IntervalIndex:
+    """
+    Intervalos [inicio, fin) ordenados por inicio con el máximo acumulado de los
+    finales: los solapes con un rango salen de dos búsquedas binarias.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, labels: List[str]):
+        order = np.argsort(starts, kind='stable')
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.labels = [labels[i] for i in order]
+        self._max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start: np.datetime64, end: np.datetime64) -> List[Tuple]:
+        """(inicio, fin, etiqueta) de los intervalos que se solapan con [start, end)"""
+        first = np.searchsorted(self._max_ends, start, side='right')
+        last = np.searchsorted(self.starts, end, side='left')
+        return [(self.starts[k], self.ends[k], self.labels[k])
+                for k in range(first, last) if self.ends[k] > start]
+
+
+def _minutes(day: date, hour: int = 0) -> np.datetime64:
+    return np.datetime64(day, 'm') + np.timedelta64(hour * 60, 'm')
+
+
+class TruckCalendar:
+    def __init__(self, first_year: int = None, last_year: int = None):
+        this_year = date.today().year
+        self.first_year = first_year or this_year - 1
+        self.last_year = last_year or this_year + 10
+        self._lock = threading.Lock()
+        self._holidays, self._bans = self._build(self.first_year, self.last_year)
+
+    @staticmethod
+    def _build(first_year: int, last_year: int) -> Tuple[Dict, Dict]:
+        """Festivos e índices de prohibiciones de todos los años: (festivos, prohibiciones)"""
+        years = np.arange(first_year, last_year + 1)
+        easter = easter_sundays(years)
+
+        holidays: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+        for country in CALENDAR_COUNTRIES:
+            days, names = [], []
+            for month, day, name in FIXED_HOLIDAYS[country]:
+                days.append(np.array([f'{year}-{month:02d}-{day:02d}' for year in years], dtype='datetime64[D]'))
+                names += [name] * len(years)
+            for offset in EASTER_HOLIDAYS.get(country, ()):
+                days.append(easter + offset)
+                names += [EASTER_OFFSETS[offset]] * len(years)
+            days = np.concatenate(days)
+            order = np.argsort(days, kind='stable')
+            holidays[country] = (days[order], [names[i] for i in order])
+
+        all_days = np.arange(np.datetime64(f'{first_year}-01-01'),
+                             np.datetime64(f'{last_year + 1}-01-01'), dtype='datetime64[D]')
+        weekdays = (all_days.astype(np.int64) + 3) % 7  # 1970-01-01 fue jueves
+        months = all_days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+        bans: Dict[str, IntervalIndex] = {}
+        for country, rules in TRUCK_BANS.items():
+            starts, ends, labels = [], [], []
+            for rule in rules:
+                kind, ban_type = rule[0], rule[1]
+                if kind == 'weekly':
+                    weekday, start_h, end_h, only_months = rule[2:]
+                    mask = weekdays == weekday
+                    if only_months:
+                        mask &= np.isin(months, only_months)
+                    base = all_days[mask]
+                elif kind == 'daily':
+                    start_h, end_h = rule[2:]
+                    base = all_days
+                else:
+                    start_h, end_h = rule[2:]
+                    base = np.unique(holidays[country][0])
+                base = base.astype('datetime64[m]')
+                starts.append(base + np.timedelta64(start_h * 60, 'm'))
+                ends.append(base + np.timedelta64(end_h * 60, 'm'))
+                labels += [ban_type] * len(base)
+            bans[country] = IntervalIndex(np.concatenate(starts), np.concatenate(ends), labels)
+        return holidays, bans
+
+    def _ensure_years(self, first: int, last: int):
+        """
+        Ampliar el rango precalculado si la consulta cae fuera (sin salir del
+        horizonte). Se construye aparte y se publica al final: las consultas
+        concurrentes siguen viendo los índices anteriores completos.
+        """
+        this_year = date.today().year
+        first = max(first, this_year - HORIZON_YEARS)
+        last = min(last, this_year + HORIZON_YEARS)
+        if first > last or (self.first_year <= first and last <= self.last_year):
+            return
+        with self._lock:
+            if self.first_year <= first and last <= self.last_year:
+                return
+            first_year, last_year = min(self.first_year, first), max(self.last_year, last + 1)
+            self._holidays, self._bans = self._build(first_year, last_year)
+            self.first_year, self.last_year = first_year, last_year
+
+    def holidays(self, country: str, date_from: date, date_to: date) -> List[Dict]:
+        """Festivos del país entre las dos fechas (inclusive)"""
+        if country not in self._holidays:
+            return []
+        self._ensure_years(date_from.year, date_to.year)
+        days, names = self._holidays[country]
+        first = np.searchsorted(days, np.datetime64(date_from, 'D'), side='left')
+        last = np.searchsorted(days, np.datetime64(date_to, 'D'), side='right')
+        return [{'country': country, 'date': str(days[k]), 'name': names[k]} for k in range(first, last)]
+
+    def bans(self, country: str, start: datetime, end: datetime, heavy: bool = True) -> List[Dict]:
+        """Prohibiciones de camiones que se solapan con [start, end)"""
+        if not heavy or country not in self._bans:
+            return []
+        self._ensure_years(start.year, end.year)
+        return [{'country': country, 'type': label,
+                 'start': str(ban_start).replace('T', ' '), 'end': str(ban_end).replace('T', ' ')}
+                for ban_start, ban_end, label in self._bans[country].overlapping(
+                    np.datetime64(start, 'm'), np.datetime64(end, 'm'))]
+
+    def blocked_days(self, country: str, start: date, days: int, heavy: bool = True) -> np.ndarray:
+        """Días (desde start) en los que la prohibición ocupa la mayor parte de la franja de conducción"""
+        blocked = np.zeros(days, dtype=bool)
+        if not heavy or country not in self._bans:
+            return blocked
+        end = start + timedelta(days=days)
+        self._ensure_years(start.year, end.year)
+        index = self._bans[country]
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            window_start, window_end = _minutes(day, DRIVING_WINDOW_HOURS[0]), _minutes(day, DRIVING_WINDOW_HOURS[1])
+            covered, cursor = 0, window_start
+            for ban_start, ban_end, _ in index.overlapping(window_start, window_end):
+                ban_start, ban_end = max(ban_start, cursor), min(ban_end, window_end)
+                if ban_end > ban_start:
+                    covered += int((ban_end - ban_start) / np.timedelta64(1, 'm'))
+                    cursor = ban_end
+            blocked[offset] = covered >= BLOCKED_MINUTES
+        return blocked
+
+    def restrictions(self, countries: List[str], pickup_date: str, vehicle_specs: Optional[Dict] = None) -> Dict:
+        """Festivos y prohibiciones del día de recogida, con el formato de get_restrictions_and_holidays"""
+        day = datetime.strptime(pickup_date, '%Y-%m-%d')
+        heavy = not vehicle_specs or vehicle_specs.get('type') != 'van'
+        alerts, holidays = [], []
+        for country in countries:
+            holidays += self.holidays(country, day.date(), day.date())
+            for ban in self.bans(country, day, day + timedelta(days=1), heavy):
+                alerts.append({
+                    **ban,
+                    'severity': 'warning' if ban['type'] == 'night_ban' else 'critical',
+                    'message': f"{BAN_MESSAGES[ban['type']]} en {country} ({ban['start']} - {ban['end']})"
+                })
+        return {
+            'restrictions': alerts,
+            'holidays': holidays,
+            'critical_alerts': len([a for a in alerts if a['severity'] == 'critical'])
+        }
+
+
+TRUCK_CALENDAR = TruckCalendar()
@@ -1049,6 +1049,8 @@ AXEL Solutions
           tracking: true,
           signature: false
         },
+        // Ruta, peajes y restricciones que el agente ya calculó
+        precomputed: quoteRequest.precomputed,
         // Mark as AI-generated
         assignedTo: quoteRequest.metadata?.assignedTo || 'ai-agent',
         createdBy: 'claude-ai-agent'
@@ -24,36 +24,44 @@ class MasterQuoteService {
     try {
       console.log('🚀 Iniciando cotización inteligente...');
       
+      // Ruta, peajes y restricciones ya calculados por el agente (prefetch)
+      const precomputed = this.getPrecomputed(quoteRequest);
+
       // PASO 1: Calcular ruta real con OpenRoute (HGV) y obtener precios
       const [routeData, transportistPrices] = await Promise.all([
-        this.openRouteService.calculateRoute(quoteRequest.route.origin, quoteRequest.route.destination),
+        precomputed.route ||
+          this.openRouteService.calculateRoute(quoteRequest.route.origin, quoteRequest.route.destination),
         this.transportistService.getAllPrices(quoteRequest)
       ]);
 
       console.log(`✅ Datos obtenidos: ${transportistPrices.length} precios, ruta ${routeData.distance}km`);
 
       // PASO 1.5: Calcular peajes exactos con TollGuru usando polyline OpenRoute
-      let tollData = null;
-      try {
-        const vehicleSpecs = this.getVehicleSpecs(quoteRequest.cargo);
-        if (routeData.geometry) {
-          tollData = await this.tollGuruService.calculateTollsFromPolyline(routeData.geometry, vehicleSpecs);
-          console.log(`🛣️ Peajes calculados: €${tollData.tolls.totalCost} (${tollData.tolls.breakdown.length} países)`);
-        } else {
-          // Si no hay geometry, usar fallback con datos de ruta
-          console.log('🔄 Sin geometry disponible, usando fallback con datos de ruta');
+      let tollData = precomputed.tolls;
+      if (tollData) {
+        console.log(`🛣️ Peajes precalculados: €${tollData.tolls.totalCost}`);
+      } else {
+        try {
+          const vehicleSpecs = this.getVehicleSpecs(quoteRequest.cargo);
+          if (routeData.geometry) {
+            tollData = await this.tollGuruService.calculateTollsFromPolyline(routeData.geometry, vehicleSpecs);
+            console.log(`🛣️ Peajes calculados: €${tollData.tolls.totalCost} (${tollData.tolls.breakdown.length} países)`);
+          } else {
+            // Si no hay geometry, usar fallback con datos de ruta
+            console.log('🔄 Sin geometry disponible, usando fallback con datos de ruta');
+            tollData = await this.tollGuruService.calculateFallbackTolls(routeData, vehicleSpecs);
+            console.log(`🛣️ Peajes estimados: €${tollData.tolls.totalCost} (${tollData.tolls.breakdown.length} países)`);
+          }
+        } catch (error) {
+          console.warn('⚠️ Error calculando peajes con TollGuru, usando fallback:', error.message);
+          // Fallback final si todo falla
+          const vehicleSpecs = this.getVehicleSpecs(quoteRequest.cargo);
           tollData = await this.tollGuruService.calculateFallbackTolls(routeData, vehicleSpecs);
-          console.log(`🛣️ Peajes estimados: €${tollData.tolls.totalCost} (${tollData.tolls.breakdown.length} países)`);
         }
-      } catch (error) {
-        console.warn('⚠️ Error calculando peajes con TollGuru, usando fallback:', error.message);
-        // Fallback final si todo falla
-        const vehicleSpecs = this.getVehicleSpecs(quoteRequest.cargo);
-        tollData = await this.tollGuruService.calculateFallbackTolls(routeData, vehicleSpecs);
       }
 
       // PASO 2: Analizar restricciones europeas en tiempo real
-      const restrictions = await this.restrictionsService.getRouteRestrictions(
+      const restrictions = precomputed.restrictions || await this.restrictionsService.getRouteRestrictions(
         routeData,
         this.getVehicleSpecs(quoteRequest.cargo),
         quoteRequest.service.pickupDate
@@ -207,7 +215,7 @@ class MasterQuoteService {
           routeConfidence: routeData.confidence,
           tollSource: tollData ? tollData.source : 'Estimation',
           tollConfidence: tollData ? tollData.confidence : 70,
-          restrictionsSource: 'EuropeanRestrictionsService',
+          restrictionsSource: restrictions.source || 'EuropeanRestrictionsService',
           countries: routeData.countries.length
         },
 
@@ -222,7 +230,7 @@ class MasterQuoteService {
           summary: restrictions.summary,
           criticalRestrictions: restrictions.alerts.filter(a => a.severity === 'critical'),
           affectedCountries: [...new Set(restrictions.alerts.map(a => a.country))],
-          source: 'EuropeanRestrictionsService'
+          source: restrictions.source || 'EuropeanRestrictionsService'
         },
 
         // Additional fields for database storage
@@ -250,6 +258,73 @@ class MasterQuoteService {
     }
   }
 
+  /**
+   * 📦 Ruta, peajes y restricciones precalculados (campo `precomputed`)
+   * Cada bloque se usa sólo si es válido; los que falten se calculan como siempre.
+   * Peajes y restricciones dependen de la ruta: sin ruta precalculada se ignoran.
+   */
+  getPrecomputed(quoteRequest) {
+    const precomputed = quoteRequest.precomputed || {};
+    const result = { route: null, tolls: null, restrictions: null };
+
+    const route = precomputed.route;
+    if (route && Number(route.distance) > 0 && Number(route.duration) > 0 &&
+        Array.isArray(route.countries) && route.countries.length > 0) {
+      const distance = Math.round(Number(route.distance));
+      const duration = Math.round(Number(route.duration));
+      result.route = {
+        origin: quoteRequest.route.origin,
+        destination: quoteRequest.route.destination,
+        distance,
+        duration,
+        estimatedTransitDays: this.openRouteService.calculateRealisticTransitDays(duration, distance),
+        countries: route.countries,
+        mainHighways: [],
+        geometry: route.geometry && route.geometry.coordinates ? route.geometry : null,
+        source: route.source || 'LUC1 prefetch',
+        confidence: route.confidence || 85
+      };
+    }
+
+    const tolls = precomputed.tolls;
+    if (result.route && tolls && Number.isFinite(Number(tolls.totalCost)) && Number(tolls.totalCost) >= 0) {
+      result.tolls = {
+        tolls: {
+          totalCost: Number(tolls.totalCost),
+          breakdown: Array.isArray(tolls.breakdown) ? tolls.breakdown : [],
+          vignettes: [],
+          specialTolls: []
+        },
+        source: tolls.source || 'LUC1 prefetch',
+        confidence: tolls.confidence || 85
+      };
+    }
+
+    const restrictions = precomputed.restrictions;
+    if (result.route && restrictions && Array.isArray(restrictions.alerts)) {
+      const summary = { critical: 0, warnings: 0, info: 0 };
+      restrictions.alerts.forEach(alert => {
+        const level = alert.severity === 'warning' ? 'warnings' : alert.severity;
+        if (level in summary) summary[level]++;
+      });
+      result.restrictions = {
+        route: `${quoteRequest.route.origin} → ${quoteRequest.route.destination}`,
+        countries: result.route.countries,
+        date: quoteRequest.service && quoteRequest.service.pickupDate,
+        alerts: restrictions.alerts,
+        holidays: Array.isArray(restrictions.holidays) ? restrictions.holidays : [],
+        summary,
+        source: restrictions.source || 'LUC1 prefetch'
+      };
+    }
+
+    const used = Object.keys(result).filter(stage => result[stage]);
+    if (used.length) {
+      console.log(`📦 Usando datos precalculados: ${used.join(', ')}`);
+    }
+    return result;
+  }
+
   generateServiceAlternatives(analysis, routeData, pickupDate, cargoType, restrictions = [], holidays = []) {
     const basePrice = analysis.finalPrice;
     const deliverySchedulingService = require('./deliverySchedulingService');
@@ -0,0 +1,66 @@
+/**
+ * Tests de datos precalculados (ruta, peajes y restricciones del agente)
+ */
+
+const MasterQuoteService = require('../services/masterQuoteService');
+
+const quoteRequest = (precomputed) => ({
+  route: { origin: 'Madrid', destination: 'París' },
+  service: { pickupDate: '2026-10-20' },
+  precomputed
+});
+
+describe('MasterQuoteService.getPrecomputed', () => {
+  let service;
+
+  beforeAll(() => {
+    service = new MasterQuoteService();
+  });
+
+  test('usa ruta, peajes y restricciones válidos', () => {
+    const result = service.getPrecomputed(quoteRequest({
+      route: { distance: 1270.4, duration: 14.2, countries: ['ES', 'FR'] },
+      tolls: { totalCost: 182.5, breakdown: [{ country: 'FR', cost: 150 }] },
+      restrictions: {
+        alerts: [{ country: 'FR', severity: 'critical' }, { country: 'ES', severity: 'warning' }],
+        holidays: [{ country: 'ES', date: '2026-10-20', name: 'Festivo' }]
+      }
+    }));
+
+    expect(result.route.distance).toBe(1270);
+    expect(result.route.duration).toBe(14);
+    expect(result.route.countries).toEqual(['ES', 'FR']);
+    expect(result.route.estimatedTransitDays).toBeGreaterThan(0);
+    expect(result.route.geometry).toBeNull();
+    expect(result.tolls.tolls.totalCost).toBe(182.5);
+    expect(result.tolls.tolls.breakdown).toHaveLength(1);
+    expect(result.restrictions.summary).toEqual({ critical: 1, warnings: 1, info: 0 });
+    expect(result.restrictions.holidays).toHaveLength(1);
+  });
+
+  test('sin bloque precalculado se calcula todo', () => {
+    expect(service.getPrecomputed(quoteRequest(undefined)))
+      .toEqual({ route: null, tolls: null, restrictions: null });
+  });
+
+  test('peajes y restricciones sin ruta válida se ignoran', () => {
+    const result = service.getPrecomputed(quoteRequest({
+      route: { distance: 0, duration: 14, countries: ['ES'] },
+      tolls: { totalCost: 100 },
+      restrictions: { alerts: [] }
+    }));
+
+    expect(result).toEqual({ route: null, tolls: null, restrictions: null });
+  });
+
+  test('peajes no numéricos se ignoran', () => {
+    const result = service.getPrecomputed(quoteRequest({
+      route: { distance: 600, duration: 7, countries: ['ES'] },
+      tolls: { totalCost: 'n/a' }
+    }));
+
+    expect(result.route.distance).toBe(600);
+    expect(result.tolls).toBeNull();
+    expect(result.restrictions).toBeNull();
+  });
+});